@@ -14,12 +14,17 @@ Key features:
   - Wayback Machine fallback for dead links
   - SHA256 checksums for all downloaded files
   - Resume capability (skips already-completed rows)
+  - JS-rendered pages are recognised from the raw HTML (js_classifier.py)
+    and left for browser_recover.py instead of being scraped as shells
 
 Usage:
   python acf_harvest.py                          # Process all rows
   python acf_harvest.py --start-row 1 --end-row 100   # Process rows 1-100
   python acf_harvest.py --resume                 # Skip completed rows
   python acf_harvest.py --dry-run                # Parse URLs only, no downloads
+  python acf_harvest.py --no-js-classifier       # Scrape every HTML page as-is
+  python acf_harvest.py --warc-record ../warc   # Keep every HTTP exchange in WARC files
+  python acf_harvest.py --warc-replay ../warc   # Re-run offline from them
 """
 
 import argparse
@@ -29,7 +34,6 @@ import logging
 import os
 import re
 import sys
-import time
 from datetime import datetime
 from pathlib import Path
 from urllib.parse import urljoin, urlparse
@@ -38,6 +42,11 @@ import openpyxl
 import requests
 from bs4 import BeautifulSoup
 
+from js_classifier import HostDecisions, classify
+from url_variants import VariantProber
+import v2_shared  # noqa: F401
+import warc_session
+
 # ─── Configuration ────────────────────────────────────────────────────────────
 
 DEFAULT_INPUT = os.path.join(os.path.dirname(__file__), "..", "input",
@@ -148,24 +157,22 @@ def fetch_with_retry(url, session, retries=MAX_RETRIES, timeout=REQUEST_TIMEOUT)
                 wait = 2 ** (attempt + 1)
                 logging.warning(f"  Retry {attempt+1}/{retries} for {url} "
                                 f"(waiting {wait}s): {e}")
-                time.sleep(wait)
+                warc_session.pause(wait)
             else:
                 logging.error(f"  Failed after {retries} attempts: {url} — {e}")
                 return None
 
 
-def try_alternate_domain(url, session):
-    """Try alternate ACF domain if the original fails.
-    acf.gov and www.acf.hhs.gov often serve the same content."""
-    alt_url = None
-    if "acf.gov/" in url and "acf.hhs.gov" not in url:
-        alt_url = url.replace("acf.gov/", "www.acf.hhs.gov/", 1)
-    elif "www.acf.hhs.gov/" in url:
-        alt_url = url.replace("www.acf.hhs.gov/", "acf.gov/", 1)
-
-    if alt_url:
-        logging.info(f"  Trying alternate domain: {alt_url}")
-        resp = fetch_with_retry(alt_url, session, retries=2)
+def try_alternate_domain(url, session, prober=None):
+    """Try alternate ACF URLs if the original fails.
+    acf.gov and www.acf.hhs.gov often serve the same content, and pages
+    moved between /resource/, /policy-guidance/ and /archive/; the
+    variants are probed together (url_variants.py)."""
+    prober = prober or VariantProber(session, headers=HEADERS)
+    hit = prober.find(url)
+    if hit:
+        logging.info(f"  Trying alternate URL ({hit['rule']}): {hit['url']}")
+        resp = fetch_with_retry(hit["url"], session, retries=2)
         if resp:
             return resp
     return None
@@ -181,7 +188,7 @@ def try_wayback(url, session):
         if snapshot.get("available"):
             wb_url = snapshot["url"]
             logging.info(f"  Wayback fallback found: {wb_url}")
-            time.sleep(WAYBACK_DELAY)
+            warc_session.pause(WAYBACK_DELAY)
             return fetch_with_retry(wb_url, session)
     except Exception as e:
         logging.warning(f"  Wayback lookup failed for {url}: {e}")
@@ -324,8 +331,23 @@ def download_file(url, dest_dir, session, prefix=""):
 
 # ─── Row Processing ──────────────────────────────────────────────────────────
 
-def process_row(row_data, output_dir, session, dry_run=False):
-    """Process a single inventory row: visit URLs, scrape, download."""
+def _hand_to_browser(result, row_dir, url, decision, html=None):
+    """Mark a row for browser_recover.py; keep the raw page if we have one."""
+    result["browser_lane"] = {"url": url, **decision}
+    if html is not None:
+        with open(os.path.join(row_dir, "page_content.html"), "w", encoding="utf-8") as f:
+            f.write(html)
+    logging.info(f"  JS-rendered ({', '.join(decision['signals'])}) — "
+                 f"left for browser recovery")
+
+
+def process_row(row_data, output_dir, session, dry_run=False, js_hosts=None,
+                prober=None):
+    """
+    Process a single inventory row: visit URLs, scrape, download.
+    js_hosts: a HostDecisions cache to classify HTML pages with, or None
+    to scrape every page as-is. prober: the VariantProber for dead links.
+    """
     row_num = row_data["excel_row"]
     folder_name = f"{row_num:04d}"
     row_dir = os.path.join(output_dir, folder_name)
@@ -357,14 +379,24 @@ def process_row(row_data, output_dir, session, dry_run=False):
         url = url_info["url"]
         logging.info(f"Row {row_num:04d}: Visiting {url}")
 
-        time.sleep(REQUEST_DELAY)
+        # Hosts that always turned out JS-rendered aren't fetched raw,
+        # apart from a sample that keeps their verdict current
+        path_ext = os.path.splitext(urlparse(url).path)[1].lower()
+        if (js_hosts is not None and path_ext not in DOWNLOAD_EXTENSIONS - {".htm", ".html"}
+                and js_hosts.skip_raw(url)):
+            _hand_to_browser(result, row_dir, url,
+                             {"needs_browser": True, "score": None,
+                              "signals": ["host_verdict"], "main_chars": None})
+            continue
+
+        warc_session.pause(REQUEST_DELAY)
 
         # First try direct fetch
         resp = fetch_with_retry(url, session)
 
         # Try alternate domain if direct fails
         if not resp:
-            resp = try_alternate_domain(url, session)
+            resp = try_alternate_domain(url, session, prober)
 
         # Wayback fallback if both fail
         if not resp:
@@ -418,12 +450,17 @@ def process_row(row_data, output_dir, session, dry_run=False):
 
         # Case 2: HTML page — scrape for document links
         if "html" in content_type or "text" in content_type:
+            if js_hosts is not None and "html" in content_type:
+                decision = js_hosts.record(resp.url, classify(resp.text, resp.url))
+                if decision["needs_browser"]:
+                    _hand_to_browser(result, row_dir, url, decision, resp.text)
+                    continue
             try:
                 doc_links = find_downloadable_links(resp.text, resp.url)
                 logging.info(f"  Found {len(doc_links)} downloadable links on page")
 
                 for link in doc_links:
-                    time.sleep(REQUEST_DELAY)
+                    warc_session.pause(REQUEST_DELAY)
                     file_meta = download_file(link["url"], row_dir, session)
                     if file_meta:
                         file_meta["link_text"] = link["text"]
@@ -483,7 +520,12 @@ def main():
                         help="Skip rows that already have output folders")
     parser.add_argument("--dry-run", action="store_true",
                         help="Parse and log URLs without downloading")
+    parser.add_argument("--no-js-classifier", action="store_true",
+                        help="Scrape JS-rendered pages too instead of leaving "
+                             "them for browser recovery")
+    warc_session.add_arguments(parser)
     args = parser.parse_args()
+    warc_session.setup(args.warc_record, args.warc_replay, stage="acf_harvest")
 
     # Resolve paths
     input_path = os.path.abspath(args.input)
@@ -515,14 +557,23 @@ def main():
                  f"({end - start + 1} rows)")
 
     # Initialize session
-    session = requests.Session()
+    session = warc_session.attach(requests.Session())
     session.headers.update(HEADERS)
 
+    # Per-host JS decisions, kept between runs
+    js_hosts = None
+    if not args.no_js_classifier:
+        js_hosts = HostDecisions(os.path.join(reports_dir, "js_host_decisions.json"))
+
+    # Rewrite rules that found live pages before are tried first
+    prober = VariantProber(session, headers=HEADERS,
+                           learned_path=os.path.join(reports_dir, "url_variant_rules.json"))
+
     # Track results
     results = []
     stats = {"success": 0, "failed": 0, "no_urls": 0,
              "no_documents": 0, "skipped": 0, "dry_run": 0,
-             "total_files": 0}
+             "browser_lane": 0, "total_files": 0}
 
     start_time = datetime.now()
 
@@ -542,7 +593,7 @@ def main():
         # Extract and process
         row_data = extract_row_data(ws, excel_row)
         result = process_row(row_data, output_dir, session,
-                             dry_run=args.dry_run)
+                             dry_run=args.dry_run, js_hosts=js_hosts, prober=prober)
         results.append(result)
 
         # Update stats
@@ -550,6 +601,8 @@ def main():
         if status in stats:
             stats[status] += 1
         stats["total_files"] += len(result.get("files_downloaded", []))
+        if result.get("browser_lane"):
+            stats["browser_lane"] += 1
 
         # Progress update every 50 rows
         processed = i - start + 1
@@ -569,6 +622,7 @@ def main():
     logging.info(f"  Failed: {stats['failed']}")
     logging.info(f"  No URLs: {stats['no_urls']}")
     logging.info(f"  No documents found: {stats['no_documents']}")
+    logging.info(f"  Left for browser (JS-rendered): {stats['browser_lane']}")
     logging.info(f"  Skipped (resume): {stats['skipped']}")
     logging.info(f"  Total files downloaded: {stats['total_files']}")
     logging.info("=" * 60)
@@ -580,6 +634,8 @@ def main():
         "duration_seconds": elapsed,
         "row_range": {"start": start, "end": end},
         "stats": stats,
+        "js_hosts": js_hosts.report() if js_hosts is not None else None,
+        "url_variants": prober.stats,
         "results": results
     }
 
@@ -587,6 +643,9 @@ def main():
     with open(report_path, "w", encoding="utf-8") as f:
         json.dump(report, f, indent=2, default=str)
     logging.info(f"Report saved: {report_path}")
+    if js_hosts is not None:
+        js_hosts.save()
+    prober.save()
 
     # Also save a CSV summary for quick reference
     csv_path = os.path.join(reports_dir, f"harvest_summary_{timestamp}.csv")
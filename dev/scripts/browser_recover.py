@@ -8,10 +8,11 @@ that the basic requests-based scraper couldn't handle.
 Targets:
   - headstart.gov pages (OHS office) — JS-rendered content
   - Any remaining no_documents pages with saved HTML that had too little content
+    (including those acf_harvest.py left here as JS-rendered: "browser_lane")
   - Failed rows get one more try with a real browser
 
 Prerequisites:
-  pip install playwright fpdf2 beautifulsoup4
+  pip install playwright fpdf2 beautifulsoup4   # fpdf2 for html_pdf.py's fpdf backend
   playwright install chromium
 
 Usage:
@@ -19,6 +20,14 @@ Usage:
   python browser_recover.py --phase 1        # JS-rendered pages only
   python browser_recover.py --phase 2        # Retry failed only
   python browser_recover.py --dry-run        # Preview
+  python browser_recover.py --block-profile hosts.json  # Per-host request blocking
+  python browser_recover.py --no-block       # Load images, fonts, trackers too
+  python browser_recover.py --workers 8 --host-limit headstart.gov=4
+
+Images, media, fonts and trackers are not loaded (see resource_profile.py),
+and a page counts as loaded once its main content has rendered rather
+than at networkidle (page_ready.py). A page that ends up printed with
+page.pdf() is first reloaded with nothing blocked.
 """
 
 import argparse
@@ -32,7 +41,6 @@ from datetime import datetime
 from urllib.parse import urljoin, urlparse
 
 from bs4 import BeautifulSoup
-from fpdf import FPDF
 
 try:
     from playwright.sync_api import sync_playwright
@@ -43,6 +51,11 @@ except ImportError:
     print("  playwright install chromium")
     sys.exit(1)
 
+from resource_profile import ResourceBlocker, load_profiles, combined_stats
+from recovery_pool import run_pool, parse_host_limits, DEFAULT_WORKERS
+from page_ready import wait_until_ready, summarize
+from v2_shared import convert_html
+
 DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), "..", "output")
 DEFAULT_REPORTS = os.path.join(os.path.dirname(__file__), "..", "reports")
 
@@ -79,166 +92,6 @@ def safe_filename(name, max_len=100):
 
 # ─── PDF Creation ────────────────────────────────────────────────────────────
 
-class GuidancePDF(FPDF):
-    def __init__(self, title="", doc_number="", office="", source_url=""):
-        super().__init__()
-        self.doc_title = title
-        self.doc_number = doc_number
-        self.office = office
-        self.source_url = source_url
-
-    def header(self):
-        self.set_font("Helvetica", "B", 8)
-        self.set_text_color(100, 100, 100)
-        header_text = f"ACF {self.office}"
-        if self.doc_number:
-            header_text += f" | {self.doc_number}"
-        self.cell(0, 5, header_text, new_x="LMARGIN", new_y="NEXT", align="L")
-        self.line(10, self.get_y(), 200, self.get_y())
-        self.ln(3)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font("Helvetica", "I", 7)
-        self.set_text_color(128, 128, 128)
-        self.cell(0, 10, f"Page {self.page_no()}/{{nb}} | Source: {self.source_url[:80]}",
-                  new_x="LMARGIN", new_y="TOP", align="C")
-
-
-def extract_blocks_from_html(html_content):
-    """Extract structured text blocks from rendered HTML."""
-    soup = BeautifulSoup(html_content, "html.parser")
-
-    # Remove junk
-    for tag in soup.find_all(["script", "style", "nav", "footer", "noscript",
-                               "iframe", "svg", "meta", "link", "button"]):
-        tag.decompose()
-
-    for tag in soup.find_all(attrs={"class": re.compile(
-            r"header|banner|nav|menu|sidebar|footer|breadcrumb|skip|cookie|usa-banner",
-            re.I)}):
-        tag.decompose()
-    for tag in soup.find_all(attrs={"id": re.compile(
-            r"header|banner|nav|menu|sidebar|footer|breadcrumb|skip|cookie",
-            re.I)}):
-        tag.decompose()
-    for tag in soup.find_all(attrs={"role": re.compile(
-            r"navigation|banner|complementary", re.I)}):
-        tag.decompose()
-
-    # Find main content
-    main = (soup.find("main") or
-            soup.find("article") or
-            soup.find("div", {"class": re.compile(
-                r"field--name-body|node__content|content-area|main-content|page-content",
-                re.I)}) or
-            soup.find("div", {"id": re.compile(
-                r"content|main|block-system-main", re.I)}) or
-            soup.find("body"))
-
-    if not main:
-        main = soup
-
-    blocks = []
-    seen_starts = set()
-
-    for element in main.find_all(["h1", "h2", "h3", "h4", "h5", "p", "li",
-                                    "td", "th", "div", "span", "blockquote",
-                                    "dd", "dt", "figcaption", "label",
-                                    "section", "article"]):
-        text = element.get_text(separator=" ", strip=True)
-
-        if not text or len(text) < 10:
-            continue
-
-        # Skip navigation junk
-        if any(skip in text.lower() for skip in [
-            "skip to main", "here's how you know", ".gov website",
-            "secure .gov", "official website", "share sensitive",
-            "an official website of the united states",
-            "contact us", "upcoming events", "login",
-        ]):
-            continue
-
-        # Deduplicate
-        start = text[:50]
-        if start in seen_starts:
-            continue
-        seen_starts.add(start)
-
-        is_heading = element.name in ["h1", "h2", "h3", "h4", "h5"]
-        blocks.append({
-            "text": text,
-            "is_heading": is_heading,
-            "level": int(element.name[1]) if is_heading else 0
-        })
-
-    return blocks
-
-
-def create_pdf_from_blocks(blocks, metadata, output_path):
-    """Create PDF from text blocks."""
-    title = metadata.get("title", "")
-    doc_number = metadata.get("doc_number", "")
-    office = metadata.get("office", "")
-    issue_date = metadata.get("issue_date", "")
-    source_url = metadata["urls"][0]["url"] if metadata.get("urls") else ""
-
-    pdf = GuidancePDF(title=title, doc_number=doc_number,
-                      office=office, source_url=source_url)
-    pdf.alias_nb_pages()
-    pdf.set_auto_page_break(auto=True, margin=20)
-    pdf.add_page()
-
-    # Title
-    pdf.set_font("Helvetica", "B", 14)
-    pdf.set_text_color(0, 0, 0)
-    if title:
-        safe_title = title.encode('latin-1', 'replace').decode('latin-1')
-        pdf.multi_cell(0, 7, safe_title, new_x="LMARGIN", new_y="NEXT")
-    pdf.ln(2)
-
-    # Metadata
-    meta_parts = []
-    if doc_number:
-        meta_parts.append(f"Document: {doc_number}")
-    if office:
-        meta_parts.append(f"Office: {office}")
-    if issue_date:
-        meta_parts.append(f"Date: {issue_date[:10]}")
-    if meta_parts:
-        pdf.set_font("Helvetica", "I", 9)
-        pdf.set_text_color(80, 80, 80)
-        pdf.cell(0, 5, " | ".join(meta_parts), new_x="LMARGIN", new_y="NEXT")
-        pdf.ln(1)
-
-    if source_url:
-        pdf.set_font("Helvetica", "I", 8)
-        pdf.set_text_color(0, 0, 200)
-        safe_url = source_url.encode('latin-1', 'replace').decode('latin-1')
-        pdf.cell(0, 5, f"Source: {safe_url}", new_x="LMARGIN", new_y="NEXT")
-        pdf.ln(1)
-
-    pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-    pdf.ln(4)
-    pdf.set_text_color(0, 0, 0)
-
-    for block in blocks:
-        safe_text = block["text"].encode('latin-1', 'replace').decode('latin-1')
-        if block["is_heading"]:
-            size = {1: 14, 2: 12, 3: 11}.get(block["level"], 11)
-            pdf.set_font("Helvetica", "B", size)
-            pdf.ln(2)
-            pdf.multi_cell(0, 6, safe_text, new_x="LMARGIN", new_y="NEXT")
-            pdf.ln(1)
-        else:
-            pdf.set_font("Helvetica", "", 10)
-            pdf.multi_cell(0, 5, safe_text, new_x="LMARGIN", new_y="NEXT")
-            pdf.ln(2)
-
-    pdf.output(output_path)
-
-
 def find_downloadable_links_from_page(page_content, base_url):
     """Find downloadable file links in HTML."""
     soup = BeautifulSoup(page_content, "html.parser")
@@ -264,20 +117,22 @@ def find_downloadable_links_from_page(page_content, base_url):
 
 # ─── Browser-Based Processing ───────────────────────────────────────────────
 
-def process_with_browser(page, row_dir, metadata, url):
-    """Visit a URL with Playwright browser and extract content/files."""
+def process_with_browser(page, row_dir, metadata, url, timings=None, blocker=None):
+    """
+    Visit a URL with Playwright browser and extract content/files.
+    The page's time-to-ready is appended to `timings` if given; the
+    context's ResourceBlocker, if any, is lifted before print-to-PDF.
+    """
+    started = time.perf_counter()
     try:
-        response = page.goto(url, timeout=NAVIGATE_TIMEOUT,
-                             wait_until="networkidle")
+        response = page.goto(url, timeout=NAVIGATE_TIMEOUT, wait_until="domcontentloaded")
     except Exception as e:
-        # Try with just domcontentloaded if networkidle times out
-        try:
-            response = page.goto(url, timeout=NAVIGATE_TIMEOUT,
-                                 wait_until="domcontentloaded")
-            page.wait_for_timeout(3000)  # Wait 3s for JS to render
-        except Exception as e2:
-            print(f"    [FAIL] Could not load page: {e2}")
-            return False
+        print(f"    [FAIL] Could not load page: {e}")
+        return False
+    # Main content rendered, or the DOM went quiet (page_ready.py)
+    ready = wait_until_ready(page, started)
+    if timings is not None:
+        timings.append({"url": url, **ready})
 
     if not response:
         print(f"    [FAIL] No response")
@@ -342,75 +197,81 @@ def process_with_browser(page, row_dir, metadata, url):
         metadata["recovery_method"] = "browser_scrape"
         return True
 
-    # No files found — try to extract text and convert to PDF
-    blocks = extract_blocks_from_html(rendered_html)
-
-    if blocks and len(blocks) >= 2:
-        doc_num = metadata.get("doc_number", "").strip()
-        if doc_num:
-            sname = re.sub(r'[^a-zA-Z0-9_-]', '_', doc_num)
-            pdf_name = f"{sname}_browser.pdf"
-        else:
-            pdf_name = f"guidance_{os.path.basename(row_dir)}_browser.pdf"
+    # No files found — convert the rendered page to a text PDF
+    doc_num = metadata.get("doc_number", "").strip()
+    if doc_num:
+        sname = re.sub(r'[^a-zA-Z0-9_-]', '_', doc_num)
+        pdf_name = f"{sname}_browser.pdf"
+    else:
+        pdf_name = f"guidance_{os.path.basename(row_dir)}_browser.pdf"
+
+    pdf_path = os.path.join(row_dir, pdf_name)
+    ok, reason = convert_html(html_path, pdf_path, metadata)
+    if ok:
+        file_size = os.path.getsize(pdf_path)
+        metadata["files_downloaded"].append({
+            "filename": pdf_name,
+            "source_url": url,
+            "size_bytes": file_size,
+            "sha256": sha256_file(pdf_path),
+            "content_type": "application/pdf",
+            "download_type": "browser_html_to_pdf"
+        })
+        metadata["status"] = "success"
+        metadata["recovery_method"] = "browser_html_to_pdf"
+        print(f"    [OK] Converted to PDF: {pdf_name} ({file_size:,} bytes)")
+        return True
+    if reason != "insufficient_content":
+        print(f"    [ERROR] PDF creation: {reason}")
+        return False
 
+    # Last resort: use Playwright's built-in PDF generation, of the page
+    # reloaded with the styles, images and fonts the blocker kept out
+    try:
+        if blocker is not None:
+            blocker.lift(page, NAVIGATE_TIMEOUT)
+        pdf_name = f"guidance_{os.path.basename(row_dir)}_print.pdf"
         pdf_path = os.path.join(row_dir, pdf_name)
-
-        try:
-            create_pdf_from_blocks(blocks, metadata, pdf_path)
-            file_size = os.path.getsize(pdf_path)
+        page.pdf(path=pdf_path, format="Letter",
+                 margin={"top": "0.75in", "bottom": "0.75in",
+                         "left": "0.75in", "right": "0.75in"},
+                 print_background=True)
+        file_size = os.path.getsize(pdf_path)
+        if file_size > 1000:
             metadata["files_downloaded"].append({
                 "filename": pdf_name,
                 "source_url": url,
                 "size_bytes": file_size,
                 "sha256": sha256_file(pdf_path),
                 "content_type": "application/pdf",
-                "download_type": "browser_html_to_pdf"
+                "download_type": "browser_print_to_pdf"
             })
             metadata["status"] = "success"
-            metadata["recovery_method"] = "browser_html_to_pdf"
-            print(f"    [OK] Converted to PDF: {pdf_name} ({file_size:,} bytes, {len(blocks)} blocks)")
+            metadata["recovery_method"] = "browser_print_to_pdf"
+            print(f"    [OK] Print-to-PDF: {pdf_name} ({file_size:,} bytes)")
             return True
-        except Exception as e:
-            print(f"    [ERROR] PDF creation: {e}")
-            return False
-    else:
-        # Last resort: use Playwright's built-in PDF generation
-        try:
-            pdf_name = f"guidance_{os.path.basename(row_dir)}_print.pdf"
-            pdf_path = os.path.join(row_dir, pdf_name)
-            page.pdf(path=pdf_path, format="Letter",
-                     margin={"top": "0.75in", "bottom": "0.75in",
-                             "left": "0.75in", "right": "0.75in"},
-                     print_background=True)
-            file_size = os.path.getsize(pdf_path)
-            if file_size > 1000:
-                metadata["files_downloaded"].append({
-                    "filename": pdf_name,
-                    "source_url": url,
-                    "size_bytes": file_size,
-                    "sha256": sha256_file(pdf_path),
-                    "content_type": "application/pdf",
-                    "download_type": "browser_print_to_pdf"
-                })
-                metadata["status"] = "success"
-                metadata["recovery_method"] = "browser_print_to_pdf"
-                print(f"    [OK] Print-to-PDF: {pdf_name} ({file_size:,} bytes)")
-                return True
-            else:
-                os.remove(pdf_path)
-        except Exception as e:
-            # print-to-pdf only works in headless Chromium, may fail in headed mode
-            pass
-
-        print(f"    [EMPTY] Page loaded but no extractable content")
-        return False
+        else:
+            os.remove(pdf_path)
+    except Exception as e:
+        # print-to-pdf only works in headless Chromium, may fail in headed mode
+        pass
+
+    print(f"    [EMPTY] Page loaded but no extractable content")
+    return False
 
 
 REQUEST_TIMEOUT = 30000  # milliseconds for Playwright
 
 
-def run_browser_recovery(output_dir, target_statuses, phase_name, dry_run=False):
-    """Run browser-based recovery on rows with given statuses."""
+def run_browser_recovery(output_dir, target_statuses, phase_name, dry_run=False,
+                         block_profiles=None, workers=DEFAULT_WORKERS, host_limits=None):
+    """
+    Run browser-based recovery on rows with given statuses, `workers`
+    rows at a time in separate browser contexts (see recovery_pool.py).
+    block_profiles: per-host resource_profile overrides ({} for the
+    defaults), or None to load every resource. host_limits: max parallel
+    pages per host, e.g. {"headstart.gov": 3}.
+    """
     print(f"\n{'=' * 60}")
     print(f"{phase_name}")
     print("=" * 60)
@@ -452,48 +313,67 @@ def run_browser_recovery(output_dir, target_statuses, phase_name, dry_run=False)
 
     stats = {"recovered": 0, "still_failed": 0, "total": len(targets)}
 
-    with sync_playwright() as p:
-        # Launch headless Chromium
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-            viewport={"width": 1280, "height": 900},
-            java_script_enabled=True
-        )
-        page = context.new_page()
-
-        for i, (folder_name, row_dir, metadata) in enumerate(targets):
-            url = metadata["urls"][0]["url"]
-            print(f"\n  [{i+1}/{len(targets)}] Row {folder_name}: {url[:70]}")
-
-            success = process_with_browser(page, row_dir, metadata, url)
-
-            if success:
-                stats["recovered"] += 1
-            else:
-                stats["still_failed"] += 1
-
-            # Clear errors if we got something
-            if success:
-                metadata["errors"] = []
-
-            metadata["browser_retry_at"] = datetime.now().isoformat()
-
-            meta_path = os.path.join(row_dir, "metadata.json")
-            with open(meta_path, "w", encoding="utf-8") as f:
-                json.dump(metadata, f, indent=2, default=str)
-
-            # Brief pause between requests
-            time.sleep(1)
+    blockers = {}
+    timings = []
+
+    def setup_context(context):
+        if block_profiles is not None:
+            blockers[context] = ResourceBlocker(block_profiles)
+            blockers[context].attach(context)
+
+    def work(page, target):
+        folder_name, row_dir, metadata = target
+        url = metadata["urls"][0]["url"]
+        print(f"\n  Row {folder_name}: {url[:70]}")
+        if page.context in blockers:
+            blockers[page.context].use(url)
+        return process_with_browser(page, row_dir, metadata, url, timings,
+                                    blockers.get(page.context))
+
+    def done(i, target, success):
+        folder_name, row_dir, metadata = target
+        print(f"  [{i+1}/{len(targets)}] Row {folder_name}: "
+              f"{'recovered' if success else 'failed'}")
+        if success:
+            stats["recovered"] += 1
+        else:
+            stats["still_failed"] += 1
 
-            # Progress update every 20 rows
-            if (i + 1) % 20 == 0:
-                print(f"\n  --- Progress: {i+1}/{len(targets)} "
-                      f"({stats['recovered']} recovered, "
-                      f"{stats['still_failed']} failed) ---")
+        # Clear errors if we got something
+        if success:
+            metadata["errors"] = []
 
-        browser.close()
+        metadata["browser_retry_at"] = datetime.now().isoformat()
 
+        meta_path = os.path.join(row_dir, "metadata.json")
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2, default=str)
+
+        # Progress update every 20 rows
+        if (i + 1) % 20 == 0:
+            print(f"\n  --- Progress: {i+1}/{len(targets)} "
+                  f"({stats['recovered']} recovered, "
+                  f"{stats['still_failed']} failed) ---")
+
+    print(f"  {min(workers, len(targets))} browser contexts")
+    pool_stats = run_pool(targets, lambda t: t[2]["urls"][0]["url"], work, done,
+                          workers, host_limits, setup_context)
+    for error in pool_stats["launch_errors"]:
+        print(f"  [ERROR] Browser: {error}")
+    stats["still_failed"] += pool_stats["unprocessed"]
+    stats["pool"] = pool_stats
+
+    if timings:
+        stats["readiness"] = summarize(timings)
+        stats["readiness"]["pages_detail"] = timings
+        r = stats["readiness"]
+        print(f"\n  Time to ready: p50 {r['p50_seconds']:.2f}s, p95 {r['p95_seconds']:.2f}s "
+              f"({', '.join(f'{k} {v}' for k, v in sorted(r['reasons'].items()))})")
+    if blockers:
+        stats["requests"] = combined_stats(blockers.values())
+        print(f"\n  Requests: {stats['requests']['allowed']} allowed, "
+              f"{stats['requests']['blocked']} blocked, "
+              f"{stats['requests']['trackers']} trackers")
     print(f"\n{phase_name} Results: {stats['recovered']} recovered, "
           f"{stats['still_failed']} still failed out of {stats['total']}")
     return stats
@@ -508,8 +388,18 @@ def main():
     parser.add_argument("--phase", type=int, choices=[1, 2], default=None,
                         help="1=no_documents only, 2=failed only, default=both")
     parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--block-profile", default=None,
+                        help="JSON file of per-host resource blocking profiles")
+    parser.add_argument("--no-block", action="store_true",
+                        help="Load images, fonts, media and trackers as well")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Parallel browser contexts")
+    parser.add_argument("--host-limit", action="append", metavar="HOST=N",
+                        help="Max parallel pages on one host (repeatable)")
     args = parser.parse_args()
 
+    block_profiles = None if args.no_block else load_profiles(args.block_profile)
+
     output_dir = os.path.abspath(args.output)
     reports_dir = os.path.abspath(args.reports)
     os.makedirs(reports_dir, exist_ok=True)
@@ -530,7 +420,10 @@ def main():
             output_dir,
             target_statuses={"no_documents"},
             phase_name="PHASE 1: BROWSER RENDER — NO DOCUMENTS PAGES",
-            dry_run=args.dry_run
+            dry_run=args.dry_run,
+            block_profiles=block_profiles,
+            workers=args.workers,
+            host_limits=parse_host_limits(args.host_limit)
         )
 
     # Phase 2: Failed rows
@@ -539,7 +432,10 @@ def main():
             output_dir,
             target_statuses={"failed"},
             phase_name="PHASE 2: BROWSER RETRY — FAILED ROWS",
-            dry_run=args.dry_run
+            dry_run=args.dry_run,
+            block_profiles=block_profiles,
+            workers=args.workers,
+            host_limits=parse_host_limits(args.host_limit)
         )
 
     elapsed = (datetime.now() - start_time).total_seconds()
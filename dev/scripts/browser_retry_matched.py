@@ -11,6 +11,21 @@ the page the match came from and following redirects.
 Usage:
   python browser_retry_matched.py
   python browser_retry_matched.py --dry-run
+  python browser_retry_matched.py --block-profile hosts.json  # Per-host request blocking
+  python browser_retry_matched.py --no-block  # Load images, fonts, trackers too
+  python browser_retry_matched.py --workers 8 --host-limit headstart.gov=4
+
+Before the browser starts, the original URL's rewrites (acf.gov ↔
+www.acf.hhs.gov, /resource/ ↔ /policy-guidance/, /archive/) are probed
+together (url_variants.py) and the first live one is added to the URLs
+the browser tries. Those probes go through warc_session.py, so
+--warc-record / --warc-replay capture and replay them; the browser's own
+traffic is not recorded.
+
+Images, media, fonts and trackers are not loaded (see resource_profile.py),
+and a page counts as loaded once its main content has rendered rather
+than at networkidle (page_ready.py). A page that ends up printed with
+page.pdf() is first reloaded with nothing blocked.
 """
 
 import hashlib
@@ -22,6 +37,7 @@ import time
 from datetime import datetime
 from urllib.parse import urljoin, urlparse
 
+import requests
 from bs4 import BeautifulSoup
 
 try:
@@ -30,6 +46,13 @@ except ImportError:
     print("ERROR: playwright not installed. Run: pip install playwright")
     sys.exit(1)
 
+from resource_profile import ResourceBlocker, load_profiles, combined_stats
+from recovery_pool import run_pool, parse_host_limits, DEFAULT_WORKERS
+from page_ready import wait_until_ready, summarize
+from url_variants import VariantProber, candidates
+from v2_shared import convert_html
+import warc_session
+
 DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), "..", "output")
 DEFAULT_REPORTS = os.path.join(os.path.dirname(__file__), "..", "reports")
 
@@ -81,130 +104,22 @@ def find_doc_links(html_content, base_url):
     return links
 
 
-def extract_blocks(html_content):
-    """Extract text blocks for PDF creation."""
-    soup = BeautifulSoup(html_content, "html.parser")
-    for tag in soup.find_all(["script", "style", "nav", "footer", "noscript",
-                               "iframe", "svg", "button"]):
-        tag.decompose()
-    for tag in soup.find_all(attrs={"class": re.compile(
-            r"header|banner|nav|menu|sidebar|footer|breadcrumb|skip|cookie|usa-banner",
-            re.I)}):
-        tag.decompose()
-    for tag in soup.find_all(attrs={"role": re.compile(
-            r"navigation|banner|complementary", re.I)}):
-        tag.decompose()
-
-    main = (soup.find("main") or soup.find("article") or
-            soup.find("div", {"class": re.compile(r"content|main", re.I)}) or
-            soup.find("body"))
-    if not main:
-        main = soup
-
-    blocks = []
-    seen = set()
-    for el in main.find_all(["h1", "h2", "h3", "h4", "p", "li", "td", "div",
-                              "blockquote", "dd", "dt"]):
-        text = el.get_text(separator=" ", strip=True)
-        if text and len(text) > 10:
-            start = text[:50]
-            if start not in seen:
-                seen.add(start)
-                is_h = el.name in ["h1", "h2", "h3", "h4"]
-                blocks.append({"text": text, "is_heading": is_h,
-                               "level": int(el.name[1]) if is_h else 0})
-    return blocks
-
-
-def create_pdf_from_blocks(blocks, metadata, output_path, source_url):
-    """Create PDF from text blocks using fpdf2."""
-    from fpdf import FPDF
-
-    class GuidancePDF(FPDF):
-        def __init__(self, office, doc_number, src_url):
-            super().__init__()
-            self.office = office
-            self.doc_number = doc_number
-            self.src_url = src_url
-        def header(self):
-            self.set_font("Helvetica", "B", 8)
-            self.set_text_color(100, 100, 100)
-            h = f"ACF {self.office}"
-            if self.doc_number:
-                h += f" | {self.doc_number}"
-            self.cell(0, 5, h, new_x="LMARGIN", new_y="NEXT", align="L")
-            self.line(10, self.get_y(), 200, self.get_y())
-            self.ln(3)
-        def footer(self):
-            self.set_y(-15)
-            self.set_font("Helvetica", "I", 7)
-            self.set_text_color(128, 128, 128)
-            self.cell(0, 10, f"Page {self.page_no()}/{{nb}} | {self.src_url[:80]}",
-                      new_x="LMARGIN", new_y="TOP", align="C")
-
-    title = metadata.get("title", "")
-    doc_number = metadata.get("doc_number", "")
-    office = metadata.get("office", "")
-    issue_date = metadata.get("issue_date", "")
-
-    pdf = GuidancePDF(office, doc_number, source_url)
-    pdf.alias_nb_pages()
-    pdf.set_auto_page_break(auto=True, margin=20)
-    pdf.add_page()
-
-    if title:
-        pdf.set_font("Helvetica", "B", 14)
-        pdf.set_text_color(0, 0, 0)
-        safe = title.encode('latin-1', 'replace').decode('latin-1')
-        pdf.multi_cell(0, 7, safe, new_x="LMARGIN", new_y="NEXT")
-        pdf.ln(2)
-
-    meta_parts = []
-    if doc_number: meta_parts.append(f"Document: {doc_number}")
-    if office: meta_parts.append(f"Office: {office}")
-    if issue_date: meta_parts.append(f"Date: {issue_date[:10]}")
-    if meta_parts:
-        pdf.set_font("Helvetica", "I", 9)
-        pdf.set_text_color(80, 80, 80)
-        pdf.cell(0, 5, " | ".join(meta_parts), new_x="LMARGIN", new_y="NEXT")
-        pdf.ln(1)
-
-    pdf.set_font("Helvetica", "I", 8)
-    pdf.set_text_color(0, 0, 200)
-    safe_url = source_url.encode('latin-1', 'replace').decode('latin-1')[:100]
-    pdf.cell(0, 5, f"Source: {safe_url}", new_x="LMARGIN", new_y="NEXT")
-    pdf.ln(1)
-    pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-    pdf.ln(4)
-    pdf.set_text_color(0, 0, 0)
-
-    for block in blocks:
-        safe_text = block["text"].encode('latin-1', 'replace').decode('latin-1')
-        if block["is_heading"]:
-            size = {1: 14, 2: 12, 3: 11}.get(block["level"], 11)
-            pdf.set_font("Helvetica", "B", size)
-            pdf.ln(2)
-            pdf.multi_cell(0, 6, safe_text, new_x="LMARGIN", new_y="NEXT")
-            pdf.ln(1)
-        else:
-            pdf.set_font("Helvetica", "", 10)
-            pdf.multi_cell(0, 5, safe_text, new_x="LMARGIN", new_y="NEXT")
-            pdf.ln(2)
-
-    pdf.output(output_path)
-
-
-def process_with_browser(page, row_dir, metadata, url):
-    """Visit URL with Playwright and download content."""
+def process_with_browser(page, row_dir, metadata, url, timings=None, blocker=None):
+    """
+    Visit URL with Playwright and download content. The page's
+    time-to-ready is appended to `timings` if given; the context's
+    ResourceBlocker, if any, is lifted before print-to-PDF.
+    """
+    started = time.perf_counter()
     try:
-        response = page.goto(url, timeout=45000, wait_until="networkidle")
-    except Exception:
-        try:
-            response = page.goto(url, timeout=45000, wait_until="domcontentloaded")
-            page.wait_for_timeout(3000)
-        except Exception as e:
-            print(f"    [FAIL] Could not load: {e}")
-            return False
+        response = page.goto(url, timeout=45000, wait_until="domcontentloaded")
+    except Exception as e:
+        print(f"    [FAIL] Could not load: {e}")
+        return False
+    # Main content rendered, or the DOM went quiet (page_ready.py)
+    ready = wait_until_ready(page, started)
+    if timings is not None:
+        timings.append({"url": url, **ready})
 
     if not response:
         print(f"    [FAIL] No response")
@@ -264,35 +179,36 @@ def process_with_browser(page, row_dir, metadata, url):
         return True
 
     # No files — try PDF from content
-    blocks = extract_blocks(html)
-    if blocks and len(blocks) >= 2:
-        doc_num = metadata.get("doc_number", "").strip()
-        if doc_num:
-            sname = re.sub(r'[^a-zA-Z0-9_-]', '_', doc_num)
-            pdf_name = f"{sname}_matched.pdf"
-        else:
-            pdf_name = f"guidance_{metadata['folder']}_matched.pdf"
-        pdf_path = os.path.join(row_dir, pdf_name)
-        try:
-            create_pdf_from_blocks(blocks, metadata, pdf_path, final_url)
-            fsize = os.path.getsize(pdf_path)
-            metadata["files_downloaded"].append({
-                "filename": pdf_name,
-                "source_url": final_url,
-                "size_bytes": fsize,
-                "sha256": sha256_file(pdf_path),
-                "content_type": "application/pdf",
-                "download_type": "browser_matched_html_to_pdf"
-            })
-            metadata["status"] = "success"
-            metadata["recovery_method"] = "browser_matched_html_to_pdf"
-            print(f"    [OK] Converted to {pdf_name} ({fsize:,} bytes, {len(blocks)} blocks)")
-            return True
-        except Exception as e:
-            print(f"    [ERROR] PDF creation: {e}")
+    doc_num = metadata.get("doc_number", "").strip()
+    if doc_num:
+        sname = re.sub(r'[^a-zA-Z0-9_-]', '_', doc_num)
+        pdf_name = f"{sname}_matched.pdf"
+    else:
+        pdf_name = f"guidance_{metadata['folder']}_matched.pdf"
+    pdf_path = os.path.join(row_dir, pdf_name)
+    ok, reason = convert_html(html_path, pdf_path, metadata)
+    if ok:
+        fsize = os.path.getsize(pdf_path)
+        metadata["files_downloaded"].append({
+            "filename": pdf_name,
+            "source_url": final_url,
+            "size_bytes": fsize,
+            "sha256": sha256_file(pdf_path),
+            "content_type": "application/pdf",
+            "download_type": "browser_matched_html_to_pdf"
+        })
+        metadata["status"] = "success"
+        metadata["recovery_method"] = "browser_matched_html_to_pdf"
+        print(f"    [OK] Converted to {pdf_name} ({fsize:,} bytes)")
+        return True
+    if reason != "insufficient_content":
+        print(f"    [ERROR] PDF creation: {reason}")
 
-    # Last resort: Playwright print-to-PDF
+    # Last resort: Playwright print-to-PDF, of the page reloaded with the
+    # styles, images and fonts the blocker kept out
     try:
+        if blocker is not None:
+            blocker.lift(page, 45000)
         pdf_name = f"guidance_{metadata['folder']}_print.pdf"
         pdf_path = os.path.join(row_dir, pdf_name)
         page.pdf(path=pdf_path, format="Letter",
@@ -328,7 +244,17 @@ def main():
     parser.add_argument("--output", default=DEFAULT_OUTPUT)
     parser.add_argument("--reports", default=DEFAULT_REPORTS)
     parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--block-profile", default=None,
+                        help="JSON file of per-host resource blocking profiles")
+    parser.add_argument("--no-block", action="store_true",
+                        help="Load images, fonts, media and trackers as well")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Parallel browser contexts")
+    parser.add_argument("--host-limit", action="append", metavar="HOST=N",
+                        help="Max parallel pages on one host (repeatable)")
+    warc_session.add_arguments(parser)
     args = parser.parse_args()
+    warc_session.setup(args.warc_record, args.warc_replay, stage="browser_retry_matched")
 
     output_dir = os.path.abspath(args.output)
     reports_dir = os.path.abspath(args.reports)
@@ -363,12 +289,6 @@ def main():
                 if orig not in urls_to_try:
                     urls_to_try.append(orig)
 
-                # Try www.acf.hhs.gov variant
-                if "acf.gov" in orig and "acf.hhs.gov" not in orig:
-                    alt = orig.replace("acf.gov", "www.acf.hhs.gov", 1)
-                    if alt not in urls_to_try:
-                        urls_to_try.append(alt)
-
             if urls_to_try:
                 meta["_row_dir"] = row_dir
                 meta["_meta_path"] = meta_path
@@ -393,50 +313,75 @@ def main():
     stats = {"recovered": 0, "failed": 0}
     start_time = datetime.now()
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                       "(KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-            viewport={"width": 1280, "height": 900},
-            java_script_enabled=True
-        )
-        page = context.new_page()
-
-        for i, meta in enumerate(targets):
-            folder = meta["folder"]
-            doc = meta.get("doc_number", "")
-            urls = meta["_urls_to_try"]
-
-            print(f"\n  [{i+1}/{len(targets)}] Row {folder}: {doc or meta.get('title','')[:40]}")
-
-            success = False
-            for url in urls:
-                print(f"    Trying: {url[:70]}")
-                success = process_with_browser(page, meta["_row_dir"], meta, url)
-                if success:
-                    break
+    # Add the live rewrite of each original URL; if none answers requests
+    # (403s are why these rows are here), the best-ranked rewrite instead
+    prober = VariantProber(warc_session.attach(requests.Session()),
+                           learned_path=os.path.join(reports_dir, "url_variant_rules.json"))
+    for meta in targets:
+        if not meta.get("urls"):
+            continue
+        orig = meta["urls"][0]["url"]
+        hit = prober.find(orig)
+        ranked = candidates(orig, wins=prober.wins)
+        alt = hit["url"] if hit else (ranked[0][0] if ranked else None)
+        if alt and alt not in meta["_urls_to_try"]:
+            meta["_urls_to_try"].append(alt)
+    prober.save()
+    print(f"  Live URL variants found for {prober.stats['hits']} rows")
+
+    block_profiles = None if args.no_block else load_profiles(args.block_profile)
+    blockers = {}
+    timings = []
+
+    def setup_context(context):
+        if block_profiles is not None:
+            blockers[context] = ResourceBlocker(block_profiles)
+            blockers[context].attach(context)
+
+    def work(page, meta):
+        print(f"\n  Row {meta['folder']}: {meta.get('doc_number', '') or meta.get('title','')[:40]}")
+        for n, url in enumerate(meta["_urls_to_try"]):
+            if n:
                 time.sleep(1)
+            print(f"    Trying: {url[:70]}")
+            if page.context in blockers:
+                blockers[page.context].use(url)
+            if process_with_browser(page, meta["_row_dir"], meta, url, timings,
+                                    blockers.get(page.context)):
+                return True
+        return False
 
-            if success:
-                meta["errors"] = []
-                meta["browser_final_at"] = datetime.now().isoformat()
-                stats["recovered"] += 1
-            else:
-                stats["failed"] += 1
-
-            # Save metadata
-            with open(meta["_meta_path"], "w", encoding="utf-8") as f:
-                json.dump(meta, f, indent=2, default=str)
-
-            time.sleep(1)
-
-            if (i + 1) % 10 == 0:
-                print(f"\n  --- Progress: {i+1}/{len(targets)} "
-                      f"(recovered: {stats['recovered']}, failed: {stats['failed']}) ---")
-
-        browser.close()
-
+    def done(i, meta, success):
+        print(f"  [{i+1}/{len(targets)}] Row {meta['folder']}: "
+              f"{'recovered' if success else 'failed'}")
+        if success:
+            meta["errors"] = []
+            meta["browser_final_at"] = datetime.now().isoformat()
+            stats["recovered"] += 1
+        else:
+            stats["failed"] += 1
+
+        # Save metadata
+        with open(meta["_meta_path"], "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2, default=str)
+
+        if (i + 1) % 10 == 0:
+            print(f"\n  --- Progress: {i+1}/{len(targets)} "
+                  f"(recovered: {stats['recovered']}, failed: {stats['failed']}) ---")
+
+    pool_stats = run_pool(targets, lambda meta: meta["_urls_to_try"][0], work, done,
+                          args.workers, parse_host_limits(args.host_limit), setup_context)
+    for error in pool_stats["launch_errors"]:
+        print(f"  [ERROR] Browser: {error}")
+    stats["failed"] += pool_stats["unprocessed"]
+    stats["pool"] = pool_stats
+    stats["url_variants"] = prober.stats
+
+    if timings:
+        stats["readiness"] = summarize(timings)
+        stats["readiness"]["pages_detail"] = timings
+    if blockers:
+        stats["requests"] = combined_stats(blockers.values())
     elapsed = (datetime.now() - start_time).total_seconds()
 
     print(f"\n{'=' * 60}")
@@ -444,6 +389,13 @@ def main():
     print("=" * 60)
     print(f"  Recovered: {stats['recovered']}")
     print(f"  Still failed: {stats['failed']}")
+    if timings:
+        r = stats["readiness"]
+        print(f"  Time to ready: p50 {r['p50_seconds']:.2f}s, p95 {r['p95_seconds']:.2f}s "
+              f"({', '.join(f'{k} {v}' for k, v in sorted(r['reasons'].items()))})")
+    if blockers:
+        print(f"  Requests: {stats['requests']['allowed']} allowed, "
+              f"{stats['requests']['blocked']} blocked, {stats['requests']['trackers']} trackers")
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     report_path = os.path.join(reports_dir, f"browser_retry_matched_{timestamp}.json")
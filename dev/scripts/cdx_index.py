@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+cdx_index.py - Local SQLite index of Wayback CDX captures.
+
+wayback_deep.py and final_cleanup.py used to send one CDX request per
+URL variant, a second apart, and throw the answers away after each run.
+Most of the URLs they look up share a handful of directories
+(acf.gov/ocs/resource/, acf.gov/cb/policy-guidance/, ...), so a CdxIndex
+asks the CDX server for whole directories at once instead:
+
+    GET /cdx/search/cdx?url=acf.gov/ocs/resource/&matchType=prefix
+        &output=json&fl=urlkey,timestamp,...&limit=5000&showResumeKey=true
+
+paging through the results with resumeKey, and stores every capture in
+a SQLite file. Per-row lookups are then answered locally. A prefix that
+was only partly fetched keeps its resumeKey and carries on from there
+next time. A URL outside every fetched prefix costs a single exact
+query, and the answer is stored even when it is empty, so a dead URL
+is only looked up once.
+
+    index = CdxIndex("reports/cdx_index.sqlite", session)
+    index.warm(urls)                 # one prefix query per directory
+    snapshots = index.lookup(url)    # same dicts search_wayback_cdx returned
+
+URLs are matched on a scheme-less, lowercased key with "www." and a
+trailing slash dropped, the same way the CDX server's SURT keys ignore
+them.
+
+For testing, `--serve FIXTURE.json` runs a local server that answers
+CDX queries (exact and prefix match, limit, fl, showResumeKey,
+resumeKey) from a JSON list of captures, and `--endpoint` points the
+client at it:
+
+    python cdx_index.py --serve fixture.json --port 8765 &
+    python cdx_index.py --endpoint http://127.0.0.1:8765/cdx/search/cdx \\
+        --db /tmp/cdx.sqlite --prefix acf.gov/ocs/resource/
+"""
+
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+import v2_shared  # noqa: F401
+import warc_session
+import wayback_rank
+
+CDX_ENDPOINT = "https://web.archive.org/cdx/search/cdx"
+FIELDS = ["urlkey", "timestamp", "original", "mimetype", "statuscode", "digest", "length"]
+PAGE_SIZE = 5000
+MAX_PAGES = 50                  # per prefix per run; the rest resumes next time
+CDX_DELAY = 1.0                 # seconds between CDX requests
+CDX_TIMEOUT = 60
+RETRIES = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    key TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    original TEXT NOT NULL,
+    mimetype TEXT,
+    statuscode TEXT,
+    digest TEXT,
+    length INTEGER,
+    PRIMARY KEY (key, timestamp, original)
+);
+CREATE TABLE IF NOT EXISTS queries (
+    prefix TEXT NOT NULL,
+    match_type TEXT NOT NULL,
+    resume_key TEXT,
+    complete INTEGER NOT NULL DEFAULT 0,
+    captures INTEGER NOT NULL DEFAULT 0,
+    fetched_at TEXT,
+    PRIMARY KEY (prefix, match_type)
+);
+"""
+
+
+def url_key(url, directory=False):
+    """Matching key: host without 'www.' + path + sorted query, lowercased."""
+    if "://" not in url:
+        url = "http://" + url
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parsed.path.lower()
+    if not directory:
+        path = path.rstrip("/")
+    key = host + path
+    if parsed.query:
+        key += "?" + urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return key
+
+
+def directory_prefix(url):
+    """'https://acf.gov/ocs/resource/foo' → 'acf.gov/ocs/resource/'; None at the site root."""
+    key = url_key(url).split("?", 1)[0]
+    host, _, path = key.partition("/")
+    parent = path.rsplit("/", 1)[0] if "/" in path else ""
+    return f"{host}/{parent}/" if parent else None
+
+
+class CdxIndex:
+    """CDX captures fetched by prefix, stored in SQLite, looked up locally."""
+
+    def __init__(self, db_path, session=None, endpoint=CDX_ENDPOINT, delay=CDX_DELAY):
+        self.session = session
+        self.endpoint = endpoint
+        self.delay = delay
+        self.stats = {"requests": 0, "captures_stored": 0, "local_hits": 0,
+                      "exact_queries": 0, "prefix_errors": 0}
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db = sqlite3.connect(db_path)
+        self.db.executescript(SCHEMA)
+        self._last_request = 0.0
+
+    def close(self):
+        self.db.close()
+
+    def _get(self, params):
+        wait = self.delay - (time.monotonic() - self._last_request)
+        if wait > 0:
+            warc_session.pause(wait)
+        for attempt in range(RETRIES):
+            self._last_request = time.monotonic()
+            self.stats["requests"] += 1
+            resp = self.session.get(self.endpoint, params=params, timeout=CDX_TIMEOUT)
+            if resp.status_code in (429, 502, 503, 504) and attempt < RETRIES - 1:
+                warc_session.pause(2 ** (attempt + 2))
+                continue
+            resp.raise_for_status()
+            text = resp.text.strip()
+            return json.loads(text) if text else []
+        return []
+
+    def fetch(self, prefix, match_type="prefix", page_size=PAGE_SIZE, max_pages=MAX_PAGES,
+              refresh=False):
+        """
+        Page through every capture under prefix (or of one URL, for
+        match_type="exact") into the index. Returns the number of
+        captures stored by this call; 0 if the query was already complete.
+        """
+        key = url_key(prefix, directory=(match_type == "prefix"))
+        row = self.db.execute("SELECT resume_key, complete FROM queries "
+                              "WHERE prefix = ? AND match_type = ?",
+                              (key, match_type)).fetchone()
+        if row and row[1] and not refresh:
+            return 0
+        resume_key = None if refresh or not row else row[0]
+        self.db.execute("INSERT OR IGNORE INTO queries (prefix, match_type) VALUES (?, ?)",
+                        (key, match_type))
+        if refresh:
+            self.db.execute("UPDATE queries SET captures = 0, complete = 0 "
+                            "WHERE prefix = ? AND match_type = ?", (key, match_type))
+
+        stored = 0
+        for _ in range(max_pages):
+            params = {"url": prefix, "matchType": match_type, "output": "json",
+                      "fl": ",".join(FIELDS), "limit": page_size, "showResumeKey": "true"}
+            if resume_key:
+                params["resumeKey"] = resume_key
+            data = self._get(params)
+
+            # [header, row, ..., [], [resumeKey]] — the last two only if there is more
+            resume_key = None
+            if len(data) >= 2 and data[-2] == [] and len(data[-1]) == 1:
+                resume_key = data[-1][0]
+                data = data[:-2]
+            rows = [dict(zip(data[0], r)) for r in data[1:] if r] if data else []
+            stored += self._store(rows)
+            self.db.execute("UPDATE queries SET resume_key = ?, complete = ?, "
+                            "captures = captures + ?, fetched_at = ? "
+                            "WHERE prefix = ? AND match_type = ?",
+                            (resume_key, 0 if resume_key else 1, len(rows),
+                             datetime.now().isoformat(), key, match_type))
+            self.db.commit()
+            if not resume_key:
+                break
+        return stored
+
+    def _store(self, rows):
+        before = self.db.total_changes
+        self.db.executemany(
+            "INSERT OR IGNORE INTO captures VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(url_key(r["original"]), r["timestamp"], r["original"], r.get("mimetype"),
+              r.get("statuscode"), r.get("digest"),
+              int(r["length"]) if str(r.get("length", "")).isdigit() else None)
+             for r in rows])
+        stored = self.db.total_changes - before
+        self.stats["captures_stored"] += stored
+        return stored
+
+    def warm(self, urls, refresh=False):
+        """
+        Fetch the directory prefix of every URL (each prefix once). A
+        prefix that fails is left for exact lookups; returns the prefixes.
+        """
+        prefixes = sorted({p for p in map(directory_prefix, urls) if p})
+        for prefix in prefixes:
+            try:
+                self.fetch(prefix, refresh=refresh)
+            except Exception:
+                self.stats["prefix_errors"] += 1
+        return prefixes
+
+    def covered(self, url):
+        """True if a complete query in the index already answers url."""
+        key = url_key(url)
+        return self.db.execute(
+            "SELECT 1 FROM queries WHERE complete = 1 AND ("
+            "(match_type = 'prefix' AND substr(?, 1, length(prefix)) = prefix) OR "
+            "(match_type = 'exact' AND prefix = ?)) LIMIT 1", (key, key)).fetchone() is not None
+
+    def lookup(self, url, limit=10, status="200", fetch_missing=True):
+        """
+        Captures of url with the given status, oldest first, adjacent
+        duplicates (same digest) collapsed, as the CDX server returns
+        them for filter=statuscode:200&collapse=digest. Each is
+        {timestamp, status, original, mimetype, digest, length, wayback_url}.
+        The first `limit` are returned, or all of them with limit=None.
+        A URL no fetched prefix covers is queried exactly first, unless
+        fetch_missing is False.
+        """
+        if self.covered(url):
+            self.stats["local_hits"] += 1
+        elif fetch_missing and self.session is not None:
+            self.stats["exact_queries"] += 1
+            try:
+                self.fetch(url, match_type="exact")
+            except Exception:
+                return []
+
+        rows = self.db.execute(
+            "SELECT timestamp, statuscode, original, mimetype, digest, length FROM captures "
+            "WHERE key = ? AND statuscode = ? ORDER BY timestamp",
+            (url_key(url), status)).fetchall()
+        results, last_digest = [], None
+        for timestamp, statuscode, original, mimetype, digest, length in rows:
+            if digest and digest == last_digest:
+                continue
+            last_digest = digest
+            results.append({
+                "timestamp": timestamp,
+                "status": statuscode,
+                "original": original,
+                "mimetype": mimetype,
+                "digest": digest,
+                "length": length,
+                "wayback_url": f"https://web.archive.org/web/{timestamp}id_/{original}",
+            })
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+
+    def summary(self):
+        """Counts for reports: queries, captures, and this run's stats."""
+        queries = self.db.execute("SELECT match_type, complete, COUNT(*) FROM queries "
+                                  "GROUP BY match_type, complete").fetchall()
+        return {
+            "captures": self.db.execute("SELECT COUNT(*) FROM captures").fetchone()[0],
+            "queries": {f"{m}{'' if c else '_partial'}": n for m, c, n in queries},
+            **self.stats,
+        }
+
+
+def rank_snapshots(snapshots, target_date=None, url=None):
+    """
+    lookup() results best-first, each with a "score", scored by
+    scripts_v2's wayback_rank (the harvester's ranking; see there) from
+    the same CDX fields. target_date is an inventory date string; url
+    the URL asked for, to know what mimetype to expect.
+    """
+    captures = [{**s, "statuscode": s.get("status")} for s in snapshots]
+    return wayback_rank.rank_snapshots(captures, target_date, url)
+
+
+# ─── Fixture Server ──────────────────────────────────────────────────────────
+
+def serve_fixture(captures, host="127.0.0.1", port=8765):
+    """
+    HTTP server answering CDX JSON queries from a list of capture dicts
+    (FIELDS keys; urlkey optional). Returns the server; call
+    serve_forever() on it, or run it in a thread.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    rows = sorted(captures, key=lambda c: (url_key(c["original"]), c["timestamp"]))
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            q = dict(parse_qsl(urlparse(self.path).query))
+            match_type = q.get("matchType", "exact")
+            target = url_key(q.get("url", ""), directory=(match_type == "prefix"))
+            if match_type == "prefix":
+                hits = [r for r in rows if url_key(r["original"]).startswith(target)]
+            else:
+                hits = [r for r in rows if url_key(r["original"]) == target]
+
+            start = int(q.get("resumeKey", "0"))
+            limit = int(q.get("limit", len(hits) or 1))
+            page = hits[start:start + limit]
+            fields = q.get("fl", ",".join(FIELDS)).split(",")
+            body = [fields] + [[str(r.get(f, url_key(r["original"]) if f == "urlkey" else ""))
+                                for f in fields] for r in page] if page else []
+            if q.get("showResumeKey") == "true" and start + limit < len(hits):
+                body += [[], [str(start + limit)]]
+
+            payload = json.dumps(body).encode()
+            self.server.requests.append(q)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.requests = []
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    import requests
+
+    parser = argparse.ArgumentParser(description="Wayback CDX index")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(__file__), "..",
+                                                     "reports", "cdx_index.sqlite"))
+    parser.add_argument("--endpoint", default=CDX_ENDPOINT)
+    parser.add_argument("--prefix", action="append", default=[],
+                        help="Fetch every capture under this prefix (repeatable)")
+    parser.add_argument("--lookup", action="append", default=[],
+                        help="Print the 200 captures of this URL (repeatable)")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Re-fetch prefixes that are already complete")
+    parser.add_argument("--serve", metavar="FIXTURE.json",
+                        help="Serve CDX queries from a JSON list of captures")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.serve:
+        with open(args.serve, "r", encoding="utf-8") as f:
+            server = serve_fixture(json.load(f), port=args.port)
+        print(f"CDX fixture server on http://127.0.0.1:{args.port}/cdx/search/cdx")
+        server.serve_forever()
+
+    session = warc_session.attach(requests.Session())
+    index = CdxIndex(args.db, session, endpoint=args.endpoint)
+    for prefix in args.prefix:
+        n = index.fetch(prefix, refresh=args.refresh)
+        print(f"{prefix}: {n} new captures")
+    for url in args.lookup:
+        snapshots = index.lookup(url)
+        print(f"{url}: {len(snapshots)} snapshots")
+        for s in snapshots:
+            print(f"  {s['timestamp']}  {s['mimetype']:24s} {s['original']}")
+    print(json.dumps(index.summary(), indent=2))
+    index.close()
+    sys.exit(0)
@@ -10,21 +10,42 @@ Handles:
   - ZIP files are skipped (kept as-is)
 
 Creates PDF copies alongside originals. Updates metadata.json with conversion info.
+
+Office files are converted in parallel by a pool of long-lived LibreOffice
+workers (see soffice_pool.py), each with its own user profile.
+
+Every document has a wall-clock deadline. A hung LibreOffice worker or
+Chromium is killed and restarted and the batch moves on; inputs that
+failed several runs in a row are quarantined and skipped (the same
+store as scripts_v2, see conversion_watchdog.py there;
+python conversion_watchdog.py --list).
+
+Usage:
+  python convert_to_pdf.py                  # Convert everything
+  python convert_to_pdf.py --workers 8      # 8 LibreOffice workers
+  python convert_to_pdf.py --timeout 60     # Per-document timeout (seconds)
+  python convert_to_pdf.py --retry-quarantined  # Retry inputs that kept failing
 """
 
+import argparse
 import json
 import os
 import sys
 import time
-import subprocess
 import shutil
-import hashlib
+import threading
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from soffice_pool import SofficePool, find_soffice, DEFAULT_WORKERS, DEFAULT_TIMEOUT
+import v2_shared  # noqa: F401
+from conversion_watchdog import Quarantine
+from conversion_cache import sha256_file
 
 # --- Configuration ---
 OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "output")
-SOFFICE = r"C:\Program Files\LibreOffice\program\soffice.exe"
+SOFFICE = find_soffice()
 REPORT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "reports")
 
 # File type groups
@@ -34,14 +55,6 @@ SKIP_EXTS = {".zip", ".pdf"}
 
 # --- Helpers ---
 
-def sha256_file(path):
-    h = hashlib.sha256()
-    with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            h.update(chunk)
-    return h.hexdigest()
-
-
 def detect_file_type(filepath):
     """Detect file type by reading magic bytes."""
     try:
@@ -75,84 +88,179 @@ def detect_file_type(filepath):
         return "unknown"
 
 
-def convert_with_libreoffice(input_path, output_dir):
-    """Convert a file to PDF using LibreOffice. Returns output PDF path or None."""
+def convert_office_parallel(office_files, workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT):
+    """Convert Office files to PDF on a pool of LibreOffice workers.
+
+    Args:
+        office_files: list of (input_path, output_pdf_path) tuples
+        workers: number of LibreOffice instances
+        timeout: seconds per document before its worker is restarted
+
+    Returns:
+        (dict mapping input_path -> output_pdf_path for successes,
+         dict mapping input_path -> failure reason, pool stats)
+    """
+    results, errors = {}, {}
+    total = len(office_files)
+    start = time.time()
+
+    with SofficePool(size=workers, soffice=SOFFICE, timeout=timeout) as pool:
+        print(f"  LibreOffice pool: {workers} workers ({pool.mode} mode)")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(pool.convert, input_path, pdf_path): (input_path, pdf_path)
+                       for input_path, pdf_path in office_files}
+            for i, future in enumerate(as_completed(futures)):
+                input_path, pdf_path = futures[future]
+                ok, reason = future.result()
+                if ok:
+                    results[input_path] = pdf_path
+                else:
+                    errors[input_path] = reason
+                if (i + 1) % 25 == 0 or i + 1 == total:
+                    rate = (i + 1) / max(time.time() - start, 1e-6)
+                    print(f"  [{i+1}/{total}] {len(results)} converted, "
+                          f"{len(errors)} failed ({rate:.1f} files/s)")
+        stats = pool.stats()
+
+    return results, errors, stats
+
+
+def _descendant_pids():
+    """PIDs of this process's children, or None without psutil."""
     try:
-        result = subprocess.run(
-            [SOFFICE, "--headless", "--convert-to", "pdf", "--outdir", output_dir, input_path],
-            capture_output=True, text=True, timeout=120
-        )
-        # Find the output file
-        stem = Path(input_path).stem
-        pdf_path = os.path.join(output_dir, f"{stem}.pdf")
-        if os.path.isfile(pdf_path):
-            return pdf_path
-        return None
-    except subprocess.TimeoutExpired:
-        return None
-    except Exception as e:
+        import psutil
+    except ImportError:
         return None
+    return {p.pid for p in psutil.Process().children(recursive=True)}
 
 
-def convert_html_batch_playwright(html_files, batch_size=50):
+def _kill_tree(pids):
+    import psutil
+    for pid in pids:
+        try:
+            proc = psutil.Process(pid)
+            for p in proc.children(recursive=True) + [proc]:
+                p.kill()
+        except psutil.Error:
+            pass
+
+
+def convert_html_batch_playwright(html_files, batch_size=50, timeout=DEFAULT_TIMEOUT):
     """Convert HTML files to PDF using Playwright in batches.
-    
+
+    Each file has a wall-clock deadline. Playwright calls such as
+    page.pdf() can block forever on a pathological page, so a watchdog
+    timer kills the browser when a file overruns it, and the batch goes
+    on with a fresh browser. (Killing needs psutil; without it only
+    Playwright's own timeouts apply.)
+
     Args:
         html_files: list of (input_path, output_pdf_path) tuples
         batch_size: number of files per browser session
-    
+        timeout: seconds per file
+
     Returns:
-        dict mapping input_path -> output_pdf_path for successful conversions
+        (dict mapping input_path -> output_pdf_path for successes,
+         dict mapping input_path -> failure reason, stats)
     """
     from playwright.sync_api import sync_playwright
-    
-    results = {}
+
+    results, errors = {}, {}
+    stats = {"timeouts": 0, "relaunches": 0}
     total = len(html_files)
-    
+
     for batch_start in range(0, total, batch_size):
         batch = html_files[batch_start:batch_start + batch_size]
         batch_num = batch_start // batch_size + 1
         total_batches = (total + batch_size - 1) // batch_size
         print(f"  Playwright batch {batch_num}/{total_batches} ({len(batch)} files)...")
-        
+
         try:
             with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                page = browser.new_page()
-                
+                def launch():
+                    before = _descendant_pids()
+                    browser = p.chromium.launch(headless=True)
+                    after = _descendant_pids()
+                    pids = after - before if before is not None and after is not None else set()
+                    page = browser.new_page()
+                    page.set_default_timeout(timeout * 1000)
+                    return browser, page, pids
+
+                browser, page, pids = launch()
+
                 for input_path, output_pdf in batch:
+                    if browser is None:
+                        browser, page, pids = launch()
+                        stats["relaunches"] += 1
+
+                    expired = threading.Event()
+
+                    def on_deadline(pids=pids):
+                        expired.set()
+                        if pids:
+                            _kill_tree(pids)
+
+                    timer = threading.Timer(timeout, on_deadline)
+                    timer.daemon = True
+                    timer.start()
                     try:
                         file_url = Path(input_path).as_uri()
                         page.goto(file_url, wait_until="load", timeout=15000)
                         page.pdf(path=output_pdf, format="Letter", print_background=True)
                         if os.path.isfile(output_pdf) and os.path.getsize(output_pdf) > 0:
                             results[input_path] = output_pdf
+                        else:
+                            errors[input_path] = "empty output"
                     except Exception as e:
-                        # Try with a fresh page
+                        if expired.is_set():
+                            stats["timeouts"] += 1
+                            errors[input_path] = f"timeout ({timeout}s)"
+                            if os.path.exists(output_pdf):
+                                os.remove(output_pdf)
+                        else:
+                            errors[input_path] = str(e)[:200]
+                        # Try with a fresh page, or a fresh browser if this one is gone
                         try:
                             page.close()
                             page = browser.new_page()
-                        except:
-                            pass
-                
-                browser.close()
+                            page.set_default_timeout(timeout * 1000)
+                        except Exception:
+                            try:
+                                browser.close()
+                            except Exception:
+                                pass
+                            browser = None
+                    finally:
+                        timer.cancel()
+
+                if browser is not None:
+                    browser.close()
         except Exception as e:
             print(f"    Playwright batch error: {e}")
-    
-    return results
+
+    return results, errors, stats
 
 
 # --- Main ---
 
 def main():
+    parser = argparse.ArgumentParser(description="Convert non-PDF harvest files to PDF")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Parallel LibreOffice workers")
+    parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT,
+                        help="Seconds per document before its worker/browser is restarted")
+    parser.add_argument("--retry-quarantined", action="store_true",
+                        help="Also convert inputs quarantined after repeated failures")
+    args = parser.parse_args()
+
     start_time = time.time()
     
     if not os.path.isdir(OUTPUT_DIR):
         print(f"ERROR: Output directory not found: {OUTPUT_DIR}")
         sys.exit(1)
     
-    if not os.path.isfile(SOFFICE):
-        print(f"ERROR: LibreOffice not found: {SOFFICE}")
+    if not SOFFICE:
+        print("ERROR: LibreOffice not found (install it, or set SOFFICE=/path/to/soffice)")
         sys.exit(1)
     
     os.makedirs(REPORT_DIR, exist_ok=True)
@@ -252,21 +360,43 @@ def main():
             print(f"    {folder}: unknown type for {os.path.basename(filepath)}, skipping")
             skip_files.append(filepath)
     
-    total_to_convert = len(html_files) + len(office_files)
-    print(f"\n  Total files to convert: {total_to_convert}")
-    
     # Tracking
     converted = []
     failed = []
+
+    # Skip inputs that failed too often already
+    quarantine = Quarantine()
+    if not args.retry_quarantined:
+        for files, method in ((html_files, "playwright"), (office_files, "libreoffice")):
+            held = [f for f in files if quarantine.is_quarantined(sha256_file(f[0]))]
+            for filepath, pdf_path, folder, file_info in held:
+                failed.append({
+                    "folder": folder,
+                    "original": os.path.basename(filepath),
+                    "method": method,
+                    "error": "quarantined"
+                })
+            files[:] = [f for f in files if f not in held]
+        quarantined = len(failed)
+        if quarantined:
+            print(f"  Quarantined (skipped): {quarantined}")
+
+    total_to_convert = len(html_files) + len(office_files)
+    print(f"\n  Total files to convert: {total_to_convert}")
     
     # Phase 2: Convert HTML files with Playwright
     if html_files:
         print(f"\nPhase 2: Converting {len(html_files)} HTML files with Playwright...")
         
         playwright_input = [(fp, pdf_p) for fp, pdf_p, _, _ in html_files]
-        results = convert_html_batch_playwright(playwright_input)
+        results, errors, html_stats = convert_html_batch_playwright(
+            playwright_input, timeout=args.timeout)
+        if html_stats["timeouts"]:
+            print(f"  Browser restarts (hung pages): {html_stats['timeouts']}")
         
         for filepath, pdf_path, folder, file_info in html_files:
+            quarantine.record(sha256_file(filepath), filepath, filepath in results,
+                              errors.get(filepath))
             if filepath in results:
                 converted.append({
                     "folder": folder,
@@ -280,7 +410,7 @@ def main():
                     "folder": folder,
                     "original": os.path.basename(filepath),
                     "method": "playwright",
-                    "error": "conversion failed"
+                    "error": errors.get(filepath, "conversion failed")
                 })
         
         print(f"  HTML: {len([r for r in converted if r['method']=='playwright'])} converted, "
@@ -290,27 +420,28 @@ def main():
     if office_files:
         print(f"\nPhase 3: Converting {len(office_files)} Office files with LibreOffice...")
         
-        for i, (filepath, pdf_path, folder, file_info) in enumerate(office_files):
-            if (i + 1) % 25 == 0 or i == 0:
-                print(f"  [{i+1}/{len(office_files)}] Converting {os.path.basename(filepath)}...")
-            
-            folder_dir = os.path.join(OUTPUT_DIR, folder)
-            result = convert_with_libreoffice(filepath, folder_dir)
-            
-            if result:
+        results, errors, pool_stats = convert_office_parallel(
+            [(fp, pdf_p) for fp, pdf_p, _, _ in office_files], args.workers, args.timeout)
+        if pool_stats["restarts"]:
+            print(f"  Worker restarts (hung/crashed): {pool_stats['restarts']}")
+
+        for filepath, pdf_path, folder, file_info in office_files:
+            quarantine.record(sha256_file(filepath), filepath, filepath in results,
+                              errors.get(filepath))
+            if filepath in results:
                 converted.append({
                     "folder": folder,
                     "original": os.path.basename(filepath),
-                    "pdf": os.path.basename(result),
+                    "pdf": os.path.basename(results[filepath]),
                     "method": "libreoffice",
-                    "size": os.path.getsize(result)
+                    "size": os.path.getsize(results[filepath])
                 })
             else:
                 failed.append({
                     "folder": folder,
                     "original": os.path.basename(filepath),
                     "method": "libreoffice",
-                    "error": "conversion failed"
+                    "error": errors.get(filepath, "conversion failed")
                 })
         
         print(f"  Office: {len([r for r in converted if r['method']=='libreoffice'])} converted, "
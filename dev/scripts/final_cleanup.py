@@ -11,6 +11,8 @@ Usage:
   python final_cleanup.py --direct-only  # Only download the 3 files
   python final_cleanup.py --search-only  # Only search for dead links
   python final_cleanup.py --dry-run      # Preview
+  python final_cleanup.py --warc-record ../warc   # Keep every HTTP exchange in WARC files
+  python final_cleanup.py --warc-replay ../warc   # Re-run offline from them
 """
 
 import argparse
@@ -19,13 +21,17 @@ import json
 import os
 import re
 import sys
-import time
 from datetime import datetime
 from urllib.parse import urljoin, urlparse, quote_plus
 
 import requests
 from bs4 import BeautifulSoup
 
+import v2_shared  # noqa: F401
+from cdx_index import CDX_ENDPOINT, CdxIndex
+from url_variants import VariantProber
+import warc_session
+
 DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), "..", "output")
 DEFAULT_REPORTS = os.path.join(os.path.dirname(__file__), "..", "reports")
 
@@ -92,7 +98,7 @@ def download_direct_files(output_dir, dry_run=False):
     if not targets:
         return {"downloaded": 0, "failed": 0}
 
-    session = requests.Session()
+    session = warc_session.attach(requests.Session())
     session.headers.update(HEADERS)
     stats = {"downloaded": 0, "failed": 0}
 
@@ -167,7 +173,7 @@ def download_direct_files(output_dir, dry_run=False):
             print(f"    [FAIL] {e}")
             stats["failed"] += 1
 
-        time.sleep(1)
+        warc_session.pause(1)
 
     print(f"\nPart 1 Results: {stats['downloaded']} downloaded, {stats['failed']} failed")
     return stats
@@ -175,8 +181,14 @@ def download_direct_files(output_dir, dry_run=False):
 
 # ─── Part 2: Search for Dead Links ──────────────────────────────────────────
 
-def try_wayback_cdx(url, session):
-    """Use Wayback CDX API to find ALL archived versions, not just the closest."""
+def try_wayback_cdx(url, session, index=None):
+    """
+    Use Wayback CDX API to find ALL archived versions, not just the closest.
+    With a CdxIndex, the lookup is answered from the index instead.
+    """
+    if index is not None:
+        snapshots = index.lookup(url, limit=5)
+        return f"https://web.archive.org/web/{snapshots[0]['timestamp']}/{url}" if snapshots else None
     domain = urlparse(url).netloc
     path = urlparse(url).path
     cdx_url = (f"http://web.archive.org/cdx/search/cdx?"
@@ -195,41 +207,19 @@ def try_wayback_cdx(url, session):
     return None
 
 
-def try_alternate_urls(url, session):
-    """Try various URL transformations for ACF.gov dead links."""
-    alternates = []
-
-    # Original URL path
-    parsed = urlparse(url)
-    path = parsed.path.rstrip("/")
-
-    # acf.gov -> www.acf.hhs.gov
-    if "acf.gov" in url and "acf.hhs.gov" not in url:
-        alternates.append(url.replace("acf.gov", "www.acf.hhs.gov", 1))
-
-    # Try /archive/ prefix (ACF moved many pages)
-    if "/archive/" not in path:
-        parts = path.split("/", 2)
-        if len(parts) >= 3:
-            archive_path = f"/{parts[1]}/archive/{'/'.join(parts[2:])}"
-            alternates.append(f"https://acf.gov{archive_path}")
-
-    # Try /resource/ <-> /policy-guidance/ swap
-    if "/resource/" in path:
-        alternates.append(url.replace("/resource/", "/policy-guidance/"))
-    elif "/policy-guidance/" in path:
-        alternates.append(url.replace("/policy-guidance/", "/resource/"))
-
-    for alt_url in alternates:
-        try:
-            resp = session.get(alt_url, timeout=20, headers=HEADERS,
-                               allow_redirects=True)
-            if resp.status_code == 200:
-                return resp
-        except Exception:
-            pass
-        time.sleep(1)
-
+def try_alternate_urls(url, session, prober=None):
+    """Try various URL transformations for ACF.gov dead links (url_variants.py)."""
+    prober = prober or VariantProber(session, headers=HEADERS)
+    hit = prober.find(url)
+    if not hit:
+        return None
+    try:
+        resp = session.get(hit["url"], timeout=20, headers=HEADERS,
+                           allow_redirects=True)
+        if resp.status_code == 200:
+            return resp
+    except Exception:
+        pass
     return None
 
 
@@ -289,8 +279,13 @@ def search_for_document(doc_number, title, office, session):
     return likely_urls
 
 
-def search_and_recover(output_dir, dry_run=False):
-    """Try alternate URLs, Wayback CDX, and URL pattern matching for dead links."""
+def search_and_recover(output_dir, dry_run=False, reports_dir=None,
+                       cdx_endpoint=CDX_ENDPOINT):
+    """
+    Try alternate URLs, Wayback CDX, and URL pattern matching for dead links.
+    reports_dir holds the CDX index (cdx_index.py) and the learned URL
+    rewrite rules (url_variants.py); without it neither is kept.
+    """
     print("\n" + "=" * 60)
     print("PART 2: SEARCH & RECOVER DEAD LINKS")
     print("=" * 60)
@@ -303,10 +298,21 @@ def search_and_recover(output_dir, dry_run=False):
     if not targets:
         return {"recovered": 0, "still_failed": 0}
 
-    session = requests.Session()
+    session = warc_session.attach(requests.Session())
     session.headers.update(HEADERS)
     stats = {"recovered": 0, "still_failed": 0, "recovered_html": 0}
 
+    # One CDX prefix query per directory of the failed URLs
+    index = None
+    if reports_dir and not dry_run:
+        index = CdxIndex(os.path.join(reports_dir, "cdx_index.sqlite"), session,
+                         endpoint=cdx_endpoint)
+        index.warm(m["urls"][0]["url"] for m in targets if m.get("urls"))
+
+    # Rewrite rules that found live pages before are tried first
+    prober = VariantProber(session, headers=HEADERS, learned_path=os.path.join(
+        reports_dir, "url_variant_rules.json") if reports_dir else None)
+
     for i, meta in enumerate(targets):
         if not meta.get("urls"):
             stats["still_failed"] += 1
@@ -332,17 +338,17 @@ def search_and_recover(output_dir, dry_run=False):
 
         # Strategy 1: Try alternate URL patterns
         print(f"    Trying alternate URLs...")
-        resp = try_alternate_urls(url, session)
+        resp = try_alternate_urls(url, session, prober)
         if resp:
             print(f"    Found via alternate URL: {resp.url[:70]}")
 
         # Strategy 2: Wayback CDX (more thorough than simple API)
         if not resp:
             print(f"    Trying Wayback CDX...")
-            wb_url = try_wayback_cdx(url, session)
+            wb_url = try_wayback_cdx(url, session, index)
             if wb_url:
                 try:
-                    time.sleep(1.5)
+                    warc_session.pause(1.5)
                     resp = session.get(wb_url, timeout=30, headers=HEADERS,
                                        allow_redirects=True)
                     resp.raise_for_status()
@@ -356,7 +362,7 @@ def search_and_recover(output_dir, dry_run=False):
             likely_urls = search_for_document(doc_number, title, office, session)
             for try_url in likely_urls:
                 try:
-                    time.sleep(1)
+                    warc_session.pause(1)
                     r = session.get(try_url, timeout=20, headers=HEADERS,
                                     allow_redirects=True)
                     if r.status_code == 200:
@@ -419,7 +425,7 @@ def search_and_recover(output_dir, dry_run=False):
             downloaded = 0
             for link_url in doc_links[:10]:
                 try:
-                    time.sleep(1)
+                    warc_session.pause(1)
                     dl_resp = session.get(link_url, timeout=20, headers=HEADERS,
                                           allow_redirects=True)
                     dl_resp.raise_for_status()
@@ -473,7 +479,7 @@ def search_and_recover(output_dir, dry_run=False):
         with open(meta_path, "w", encoding="utf-8") as f:
             json.dump(meta, f, indent=2, default=str)
 
-        time.sleep(1.5)
+        warc_session.pause(1.5)
 
         # Progress
         if (i + 1) % 10 == 0:
@@ -485,6 +491,11 @@ def search_and_recover(output_dir, dry_run=False):
     print(f"\nPart 2 Results: {stats['recovered']} recovered, "
           f"{stats['recovered_html']} saved as HTML, "
           f"{stats['still_failed']} still failed")
+    if index is not None:
+        stats["cdx_index"] = index.summary()
+        index.close()
+    stats["url_variants"] = prober.stats
+    prober.save()
     return stats
 
 
@@ -497,7 +508,11 @@ def main():
     parser.add_argument("--direct-only", action="store_true")
     parser.add_argument("--search-only", action="store_true")
     parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--cdx-endpoint", default=CDX_ENDPOINT,
+                        help="CDX server (e.g. a local fixture server)")
+    warc_session.add_arguments(parser)
     args = parser.parse_args()
+    warc_session.setup(args.warc_record, args.warc_replay, stage="final_cleanup")
 
     output_dir = os.path.abspath(args.output)
     reports_dir = os.path.abspath(args.reports)
@@ -514,7 +529,10 @@ def main():
         all_stats["direct"] = download_direct_files(output_dir, args.dry_run)
 
     if not args.direct_only:
-        all_stats["search"] = search_and_recover(output_dir, args.dry_run)
+        all_stats["search"] = search_and_recover(
+            output_dir, args.dry_run,
+            reports_dir=reports_dir,
+            cdx_endpoint=args.cdx_endpoint)
 
     elapsed = (datetime.now() - start_time).total_seconds()
 
@@ -6,7 +6,8 @@ Converts saved page_content.html files to PDFs for rows where the
 guidance document was embedded in the webpage rather than available
 as a separate downloadable file.
 
-Also updates metadata.json to reflect the conversion.
+Also updates metadata.json to reflect the conversion. Pages are laid
+out by scripts_v2/html_pdf.py's fpdf backend (see v2_shared.py).
 
 Usage:
   python html_to_pdf.py                    # Convert all eligible rows
@@ -23,42 +24,12 @@ import sys
 from datetime import datetime
 from pathlib import Path
 
-from bs4 import BeautifulSoup
-from fpdf import FPDF
+from v2_shared import convert_html
 
 DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), "..", "output")
 DEFAULT_REPORTS = os.path.join(os.path.dirname(__file__), "..", "reports")
 
 
-class GuidancePDF(FPDF):
-    """Custom PDF class for guidance documents."""
-
-    def __init__(self, title="", doc_number="", office="", issue_date="", source_url=""):
-        super().__init__()
-        self.doc_title = title
-        self.doc_number = doc_number
-        self.office = office
-        self.issue_date = issue_date
-        self.source_url = source_url
-
-    def header(self):
-        self.set_font("Helvetica", "B", 8)
-        self.set_text_color(100, 100, 100)
-        header_text = f"ACF {self.office}"
-        if self.doc_number:
-            header_text += f" | {self.doc_number}"
-        self.cell(0, 5, header_text, new_x="LMARGIN", new_y="NEXT", align="L")
-        self.line(10, self.get_y(), 200, self.get_y())
-        self.ln(3)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font("Helvetica", "I", 7)
-        self.set_text_color(128, 128, 128)
-        self.cell(0, 10, f"Page {self.page_no()}/{{nb}} | Source: {self.source_url[:80]}",
-                  new_x="LMARGIN", new_y="TOP", align="C")
-
-
 def sha256_file(filepath):
     """Compute SHA256 hash of a file."""
     h = hashlib.sha256()
@@ -68,164 +39,6 @@ def sha256_file(filepath):
     return h.hexdigest()
 
 
-def clean_text(text):
-    """Clean extracted text for PDF rendering."""
-    # Remove excessive whitespace
-    text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
-    # Remove leading/trailing whitespace per line
-    lines = [line.strip() for line in text.split('\n')]
-    text = '\n'.join(lines)
-    # Remove common navigation/footer junk
-    for junk in [
-        "Skip to main content",
-        "An official website of the United States government",
-        "Here's how you know",
-        "Official websites use .gov",
-        "Secure .gov websites use HTTPS",
-        "Share sensitive information only on official",
-    ]:
-        text = text.replace(junk, "")
-    return text.strip()
-
-
-def extract_content_from_html(html_path):
-    """Extract main content text from an HTML file."""
-    with open(html_path, "r", encoding="utf-8", errors="replace") as f:
-        html = f.read()
-
-    soup = BeautifulSoup(html, "html.parser")
-
-    # Remove script, style, nav, footer elements
-    for tag in soup.find_all(["script", "style", "nav", "footer", "header",
-                               "noscript", "iframe"]):
-        tag.decompose()
-
-    # Try to find main content area
-    main = (soup.find("main") or
-            soup.find("article") or
-            soup.find("div", {"class": re.compile(r"content|main|body", re.I)}) or
-            soup.find("div", {"id": re.compile(r"content|main|body", re.I)}))
-
-    if main:
-        content = main
-    else:
-        content = soup.find("body") or soup
-
-    # Extract text with some structure
-    sections = []
-    current_section = {"heading": "", "paragraphs": []}
-
-    for element in content.descendants:
-        if element.name in ["h1", "h2", "h3", "h4"]:
-            # Save previous section
-            if current_section["paragraphs"]:
-                sections.append(current_section)
-            current_section = {
-                "heading": element.get_text(strip=True),
-                "level": int(element.name[1]),
-                "paragraphs": []
-            }
-        elif element.name in ["p", "li"]:
-            text = element.get_text(strip=True)
-            if text and len(text) > 5:
-                prefix = "  - " if element.name == "li" else ""
-                current_section["paragraphs"].append(prefix + text)
-        elif element.name in ["td", "th"]:
-            text = element.get_text(strip=True)
-            if text:
-                current_section["paragraphs"].append(text)
-
-    # Don't forget the last section
-    if current_section["paragraphs"]:
-        sections.append(current_section)
-
-    return sections
-
-
-def create_pdf(sections, metadata, output_path):
-    """Create a PDF from extracted content sections."""
-    title = metadata.get("title", "")
-    doc_number = metadata.get("doc_number", "")
-    office = metadata.get("office", "")
-    issue_date = metadata.get("issue_date", "")
-    source_url = ""
-    if metadata.get("urls"):
-        source_url = metadata["urls"][0].get("url", "")
-
-    pdf = GuidancePDF(
-        title=title,
-        doc_number=doc_number,
-        office=office,
-        issue_date=issue_date,
-        source_url=source_url
-    )
-    pdf.alias_nb_pages()
-    pdf.set_auto_page_break(auto=True, margin=20)
-    pdf.add_page()
-
-    # Title
-    pdf.set_font("Helvetica", "B", 16)
-    pdf.set_text_color(0, 0, 0)
-    if title:
-        pdf.multi_cell(0, 8, title, new_x="LMARGIN", new_y="NEXT")
-    pdf.ln(3)
-
-    # Metadata line
-    meta_parts = []
-    if doc_number:
-        meta_parts.append(f"Document: {doc_number}")
-    if office:
-        meta_parts.append(f"Office: {office}")
-    if issue_date:
-        meta_parts.append(f"Date: {issue_date[:10]}")
-
-    if meta_parts:
-        pdf.set_font("Helvetica", "I", 9)
-        pdf.set_text_color(80, 80, 80)
-        pdf.multi_cell(0, 5, " | ".join(meta_parts), new_x="LMARGIN", new_y="NEXT")
-        pdf.ln(2)
-
-    if source_url:
-        pdf.set_font("Helvetica", "I", 8)
-        pdf.set_text_color(0, 0, 200)
-        pdf.multi_cell(0, 5, f"Source: {source_url}", new_x="LMARGIN", new_y="NEXT")
-        pdf.ln(2)
-
-    pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-    pdf.ln(5)
-
-    # Content
-    pdf.set_text_color(0, 0, 0)
-
-    for section in sections:
-        heading = section.get("heading", "")
-        level = section.get("level", 2)
-
-        if heading:
-            if level == 1:
-                pdf.set_font("Helvetica", "B", 14)
-            elif level == 2:
-                pdf.set_font("Helvetica", "B", 12)
-            else:
-                pdf.set_font("Helvetica", "B", 11)
-
-            pdf.ln(3)
-            # Encode safely
-            safe_heading = heading.encode('latin-1', 'replace').decode('latin-1')
-            pdf.multi_cell(0, 6, safe_heading, new_x="LMARGIN", new_y="NEXT")
-            pdf.ln(2)
-
-        pdf.set_font("Helvetica", "", 10)
-        for para in section["paragraphs"]:
-            # Encode safely for PDF (latin-1 compatible)
-            safe_para = para.encode('latin-1', 'replace').decode('latin-1')
-            if safe_para:
-                pdf.multi_cell(0, 5, safe_para, new_x="LMARGIN", new_y="NEXT")
-                pdf.ln(2)
-
-    pdf.output(output_path)
-
-
 def process_row(row_dir, dry_run=False):
     """Process a single row folder — convert HTML to PDF if applicable."""
     meta_path = os.path.join(row_dir, "metadata.json")
@@ -251,13 +64,6 @@ def process_row(row_dir, dry_run=False):
               f"({metadata.get('office', '')})")
         return "dry_run"
 
-    # Extract content
-    sections = extract_content_from_html(html_path)
-
-    if not sections:
-        print(f"  [SKIP] {folder_name}: No extractable content in HTML")
-        return "empty"
-
     # Generate PDF filename
     doc_num = metadata.get("doc_number", "").strip()
     if doc_num:
@@ -268,10 +74,12 @@ def process_row(row_dir, dry_run=False):
 
     pdf_path = os.path.join(row_dir, pdf_name)
 
-    try:
-        create_pdf(sections, metadata, pdf_path)
-    except Exception as e:
-        print(f"  [ERROR] {folder_name}: PDF creation failed — {e}")
+    ok, reason = convert_html(html_path, pdf_path, metadata)
+    if reason == "insufficient_content":
+        print(f"  [SKIP] {folder_name}: No extractable content in HTML")
+        return "empty"
+    if not ok:
+        print(f"  [ERROR] {folder_name}: PDF creation failed — {reason}")
         return "error"
 
     file_size = os.path.getsize(pdf_path)
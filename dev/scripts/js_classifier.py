@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+js_classifier.py - Decide from the first raw HTML whether a page needs a browser.
+
+acf_harvest.py fetches every page with requests and scrapes it for
+document links; a JS-rendered page comes back as an empty shell, ends
+up as no_documents, and browser_recover.py fetches it all over again
+in Chromium. Classifying the raw response as it arrives lets the
+harvester hand such rows straight to the browser lane instead of
+scraping a shell: the row's result gets a "browser_lane" entry (URL and
+decision) and ends up no_documents, which browser_recover.py retries.
+Signals, each with a weight:
+
+  - empty_main    a main-content element exists but holds fewer than
+                  MIN_MAIN_CHARS characters of text (or the whole body
+                  does, when there is no main element)
+  - bootstrap     framework markers: __NEXT_DATA__, __NUXT__, ng-app,
+                  data-reactroot, an empty #root/#app/#__next mount
+                  point, Drupal BigPipe placeholders
+  - noscript      a <noscript> notice asking to enable JavaScript
+  - script_heavy  inline script outweighs visible text SCRIPT_RATIO to 1
+  - js_host       the host is in JS_HOSTS (e.g. headstart.gov)
+
+A page needs the browser when its score reaches THRESHOLD; js_host
+alone does not, so a static page on a JS host still gets scraped.
+
+Decisions are tallied per host in a HostDecisions cache (a JSON file
+kept between runs). Once a host has MIN_HOST_SAMPLES decisions and at
+least HOST_AGREEMENT of them went to the browser, its verdict is
+"browser" and the harvester sends that host's pages to the browser
+lane without fetching them raw (skip_raw()). Every RESAMPLE_EVERY-th
+such page is still fetched and classified, so static pages keep
+counting and the verdict can change back.
+
+    hosts = HostDecisions(path)
+    if hosts.skip_raw(url): ...            # straight to the browser lane
+    decision = hosts.record(url, classify(resp.text, resp.url))
+    if decision["needs_browser"]: ...
+    hosts.save()
+"""
+
+import json
+import os
+import re
+
+from bs4 import BeautifulSoup
+
+from recovery_pool import host_key
+
+MAIN_SELECTORS = [
+    "main", "article", ".field--name-body", ".node__content", "#main-content",
+    "[role='main']", ".main-content", "#content",
+]
+MIN_MAIN_CHARS = 200
+SCRIPT_RATIO = 5
+
+# Hosts known to render their content client-side
+JS_HOSTS = ["headstart.gov", "eclkc.ohs.acf.hhs.gov"]
+
+WEIGHTS = {
+    "empty_main": 3,
+    "bootstrap": 2,
+    "noscript": 2,
+    "script_heavy": 1,
+    "js_host": 2,
+}
+THRESHOLD = 4
+
+MIN_HOST_SAMPLES = 5
+HOST_AGREEMENT = 0.9
+RESAMPLE_EVERY = 10     # under a "browser" verdict, every 10th page is still classified
+
+BOOTSTRAP_MARKERS = [
+    ("next", re.compile(r'id=["\']__NEXT_DATA__["\']')),
+    ("nuxt", re.compile(r"window\.__NUXT__")),
+    ("angular", re.compile(r"\bng-app\b|<app-root", re.I)),
+    ("react", re.compile(r"data-reactroot")),
+    ("bigpipe", re.compile(r"data-big-pipe-placeholder-id")),
+]
+MOUNT_IDS = ["root", "app", "__next", "__nuxt"]
+NOSCRIPT_NOTICE = re.compile(r"enable\s+javascript|requires?\s+javascript|"
+                             r"javascript\s+(is\s+)?(disabled|required)", re.I)
+
+
+def _is_js_host(host):
+    return any(host == h or host.endswith("." + h) for h in JS_HOSTS)
+
+
+def classify(html, url=""):
+    """
+    Classify one raw HTML response. Returns
+    {"needs_browser", "score", "signals", "main_chars"}; signals lists
+    the names that fired (bootstrap as "bootstrap:<framework>").
+    """
+    signals = []
+    soup = BeautifulSoup(html or "", "html.parser")
+
+    bootstraps = [name for name, pattern in BOOTSTRAP_MARKERS if pattern.search(html or "")]
+    for mount in MOUNT_IDS:
+        el = soup.find(id=mount)
+        if el is not None and not el.get_text(strip=True):
+            bootstraps.append(f"mount#{mount}")
+
+    noscript = any(NOSCRIPT_NOTICE.search(n.get_text(" ", strip=True))
+                   for n in soup.find_all("noscript"))
+
+    script_chars = sum(len(s.string or "") for s in soup.find_all("script"))
+    for tag in soup(["script", "style", "noscript", "template"]):
+        tag.decompose()
+
+    main = None
+    for selector in MAIN_SELECTORS:
+        main = soup.select_one(selector)
+        if main is not None:
+            break
+    scope = main if main is not None else (soup.body or soup)
+    main_chars = len(scope.get_text(" ", strip=True))
+    text_chars = len((soup.body or soup).get_text(" ", strip=True))
+
+    if main_chars < MIN_MAIN_CHARS:
+        signals.append("empty_main")
+    if bootstraps:
+        signals.extend(f"bootstrap:{b}" for b in bootstraps)
+    if noscript:
+        signals.append("noscript")
+    if script_chars > SCRIPT_RATIO * max(text_chars, 1):
+        signals.append("script_heavy")
+    if _is_js_host(host_key(url)):
+        signals.append("js_host")
+
+    score = sum(WEIGHTS[name] for name in {s.split(":")[0] for s in signals})
+    return {"needs_browser": score >= THRESHOLD, "score": score,
+            "signals": signals, "main_chars": main_chars}
+
+
+class HostDecisions:
+    """Per-host tallies of classify() decisions, persisted as JSON."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.hosts = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.hosts = json.load(f)
+
+    def verdict(self, url):
+        """'browser' once a host has enough agreeing decisions, else None."""
+        entry = self.hosts.get(host_key(url))
+        if not entry or entry["pages"] < MIN_HOST_SAMPLES:
+            return None
+        if entry["browser"] >= HOST_AGREEMENT * entry["pages"]:
+            return "browser"
+        return None
+
+    def skip_raw(self, url):
+        """
+        Whether url goes to the browser lane without a raw fetch: its host's
+        verdict is "browser" and it isn't one of the pages resampled.
+        """
+        if self.verdict(url) != "browser":
+            return False
+        entry = self.hosts[host_key(url)]
+        entry["skipped"] = entry.get("skipped", 0) + 1
+        return entry["skipped"] % RESAMPLE_EVERY != 0
+
+    def record(self, url, decision):
+        """Tally a classify() decision for url's host; returns the decision."""
+        entry = self.hosts.setdefault(host_key(url),
+                                      {"pages": 0, "browser": 0, "signals": {}})
+        entry["pages"] += 1
+        if decision["needs_browser"]:
+            entry["browser"] += 1
+        for signal in decision["signals"]:
+            entry["signals"][signal] = entry["signals"].get(signal, 0) + 1
+        return decision
+
+    def report(self):
+        """{host: {pages, browser, static, verdict, signals}}, busiest host first."""
+        rows = sorted(self.hosts.items(), key=lambda kv: -kv[1]["pages"])
+        return {host: {"pages": e["pages"], "browser": e["browser"],
+                       "static": e["pages"] - e["browser"],
+                       "verdict": self.verdict("//" + host) or "classify",
+                       "signals": e["signals"]}
+                for host, e in rows}
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.hosts, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Classify saved HTML pages")
+    parser.add_argument("files", nargs="+", help="HTML files (e.g. output/*/page_content.html)")
+    parser.add_argument("--url", default="", help="URL the pages came from (for js_host)")
+    args = parser.parse_args()
+
+    for path in args.files:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            d = classify(f.read(), args.url)
+        lane = "browser" if d["needs_browser"] else "requests"
+        print(f"{lane:8s} score={d['score']:2d} main={d['main_chars']:6d}  {path}  "
+              f"{', '.join(d['signals'])}")
+    sys.exit(0)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+page_ready.py - Decide when a recovered page has rendered its content.
+
+Browser recovery used to wait for `networkidle` and, when that timed out,
+for domcontentloaded plus a fixed 3 s sleep, so every page cost seconds
+even when its main content was on screen almost at once. Instead,
+navigate to domcontentloaded and run one in-page wait that resolves as
+soon as either:
+
+  - content  a main-content element (MAIN_SELECTORS, first match wins)
+             holds at least MIN_CHARS characters of text, or
+  - quiet    the DOM has not changed for QUIET_MS,
+
+with a hard cap of CAP_MS ("cap"). The result says which, how long it
+took and how much text was there, for the recovery report:
+
+    start = time.perf_counter()
+    page.goto(url, wait_until="domcontentloaded")
+    ready = wait_until_ready(page, start)
+    # {"reason": "content", "selector": "main", "chars": 5120, "seconds": 0.84}
+"""
+
+import time
+
+MAIN_SELECTORS = [
+    "main", "article", ".field--name-body", ".node__content", "#main-content",
+    "[role='main']", ".main-content", "#content",
+]
+MIN_CHARS = 200
+QUIET_MS = 750
+CAP_MS = 10000
+CHECK_MS = 100              # text length is re-read at most this often
+
+READY_JS = """
+async ({selectors, minChars, quietMs, capMs, checkMs}) => {
+    const content = () => {
+        for (const sel of selectors) {
+            const el = document.querySelector(sel);
+            if (!el) continue;
+            const n = (el.innerText || '').trim().length;
+            if (n >= minChars) return [sel, n];
+        }
+        return null;
+    };
+    return await new Promise(resolve => {
+        let quiet, cap, pending = null, observer = null;
+        const finish = (reason, hit) => {
+            if (observer) observer.disconnect();
+            clearTimeout(quiet); clearTimeout(cap); clearTimeout(pending);
+            resolve({reason, selector: hit ? hit[0] : null, chars: hit ? hit[1] : 0});
+        };
+        const check = () => {
+            pending = null;
+            const hit = content();
+            if (hit) finish('content', hit);
+        };
+        const armQuiet = () => {
+            clearTimeout(quiet);
+            quiet = setTimeout(() => finish('quiet', content()), quietMs);
+        };
+        const initial = content();
+        if (initial) return finish('content', initial);
+        observer = new MutationObserver(() => {
+            armQuiet();
+            if (pending === null) pending = setTimeout(check, checkMs);
+        });
+        observer.observe(document.documentElement,
+                         {childList: true, subtree: true, characterData: true});
+        armQuiet();
+        cap = setTimeout(() => finish('cap', content()), capMs);
+    });
+}
+"""
+
+
+def wait_until_ready(page, started=None, min_chars=MIN_CHARS, quiet_ms=QUIET_MS,
+                     cap_ms=CAP_MS):
+    """
+    Block until the page's main content is ready (see module docstring).
+    `started` is the perf_counter() taken before page.goto(), so
+    "seconds" is the whole time-to-ready. A navigation during the wait
+    (JS redirect) restarts it once on the new document.
+    """
+    started = time.perf_counter() if started is None else started
+    args = {"selectors": MAIN_SELECTORS, "minChars": min_chars, "quietMs": quiet_ms,
+            "capMs": cap_ms, "checkMs": CHECK_MS}
+    try:
+        ready = page.evaluate(READY_JS, args)
+    except Exception:
+        try:
+            page.wait_for_load_state("domcontentloaded", timeout=cap_ms)
+            ready = page.evaluate(READY_JS, args)
+        except Exception as e:
+            ready = {"reason": "error", "selector": None, "chars": 0, "error": str(e)[:200]}
+    ready["seconds"] = round(time.perf_counter() - started, 3)
+    return ready
+
+
+def summarize(timings):
+    """Report block for a list of wait_until_ready() results."""
+    seconds = sorted(t["seconds"] for t in timings)
+    reasons = {}
+    for t in timings:
+        reasons[t["reason"]] = reasons.get(t["reason"], 0) + 1
+
+    def pct(p):
+        return seconds[min(len(seconds) - 1, int(round(p / 100 * (len(seconds) - 1))))]
+
+    return {
+        "pages": len(timings),
+        "reasons": reasons,
+        "p50_seconds": pct(50) if seconds else None,
+        "p95_seconds": pct(95) if seconds else None,
+        "max_seconds": seconds[-1] if seconds else None,
+    }
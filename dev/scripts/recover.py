@@ -4,7 +4,7 @@ ACF Guidance — Recovery Script
 ================================
 Handles the remaining ~300 rows that weren't captured in the initial harvest:
 
-1. Converts remaining HTML pages to PDF using a more aggressive text extractor
+1. Converts remaining HTML pages to PDF (scripts_v2/html_pdf.py's fpdf backend)
 2. Retries failed rows using Wayback Machine
 
 Usage:
@@ -12,6 +12,7 @@ Usage:
   python recover.py --convert-only     # Only convert remaining HTML to PDF
   python recover.py --retry-only       # Only retry failed rows
   python recover.py --dry-run          # Show what would be done
+  python recover.py --retry-only --warc-replay ../warc   # Retry offline from a recording
 """
 
 import argparse
@@ -20,13 +21,14 @@ import json
 import os
 import re
 import sys
-import time
 from datetime import datetime
 from urllib.parse import urljoin, urlparse
 
 import requests
 from bs4 import BeautifulSoup
-from fpdf import FPDF
+
+from v2_shared import convert_html
+import warc_session
 
 DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), "..", "output")
 DEFAULT_REPORTS = os.path.join(os.path.dirname(__file__), "..", "reports")
@@ -71,172 +73,12 @@ def safe_filename(name, max_len=100):
     return name[:max_len] if name else "unnamed"
 
 
-# ─── PART 1: Aggressive HTML to PDF ─────────────────────────────────────────
-
-class GuidancePDF(FPDF):
-    def __init__(self, title="", doc_number="", office="", source_url=""):
-        super().__init__()
-        self.doc_title = title
-        self.doc_number = doc_number
-        self.office = office
-        self.source_url = source_url
-
-    def header(self):
-        self.set_font("Helvetica", "B", 8)
-        self.set_text_color(100, 100, 100)
-        header_text = f"ACF {self.office}"
-        if self.doc_number:
-            header_text += f" | {self.doc_number}"
-        self.cell(0, 5, header_text, new_x="LMARGIN", new_y="NEXT", align="L")
-        self.line(10, self.get_y(), 200, self.get_y())
-        self.ln(3)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font("Helvetica", "I", 7)
-        self.set_text_color(128, 128, 128)
-        self.cell(0, 10, f"Page {self.page_no()}/{{nb}} | Source: {self.source_url[:80]}",
-                  new_x="LMARGIN", new_y="TOP", align="C")
-
-
-def aggressive_extract(html_path):
-    """More aggressive text extraction — grabs ALL visible text."""
-    with open(html_path, "r", encoding="utf-8", errors="replace") as f:
-        html = f.read()
-
-    soup = BeautifulSoup(html, "html.parser")
-
-    # Remove junk tags
-    for tag in soup.find_all(["script", "style", "nav", "footer", "noscript",
-                               "iframe", "svg", "meta", "link", "button"]):
-        tag.decompose()
-
-    # Remove header/banner/nav elements by class/id/role
-    for tag in soup.find_all(attrs={"class": re.compile(
-            r"header|banner|nav|menu|sidebar|footer|breadcrumb|skip|cookie",
-            re.I)}):
-        tag.decompose()
-    for tag in soup.find_all(attrs={"id": re.compile(
-            r"header|banner|nav|menu|sidebar|footer|breadcrumb|skip|cookie",
-            re.I)}):
-        tag.decompose()
-    for tag in soup.find_all(attrs={"role": re.compile(
-            r"navigation|banner|complementary", re.I)}):
-        tag.decompose()
-
-    # Try multiple selectors for main content
-    main = (soup.find("main") or
-            soup.find("article") or
-            soup.find("div", {"class": re.compile(
-                r"field--name-body|content|main-content|page-content|article",
-                re.I)}) or
-            soup.find("div", {"id": re.compile(
-                r"content|main|block-system-main", re.I)}) or
-            soup.find("body"))
-
-    if not main:
-        main = soup
-
-    # Get all text blocks
-    blocks = []
-    for element in main.find_all(["h1", "h2", "h3", "h4", "h5", "p", "li",
-                                    "td", "th", "div", "span", "blockquote",
-                                    "dd", "dt", "figcaption", "label"]):
-        text = element.get_text(separator=" ", strip=True)
-        if text and len(text) > 10:
-            if any(skip in text.lower() for skip in [
-                "skip to main", "here's how you know", ".gov website",
-                "secure .gov", "official website", "share sensitive",
-                "an official website of the united states"
-            ]):
-                continue
-
-            is_heading = element.name in ["h1", "h2", "h3", "h4", "h5"]
-            blocks.append({
-                "text": text,
-                "is_heading": is_heading,
-                "level": int(element.name[1]) if is_heading else 0
-            })
-
-    # Deduplicate
-    deduped = []
-    seen_starts = set()
-    for block in blocks:
-        start = block["text"][:50]
-        if start not in seen_starts:
-            seen_starts.add(start)
-            deduped.append(block)
-
-    return deduped
-
-
-def create_pdf_from_blocks(blocks, metadata, output_path):
-    """Create PDF from extracted text blocks."""
-    title = metadata.get("title", "")
-    doc_number = metadata.get("doc_number", "")
-    office = metadata.get("office", "")
-    issue_date = metadata.get("issue_date", "")
-    source_url = metadata["urls"][0]["url"] if metadata.get("urls") else ""
-
-    pdf = GuidancePDF(title=title, doc_number=doc_number,
-                      office=office, source_url=source_url)
-    pdf.alias_nb_pages()
-    pdf.set_auto_page_break(auto=True, margin=20)
-    pdf.add_page()
-
-    # Title
-    pdf.set_font("Helvetica", "B", 14)
-    pdf.set_text_color(0, 0, 0)
-    if title:
-        safe_title = title.encode('latin-1', 'replace').decode('latin-1')
-        pdf.multi_cell(0, 7, safe_title, new_x="LMARGIN", new_y="NEXT")
-    pdf.ln(2)
-
-    # Metadata line
-    meta_parts = []
-    if doc_number:
-        meta_parts.append(f"Document: {doc_number}")
-    if office:
-        meta_parts.append(f"Office: {office}")
-    if issue_date:
-        meta_parts.append(f"Date: {issue_date[:10]}")
-    if meta_parts:
-        pdf.set_font("Helvetica", "I", 9)
-        pdf.set_text_color(80, 80, 80)
-        pdf.cell(0, 5, " | ".join(meta_parts), new_x="LMARGIN", new_y="NEXT")
-        pdf.ln(1)
-
-    if source_url:
-        pdf.set_font("Helvetica", "I", 8)
-        pdf.set_text_color(0, 0, 200)
-        safe_url = source_url.encode('latin-1', 'replace').decode('latin-1')
-        pdf.cell(0, 5, f"Source: {safe_url}", new_x="LMARGIN", new_y="NEXT")
-        pdf.ln(1)
-
-    pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-    pdf.ln(4)
-    pdf.set_text_color(0, 0, 0)
-
-    for block in blocks:
-        safe_text = block["text"].encode('latin-1', 'replace').decode('latin-1')
-        if block["is_heading"]:
-            size = {1: 14, 2: 12, 3: 11}.get(block["level"], 11)
-            pdf.set_font("Helvetica", "B", size)
-            pdf.ln(2)
-            pdf.multi_cell(0, 6, safe_text, new_x="LMARGIN", new_y="NEXT")
-            pdf.ln(1)
-        else:
-            pdf.set_font("Helvetica", "", 10)
-            pdf.multi_cell(0, 5, safe_text, new_x="LMARGIN", new_y="NEXT")
-            pdf.ln(2)
-
-    pdf.output(output_path)
-
+# ─── PART 1: HTML to PDF ────────────────────────────────────────────────────
 
 def convert_remaining_html(output_dir, dry_run=False):
     """Convert remaining no_documents HTML files to PDF."""
     print("\n" + "=" * 60)
-    print("PHASE 1: AGGRESSIVE HTML TO PDF CONVERSION")
+    print("PHASE 1: HTML TO PDF CONVERSION")
     print("=" * 60)
 
     stats = {"converted": 0, "empty": 0, "error": 0, "skipped": 0}
@@ -266,13 +108,6 @@ def convert_remaining_html(output_dir, dry_run=False):
             stats["converted"] += 1
             continue
 
-        blocks = aggressive_extract(html_path)
-
-        if not blocks or len(blocks) < 2:
-            print(f"  [EMPTY] {folder_name}: Insufficient content ({len(blocks)} blocks)")
-            stats["empty"] += 1
-            continue
-
         doc_num = metadata.get("doc_number", "").strip()
         if doc_num:
             safe_name = re.sub(r'[^a-zA-Z0-9_-]', '_', doc_num)
@@ -282,8 +117,17 @@ def convert_remaining_html(output_dir, dry_run=False):
 
         pdf_path = os.path.join(row_dir, pdf_name)
 
+        ok, reason = convert_html(html_path, pdf_path, metadata)
+        if not ok:
+            if reason == "insufficient_content":
+                print(f"  [EMPTY] {folder_name}: Insufficient content")
+                stats["empty"] += 1
+            else:
+                print(f"  [ERROR] {folder_name}: {reason}")
+                stats["error"] += 1
+            continue
+
         try:
-            create_pdf_from_blocks(blocks, metadata, pdf_path)
             file_size = os.path.getsize(pdf_path)
             file_hash = sha256_file(pdf_path)
 
@@ -298,7 +142,7 @@ def convert_remaining_html(output_dir, dry_run=False):
                 "converted_at": datetime.now().isoformat()
             })
             metadata["status"] = "success"
-            metadata["conversion_note"] = "Recovered via aggressive HTML extraction"
+            metadata["conversion_note"] = "Recovered via HTML to PDF conversion"
 
             with open(meta_path, "w", encoding="utf-8") as f:
                 json.dump(metadata, f, indent=2, default=str)
@@ -326,7 +170,7 @@ def try_wayback(url, session):
         if snapshot.get("available"):
             wb_url = snapshot["url"]
             print(f"    Wayback found: {wb_url[:80]}")
-            time.sleep(REQUEST_DELAY)
+            warc_session.pause(REQUEST_DELAY)
             resp2 = session.get(wb_url, timeout=REQUEST_TIMEOUT, headers=HEADERS,
                                 allow_redirects=True)
             resp2.raise_for_status()
@@ -362,7 +206,7 @@ def retry_failed_rows(output_dir, dry_run=False):
     print("PHASE 2: RETRY FAILED ROWS")
     print("=" * 60)
 
-    session = requests.Session()
+    session = warc_session.attach(requests.Session())
     session.headers.update(HEADERS)
 
     stats = {"recovered": 0, "still_failed": 0, "saved_html": 0, "skipped": 0}
@@ -394,7 +238,7 @@ def retry_failed_rows(output_dir, dry_run=False):
             stats["recovered"] += 1
             continue
 
-        time.sleep(REQUEST_DELAY)
+        warc_session.pause(REQUEST_DELAY)
 
         # Try direct
         resp = None
@@ -414,7 +258,7 @@ def retry_failed_rows(output_dir, dry_run=False):
             if alt_url:
                 try:
                     print(f"    Alternate: {alt_url[:70]}")
-                    time.sleep(REQUEST_DELAY)
+                    warc_session.pause(REQUEST_DELAY)
                     resp = session.get(alt_url, timeout=REQUEST_TIMEOUT,
                                        headers=HEADERS, allow_redirects=True)
                     resp.raise_for_status()
@@ -424,7 +268,7 @@ def retry_failed_rows(output_dir, dry_run=False):
         # Wayback
         if not resp:
             print(f"    Wayback...")
-            time.sleep(REQUEST_DELAY)
+            warc_session.pause(REQUEST_DELAY)
             resp = try_wayback(url, session)
 
         if not resp:
@@ -462,7 +306,7 @@ def retry_failed_rows(output_dir, dry_run=False):
             if doc_links:
                 downloaded = 0
                 for link in doc_links:
-                    time.sleep(REQUEST_DELAY)
+                    warc_session.pause(REQUEST_DELAY)
                     try:
                         dl_resp = session.get(link["url"], timeout=REQUEST_TIMEOUT,
                                               headers=HEADERS, allow_redirects=True)
@@ -502,38 +346,36 @@ def retry_failed_rows(output_dir, dry_run=False):
                 with open(html_path, "w", encoding="utf-8") as f:
                     f.write(resp.text)
 
-                blocks = aggressive_extract(html_path)
-                if blocks and len(blocks) >= 2:
-                    doc_num = metadata.get("doc_number", "").strip()
-                    if doc_num:
-                        sname = re.sub(r'[^a-zA-Z0-9_-]', '_', doc_num)
-                        pdf_name = f"{sname}_recovered.pdf"
-                    else:
-                        pdf_name = f"guidance_{folder_name}_recovered.pdf"
-
-                    pdf_path = os.path.join(row_dir, pdf_name)
-                    try:
-                        create_pdf_from_blocks(blocks, metadata, pdf_path)
-                        metadata["files_downloaded"].append({
-                            "filename": pdf_name,
-                            "source_url": resp.url,
-                            "size_bytes": os.path.getsize(pdf_path),
-                            "sha256": sha256_file(pdf_path),
-                            "content_type": "application/pdf",
-                            "download_type": "retry_html_to_pdf"
-                        })
-                        metadata["status"] = "success"
-                        metadata["retry_note"] = "Recovered: HTML to PDF on retry"
-                        print(f"    [OK] Converted to {pdf_name}")
-                        stats["recovered"] += 1
-                    except Exception as e:
-                        print(f"    [ERROR] PDF conversion: {e}")
-                        metadata["status"] = "no_documents"
-                        stats["saved_html"] += 1
+                doc_num = metadata.get("doc_number", "").strip()
+                if doc_num:
+                    sname = re.sub(r'[^a-zA-Z0-9_-]', '_', doc_num)
+                    pdf_name = f"{sname}_recovered.pdf"
                 else:
+                    pdf_name = f"guidance_{folder_name}_recovered.pdf"
+
+                pdf_path = os.path.join(row_dir, pdf_name)
+                ok, reason = convert_html(html_path, pdf_path, metadata)
+                if ok:
+                    metadata["files_downloaded"].append({
+                        "filename": pdf_name,
+                        "source_url": resp.url,
+                        "size_bytes": os.path.getsize(pdf_path),
+                        "sha256": sha256_file(pdf_path),
+                        "content_type": "application/pdf",
+                        "download_type": "retry_html_to_pdf"
+                    })
+                    metadata["status"] = "success"
+                    metadata["retry_note"] = "Recovered: HTML to PDF on retry"
+                    print(f"    [OK] Converted to {pdf_name}")
+                    stats["recovered"] += 1
+                elif reason == "insufficient_content":
                     metadata["status"] = "no_documents"
                     print(f"    [HTML] Saved page, insufficient content for PDF")
                     stats["saved_html"] += 1
+                else:
+                    print(f"    [ERROR] PDF conversion: {reason}")
+                    metadata["status"] = "no_documents"
+                    stats["saved_html"] += 1
 
         # Save updated metadata
         metadata["errors"] = []
@@ -556,7 +398,9 @@ def main():
     parser.add_argument("--convert-only", action="store_true")
     parser.add_argument("--retry-only", action="store_true")
     parser.add_argument("--dry-run", action="store_true")
+    warc_session.add_arguments(parser)
     args = parser.parse_args()
+    warc_session.setup(args.warc_record, args.warc_replay, stage="recover")
 
     output_dir = os.path.abspath(args.output)
     reports_dir = os.path.abspath(args.reports)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+recovery_pool.py - Parallel, isolated browser contexts for browser recovery.
+
+browser_recover.py and browser_retry_matched.py used to push every row
+through one page in one context, strictly in order, so a backlog of
+slow JS-heavy headstart.gov pages ran at one page at a time. Here each
+worker thread owns its own Playwright, headless Chromium, context (own
+cookie jar and cache) and page, and pulls rows from a shared queue:
+
+  - per-host concurrency limits: a worker takes the first queued row
+    whose host has a free slot, so one slow host can't take every
+    worker, and no host sees more than its limit of parallel pages
+  - a worker whose browser crashed during a row relaunches it before
+    taking the next one; a worker that can't launch at all exits and
+    the others carry on with the queue
+  - results come back to the calling thread in queue order, so metadata
+    writes and progress output stay sequential and deterministic even
+    though rows finish out of order
+
+Sync Playwright objects are bound to the thread that created them, which
+is why every worker has its own Playwright instance rather than sharing
+one browser.
+
+    def work(page, item):          # runs on a worker thread
+        return process_with_browser(page, ...)
+
+    def done(i, item, ok):         # runs on this thread, in item order
+        write_metadata(item)
+
+    run_pool(items, url_of, work, done, workers=4, host_limits={"headstart.gov": 2})
+"""
+
+import queue
+import threading
+import time
+from urllib.parse import urlparse
+
+DEFAULT_WORKERS = 4
+DEFAULT_HOST_LIMIT = 2          # parallel pages per host unless host_limits says otherwise
+HOST_DELAY = 1.0                # seconds a worker waits after a row before its next one
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36")
+
+CONTEXT_OPTIONS = {
+    "user_agent": USER_AGENT,
+    "viewport": {"width": 1280, "height": 900},
+    "java_script_enabled": True,
+}
+
+
+def host_key(url):
+    """Host used for concurrency limits ('www.' ignored)."""
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def parse_host_limits(values):
+    """['headstart.gov=3', ...] from the command line → {'headstart.gov': 3}."""
+    limits = {}
+    for value in values or []:
+        host, _, n = value.partition("=")
+        if not n.isdigit() or int(n) < 1:
+            raise ValueError(f"Expected HOST=N, got {value!r}")
+        limits[host_key("//" + host.strip())] = int(n)
+    return limits
+
+
+class HostScheduler:
+    """Hands out queued items, never more than a host's limit at once."""
+
+    def __init__(self, items, url_of, host_limits=None, default_limit=DEFAULT_HOST_LIMIT):
+        self.pending = [(i, item, host_key(url_of(item))) for i, item in enumerate(items)]
+        self.limits = host_limits or {}
+        self.default_limit = default_limit
+        self.active = {}
+        self._cond = threading.Condition()
+
+    def _limit(self, host):
+        return self.limits.get(host, self.default_limit)
+
+    def take(self):
+        """Next (index, item, host) with a free host slot; None when the queue is empty."""
+        with self._cond:
+            while self.pending:
+                for n, (i, item, host) in enumerate(self.pending):
+                    if self.active.get(host, 0) < self._limit(host):
+                        del self.pending[n]
+                        self.active[host] = self.active.get(host, 0) + 1
+                        return i, item, host
+                self._cond.wait()
+            return None
+
+    def release(self, host):
+        with self._cond:
+            self.active[host] -= 1
+            self._cond.notify_all()
+
+
+def _worker(wid, scheduler, work, results, setup_context, launch_errors):
+    try:
+        _worker_loop(wid, scheduler, work, results, setup_context, launch_errors)
+    except Exception as e:
+        # Playwright itself failed to start; no row was taken
+        launch_errors.append(f"worker {wid}: {e}")
+
+
+def _worker_loop(wid, scheduler, work, results, setup_context, launch_errors):
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        browser = page = None
+        while True:
+            if page is None:
+                try:
+                    browser = p.chromium.launch(headless=True)
+                    context = browser.new_context(**CONTEXT_OPTIONS)
+                    if setup_context:
+                        setup_context(context)
+                    page = context.new_page()
+                except Exception as e:
+                    launch_errors.append(f"worker {wid}: {e}")
+                    if browser is not None:
+                        browser.close()
+                    return
+
+            task = scheduler.take()
+            if task is None:
+                break
+            i, item, host = task
+            try:
+                ok, error = bool(work(page, item)), None
+            except Exception as e:
+                ok, error = False, str(e)[:300]
+            if not browser.is_connected():
+                page = None             # relaunch before the next row
+            results.put((i, item, ok, error))
+            time.sleep(HOST_DELAY)
+            scheduler.release(host)
+
+        if browser is not None and browser.is_connected():
+            browser.close()
+
+
+def run_pool(items, url_of, work, done, workers=DEFAULT_WORKERS, host_limits=None,
+             setup_context=None):
+    """
+    Run work(page, item) for every item on `workers` browser contexts.
+    done(index, item, ok) is called on this thread in item order; a work
+    function that raised counts as not ok. setup_context(context) runs
+    once per context (e.g. to attach a ResourceBlocker). Returns
+    {"workers", "errors", "launch_errors", "unprocessed"}.
+    """
+    scheduler = HostScheduler(items, url_of, host_limits)
+    results = queue.Queue()
+    launch_errors = []
+    threads = [threading.Thread(target=_worker, daemon=True,
+                                args=(wid, scheduler, work, results, setup_context,
+                                      launch_errors))
+               for wid in range(min(workers, len(items)))]
+    for t in threads:
+        t.start()
+
+    finished, next_index, errors = {}, 0, []
+    while next_index < len(items):
+        try:
+            i, item, ok, error = results.get(timeout=1.0)
+        except queue.Empty:
+            if not any(t.is_alive() for t in threads) and results.empty():
+                break           # every worker failed to launch
+            continue
+        if error:
+            errors.append({"index": i, "error": error})
+        finished[i] = (item, ok)
+        while next_index in finished:
+            item, ok = finished.pop(next_index)
+            done(next_index, item, ok)
+            next_index += 1
+
+    for t in threads:
+        t.join()
+    if next_index < len(items) and not launch_errors:
+        launch_errors.append("workers exited with rows left in the queue")
+    return {"workers": len(threads), "errors": errors, "launch_errors": launch_errors,
+            "unprocessed": len(items) - next_index}
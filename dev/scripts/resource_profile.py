@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+resource_profile.py - Request blocking for browser-based recovery.
+
+Recovery only needs the rendered DOM: page.content() and the document
+links in it. Loading every image, font, video and analytics beacon on
+headstart.gov and acf.gov costs bandwidth, and it keeps `networkidle`
+from settling. A ResourceBlocker routes every request in a browser
+context and aborts what the DOM doesn't need:
+
+  - requests to known tracker/analytics domains, whatever their type
+  - resource types outside the profile's allow list (by default only
+    document, script, xhr and fetch get through)
+
+The main-frame navigation itself is always allowed. Profiles are chosen
+per host of the page being recovered: DEFAULT_PROFILE, overridden by
+HOST_PROFILES and by a JSON file of the same shape (--block-profile),
+matched on the host or any parent domain:
+
+    {"headstart.gov": {"allow_types": ["document", "script", "xhr", "fetch",
+                                       "stylesheet"]},
+     "www.acf.hhs.gov": {"block_domains": ["cdn.example.net"]},
+     "example.gov": {"enabled": false}}
+
+allow_types replaces the default list, block_domains adds to it, and
+"enabled": false lets everything through for that host.
+
+    blocker = ResourceBlocker(load_profiles(path))
+    blocker.attach(context)   # one blocker per context
+    blocker.use(url)          # before each page.goto(url)
+    page.goto(url, ...)
+
+The blocked load is fine for page.content() but prints bare, so before a
+page.pdf() call blocker.lift(page): it lets everything through and
+reloads the page. The next use() restores blocking.
+"""
+
+import json
+from urllib.parse import urlparse
+
+DEFAULT_ALLOW_TYPES = ["document", "script", "xhr", "fetch"]
+
+TRACKER_DOMAINS = [
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+    "googleadservices.com", "dap.digitalgov.gov", "siteimproveanalytics.com",
+    "siteimproveanalytics.io", "siteimprove.com", "hotjar.com", "facebook.net",
+    "connect.facebook.net", "platform.twitter.com", "addthis.com", "addtoany.com",
+    "nr-data.net", "newrelic.com", "crazyegg.com", "qualtrics.com",
+    "clarity.ms", "youtube.com", "ytimg.com", "vimeo.com",
+]
+
+DEFAULT_PROFILE = {
+    "enabled": True,
+    "allow_types": DEFAULT_ALLOW_TYPES,
+    "block_domains": TRACKER_DOMAINS,
+}
+
+# Built-in per-host overrides; extend with a --block-profile JSON file
+HOST_PROFILES = {}
+
+
+def _domain_match(host, domains):
+    """True if host is one of domains or a subdomain of one."""
+    host = (host or "").lower()
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+def load_profiles(path=None):
+    """HOST_PROFILES, overridden by the JSON file at path if given."""
+    profiles = dict(HOST_PROFILES)
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            profiles.update(json.load(f))
+    return profiles
+
+
+def profile_for(url, profiles):
+    """Effective profile for a page URL; the most specific host entry wins."""
+    host = (urlparse(url).hostname or "").lower()
+    match = None
+    for key in profiles:
+        if _domain_match(host, [key.lower()]) and (match is None or len(key) > len(match)):
+            match = key
+    override = profiles.get(match, {}) if match else {}
+    return {
+        "enabled": override.get("enabled", DEFAULT_PROFILE["enabled"]),
+        "allow_types": set(override.get("allow_types", DEFAULT_PROFILE["allow_types"])),
+        "block_domains": DEFAULT_PROFILE["block_domains"] + override.get("block_domains", []),
+    }
+
+
+class ResourceBlocker:
+    """Aborts unneeded requests in one browser context; counts what it did."""
+
+    def __init__(self, profiles=None):
+        self.profiles = HOST_PROFILES if profiles is None else profiles
+        self.profile = profile_for("", self.profiles)
+        self.stats = {"allowed": 0, "blocked": 0, "trackers": 0, "by_type": {}}
+
+    def use(self, url):
+        """Switch to the profile for the page about to be loaded."""
+        self.profile = profile_for(url, self.profiles)
+
+    def lift(self, page, timeout=30000):
+        """Stop blocking until the next use() and reload page with everything."""
+        self.profile = {**self.profile, "enabled": False}
+        page.reload(timeout=timeout, wait_until="load")
+
+    def attach(self, context):
+        context.route("**/*", self._handle)
+
+    def _handle(self, route):
+        request = route.request
+        profile = self.profile
+        if not profile["enabled"]:
+            self.stats["allowed"] += 1
+            route.continue_()
+            return
+        rtype = request.resource_type
+        if rtype == "document" and request.frame.parent_frame is None:
+            # The row's own page, even on a tracker domain (a youtube.com link)
+            self.stats["allowed"] += 1
+            route.continue_()
+            return
+        if _domain_match(urlparse(request.url).hostname, profile["block_domains"]):
+            self.stats["trackers"] += 1
+            route.abort()
+            return
+        if rtype in profile["allow_types"]:
+            self.stats["allowed"] += 1
+            route.continue_()
+            return
+        self.stats["blocked"] += 1
+        self.stats["by_type"][rtype] = self.stats["by_type"].get(rtype, 0) + 1
+        route.abort()
+
+
+def combined_stats(blockers):
+    """Sum the stats of several blockers (one per browser context)."""
+    total = {"allowed": 0, "blocked": 0, "trackers": 0, "by_type": {}}
+    for blocker in blockers:
+        for key in ("allowed", "blocked", "trackers"):
+            total[key] += blocker.stats[key]
+        for rtype, n in blocker.stats["by_type"].items():
+            total["by_type"][rtype] = total["by_type"].get(rtype, 0) + n
+    return total
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show the blocking profile for URLs")
+    parser.add_argument("urls", nargs="+")
+    parser.add_argument("--block-profile", default=None, help="JSON file of host profiles")
+    args = parser.parse_args()
+
+    profiles = load_profiles(args.block_profile)
+    for url in args.urls:
+        p = profile_for(url, profiles)
+        state = "allow " + ", ".join(sorted(p["allow_types"])) if p["enabled"] else "no blocking"
+        print(f"{url}\n  {state}; {len(p['block_domains'])} blocked domains")
@@ -11,21 +11,26 @@ This script:
 Usage:
   python smart_match.py               # Run full matching + download
   python smart_match.py --dry-run     # Preview matches only
+  python smart_match.py --warc-record ../warc   # Keep every HTTP exchange in WARC files
+  python smart_match.py --warc-replay ../warc   # Re-run offline from them
 """
 
 import argparse
 import hashlib
 import json
+import math
 import os
 import re
 import sys
-import time
 from datetime import datetime
 from urllib.parse import urljoin, urlparse
 
 import requests
 from bs4 import BeautifulSoup
-from fpdf import FPDF
+
+from v2_shared import convert_html
+import title_match
+import warc_session
 
 DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), "..", "output")
 DEFAULT_REPORTS = os.path.join(os.path.dirname(__file__), "..", "reports")
@@ -73,6 +78,39 @@ INDEX_PAGES = {
     ],
 }
 
+# Document numbers in URL slugs (already lowercased)
+URL_ID_PATTERNS = [re.compile(p) for p in [
+    r'(liheap-dcl-\d{4}-\d+)',
+    r'(ocs-dcl-\d{4}-\d+)',
+    r'(dcl-\d{2,4}-\d+)',
+    r'(liheap-im-\d{4}-\d+)',
+    r'(liheap-at-\d{4}-\d+)',
+    r'(ccdf-acf-[a-z]+-\d{4}-\d+)',
+    r'(acf-[a-z]+-[a-z]+-\d{2,4}-\d+)',
+    r'(\d{2,4}-\d{2})',  # e.g. 24-11, 15-10
+]]
+
+# Document numbers in link text
+TEXT_ID_PATTERNS = [re.compile(p, re.IGNORECASE) for p in [
+    r'(LIHEAP[- ]DCL[- ]\d{4}[- ]\d+)',
+    r'(OCS[- ]DCL[- ]\d{4}[- ]\d+)',
+    r'(DCL[- ]\d{2,4}[- ]\d+)',
+    r'(LIHEAP[- ]IM[- ]\d{4}[- ]\d+)',
+    r'(LIHEAP[- ]AT[- ]\d{4}[- ]\d+)',
+    r'(CCDF[- ]ACF[- ][A-Z]+[- ]\d{4}[- ]\d+)',
+    r'(ACF[- ][A-Z]+[- ][A-Z]+[- ]\d{2,4}[- ]\d+)',
+]]
+
+# Title matching: words ignored, shared words required, BM25 parameters
+TITLE_STOPWORDS = {"the", "of", "and", "for", "a", "an", "to", "in", "on",
+                   "at", "is", "by", "with", "from", "or", "as", "acf"}
+MIN_TITLE_OVERLAP = 3
+MIN_LINK_WORDS = 4          # shorter link texts are nav labels ("Program Instruction")
+WORD_STEM = 5               # words match on their first 5 letters (release ~ released)
+TITLE_TOP_K = 3
+BM25_K1 = 1.2
+BM25_B = 0.75
+
 
 def sha256_file(filepath):
     h = hashlib.sha256()
@@ -113,19 +151,8 @@ def extract_doc_ids_from_url(url):
     ids.add(normalize_doc_id(slug))
 
     # Try to extract DCL/IM/PI/AT numbers from slug
-    patterns = [
-        r'(liheap-dcl-\d{4}-\d+)',
-        r'(ocs-dcl-\d{4}-\d+)',
-        r'(dcl-\d{2,4}-\d+)',
-        r'(liheap-im-\d{4}-\d+)',
-        r'(liheap-at-\d{4}-\d+)',
-        r'(ccdf-acf-[a-z]+-\d{4}-\d+)',
-        r'(acf-[a-z]+-[a-z]+-\d{2,4}-\d+)',
-        r'(\d{2,4}-\d{2})',  # e.g. 24-11, 15-10
-    ]
-    for pat in patterns:
-        matches = re.findall(pat, slug)
-        for m in matches:
+    for pat in URL_ID_PATTERNS:
+        for m in pat.findall(slug):
             ids.add(normalize_doc_id(m))
 
     return ids
@@ -162,17 +189,8 @@ def scrape_index_page(url, session):
         text_ids = set()
 
         # Try to find doc numbers in link text
-        text_patterns = [
-            r'(LIHEAP[- ]DCL[- ]\d{4}[- ]\d+)',
-            r'(OCS[- ]DCL[- ]\d{4}[- ]\d+)',
-            r'(DCL[- ]\d{2,4}[- ]\d+)',
-            r'(LIHEAP[- ]IM[- ]\d{4}[- ]\d+)',
-            r'(LIHEAP[- ]AT[- ]\d{4}[- ]\d+)',
-            r'(CCDF[- ]ACF[- ][A-Z]+[- ]\d{4}[- ]\d+)',
-            r'(ACF[- ][A-Z]+[- ][A-Z]+[- ]\d{2,4}[- ]\d+)',
-        ]
-        for pat in text_patterns:
-            for m in re.findall(pat, link_text, re.IGNORECASE):
+        for pat in TEXT_ID_PATTERNS:
+            for m in pat.findall(link_text):
                 text_ids.add(normalize_doc_id(m))
 
         all_ids = url_ids | text_ids
@@ -187,6 +205,95 @@ def scrape_index_page(url, session):
     return links
 
 
+def title_words(text):
+    """Lowercased words of a title or link text, stopwords removed."""
+    return [w for w in text.lower().split() if w not in TITLE_STOPWORDS]
+
+
+def shares_words(title, text):
+    """
+    Whether a link text a TF-IDF candidate picked holds up word by word:
+    it has at least MIN_LINK_WORDS words, MIN_TITLE_OVERLAP of them also
+    in the title, words compared without punctuation on their first
+    WORD_STEM letters.
+    """
+    link_words = title_words(re.sub(r"[^a-z0-9]+", " ", text.lower()))
+    if len(link_words) < MIN_LINK_WORDS:
+        return False
+    stems = {w[:WORD_STEM] for w in title_words(re.sub(r"[^a-z0-9]+", " ", title.lower()))}
+    return len(stems & {w[:WORD_STEM] for w in link_words}) >= MIN_TITLE_OVERLAP
+
+
+class LinkIndex:
+    """
+    Links scraped from the listing pages, indexed once: document ID →
+    link positions, and title word → postings of (position, count).
+    Looking a row up touches only the postings of its own IDs and
+    words, not every link.
+    """
+
+    def __init__(self, links=()):
+        self.links = []
+        self.by_id = {}
+        self.postings = {}
+        self.lengths = []
+        self.total_words = 0
+        for link in links:
+            self.add(link)
+
+    def __len__(self):
+        return len(self.links)
+
+    def __iter__(self):
+        return iter(self.links)
+
+    def add(self, link):
+        pos = len(self.links)
+        self.links.append(link)
+        for doc_id in link["ids"]:
+            self.by_id.setdefault(doc_id, []).append(pos)
+        words = title_words(link["text"])
+        counts = {}
+        for w in words:
+            counts[w] = counts.get(w, 0) + 1
+        for w, tf in counts.items():
+            self.postings.setdefault(w, []).append((pos, tf))
+        self.lengths.append(len(words))
+        self.total_words += len(words)
+
+    def find_by_ids(self, ids):
+        """First link (in scrape order) carrying any of ids, or None."""
+        positions = [p for doc_id in ids for p in self.by_id.get(doc_id, ())]
+        return self.links[min(positions)] if positions else None
+
+    def find_by_title(self, title, min_overlap=MIN_TITLE_OVERLAP):
+        """
+        (link, score) for the link text that best matches title by BM25,
+        among links sharing at least min_overlap words with it; (None, 0)
+        if there is none. Ties go to the link scraped first.
+        """
+        if not self.links:
+            return None, 0
+        n = len(self.links)
+        avg_len = self.total_words / n or 1
+        scores, overlap = {}, {}
+        for w in set(title_words(title)):
+            plist = self.postings.get(w)
+            if not plist:
+                continue
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for pos, tf in plist:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[pos] / avg_len)
+                scores[pos] = scores.get(pos, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+                overlap[pos] = overlap.get(pos, 0) + 1
+
+        eligible = [pos for pos, count in overlap.items() if count >= min_overlap]
+        if not eligible:
+            return None, 0
+        best = max(eligible, key=lambda pos: (scores[pos], -pos))
+        return self.links[best], round(scores[best], 3)
+
+
 def build_link_index(session, offices_needed):
     """Build a searchable index of links from all relevant index pages."""
     print("\n" + "=" * 60)
@@ -202,14 +309,38 @@ def build_link_index(session, offices_needed):
             for link in links:
                 link["office"] = office
             all_links.extend(links)
-            time.sleep(1.5)
-
-    print(f"\n  Total links indexed: {len(all_links)}")
-    return all_links
-
-
-def match_failed_row(metadata, link_index):
-    """Try to match a failed row to a link in the index."""
+            warc_session.pause(1.5)
+
+    index = LinkIndex(all_links)
+    print(f"\n  Total links indexed: {len(index)} ({len(index.postings)} distinct title words)")
+    return index
+
+
+def batch_title_candidates(rows, link_index, k=TITLE_TOP_K):
+    """
+    {folder: [(link, cosine)]} for every row with a usable title, the k
+    most similar link texts by character n-gram TF-IDF (title_match.py),
+    all rows scored in one pass. None if numpy/scipy are not installed.
+    """
+    if not title_match.available():
+        print("  [WARN] numpy/scipy not installed — title matching by shared words only")
+        return None
+    titled = [m for m in rows if len(m.get("title") or "") > 15]
+    if not titled or not len(link_index):
+        return {}
+    matcher = title_match.TitleMatcher([link["text"] for link in link_index])
+    ranked = matcher.top_k([m["title"] for m in titled], k=k)
+    return {m["folder"]: [(link_index.links[pos], score) for pos, score in r]
+            for m, r in zip(titled, ranked)}
+
+
+def match_failed_row(metadata, link_index, title_candidates=None):
+    """
+    Try to match a failed row to a link in the index (a LinkIndex).
+    title_candidates: this row's entry from batch_title_candidates();
+    the best one over title_match.MIN_SIMILARITY that also shares_words()
+    with the title wins. Otherwise titles are matched by shared words.
+    """
     doc_number = metadata.get("doc_number", "")
     title = metadata.get("title", "")
     original_url = metadata["urls"][0]["url"] if metadata.get("urls") else ""
@@ -223,150 +354,21 @@ def match_failed_row(metadata, link_index):
     all_search_ids.discard("")
 
     # Search by ID match
-    for link in link_index:
-        if all_search_ids & link["ids"]:
-            return link
+    link = link_index.find_by_ids(all_search_ids)
+    if link:
+        return link
 
-    # Search by title substring match (fuzzy)
+    # Search by title (fuzzy)
+    for link, score in title_candidates or ():
+        if score >= title_match.MIN_SIMILARITY and shares_words(title, link["text"]):
+            return link
     if title and len(title) > 15:
-        title_words = set(title.lower().split())
-        # Remove common words
-        title_words -= {"the", "of", "and", "for", "a", "an", "to", "in", "on",
-                        "at", "is", "by", "with", "from", "or", "as", "acf"}
-
-        best_match = None
-        best_score = 0
-
-        for link in link_index:
-            link_words = set(link["text"].lower().split())
-            overlap = len(title_words & link_words)
-            if overlap > best_score and overlap >= 3:
-                best_score = overlap
-                best_match = link
-
-        if best_match and best_score >= 3:
-            return best_match
+        link, _ = link_index.find_by_title(title)
+        return link
 
     return None
 
 
-class GuidancePDF(FPDF):
-    def __init__(self, title="", doc_number="", office="", source_url=""):
-        super().__init__()
-        self.doc_title = title
-        self.doc_number = doc_number
-        self.office = office
-        self.source_url = source_url
-
-    def header(self):
-        self.set_font("Helvetica", "B", 8)
-        self.set_text_color(100, 100, 100)
-        header_text = f"ACF {self.office}"
-        if self.doc_number:
-            header_text += f" | {self.doc_number}"
-        self.cell(0, 5, header_text, new_x="LMARGIN", new_y="NEXT", align="L")
-        self.line(10, self.get_y(), 200, self.get_y())
-        self.ln(3)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font("Helvetica", "I", 7)
-        self.set_text_color(128, 128, 128)
-        self.cell(0, 10, f"Page {self.page_no()}/{{nb}} | {self.source_url[:80]}",
-                  new_x="LMARGIN", new_y="TOP", align="C")
-
-
-def extract_and_create_pdf(html_content, metadata, output_path, source_url):
-    """Extract text from HTML and create PDF."""
-    soup = BeautifulSoup(html_content, "html.parser")
-
-    for tag in soup.find_all(["script", "style", "nav", "footer", "noscript",
-                               "iframe", "svg", "button"]):
-        tag.decompose()
-    for tag in soup.find_all(attrs={"class": re.compile(
-            r"header|banner|nav|menu|sidebar|footer|breadcrumb|skip|cookie|usa-banner",
-            re.I)}):
-        tag.decompose()
-
-    main = (soup.find("main") or soup.find("article") or
-            soup.find("div", {"class": re.compile(r"content|main", re.I)}) or
-            soup.find("body"))
-    if not main:
-        main = soup
-
-    blocks = []
-    seen = set()
-    for el in main.find_all(["h1", "h2", "h3", "h4", "p", "li", "td", "div",
-                              "blockquote", "dd", "dt"]):
-        text = el.get_text(separator=" ", strip=True)
-        if text and len(text) > 10:
-            start = text[:50]
-            if start not in seen:
-                seen.add(start)
-                is_h = el.name in ["h1", "h2", "h3", "h4"]
-                blocks.append({"text": text, "is_heading": is_h,
-                               "level": int(el.name[1]) if is_h else 0})
-
-    if len(blocks) < 2:
-        return False
-
-    title = metadata.get("title", "")
-    doc_number = metadata.get("doc_number", "")
-    office = metadata.get("office", "")
-    issue_date = metadata.get("issue_date", "")
-
-    pdf = GuidancePDF(title=title, doc_number=doc_number,
-                      office=office, source_url=source_url)
-    pdf.alias_nb_pages()
-    pdf.set_auto_page_break(auto=True, margin=20)
-    pdf.add_page()
-
-    if title:
-        pdf.set_font("Helvetica", "B", 14)
-        pdf.set_text_color(0, 0, 0)
-        safe = title.encode('latin-1', 'replace').decode('latin-1')
-        pdf.multi_cell(0, 7, safe, new_x="LMARGIN", new_y="NEXT")
-        pdf.ln(2)
-
-    meta_parts = []
-    if doc_number:
-        meta_parts.append(f"Document: {doc_number}")
-    if office:
-        meta_parts.append(f"Office: {office}")
-    if issue_date:
-        meta_parts.append(f"Date: {issue_date[:10]}")
-    if meta_parts:
-        pdf.set_font("Helvetica", "I", 9)
-        pdf.set_text_color(80, 80, 80)
-        pdf.cell(0, 5, " | ".join(meta_parts), new_x="LMARGIN", new_y="NEXT")
-        pdf.ln(1)
-
-    pdf.set_font("Helvetica", "I", 8)
-    pdf.set_text_color(0, 0, 200)
-    safe_url = source_url.encode('latin-1', 'replace').decode('latin-1')[:100]
-    pdf.cell(0, 5, f"Source: {safe_url}", new_x="LMARGIN", new_y="NEXT")
-    pdf.ln(1)
-    pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-    pdf.ln(4)
-    pdf.set_text_color(0, 0, 0)
-
-    for block in blocks:
-        safe_text = block["text"].encode('latin-1', 'replace').decode('latin-1')
-        if block["is_heading"]:
-            size = {1: 14, 2: 12, 3: 11}.get(block["level"], 11)
-            pdf.set_font("Helvetica", "B", size)
-            pdf.ln(2)
-            pdf.multi_cell(0, 6, safe_text, new_x="LMARGIN", new_y="NEXT")
-            pdf.ln(1)
-        else:
-            pdf.set_font("Helvetica", "", 10)
-            pdf.multi_cell(0, 5, safe_text, new_x="LMARGIN", new_y="NEXT")
-            pdf.ln(2)
-
-    pdf.output(output_path)
-    return True
-
-
 def process_matched_row(metadata, matched_link, row_dir, session):
     """Download content from the matched URL."""
     url = matched_link["url"]
@@ -422,7 +424,7 @@ def process_matched_row(metadata, matched_link, row_dir, session):
         downloaded = 0
         for link in doc_links:
             try:
-                time.sleep(1)
+                warc_session.pause(1)
                 dl = session.get(link["url"], timeout=30, headers=HEADERS,
                                  allow_redirects=True)
                 dl.raise_for_status()
@@ -471,7 +473,8 @@ def process_matched_row(metadata, matched_link, row_dir, session):
             pdf_name = f"guidance_{metadata['folder']}_matched.pdf"
         pdf_path = os.path.join(row_dir, pdf_name)
 
-        if extract_and_create_pdf(resp.text, metadata, pdf_path, url):
+        ok, reason = convert_html(html_path, pdf_path, metadata)
+        if ok:
             metadata["files_downloaded"].append({
                 "filename": pdf_name,
                 "source_url": url,
@@ -484,9 +487,12 @@ def process_matched_row(metadata, matched_link, row_dir, session):
             metadata["recovery_method"] = "smart_match_html_to_pdf"
             print(f"    [OK] Converted to {pdf_name}")
             return True
-        else:
+        elif reason == "insufficient_content":
             print(f"    [FAIL] Page loaded but no extractable content")
             return False
+        else:
+            print(f"    [ERROR] PDF creation: {reason}")
+            return False
 
     return False
 
@@ -496,7 +502,9 @@ def main():
     parser.add_argument("--output", default=DEFAULT_OUTPUT)
     parser.add_argument("--reports", default=DEFAULT_REPORTS)
     parser.add_argument("--dry-run", action="store_true")
+    warc_session.add_arguments(parser)
     args = parser.parse_args()
+    warc_session.setup(args.warc_record, args.warc_replay, stage="smart_match")
 
     output_dir = os.path.abspath(args.output)
     reports_dir = os.path.abspath(args.reports)
@@ -506,7 +514,7 @@ def main():
     print("ACF GUIDANCE — SMART URL MATCHER")
     print("=" * 60)
 
-    session = requests.Session()
+    session = warc_session.attach(requests.Session())
     session.headers.update(HEADERS)
 
     # Load all failed rows
@@ -535,6 +543,12 @@ def main():
 
     # Build link index
     link_index = build_link_index(session, offices_needed)
+    t0 = datetime.now()
+    title_hits = batch_title_candidates(failed_rows, link_index)
+    if title_hits is not None:
+        print(f"  Title candidates for {len(title_hits)} rows "
+              f"({(datetime.now() - t0).total_seconds():.2f}s)")
+    candidates_report = {}
 
     # Match and process
     print(f"\n{'=' * 60}")
@@ -552,7 +566,11 @@ def main():
 
         print(f"\n  [{i+1}/{len(failed_rows)}] Row {folder}: {doc_num or title or url}")
 
-        match = match_failed_row(meta, link_index)
+        candidates = title_hits.get(folder, []) if title_hits is not None else None
+        if candidates:
+            candidates_report[folder] = [{"url": link["url"], "text": link["text"], "score": score}
+                                         for link, score in candidates]
+        match = match_failed_row(meta, link_index, candidates)
 
         if match:
             stats["matched"] += 1
@@ -563,7 +581,7 @@ def main():
                 stats["recovered"] += 1
                 continue
 
-            time.sleep(1.5)
+            warc_session.pause(1.5)
             success = process_matched_row(meta, match, meta["_row_dir"], session)
 
             if success:
@@ -577,6 +595,8 @@ def main():
                 stats["match_failed"] += 1
         else:
             print(f"    NO MATCH found in index pages")
+            for link, score in candidates or []:
+                print(f"      candidate {score:.2f}: {link['text'][:60]}")
             stats["no_match"] += 1
 
     elapsed = (datetime.now() - start_time).total_seconds()
@@ -592,7 +612,8 @@ def main():
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     report_path = os.path.join(reports_dir, f"smart_match_{timestamp}.json")
     with open(report_path, "w", encoding="utf-8") as f:
-        json.dump({"stats": stats, "duration": elapsed}, f, indent=2)
+        json.dump({"stats": stats, "duration": elapsed,
+                   "title_candidates": candidates_report}, f, indent=2)
     print(f"Report saved: {report_path}")
 
 
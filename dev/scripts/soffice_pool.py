@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+soffice_pool.py - Pool of long-lived headless LibreOffice workers for Office→PDF.
+
+Starting soffice costs seconds; converting a typical DOC/XLS/PPT costs a
+fraction of that. Each worker here keeps one headless LibreOffice
+listening on a local socket and converts documents sent to it over UNO,
+so startup is paid once per worker instead of once per file.
+
+  - Every worker has its own -env:UserInstallation profile, so parallel
+    instances never collide on the shared user profile (which otherwise
+    makes concurrent `soffice --convert-to` runs fail or serialize).
+  - Each job has a timeout. A worker that hangs is killed and relaunched,
+    and the job is reported failed.
+  - soffice is found on PATH, in the usual Linux/macOS install locations,
+    or via the SOFFICE environment variable.
+
+UNO needs LibreOffice's Python bindings (`import uno`; Debian/Ubuntu:
+apt install python3-uno). Without them the pool falls back to one
+`soffice --convert-to` process per job, still in parallel and still with
+an isolated profile per worker.
+
+    with SofficePool(size=4) as pool:
+        ok, reason = pool.convert("/path/file.docx", "/path/file.pdf")
+"""
+
+import os
+import sys
+import glob
+import time
+import queue
+import shutil
+import signal
+import socket
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+DEFAULT_WORKERS = 4
+DEFAULT_TIMEOUT = 120           # seconds per document
+STARTUP_TIMEOUT = 45            # seconds for a listener to accept UNO connections
+BASE_PORT = 2002
+
+SOFFICE_CANDIDATES = [
+    "/usr/bin/soffice",
+    "/usr/bin/libreoffice",
+    "/usr/local/bin/soffice",
+    "/usr/lib/libreoffice/program/soffice",
+    "/usr/lib64/libreoffice/program/soffice",
+    "/opt/libreoffice*/program/soffice",
+    "/snap/bin/libreoffice",
+    "/Applications/LibreOffice.app/Contents/MacOS/soffice",
+    r"C:\Program Files\LibreOffice\program\soffice.exe",
+    r"C:\Program Files (x86)\LibreOffice\program\soffice.exe",
+]
+
+# PDF export filter by document kind (the generic writer_pdf_Export
+# can't store spreadsheets or presentations)
+EXPORT_FILTERS = [
+    ("com.sun.star.sheet.SpreadsheetDocument", "calc_pdf_Export"),
+    ("com.sun.star.presentation.PresentationDocument", "impress_pdf_Export"),
+    ("com.sun.star.drawing.DrawingDocument", "draw_pdf_Export"),
+    ("com.sun.star.text.GenericTextDocument", "writer_pdf_Export"),
+]
+
+
+def find_soffice():
+    """Locate the soffice binary. Returns its path or None."""
+    env = os.environ.get("SOFFICE")
+    if env and os.path.isfile(env):
+        return env
+    for name in ("soffice", "libreoffice"):
+        found = shutil.which(name)
+        if found:
+            return found
+    for pattern in SOFFICE_CANDIDATES:
+        for path in sorted(glob.glob(pattern), reverse=True):
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def _uno_available():
+    try:
+        import uno  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _free_port(start):
+    port = start
+    while True:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            if s.connect_ex(("127.0.0.1", port)) != 0:
+                return port
+        port += 1
+
+
+def _kill_tree(proc):
+    """Kill soffice and its soffice.bin child."""
+    if proc is None or proc.poll() is not None:
+        return
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                           capture_output=True)
+    except (OSError, ProcessLookupError):
+        pass
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        pass
+
+
+def _popen(args):
+    kwargs = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+    if os.name == "posix":
+        kwargs["start_new_session"] = True       # own process group for _kill_tree
+    else:
+        kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+    return subprocess.Popen(args, **kwargs)
+
+
+class SofficeWorker:
+    """One headless LibreOffice with a private profile."""
+
+    def __init__(self, wid, soffice, use_uno, port=None):
+        self.wid = wid
+        self.soffice = soffice
+        self.use_uno = use_uno
+        self.port = port
+        self.profile_dir = tempfile.mkdtemp(prefix=f"lo_worker{wid}_")
+        self.profile_url = Path(self.profile_dir).as_uri()
+        self.proc = None
+        self.desktop = None
+        self.jobs = 0
+        self.restarts = 0
+        if use_uno:
+            self.start()
+
+    # ── Listener lifecycle (UNO mode) ──
+
+    def start(self):
+        self.proc = _popen([
+            self.soffice, "--headless", "--invisible", "--nologo", "--norestore",
+            "--nodefault", "--nolockcheck",
+            f"-env:UserInstallation={self.profile_url}",
+            f"--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext",
+        ])
+        self.desktop = self._connect()
+
+    def _connect(self):
+        import uno
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local)
+        url = f"uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext"
+
+        deadline = time.time() + STARTUP_TIMEOUT
+        while True:
+            try:
+                ctx = resolver.resolve(url)
+                return ctx.ServiceManager.createInstanceWithContext(
+                    "com.sun.star.frame.Desktop", ctx)
+            except Exception as e:
+                if self.proc.poll() is not None:
+                    raise RuntimeError(f"soffice exited during startup (code {self.proc.returncode})")
+                if time.time() > deadline:
+                    raise RuntimeError(f"soffice listener not ready after {STARTUP_TIMEOUT}s: {e}")
+                time.sleep(0.5)
+
+    def restart(self):
+        self.restarts += 1
+        self.stop()
+        # A killed instance can leave its profile locked or half-written
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self.start()
+
+    def stop(self):
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+            self.desktop = None
+        if self.proc is not None:
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                pass
+            _kill_tree(self.proc)
+            self.proc = None
+
+    def close(self):
+        self.stop()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+    # ── Conversion ──
+
+    def _convert_uno(self, input_path, pdf_path, result):
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def prop(name, value):
+            p = PropertyValue()
+            p.Name, p.Value = name, value
+            return p
+
+        doc = None
+        try:
+            doc = self.desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(os.path.abspath(input_path)), "_blank", 0,
+                (prop("Hidden", True), prop("ReadOnly", True),
+                 prop("UpdateDocMode", 0)))       # never fetch linked content
+            if doc is None:
+                result["reason"] = "load_failed"
+                return
+            export_filter = next((f for service, f in EXPORT_FILTERS
+                                  if doc.supportsService(service)), "writer_pdf_Export")
+            doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(pdf_path)),
+                           (prop("FilterName", export_filter),))
+            result["ok"] = True
+        except Exception as e:
+            result["reason"] = f"uno_error: {e}"
+        finally:
+            if doc is not None:
+                try:
+                    doc.close(True)
+                except Exception:
+                    pass
+
+    def _convert_cli(self, input_path, pdf_path, timeout):
+        """One soffice process for this job, using this worker's profile."""
+        outdir = tempfile.mkdtemp(prefix=f"lo_out{self.wid}_")
+        proc = None
+        try:
+            proc = _popen([self.soffice, "--headless", "--norestore", "--nolockcheck",
+                           f"-env:UserInstallation={self.profile_url}",
+                           "--convert-to", "pdf", "--outdir", outdir, input_path])
+            try:
+                proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                _kill_tree(proc)
+                self.restarts += 1
+                return False, "timeout"
+            produced = os.path.join(outdir, f"{Path(input_path).stem}.pdf")
+            if not os.path.isfile(produced):
+                return False, f"no output (exit {proc.returncode})"
+            shutil.move(produced, pdf_path)
+            return True, "ok"
+        finally:
+            shutil.rmtree(outdir, ignore_errors=True)
+
+    def convert(self, input_path, pdf_path, timeout):
+        self.jobs += 1
+        if not self.use_uno:
+            return self._convert_cli(input_path, pdf_path, timeout)
+
+        if self.proc is None or self.proc.poll() is not None:
+            self.restart()
+
+        # UNO calls block with no timeout of their own; run the job on a
+        # helper thread and kill the instance if it doesn't come back.
+        result = {"ok": False, "reason": "unknown"}
+        t = threading.Thread(target=self._convert_uno, args=(input_path, pdf_path, result),
+                             daemon=True)
+        t.start()
+        t.join(timeout)
+        if t.is_alive():
+            _kill_tree(self.proc)      # breaks the bridge, so the helper thread exits
+            t.join(10)
+            self.restart()
+            return False, "timeout"
+
+        if result["ok"] and os.path.isfile(pdf_path) and os.path.getsize(pdf_path) > 0:
+            return True, "ok"
+        if self.proc.poll() is not None:
+            self.restart()
+        return False, result["reason"] if not result["ok"] else "empty_output"
+
+
+class SofficePool:
+    """Fixed set of SofficeWorkers; convert() blocks until a worker is free."""
+
+    def __init__(self, size=DEFAULT_WORKERS, soffice=None, timeout=DEFAULT_TIMEOUT,
+                 use_uno=None):
+        self.soffice = soffice or find_soffice()
+        if not self.soffice:
+            raise RuntimeError("LibreOffice not found (install it, or set SOFFICE=/path/to/soffice)")
+        self.timeout = timeout
+        self.use_uno = _uno_available() if use_uno is None else use_uno
+        self.size = size
+
+        self._idle = queue.Queue()
+        self.workers = []
+        port = BASE_PORT
+        try:
+            for wid in range(size):
+                if self.use_uno:
+                    port = _free_port(port)
+                worker = SofficeWorker(wid, self.soffice, self.use_uno, port)
+                port += 1
+                self.workers.append(worker)
+                self._idle.put(worker)
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def mode(self):
+        return "uno" if self.use_uno else "cli"
+
+    def convert(self, input_path, pdf_path):
+        """Convert one document to pdf_path. Returns (ok, reason)."""
+        worker = self._idle.get()
+        try:
+            return worker.convert(input_path, pdf_path, self.timeout)
+        except Exception as e:
+            return False, str(e)
+        finally:
+            self._idle.put(worker)
+
+    def stats(self):
+        return {"mode": self.mode, "workers": self.size,
+                "jobs": sum(w.jobs for w in self.workers),
+                "restarts": sum(w.restarts for w in self.workers)}
+
+    def close(self):
+        for w in self.workers:
+            w.close()
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+if __name__ == "__main__":
+    path = find_soffice()
+    print(f"soffice:  {path or 'NOT FOUND'}")
+    print(f"UNO:      {'available' if _uno_available() else 'not available (CLI fallback)'}")
+    if len(sys.argv) == 3 and path:
+        with SofficePool(size=1) as pool:
+            print(pool.convert(sys.argv[1], sys.argv[2]))
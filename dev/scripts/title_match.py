@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+title_match.py - Match many titles against many link texts at once.
+
+smart_match.py matched a failed row to a listing-page link by shared
+words, one row at a time. A reworded title ("Dear Colleague Letter:
+LIHEAP Funding Release" vs "LIHEAP Funding Released — DCL") shares few
+whole words but many character n-grams. A TitleMatcher turns every link
+text into a character n-gram TF-IDF vector once; top_k() turns all the
+titles into vectors the same way, then scores them against every link
+with one sparse matrix product (cosine similarity, since all rows are
+L2-normalized). For each title it returns the k best links with scores.
+
+  - text is lowercased, and runs of non-alphanumerics become one space
+  - n-grams of NGRAM_RANGE lengths are taken within each word padded
+    with spaces, so they never span two words
+  - tf is sublinear (1 + log count); idf is smoothed,
+    log((1 + N) / (1 + df)) + 1, with df counted over the link texts;
+    a title's n-grams that no link has still count in its norm, so
+    "LIHEAP Funding" is not a perfect match for a link "LIHEAP"
+  - titles are scored CHUNK_ROWS at a time to bound memory
+
+Needs numpy and scipy (pip install numpy scipy); available() says
+whether they can be imported, and smart_match.py falls back to its word
+index without them.
+
+    matcher = TitleMatcher([link["text"] for link in links])
+    for ranked in matcher.top_k(titles, k=5):
+        for pos, score in ranked: ...      # links[pos], cosine in [0, 1]
+"""
+
+import math
+import re
+from collections import Counter
+
+NGRAM_RANGE = (3, 4)
+MIN_SIMILARITY = 0.45       # cosine a candidate needs; smart_match.py also checks shared words
+CHUNK_ROWS = 2000
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def available():
+    try:
+        import numpy  # noqa: F401
+        import scipy.sparse  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def char_ngrams(text, ngram_range=NGRAM_RANGE):
+    """{ngram: count} for text, n-grams taken within space-padded words."""
+    lo, hi = ngram_range
+    padded = [f" {w} " for w in _NON_ALNUM.sub(" ", (text or "").lower()).split()]
+    return Counter([p[i:i + n] for p in padded for n in range(lo, hi + 1)
+                    for i in range(len(p) - n + 1)])
+
+
+class TitleMatcher:
+    """Character n-gram TF-IDF vectors of link texts, for batch cosine lookups."""
+
+    def __init__(self, texts, ngram_range=NGRAM_RANGE):
+        import numpy as np
+
+        self.ngram_range = ngram_range
+        docs = [char_ngrams(t, ngram_range) for t in texts]
+        df = Counter()
+        for counts in docs:
+            df.update(counts.keys())
+        self.vocab = {gram: col for col, gram in enumerate(df)}
+
+        n = len(docs)
+        counts = np.fromiter(df.values(), dtype=np.float64, count=len(df))
+        self.idf = np.log((1 + n) / (1 + counts)) + 1
+        self.unseen_idf = math.log(1 + n) + 1
+        self.matrix = self._vectorize(docs)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def _vectorize(self, docs):
+        """CSR matrix, one L2-normalized TF-IDF row per {ngram: count} dict."""
+        import numpy as np
+        from scipy import sparse
+
+        vocab = self.vocab
+        rows, cols, data = [], [], []
+        unseen = np.zeros(len(docs))     # squared weight of n-grams no link has
+        for r, counts in enumerate(docs):
+            for gram, count in counts.items():
+                col = vocab.get(gram)
+                if col is not None:
+                    rows.append(r)
+                    cols.append(col)
+                    data.append(count)
+                else:
+                    unseen[r] += ((1 + math.log(count)) * self.unseen_idf) ** 2
+        tf = 1 + np.log(np.asarray(data, dtype=np.float64))
+        matrix = sparse.csr_matrix((tf, (rows, cols)), shape=(len(docs), len(vocab)))
+        matrix = matrix @ sparse.diags(self.idf)
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel() + unseen)
+        norms[norms == 0] = 1
+        return sparse.diags(1 / norms) @ matrix
+
+    def top_k(self, titles, k=5, min_score=0.0):
+        """
+        For each title, [(link position, cosine)] of its k most similar
+        link texts, best first; pairs under min_score are left out.
+        """
+        import numpy as np
+
+        results = []
+        link_matrix_t = self.matrix.T.tocsr()
+        for start in range(0, len(titles), CHUNK_ROWS):
+            chunk = titles[start:start + CHUNK_ROWS]
+            queries = self._vectorize([char_ngrams(t, self.ngram_range) for t in chunk])
+            sims = (queries @ link_matrix_t).tocsr()
+            for r in range(sims.shape[0]):
+                lo, hi = sims.indptr[r], sims.indptr[r + 1]
+                scores, positions = sims.data[lo:hi], sims.indices[lo:hi]
+                keep = scores >= min_score
+                scores, positions = scores[keep], positions[keep]
+                if len(scores) > k:
+                    part = np.argpartition(-scores, k - 1)[:k]
+                    scores, positions = scores[part], positions[part]
+                order = np.lexsort((positions, -scores))
+                results.append([(int(positions[i]), round(float(scores[i]), 4))
+                                for i in order])
+        return results
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+url_variants.py - Find the live variant of a dead ACF URL.
+
+ACF has moved its pages more than once: acf.gov ↔ www.acf.hhs.gov,
+/resource/ ↔ /policy-guidance/, and older pages under
+/<office>/archive/. acf_harvest.py, final_cleanup.py,
+browser_retry_matched.py and wayback_deep.py each had their own copy of
+these rewrites and tried the results one at a time with a sleep in
+between. Here the rewrites are one rule table (RULES), and a
+VariantProber tries the candidates concurrently:
+
+  - candidates are every single rule that applies, then every pair of
+    rules (a domain swap plus a path rewrite), deduplicated
+  - each is probed with HEAD, falling back to a streamed GET when the
+    server refuses HEAD or errors; a final 200 is a hit
+  - no host gets more than its limit of parallel probes
+    (DEFAULT_HOST_LIMIT, or host_limits)
+  - the first hit wins and the probes not yet started are cancelled
+  - the rule (or pair) behind each hit is counted, and candidates from
+    rules that have won before are tried first; the counts are kept in
+    a JSON file between runs
+
+    prober = VariantProber(session, learned_path="reports/url_variant_rules.json")
+    hit = prober.find(url)          # {"url", "rule", "status", "method"} or None
+    prober.save()
+"""
+
+import json
+import os
+import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import permutations
+
+from recovery_pool import host_key
+
+# name, pattern, replacement — applied with re.sub(count=1)
+RULES = [
+    ("acf_to_hhs", r"^(https?://)acf\.gov/", r"\1www.acf.hhs.gov/"),
+    ("hhs_to_acf", r"^(https?://)www\.acf\.hhs\.gov/", r"\1acf.gov/"),
+    ("resource_to_policy", r"/resource/", "/policy-guidance/"),
+    ("policy_to_resource", r"/policy-guidance/", "/resource/"),
+    ("archive", r"^https?://[^/]+/(?!.*/archive/)([^/]+)/(.+?)/?$",
+     r"https://acf.gov/\1/archive/\2"),
+]
+
+DEFAULT_WORKERS = 8
+DEFAULT_HOST_LIMIT = 3
+PROBE_TIMEOUT = 15
+HEAD_FALLBACK_STATUS = {403, 405, 501}
+
+_COMPILED = [(name, re.compile(pattern), repl) for name, pattern, repl in RULES]
+
+
+def apply_rule(name, url):
+    """url rewritten by one rule, or None if the rule doesn't apply."""
+    for rule, pattern, repl in _COMPILED:
+        if rule == name:
+            new = pattern.sub(repl, url, count=1)
+            return new if new != url else None
+    raise KeyError(name)
+
+
+def candidates(url, max_chain=2, wins=None):
+    """
+    [(variant_url, rule)] for url: single rules in table order, then
+    pairs joined with '+'. With wins ({rule: count}), rules that have
+    won more often come first.
+    """
+    names = [name for name, _, _ in RULES]
+    chains = [(n,) for n in names]
+    if max_chain >= 2:
+        chains += list(permutations(names, 2))
+
+    seen, out = {url}, []
+    for chain in chains:
+        variant = url
+        for name in chain:
+            variant = apply_rule(name, variant)
+            if variant is None:
+                break
+        if variant is not None and variant not in seen:
+            seen.add(variant)
+            out.append((variant, "+".join(chain)))
+    if wins:
+        out.sort(key=lambda c: -wins.get(c[1], 0))   # stable: table order breaks ties
+    return out
+
+
+class VariantProber:
+    """Probes URL variants concurrently; remembers which rules find live pages."""
+
+    def __init__(self, session, learned_path=None, workers=DEFAULT_WORKERS,
+                 host_limits=None, headers=None):
+        self.session = session
+        self.learned_path = learned_path
+        self.workers = workers
+        self.host_limits = host_limits or {}
+        self.headers = headers
+        self.wins = {}
+        if learned_path and os.path.exists(learned_path):
+            with open(learned_path, "r", encoding="utf-8") as f:
+                self.wins = json.load(f)
+        self._host_slots = {}
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "probes": 0, "get_fallbacks": 0,
+                      "by_rule": {}}
+
+    def _slot(self, url):
+        host = host_key(url)
+        with self._lock:
+            if host not in self._host_slots:
+                limit = self.host_limits.get(host, DEFAULT_HOST_LIMIT)
+                self._host_slots[host] = threading.BoundedSemaphore(limit)
+            return self._host_slots[host]
+
+    def _probe(self, url, cancelled):
+        """(status, method) for url; status None if unreachable."""
+        with self._slot(url):
+            if cancelled.is_set():
+                return None, None
+            with self._lock:
+                self.stats["probes"] += 1
+            try:
+                resp = self.session.head(url, timeout=PROBE_TIMEOUT, headers=self.headers,
+                                         allow_redirects=True)
+                if resp.status_code not in HEAD_FALLBACK_STATUS:
+                    return resp.status_code, "HEAD"
+            except Exception:
+                pass
+            with self._lock:
+                self.stats["get_fallbacks"] += 1
+            try:
+                resp = self.session.get(url, timeout=PROBE_TIMEOUT, headers=self.headers,
+                                        allow_redirects=True, stream=True)
+                resp.close()
+                return resp.status_code, "GET"
+            except Exception:
+                return None, None
+
+    def find(self, url, include_original=False, max_chain=2):
+        """
+        First live URL among url's variants (and url itself first, if
+        include_original): {"url", "rule", "status", "method"}, or None.
+        """
+        self.stats["lookups"] += 1
+        todo = candidates(url, max_chain, self.wins)
+        if include_original:
+            todo.insert(0, (url, "original"))
+        if not todo:
+            return None
+
+        cancelled = threading.Event()
+        hit = None
+        pool = ThreadPoolExecutor(max_workers=min(self.workers, len(todo)))
+        try:
+            pending = {pool.submit(self._probe, u, cancelled): (u, rule) for u, rule in todo}
+            while pending and hit is None:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    u, rule = pending.pop(future)
+                    status, method = future.result()
+                    if status == 200 and hit is None:
+                        hit = {"url": u, "rule": rule, "status": status, "method": method}
+        finally:
+            # Return on the first hit: queued probes are dropped, and ones
+            # already in flight finish (or time out) in the background
+            cancelled.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        if hit:
+            self.stats["hits"] += 1
+            if hit["rule"] != "original":
+                self.wins[hit["rule"]] = self.wins.get(hit["rule"], 0) + 1
+                by_rule = self.stats["by_rule"]
+                by_rule[hit["rule"]] = by_rule.get(hit["rule"], 0) + 1
+        return hit
+
+    def save(self):
+        if not self.learned_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.learned_path)), exist_ok=True)
+        with open(self.learned_path, "w", encoding="utf-8") as f:
+            json.dump(self.wins, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    import requests
+
+    parser = argparse.ArgumentParser(description="Find live variants of dead ACF URLs")
+    parser.add_argument("urls", nargs="+")
+    parser.add_argument("--list", action="store_true", help="Only list the candidates")
+    parser.add_argument("--learned", default=None, help="JSON file of rule win counts")
+    args = parser.parse_args()
+
+    prober = VariantProber(requests.Session(), learned_path=args.learned)
+    for url in args.urls:
+        if args.list:
+            print(url)
+            for variant, rule in candidates(url, wins=prober.wins):
+                print(f"  {rule:36s} {variant}")
+            continue
+        hit = prober.find(url, include_original=True)
+        print(f"{url}\n  → {hit['url']} ({hit['rule']}, {hit['method']})" if hit
+              else f"{url}\n  → no live variant")
+    if not args.list:
+        prober.save()
+    sys.exit(0)
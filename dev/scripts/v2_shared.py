@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+v2_shared.py - Use scripts_v2's modules from dev/scripts.
+
+Importing this puts scripts_v2 on sys.path right after dev/scripts: a
+dev module of the same name still wins. Code that must not drift
+between the two trees is imported from there:
+
+    import v2_shared  # noqa: F401
+    from html_pdf import Converter, get_backend
+    from conversion_watchdog import Quarantine   # one quarantine store
+    from conversion_cache import sha256_file
+
+convert_html() is the recovery scripts' HTML→PDF fallback: html_pdf's
+fpdf layout, rendered on the calling thread. The browser scripts call it
+from every pool thread at once, so it goes around Converter, whose
+convert() lets one caller in at a time.
+"""
+
+import os
+import sys
+
+V2_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))), "scripts_v2")
+
+if V2_DIR not in sys.path:
+    sys.path.insert(1, V2_DIR)
+
+
+def convert_html(html_path, pdf_path, metadata):
+    """
+    Render a saved page to pdf_path as a text PDF headed with the row's
+    doc number and title. Returns (ok, reason); reason is
+    "insufficient_content" when the page has too little text.
+    """
+    from html_pdf import convert_html_to_fpdf
+    from text_pdf import metadata_header
+
+    # Unlink rather than overwrite, as Converter does: the old PDF may be a
+    # hard link into the conversion cache
+    if os.path.exists(pdf_path):
+        os.remove(pdf_path)
+    try:
+        return convert_html_to_fpdf(html_path, pdf_path, metadata_header(metadata))
+    except Exception as e:
+        return False, str(e)[:300]
@@ -8,9 +8,16 @@ For the final holdout rows, tries multiple Wayback Machine strategies:
 3. CDX API search with URL variations (/resource/ <-> /policy-guidance/, /archive/ prefix)
 4. For each found snapshot, downloads the page AND any linked PDFs from the snapshot
 
+CDX lookups are answered from a local SQLite index (cdx_index.py) that is
+filled with one prefix query per directory of the URLs being searched.
+
 Usage:
   python wayback_deep.py
   python wayback_deep.py --dry-run
+  python wayback_deep.py --refresh-cdx           # Re-fetch the CDX index
+  python wayback_deep.py --cdx-endpoint http://127.0.0.1:8765/cdx/search/cdx
+  python wayback_deep.py --warc-record ../warc   # Keep every HTTP exchange in WARC files
+  python wayback_deep.py --warc-replay ../warc   # Re-run offline from them
 """
 
 import argparse
@@ -19,13 +26,17 @@ import json
 import os
 import re
 import sys
-import time
+import tempfile
 from datetime import datetime
 from urllib.parse import urljoin, urlparse
 
 import requests
 from bs4 import BeautifulSoup
-from fpdf import FPDF
+
+from v2_shared import convert_html
+from cdx_index import CDX_ENDPOINT, CdxIndex, rank_snapshots
+from url_variants import candidates
+import warc_session
 
 DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), "..", "output")
 DEFAULT_REPORTS = os.path.join(os.path.dirname(__file__), "..", "reports")
@@ -65,39 +76,23 @@ def safe_filename(name, max_len=100):
 
 
 def generate_url_variants(url):
-    """Generate URL variants to search in Wayback."""
-    variants = [url]
-    parsed = urlparse(url)
-    path = parsed.path.rstrip("/")
-
-    # acf.gov <-> www.acf.hhs.gov
-    if "acf.gov" in url and "acf.hhs.gov" not in url:
-        variants.append(url.replace("acf.gov", "www.acf.hhs.gov", 1))
-    elif "acf.hhs.gov" in url:
-        variants.append(url.replace("www.acf.hhs.gov", "acf.gov", 1))
-
-    # /resource/ <-> /policy-guidance/
-    if "/resource/" in path:
-        variants.append(url.replace("/resource/", "/policy-guidance/"))
-    elif "/policy-guidance/" in path:
-        variants.append(url.replace("/policy-guidance/", "/resource/"))
-
-    # /archive/ prefix
-    if "/archive/" not in path:
-        parts = path.split("/", 2)
-        if len(parts) >= 3:
-            archive_path = f"/{parts[1]}/archive/{'/'.join(parts[2:])}"
-            variants.append(f"https://acf.gov{archive_path}")
-
-    return list(dict.fromkeys(variants))  # deduplicate preserving order
-
-
-def search_wayback_cdx(url, session):
-    """Search Wayback Machine CDX API for snapshots of a URL."""
+    """Generate URL variants to search in Wayback (one rewrite rule each)."""
+    return [url] + [variant for variant, _ in candidates(url, max_chain=1)]
+
+
+def search_wayback_cdx(url, session, index=None):
+    """
+    Search Wayback Machine CDX API for every snapshot of a URL. With a
+    CdxIndex, the lookup is answered from the index instead. The caller
+    ranks them all, so none are cut off here (the CDX server returns the
+    oldest first).
+    """
+    if index is not None:
+        return index.lookup(url, limit=None)
     cdx_url = (
         f"https://web.archive.org/cdx/search/cdx?"
-        f"url={url}&output=json&limit=10"
-        f"&fl=timestamp,statuscode,original,mimetype"
+        f"url={url}&output=json"
+        f"&fl=timestamp,statuscode,original,mimetype,digest,length"
         f"&filter=statuscode:200&collapse=digest"
     )
     try:
@@ -112,6 +107,8 @@ def search_wayback_cdx(url, session):
                         "status": row[1],
                         "original": row[2],
                         "mimetype": row[3],
+                        "digest": row[4],
+                        "length": int(row[5]) if row[5].isdigit() else None,
                         "wayback_url": f"https://web.archive.org/web/{row[0]}id_/{row[2]}"
                     })
                 return results
@@ -212,7 +209,7 @@ def download_from_wayback(wayback_url, row_dir, metadata, session):
         downloaded = 0
         for link in doc_links[:15]:
             try:
-                time.sleep(0.5)
+                warc_session.pause(0.5)
                 dl = session.get(link["wayback_url"], timeout=30, headers=HEADERS)
                 dl.raise_for_status()
 
@@ -256,42 +253,7 @@ def download_from_wayback(wayback_url, row_dir, metadata, session):
 
 
 def convert_html_to_pdf(html_content, source_url, row_dir, metadata):
-    """Extract text and create PDF from HTML content."""
-    soup = BeautifulSoup(html_content, "html.parser")
-
-    # Remove wayback toolbar
-    for tag in soup.find_all(id=re.compile(r"wm-ipp|wayback|donate")):
-        tag.decompose()
-    for tag in soup.find_all(["script", "style", "nav", "footer", "noscript",
-                               "iframe", "svg", "button"]):
-        tag.decompose()
-    for tag in soup.find_all(attrs={"class": re.compile(
-            r"header|banner|nav|menu|sidebar|footer|breadcrumb|skip|cookie|usa-banner",
-            re.I)}):
-        tag.decompose()
-
-    main = (soup.find("main") or soup.find("article") or
-            soup.find("div", {"class": re.compile(r"content|main", re.I)}) or
-            soup.find("body"))
-    if not main:
-        main = soup
-
-    blocks = []
-    seen = set()
-    for el in main.find_all(["h1", "h2", "h3", "h4", "p", "li", "td", "div",
-                              "blockquote", "dd", "dt"]):
-        text = el.get_text(separator=" ", strip=True)
-        if text and len(text) > 10:
-            start = text[:50]
-            if start not in seen:
-                seen.add(start)
-                is_h = el.name in ["h1", "h2", "h3", "h4"]
-                blocks.append({"text": text, "is_heading": is_h,
-                               "level": int(el.name[1]) if is_h else 0})
-
-    if len(blocks) < 2:
-        return False
-
+    """Create a text PDF from a snapshot's HTML (html_pdf.py's fpdf backend)."""
     doc_num = metadata.get("doc_number", "").strip()
     if doc_num:
         sname = re.sub(r'[^a-zA-Z0-9_-]', '_', doc_num)
@@ -301,78 +263,45 @@ def convert_html_to_pdf(html_content, source_url, row_dir, metadata):
 
     pdf_path = os.path.join(row_dir, pdf_name)
 
+    # The converter reads from disk; the snapshot HTML isn't kept in the row
+    fd, html_path = tempfile.mkstemp(suffix=".html", dir=row_dir)
     try:
-        title = metadata.get("title", "")
-        office = metadata.get("office", "")
-        issue_date = metadata.get("issue_date", "")
-
-        pdf = FPDF()
-        pdf.set_auto_page_break(auto=True, margin=20)
-        pdf.add_page()
-
-        if title:
-            pdf.set_font("Helvetica", "B", 14)
-            safe = title.encode('latin-1', 'replace').decode('latin-1')
-            pdf.multi_cell(0, 7, safe, new_x="LMARGIN", new_y="NEXT")
-            pdf.ln(2)
-
-        meta_parts = []
-        if doc_num: meta_parts.append(f"Document: {doc_num}")
-        if office: meta_parts.append(f"Office: {office}")
-        if issue_date: meta_parts.append(f"Date: {issue_date[:10]}")
-        if meta_parts:
-            pdf.set_font("Helvetica", "I", 9)
-            pdf.set_text_color(80, 80, 80)
-            pdf.cell(0, 5, " | ".join(meta_parts), new_x="LMARGIN", new_y="NEXT")
-            pdf.ln(1)
-
-        pdf.set_font("Helvetica", "I", 8)
-        pdf.set_text_color(0, 0, 200)
-        safe_url = source_url.encode('latin-1', 'replace').decode('latin-1')[:100]
-        pdf.cell(0, 5, f"Source: {safe_url}", new_x="LMARGIN", new_y="NEXT")
-        pdf.ln(1)
-        pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-        pdf.ln(4)
-        pdf.set_text_color(0, 0, 0)
-
-        for block in blocks:
-            safe_text = block["text"].encode('latin-1', 'replace').decode('latin-1')
-            if block["is_heading"]:
-                size = {1: 14, 2: 12, 3: 11}.get(block["level"], 11)
-                pdf.set_font("Helvetica", "B", size)
-                pdf.ln(2)
-                pdf.multi_cell(0, 6, safe_text, new_x="LMARGIN", new_y="NEXT")
-                pdf.ln(1)
-            else:
-                pdf.set_font("Helvetica", "", 10)
-                pdf.multi_cell(0, 5, safe_text, new_x="LMARGIN", new_y="NEXT")
-                pdf.ln(2)
-
-        pdf.output(pdf_path)
-        fsize = os.path.getsize(pdf_path)
-
-        metadata["files_downloaded"].append({
-            "filename": pdf_name,
-            "source_url": source_url,
-            "size_bytes": fsize,
-            "sha256": sha256_file(pdf_path),
-            "content_type": "application/pdf",
-            "download_type": "wayback_html_to_pdf"
-        })
-        print(f"    [OK] Converted to {pdf_name} ({fsize:,} bytes, {len(blocks)} blocks)")
-        return True
-
-    except Exception as e:
-        print(f"    [ERROR] PDF creation: {e}")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(html_content)
+        ok, reason = convert_html(html_path, pdf_path, metadata)
+    finally:
+        os.remove(html_path)
+
+    if not ok:
+        if reason != "insufficient_content":
+            print(f"    [ERROR] PDF creation: {reason}")
         return False
 
+    fsize = os.path.getsize(pdf_path)
+    metadata["files_downloaded"].append({
+        "filename": pdf_name,
+        "source_url": source_url,
+        "size_bytes": fsize,
+        "sha256": sha256_file(pdf_path),
+        "content_type": "application/pdf",
+        "download_type": "wayback_html_to_pdf"
+    })
+    print(f"    [OK] Converted to {pdf_name} ({fsize:,} bytes)")
+    return True
+
 
 def main():
     parser = argparse.ArgumentParser(description="ACF Wayback Deep Recovery")
     parser.add_argument("--output", default=DEFAULT_OUTPUT)
     parser.add_argument("--reports", default=DEFAULT_REPORTS)
     parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--cdx-endpoint", default=CDX_ENDPOINT,
+                        help="CDX server (e.g. a local fixture server)")
+    parser.add_argument("--refresh-cdx", action="store_true",
+                        help="Re-fetch CDX prefixes already in the index")
+    warc_session.add_arguments(parser)
     args = parser.parse_args()
+    warc_session.setup(args.warc_record, args.warc_replay, stage="wayback_deep")
 
     output_dir = os.path.abspath(args.output)
     reports_dir = os.path.abspath(args.reports)
@@ -382,7 +311,7 @@ def main():
     print("ACF — WAYBACK MACHINE DEEP RECOVERY")
     print("=" * 60)
 
-    session = requests.Session()
+    session = warc_session.attach(requests.Session())
     session.headers.update(HEADERS)
 
     # Collect failed rows
@@ -407,9 +336,24 @@ def main():
         print("  Nothing to do.")
         return
 
-    stats = {"recovered": 0, "failed": 0, "snapshots_found": 0}
+    stats = {"recovered": 0, "failed": 0, "snapshots_found": 0, "snapshot_downloads": 0}
     start_time = datetime.now()
 
+    # Fill the CDX index with one prefix query per directory searched below
+    index = None
+    if not args.dry_run:
+        index = CdxIndex(os.path.join(reports_dir, "cdx_index.sqlite"), session,
+                         endpoint=args.cdx_endpoint)
+        search_urls = []
+        for meta in targets:
+            if meta.get("urls"):
+                search_urls.extend(generate_url_variants(meta["urls"][0]["url"]))
+            if meta.get("matched_url"):
+                search_urls.extend(generate_url_variants(meta["matched_url"]))
+        prefixes = index.warm(search_urls, refresh=args.refresh_cdx)
+        print(f"  CDX index: {len(prefixes)} prefixes, "
+              f"{index.summary()['captures']} captures\n")
+
     for i, meta in enumerate(targets):
         folder = meta["folder"]
         doc_num = meta.get("doc_number", "")
@@ -438,8 +382,7 @@ def main():
         # Search Wayback for each variant
         all_snapshots = []
         for search_url in urls_to_search:
-            time.sleep(1)
-            snapshots = search_wayback_cdx(search_url, session)
+            snapshots = search_wayback_cdx(search_url, session, index)
             if snapshots:
                 print(f"    Found {len(snapshots)} snapshots for: {search_url[:60]}")
                 all_snapshots.extend(snapshots)
@@ -451,15 +394,17 @@ def main():
             stats["failed"] += 1
             continue
 
-        # Try snapshots from newest to oldest
-        all_snapshots.sort(key=lambda s: s["timestamp"], reverse=True)
+        # Most likely real document first (raw id_ captures, no toolbar)
+        all_snapshots = rank_snapshots(all_snapshots, meta.get("issue_date"),
+                                       all_snapshots[0]["original"])
 
         success = False
-        for snap in all_snapshots[:3]:  # Try up to 3 snapshots
+        for attempt, snap in enumerate(all_snapshots[:3], start=1):  # Up to 3 snapshots
             wb_url = snap["wayback_url"]
             print(f"    Trying snapshot {snap['timestamp']}: {snap['original'][:50]}")
+            stats["snapshot_downloads"] += 1
 
-            time.sleep(1.5)
+            warc_session.pause(1.5)
             success = download_from_wayback(wb_url, meta["_row_dir"], meta, session)
             if success:
                 break
@@ -469,6 +414,7 @@ def main():
             meta["recovery_method"] = "wayback_deep"
             meta["errors"] = []
             meta["wayback_recovery_at"] = datetime.now().isoformat()
+            meta["wayback_snapshot"] = {"timestamp": snap["timestamp"], "attempt": attempt}
             stats["recovered"] += 1
         else:
             stats["failed"] += 1
@@ -489,11 +435,21 @@ def main():
     print(f"  Snapshots found: {stats['snapshots_found']}")
     print(f"  Recovered: {stats['recovered']}")
     print(f"  Still failed: {stats['failed']}")
+    if stats["recovered"]:
+        print(f"  Snapshot downloads per recovered row: "
+              f"{stats['snapshot_downloads'] / stats['recovered']:.2f}")
+
+    cdx = None
+    if index is not None:
+        cdx = index.summary()
+        index.close()
+        print(f"  CDX requests: {cdx['requests']} "
+              f"({cdx['local_hits']} lookups answered from the index)")
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     report_path = os.path.join(reports_dir, f"wayback_deep_{timestamp}.json")
     with open(report_path, "w", encoding="utf-8") as f:
-        json.dump({"stats": stats, "duration": elapsed}, f, indent=2)
+        json.dump({"stats": stats, "cdx_index": cdx, "duration": elapsed}, f, indent=2)
     print(f"Report saved: {report_path}")
 
 
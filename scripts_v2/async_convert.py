@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+ACF Guidance v2 — Async Playwright Conversion Engine
+======================================================
+Runs HTML→PDF render jobs on playwright.async_api with K pages in flight
+against one Chromium. While one page waits on layout or PDF output the
+event loop drives the others, so a single browser stays busy without a
+thread per render.
+
+  - Largest-first scheduling: jobs are queued by source size, descending,
+    so the slowest renders start early instead of trailing at the end.
+  - Per-job timeout: a render that exceeds it is cancelled and reported
+    as failed; its context is closed and the slot moves on.
+  - Each job gets a fresh browser context; a crashed browser is relaunched.
+
+Jobs are dicts carrying at least "size"; the caller supplies the render
+coroutine and a completion callback, which runs on the event loop thread
+(so callbacks writing metadata.json never race each other):
+
+    async def render(page, job): ... return ok, reason
+    def on_done(job, ok, reason, seconds): ...
+
+    stats = run_jobs(jobs, render, on_done, concurrency=8, timeout=90)
+
+Requires: pip install playwright && playwright install chromium
+"""
+
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger("acf_v2.async_convert")
+
+DEFAULT_CONCURRENCY = 8          # pages rendering at once
+DEFAULT_JOB_TIMEOUT = 90         # seconds per render
+CONTEXT_CLOSE_TIMEOUT = 10       # don't let a wedged page block its slot
+
+
+async def _close_quietly(context):
+    try:
+        await asyncio.wait_for(context.close(), CONTEXT_CLOSE_TIMEOUT)
+    except Exception:
+        pass
+
+
+async def _run_jobs(jobs, render, on_done, concurrency, timeout,
+                    launch_options, context_options):
+    try:
+        from playwright.async_api import async_playwright
+    except ImportError as e:
+        raise RuntimeError(f"Chromium failed to launch: {e}")
+
+    queue = asyncio.Queue()
+    for job in sorted(jobs, key=lambda j: j.get("size", 0), reverse=True):
+        queue.put_nowait(job)
+
+    stats = {"jobs": 0, "failed": 0, "timeouts": 0, "relaunches": 0,
+             "concurrency": concurrency}
+
+    async with async_playwright() as p:
+        try:
+            browser = await p.chromium.launch(**launch_options)
+        except Exception as e:
+            raise RuntimeError(f"Chromium failed to launch: {e}")
+        state = {"browser": browser}
+        relaunch_lock = asyncio.Lock()
+
+        async def current_browser():
+            async with relaunch_lock:
+                if not state["browser"].is_connected():
+                    logger.debug("  Browser disconnected — relaunching")
+                    stats["relaunches"] += 1
+                    state["browser"] = await p.chromium.launch(**launch_options)
+            return state["browser"]
+
+        async def render_in_context(job):
+            context = await (await current_browser()).new_context(**context_options)
+            try:
+                page = await context.new_page()
+                return await render(page, job)
+            finally:
+                await _close_quietly(context)
+
+        async def worker():
+            while True:
+                try:
+                    job = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                start = time.perf_counter()
+                try:
+                    ok, reason = await asyncio.wait_for(render_in_context(job), timeout)
+                except asyncio.TimeoutError:
+                    ok, reason = False, f"timeout ({timeout}s)"
+                    stats["timeouts"] += 1
+                except Exception as e:
+                    ok, reason = False, str(e)
+
+                stats["jobs"] += 1
+                if not ok:
+                    stats["failed"] += 1
+                try:
+                    on_done(job, ok, reason, time.perf_counter() - start)
+                except Exception as e:
+                    logger.error(f"  Result callback failed — {e}")
+
+        await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, len(jobs))))))
+
+        try:
+            await state["browser"].close()
+        except Exception:
+            pass
+
+    return stats
+
+
+def run_jobs(jobs, render, on_done, concurrency=DEFAULT_CONCURRENCY,
+             timeout=DEFAULT_JOB_TIMEOUT, launch_options=None, context_options=None):
+    """
+    Render every job, `concurrency` pages at a time, largest first.
+    Blocks until all jobs finish and returns engine stats. Raises
+    RuntimeError if Playwright or Chromium can't be started.
+    """
+    if not jobs:
+        return {"jobs": 0, "failed": 0, "timeouts": 0, "relaunches": 0,
+                "concurrency": concurrency}
+    return asyncio.run(_run_jobs(jobs, render, on_done, concurrency, timeout,
+                                 {"headless": True, **(launch_options or {})},
+                                 context_options or {}))
@@ -12,6 +12,8 @@ Usage:
   python audit_v1.py                      # Scan output/
   python audit_v1.py --dir output         # Specify directory
   python audit_v1.py --sample 100         # Quick sample scan
+  python audit_v1.py --junk-fingerprints reports/learned_junk_fingerprints.json
+  python audit_v1.py --rules rules/default.yaml   # Rule engine + per-rule timing
 """
 
 import os
@@ -23,7 +25,7 @@ import random
 from datetime import datetime
 from collections import defaultdict
 
-from validate import validate_content, detect_file_type
+from validate import validate_content, detect_file_type, load_junk_fingerprints
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if not os.path.exists(os.path.join(BASE_DIR, "output")):
@@ -33,7 +35,7 @@ OUTPUT_DIR = os.path.join(BASE_DIR, "output")
 REPORTS_DIR = os.path.join(BASE_DIR, "reports")
 
 
-def audit_collection(scan_dir, sample_size=None):
+def audit_collection(scan_dir, sample_size=None, validator=validate_content):
     """
     Scan every row folder and validate all files.
     Returns detailed stats on quality issues.
@@ -102,7 +104,7 @@ def audit_collection(scan_dir, sample_size=None):
             stats["file_types"][ftype] += 1
 
             # Validate
-            vr = validate_content(fpath)
+            vr = validator(fpath)
 
             if vr.valid:
                 stats["valid_files"] += 1
@@ -144,6 +146,10 @@ def main():
     parser = argparse.ArgumentParser(description="Audit existing v1 collection")
     parser.add_argument("--dir", type=str, default=None, help="Directory to scan")
     parser.add_argument("--sample", type=int, default=None, help="Sample N random folders")
+    parser.add_argument("--junk-fingerprints", type=str, default=None,
+                        help="Learned junk templates from find_templates.py")
+    parser.add_argument("--rules", action="append", default=None,
+                        help="Validate with a rule pack (YAML/JSON); repeat to chain packs")
     parser.add_argument("--verbose", "-v", action="store_true")
     args = parser.parse_args()
 
@@ -158,10 +164,20 @@ def main():
         logger.error(f"Directory not found: {scan_dir}")
         sys.exit(1)
 
+    if args.junk_fingerprints:
+        load_junk_fingerprints(args.junk_fingerprints)
+
     logger.info(f"Auditing collection in: {scan_dir}")
     start = datetime.now()
 
-    stats, junk_rows, mixed_rows = audit_collection(scan_dir, args.sample)
+    engine = None
+    validator = validate_content
+    if args.rules:
+        from rule_engine import RuleEngine
+        engine = RuleEngine.from_files(args.rules)
+        validator = engine.validate
+
+    stats, junk_rows, mixed_rows = audit_collection(scan_dir, args.sample, validator)
 
     elapsed = datetime.now() - start
 
@@ -198,6 +214,13 @@ def main():
             for reason, count in sorted(reasons.items(), key=lambda x: -x[1]):
                 print(f"      {reason:33s}  {count}")
 
+    rule_stats = engine.stats() if engine else None
+    if rule_stats:
+        print(f"\n  Rule timings ({rule_stats['files']} files):")
+        for r in rule_stats["rules"]:
+            print(f"    {r['id']:25s}  hits {r['hits']:6d} / {r['evaluated']:6d}"
+                  f"  {r['total_ms']:10.1f} ms")
+
     print(f"\n  Elapsed: {elapsed}")
 
     # ── Save detailed report ──
@@ -219,6 +242,7 @@ def main():
         "elapsed_seconds": elapsed.total_seconds(),
         "scan_dir": scan_dir,
         "sampled": args.sample is not None,
+        "rule_stats": rule_stats,
     }
 
     report_path = os.path.join(REPORTS_DIR,
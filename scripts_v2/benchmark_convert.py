@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+ACF Guidance v2 — HTML→PDF Backend Benchmark
+==============================================
+Runs every html_pdf backend over the same fixed corpus of saved pages
+and reports, per backend:
+
+  - pages/min and files/min (wall clock, all workers)
+  - p50 / p95 render latency per file
+  - peak RSS of this process plus all its children (browsers, workers)
+
+The corpus is a plain directory of .html files. --build samples one
+deterministically from a collection (every Nth valid page, by row
+order) and writes a manifest of their hashes, so later runs — on this
+machine or another — measure the same input. Renders bypass the
+conversion cache and go to a temp directory.
+
+Usage:
+  python benchmark_convert.py --build --from ../output --count 100
+  python benchmark_convert.py                              # All backends
+  python benchmark_convert.py --backends reportlab fpdf --workers 8
+
+Optional: pip install psutil pypdf   (RSS sampling, exact page counts)
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+
+from browser_pool import DEFAULT_POOL_SIZE
+from conversion_cache import sha256_file
+from html_pdf import BACKENDS, Converter, get_backend
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if not os.path.exists(os.path.join(BASE_DIR, "output")):
+    BASE_DIR = os.path.dirname(BASE_DIR)
+
+CORPUS_DIR = os.path.join(BASE_DIR, "bench_corpus")
+REPORTS_DIR = os.path.join(BASE_DIR, "reports")
+MANIFEST = "manifest.json"
+
+RSS_SAMPLE_SECONDS = 0.2
+
+
+# ── Corpus ───────────────────────────────────────────────────────────────
+
+def build_corpus(source_dir, corpus_dir, count):
+    """Copy `count` HTML pages, evenly spaced over the collection's rows."""
+    from validate import validate_content
+
+    candidates = []
+    for folder in sorted(os.listdir(source_dir)):
+        row_dir = os.path.join(source_dir, folder)
+        if not (folder.isdigit() and os.path.isdir(row_dir)):
+            continue
+        for fname in sorted(os.listdir(row_dir)):
+            if fname.endswith((".html", ".htm")) and not fname.endswith(".clean.html"):
+                candidates.append((folder, os.path.join(row_dir, fname)))
+
+    step = max(1, len(candidates) // max(1, count))
+    os.makedirs(corpus_dir, exist_ok=True)
+    manifest = []
+    for folder, path in candidates[::step]:
+        if len(manifest) >= count:
+            break
+        if not validate_content(path).valid:
+            continue
+        name = f"{folder}_{os.path.basename(path)}"
+        shutil.copy2(path, os.path.join(corpus_dir, name))
+        manifest.append({"file": name, "sha256": sha256_file(path),
+                         "size": os.path.getsize(path)})
+
+    with open(os.path.join(corpus_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({"source": os.path.abspath(source_dir), "files": manifest}, f, indent=2)
+    return manifest
+
+
+def load_corpus(corpus_dir):
+    """Corpus files from the manifest, checked against their recorded hashes."""
+    with open(os.path.join(corpus_dir, MANIFEST), "r", encoding="utf-8") as f:
+        manifest = json.load(f)["files"]
+    for entry in manifest:
+        path = os.path.join(corpus_dir, entry["file"])
+        if sha256_file(path) != entry["sha256"]:
+            raise ValueError(f"Corpus file changed since --build: {entry['file']}")
+    return manifest
+
+
+# ── Measurement ──────────────────────────────────────────────────────────
+
+def count_pages(pdf_path):
+    try:
+        from pypdf import PdfReader
+        return len(PdfReader(pdf_path).pages)
+    except ImportError:
+        pass
+    except Exception:
+        return 0
+    with open(pdf_path, "rb") as f:
+        return len(re.findall(rb"/Type\s*/Page\b", f.read()))
+
+
+class PeakRSS:
+    """Samples RSS of this process and all descendants on a thread."""
+
+    def __init__(self):
+        self.peak_mb = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self, psutil):
+        me = psutil.Process()
+        while not self._stop.is_set():
+            total = 0
+            for proc in [me] + me.children(recursive=True):
+                try:
+                    total += proc.memory_info().rss
+                except psutil.Error:
+                    pass
+            self.peak_mb = max(self.peak_mb or 0, total / (1024 * 1024))
+            self._stop.wait(RSS_SAMPLE_SECONDS)
+
+    def __enter__(self):
+        try:
+            import psutil
+        except ImportError:
+            return self
+        self._thread = threading.Thread(target=self._sample, args=(psutil,), daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def bench_backend(name, corpus_dir, manifest, workers, offline):
+    """Convert the whole corpus with one backend. Returns its result row."""
+    out_dir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    jobs = [{"html_path": os.path.join(corpus_dir, e["file"]),
+             "pdf_path": os.path.join(out_dir, os.path.splitext(e["file"])[0] + ".pdf"),
+             "header": e["file"], "size": e["size"]}
+            for e in manifest]
+    latencies, pages = [], [0]
+
+    def on_done(job, ok, reason, info):
+        if ok:
+            latencies.append(job["seconds"])
+            pages[0] += count_pages(job["pdf_path"])
+
+    try:
+        with PeakRSS() as rss:
+            start = time.perf_counter()
+            try:
+                with Converter(get_backend(name, offline), workers) as converter:
+                    stats = converter.run(jobs, on_done)
+            except RuntimeError as e:
+                return {"backend": name, "available": False, "error": str(e)}
+            wall = time.perf_counter() - start
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    minutes = wall / 60
+    return {
+        "backend": name, "available": True, "workers": workers,
+        "files": len(jobs), "converted": stats["converted"], "failed": stats["failed"],
+        "pages": pages[0], "wall_seconds": round(wall, 2),
+        "pages_per_min": round(pages[0] / minutes, 1) if minutes else None,
+        "files_per_min": round(stats["converted"] / minutes, 1) if minutes else None,
+        "p50_seconds": percentile(latencies, 50),
+        "p95_seconds": percentile(latencies, 95),
+        "peak_rss_mb": round(rss.peak_mb, 1) if rss.peak_mb is not None else None,
+    }
+
+
+def _fmt(value, spec):
+    return "—" if value is None else format(value, spec)
+
+
+# ── CLI ──────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML→PDF backends")
+    parser.add_argument("--corpus", default=CORPUS_DIR, help="Corpus directory")
+    parser.add_argument("--build", action="store_true",
+                        help="(Re)build the corpus from a collection, then exit")
+    parser.add_argument("--from", dest="source", default=os.path.join(BASE_DIR, "output"),
+                        help="Collection to sample with --build")
+    parser.add_argument("--count", type=int, default=100, help="Corpus size for --build")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--workers", type=int, default=DEFAULT_POOL_SIZE)
+    parser.add_argument("--allow-network", action="store_true",
+                        help="Let Playwright renders fetch remote assets")
+    args = parser.parse_args()
+
+    if args.build:
+        manifest = build_corpus(args.source, args.corpus, args.count)
+        print(f"  Corpus: {len(manifest)} pages → {args.corpus}")
+        return
+
+    if not os.path.exists(os.path.join(args.corpus, MANIFEST)):
+        print(f"  No corpus at {args.corpus} — run with --build first")
+        sys.exit(1)
+    manifest = load_corpus(args.corpus)
+    print(f"  Corpus: {len(manifest)} pages, "
+          f"{sum(e['size'] for e in manifest) / (1024 * 1024):.1f} MB")
+
+    results = []
+    for name in args.backends:
+        print(f"  Running {name}...")
+        results.append(bench_backend(name, args.corpus, manifest, args.workers,
+                                     not args.allow_network))
+
+    print("\n" + "=" * 78)
+    print(f"  {'Backend':<11} {'OK':>5} {'Fail':>5} {'Pages':>6} {'Pages/min':>10} "
+          f"{'p50 s':>7} {'p95 s':>7} {'Peak RSS MB':>12}")
+    print("  " + "-" * 76)
+    for r in results:
+        if not r["available"]:
+            print(f"  {r['backend']:<11} unavailable — {r['error'].splitlines()[0][:55]}")
+            continue
+        print(f"  {r['backend']:<11} {r['converted']:>5} {r['failed']:>5} {r['pages']:>6} "
+              f"{_fmt(r['pages_per_min'], '>10.1f')} {_fmt(r['p50_seconds'], '>7.2f')} "
+              f"{_fmt(r['p95_seconds'], '>7.2f')} {_fmt(r['peak_rss_mb'], '>12.1f')}")
+    print("=" * 78)
+
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    report_path = os.path.join(REPORTS_DIR,
+                               f"benchmark_convert_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(report_path, "w") as f:
+        json.dump({"corpus": os.path.abspath(args.corpus), "files": len(manifest),
+                   "workers": args.workers, "results": results}, f, indent=2)
+    print(f"  Report saved: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
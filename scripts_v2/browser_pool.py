@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+ACF Guidance v2 — Persistent Chromium Browser Pool
+====================================================
+Launching Chromium costs far more than rendering one saved ACF page, so
+converting ~2,000 HTML files one `chromium.launch()` at a time spends
+most of its time starting and stopping browsers.
+
+BrowserPool launches N headless Chromium instances once and runs render
+jobs against them. Each job gets a fresh browser context and page, so no
+state (cookies, storage, scripts) leaks between documents. A browser is
+relaunched after `max_renders` jobs, when its process tree grows past
+`max_rss_mb`, or if it disconnects.
+
+With `job_timeout`, a watchdog thread gives every job a wall-clock
+deadline. A hung render (evaluate() and pdf() have no timeout of their
+own) has its future failed with TimeoutError so the caller moves on, and
+its browser is killed, which unblocks the worker and triggers a
+relaunch. Without psutil the browser's processes aren't known; the
+stuck worker is then retired and a replacement browser started.
+
+Playwright's sync API objects are bound to the thread that created them,
+so every browser lives in its own worker thread with its own
+sync_playwright() driver. Jobs are plain callables taking the page:
+
+    with BrowserPool(size=4) as pool:
+        future = pool.submit(render_fn, html_path, pdf_path)  # render_fn(page, ...)
+        ok, reason = future.result()
+
+Requires: pip install playwright && playwright install chromium
+Optional: pip install psutil   (enables RSS-based recycling)
+"""
+
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future, InvalidStateError
+
+logger = logging.getLogger("acf_v2.browser_pool")
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_MAX_RENDERS = 200        # relaunch a browser after this many jobs
+DEFAULT_MAX_RSS_MB = 1500        # ...or once its process tree exceeds this
+RSS_CHECK_EVERY = 10             # jobs between RSS checks
+WATCHDOG_INTERVAL = 1.0          # seconds between deadline checks
+
+# Serializes launches so each worker can attribute new child processes
+# to its own browser.
+_launch_lock = threading.Lock()
+
+
+def _descendant_pids():
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return {p.pid for p in psutil.Process().children(recursive=True)}
+
+
+def _browser_roots(new_pids):
+    """
+    Pick Chromium root processes out of newly seen descendants. Chromium's
+    own helpers (renderers, GPU, zygote) all carry --type=...; so may
+    renderers of other pool browsers that happened to spawn meanwhile.
+    """
+    import psutil
+    roots = set()
+    for pid in new_pids:
+        try:
+            cmdline = psutil.Process(pid).cmdline()
+        except psutil.Error:
+            continue
+        if cmdline and not any(arg.startswith("--type=") for arg in cmdline):
+            roots.add(pid)
+    return roots
+
+
+def _kill_tree(root_pids):
+    """Kill the given processes and their children."""
+    import psutil
+    for pid in root_pids:
+        try:
+            proc = psutil.Process(pid)
+            for p in proc.children(recursive=True) + [proc]:
+                try:
+                    p.kill()
+                except psutil.Error:
+                    pass
+        except psutil.Error:
+            continue
+
+
+def _tree_rss_mb(root_pids):
+    """Resident memory of the given processes and their children, in MB."""
+    import psutil
+    total = 0
+    for pid in root_pids:
+        try:
+            proc = psutil.Process(pid)
+            for p in [proc] + proc.children(recursive=True):
+                total += p.memory_info().rss
+        except psutil.Error:
+            continue
+    return total / (1024 * 1024)
+
+
+class BrowserPool:
+    """Fixed set of long-lived Chromium browsers that run page jobs."""
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, max_renders=DEFAULT_MAX_RENDERS,
+                 max_rss_mb=DEFAULT_MAX_RSS_MB, launch_options=None, context_options=None,
+                 job_timeout=None):
+        self.size = size
+        self.max_renders = max_renders
+        self.max_rss_mb = max_rss_mb
+        self.job_timeout = job_timeout
+        self.launch_options = {"headless": True, **(launch_options or {})}
+        self.context_options = context_options or {}
+
+        self._jobs = queue.Queue()
+        self._threads = []
+        self._retired = []
+        self._threads_lock = threading.RLock()   # guards _threads/_retired
+        self._alive = 0
+        self._stats_lock = threading.Lock()
+        self._active = {}            # wid -> {"future", "deadline", "roots"} while rendering
+        self._next_wid = size
+        self._closing = threading.Event()
+        self.stats = {"jobs": 0, "failed": 0, "launches": 0, "timeouts": 0,
+                      "recycled_renders": 0, "recycled_rss": 0, "recycled_crash": 0,
+                      "recycled_timeout": 0, "retired": 0}
+
+        self._start()
+        if job_timeout:
+            threading.Thread(target=self._watchdog, name="browser-watchdog",
+                             daemon=True).start()
+
+    # ── Lifecycle ──
+
+    def _spawn(self, wid, counted=False):
+        started = threading.Event()
+        state = {"error": None, "retired": False, "counted": counted}
+        t = threading.Thread(target=self._worker, args=(wid, started, state),
+                             name=f"browser-{wid}", daemon=True)
+        t.state = state
+        with self._threads_lock:
+            t.start()
+            self._threads.append(t)
+        return started, state
+
+    def _start(self):
+        with self._threads_lock:
+            ready = [self._spawn(wid) for wid in range(self.size)]
+
+        for started, state in ready:
+            started.wait()
+            if state["error"] is not None:
+                self.close()
+                raise RuntimeError(f"Chromium failed to launch: {state['error']}")
+        logger.debug(f"Browser pool ready: {self.size} browsers")
+
+    def close(self):
+        # Once _closing is set the watchdog spawns no more replacements,
+        # so the snapshot covers every worker that needs a sentinel
+        with self._threads_lock:
+            self._closing.set()
+            threads = list(self._threads)
+            retired = list(self._retired)
+        for _ in threads:
+            self._jobs.put(None)
+        for t in threads:
+            t.join()
+        # Retired workers may still be stuck in a render; they're daemons
+        for t in retired:
+            t.join(5)
+        with self._threads_lock:
+            self._threads = []
+            self._retired = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ── Jobs ──
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(page, *args, **kwargs) on the next free browser. Returns a Future."""
+        future = Future()
+        self._jobs.put((future, fn, args, kwargs))
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        """Run a job and wait for its result."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    # ── Watchdog ──
+
+    def _watchdog(self):
+        while not self._closing.wait(WATCHDOG_INTERVAL):
+            now = time.monotonic()
+            for wid, job in list(self._active.items()):
+                if job.get("expired") or now < job["deadline"]:
+                    continue
+                job["expired"] = True
+                self._expire(wid, job)
+
+    def _expire(self, wid, job):
+        try:
+            job["future"].set_exception(
+                TimeoutError(f"render exceeded {self.job_timeout}s"))
+        except InvalidStateError:
+            return          # finished just now
+        with self._stats_lock:
+            self.stats["timeouts"] += 1
+        if job["roots"]:
+            logger.warning(f"  browser-{wid}: job over {self.job_timeout}s — killing browser")
+            _kill_tree(job["roots"])
+            return
+        # Can't kill what we can't see: leave the stuck worker behind and
+        # bring up a replacement so the pool keeps its size
+        with self._threads_lock:
+            if self._closing.is_set():
+                return      # close() is already sending sentinels to the current set
+            logger.warning(f"  browser-{wid}: job over {self.job_timeout}s — retiring worker")
+            with self._stats_lock:
+                self.stats["retired"] += 1
+                new_wid = self._next_wid
+                self._next_wid += 1
+                # Count the replacement now, so the retired worker exiting
+                # first never looks like the pool running dry
+                self._alive += 1
+            for t in self._threads:
+                if t.name == f"browser-{wid}":
+                    t.state["retired"] = True
+                    self._threads.remove(t)
+                    self._retired.append(t)
+                    break
+            self._spawn(new_wid, counted=True)
+
+    # ── Worker thread ──
+
+    def _launch(self, p):
+        with _launch_lock:
+            before = _descendant_pids()
+            browser = p.chromium.launch(**self.launch_options)
+            after = _descendant_pids()
+        with self._stats_lock:
+            self.stats["launches"] += 1
+        roots = None
+        if before is not None and after is not None:
+            roots = _browser_roots(after - before)
+        return browser, roots
+
+    def _should_recycle(self, browser, renders, roots):
+        if not browser.is_connected():
+            return "recycled_crash"
+        if renders >= self.max_renders:
+            return "recycled_renders"
+        if roots and self.max_rss_mb and renders % RSS_CHECK_EVERY == 0:
+            if _tree_rss_mb(roots) > self.max_rss_mb:
+                return "recycled_rss"
+        return None
+
+    def _worker(self, wid, started, state):
+        p = None
+        try:
+            from playwright.sync_api import sync_playwright
+            with _launch_lock:
+                p = sync_playwright().start()
+            browser, roots = self._launch(p)
+        except Exception as e:
+            if p is not None:
+                p.stop()
+            state["error"] = e
+            started.set()
+            if state.get("counted"):
+                logger.error(f"  browser-{wid}: replacement launch failed — {e}")
+                self._worker_exited()
+            return
+        if not state.get("counted"):
+            with self._stats_lock:
+                self._alive += 1
+        started.set()
+
+        renders = 0
+        try:
+            while True:
+                item = self._jobs.get()
+                if item is None:
+                    break
+                future, fn, args, kwargs = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                context = None
+                job = {"future": future, "roots": roots,
+                       "deadline": time.monotonic() + (self.job_timeout or 0)}
+                self._active[wid] = job
+                try:
+                    context = browser.new_context(**self.context_options)
+                    page = context.new_page()
+                    result = fn(page, *args, **kwargs)
+                    try:
+                        future.set_result(result)
+                    except InvalidStateError:
+                        pass        # the watchdog already failed it
+                except BaseException as e:
+                    with self._stats_lock:
+                        self.stats["failed"] += 1
+                    try:
+                        future.set_exception(e)
+                    except InvalidStateError:
+                        pass
+                finally:
+                    self._active.pop(wid, None)
+                    if context is not None:
+                        try:
+                            context.close()
+                        except Exception:
+                            pass
+
+                if state["retired"]:
+                    break
+
+                renders += 1
+                with self._stats_lock:
+                    self.stats["jobs"] += 1
+
+                reason = self._should_recycle(browser, renders, roots)
+                if reason == "recycled_crash" and job.get("expired"):
+                    reason = "recycled_timeout"
+                if reason:
+                    logger.debug(f"  browser-{wid}: relaunching ({reason}, {renders} renders)")
+                    with self._stats_lock:
+                        self.stats[reason] += 1
+                    try:
+                        browser.close()
+                    except Exception:
+                        pass
+                    try:
+                        browser, roots = self._launch(p)
+                    except Exception as e:
+                        logger.error(f"  browser-{wid}: relaunch failed — {e}")
+                        break
+                    renders = 0
+        finally:
+            try:
+                browser.close()
+            except Exception:
+                pass
+            p.stop()
+            self._worker_exited()
+
+    def _worker_exited(self):
+        """Fail queued jobs once no browser is left to run them."""
+        with self._stats_lock:
+            self._alive -= 1
+            if self._alive > 0:
+                return
+        while True:
+            try:
+                item = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None and item[0].set_running_or_notify_cancel():
+                item[0].set_exception(RuntimeError("no browsers left in pool"))
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+ACF Guidance v2 — Page Complexity Scoring
+===========================================
+Most saved ACF pages are plain prose that the text backends render
+correctly in milliseconds; only some need Chromium's layout. One cheap
+streaming html.parser pass counts what the text backends lose or flatten:
+
+  tables          +4 each, +8 nested, +6 wider than text_pdf's 6 columns,
+                  +1 per merged cell (colspan/rowspan)
+  images          +2 each <img>; +3 each <svg>/<canvas>/<iframe>/<object>/
+                  <embed>/<video>
+  nested lists    +2 per list opened more than two levels deep
+  inline styles   +0.25 per style="" attribute
+
+Site chrome (nav, header, footer, scripts, styles) isn't counted — both
+renderers drop it. A page scoring at or above the threshold goes to the
+browser; below it, to a text backend (see html_pdf.RoutedBackend).
+
+Usage:
+  python complexity.py page.html [...]          # Score files
+  python complexity.py --scan ../output         # Score distribution of a collection
+"""
+
+import os
+import sys
+import argparse
+from html.parser import HTMLParser
+
+from text_pdf import SKIP_TAGS, VOID_TAGS, MAX_TABLE_COLS, READ_CHUNK
+
+DEFAULT_THRESHOLD = 8.0
+
+MEDIA_TAGS = {"svg", "canvas", "iframe", "object", "embed", "video"}
+LIST_TAGS = {"ul", "ol"}
+
+
+class ComplexityScanner(HTMLParser):
+    """Streaming feature counter; read self.features after close()."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.features = {"tables": 0, "nested_tables": 0, "wide_tables": 0,
+                         "merged_cells": 0, "images": 0, "media": 0,
+                         "deep_lists": 0, "inline_styles": 0}
+        self._skip = 0              # depth inside chrome
+        self._tables = []           # column count of the current row, per open table
+        self._widest = []
+        self._lists = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self._skip:
+            if tag in SKIP_TAGS and tag not in VOID_TAGS:
+                self._skip += 1
+            return
+        if tag in SKIP_TAGS:
+            # <svg> is chrome to the text extractor but content here
+            if tag in MEDIA_TAGS:
+                self.features["media"] += 1
+            if tag not in VOID_TAGS:
+                self._skip = 1
+            return
+
+        f = self.features
+        if any(name == "style" and value for name, value in attrs):
+            f["inline_styles"] += 1
+
+        if tag == "table":
+            f["tables"] += 1
+            if self._tables:
+                f["nested_tables"] += 1
+            self._tables.append(0)
+            self._widest.append(0)
+        elif tag == "tr" and self._tables:
+            self._tables[-1] = 0
+        elif tag in ("td", "th") and self._tables:
+            span = 1
+            for name, value in attrs:
+                if name in ("colspan", "rowspan") and value and value.strip() not in ("", "1"):
+                    f["merged_cells"] += 1
+                    if name == "colspan" and value.strip().isdigit():
+                        span = int(value.strip())
+            self._tables[-1] += span
+            self._widest[-1] = max(self._widest[-1], self._tables[-1])
+        elif tag == "img":
+            f["images"] += 1
+        elif tag in MEDIA_TAGS:
+            f["media"] += 1
+        elif tag in LIST_TAGS:
+            self._lists += 1
+            if self._lists > 2:
+                f["deep_lists"] += 1
+
+    def handle_endtag(self, tag):
+        if self._skip:
+            if tag in SKIP_TAGS:
+                self._skip -= 1
+            return
+        if tag == "table" and self._tables:
+            self._tables.pop()
+            if self._widest.pop() > MAX_TABLE_COLS:
+                self.features["wide_tables"] += 1
+        elif tag in LIST_TAGS and self._lists:
+            self._lists -= 1
+
+
+def score_features(f):
+    return (4 * f["tables"] + 8 * f["nested_tables"] + 6 * f["wide_tables"]
+            + f["merged_cells"] + 2 * f["images"] + 3 * f["media"]
+            + 2 * f["deep_lists"] + 0.25 * f["inline_styles"])
+
+
+def complexity_score(html_path, chunk_size=READ_CHUNK):
+    """Returns (score, features) for one saved page."""
+    scanner = ComplexityScanner()
+    with open(html_path, "r", encoding="utf-8", errors="ignore") as f:
+        for chunk in iter(lambda: f.read(chunk_size), ""):
+            scanner.feed(chunk)
+    scanner.close()
+    return round(score_features(scanner.features), 2), scanner.features
+
+
+# ── CLI ──────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score saved pages for conversion routing")
+    parser.add_argument("files", nargs="*", help="HTML files to score")
+    parser.add_argument("--scan", metavar="DIR", help="Score every row HTML in a collection")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    paths = list(args.files)
+    if args.scan:
+        for folder in sorted(os.listdir(args.scan)):
+            row_dir = os.path.join(args.scan, folder)
+            if folder.isdigit() and os.path.isdir(row_dir):
+                paths += [os.path.join(row_dir, f) for f in sorted(os.listdir(row_dir))
+                          if f.endswith((".html", ".htm")) and not f.endswith(".clean.html")]
+    if not paths:
+        parser.print_help()
+        sys.exit(1)
+
+    scores = []
+    for path in paths:
+        score, features = complexity_score(path)
+        scores.append(score)
+        if not args.scan:
+            route = "browser" if score >= args.threshold else "text"
+            detail = ", ".join(f"{k}={v}" for k, v in features.items() if v)
+            print(f"  {score:7.2f}  {route:7s}  {path}  {detail}")
+
+    browser = sum(1 for s in scores if s >= args.threshold)
+    print(f"\n  {len(scores)} pages: {len(scores) - browser} text, {browser} browser "
+          f"(threshold {args.threshold})")
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+ACF Guidance v2 — Content-Addressed Conversion Cache
+======================================================
+Stores rendered PDFs under a key derived from the source HTML and the
+render configuration:
+
+    key = sha256( sha256(source HTML) : hash(CSS, JS, page options) )
+
+Re-running a conversion over the same source with the same config is a
+cache hit: the stored PDF is hard-linked into the row folder (copied when
+the cache lives on another filesystem) instead of being rendered again.
+Editing the source or CLEAN_CSS / CLEANUP_JS / PDF options changes the
+key, so only real changes trigger a new render.
+
+Layout: <cache_dir>/<key[:2]>/<key>.pdf
+
+Renders on a miss are written into the cache's staging area, never
+straight into the row folder, and files are only ever put in place with
+os.replace(). A row PDF that is a hard link to a cache entry is therefore
+never truncated and rewritten in place.
+
+Entries are never evicted on their own; a changed render config leaves
+the old renders behind. prune() deletes entries no row folder links to
+any more (link count 1) — with copies instead of hard links (another
+filesystem) that is every entry, so there it also takes an age limit.
+
+Usage:
+  python conversion_cache.py                # Show cache size
+  python conversion_cache.py --prune        # Delete entries no row links to
+  python conversion_cache.py --prune --older-than 30   # ...unused for 30+ days
+  python conversion_cache.py --clear        # Delete all cached PDFs
+"""
+
+import os
+import sys
+import json
+import shutil
+import uuid
+import hashlib
+import argparse
+import time
+import threading
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if not os.path.exists(os.path.join(BASE_DIR, "output")):
+    BASE_DIR = os.path.dirname(BASE_DIR)
+
+CACHE_DIR = os.path.join(BASE_DIR, "conversion_cache")
+
+
+def sha256_file(filepath):
+    h = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def render_config_hash(*parts):
+    """
+    Short hash of everything besides the source that shapes a render
+    (CSS, JS, PDF options, offline flag...). Parts must be JSON-serializable.
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+def _place(src, dest, link):
+    """Put src at dest atomically, as a hard link when possible."""
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    if link:
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copy2(src, tmp)
+    else:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dest)
+
+
+class ConversionCache:
+    """Rendered PDFs keyed by source hash + render config."""
+
+    def __init__(self, cache_dir=CACHE_DIR, link=True):
+        self.cache_dir = cache_dir
+        self.link = link
+        self.stats = {"hits": 0, "misses": 0, "stored": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    @staticmethod
+    def key(html_sha256, render_config):
+        return hashlib.sha256(f"{html_sha256}:{render_config}".encode("utf-8")).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.pdf")
+
+    def staging_path(self, key):
+        """Where a render for `key` should write before store()."""
+        staging = os.path.join(self.cache_dir, "staging")
+        os.makedirs(staging, exist_ok=True)
+        # Unique per call: two rows can share a source, hence a key
+        return os.path.join(staging, f"{key}.{uuid.uuid4().hex[:12]}.pdf")
+
+    def materialize(self, key, dest):
+        """Place the cached PDF for key at dest. Returns False on a miss."""
+        src = self.path_for(key)
+        if not os.path.isfile(src):
+            return False
+        _place(src, dest, self.link)
+        return True
+
+    def store(self, key, rendered_path):
+        """Move a finished render into the cache."""
+        dest = self.path_for(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(rendered_path, dest)
+        self._count("stored")
+        return dest
+
+    def replace(self, key, pdf_path):
+        """Make pdf_path (e.g. an optimized rewrite of the render) the entry for key."""
+        dest = self.path_for(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        _place(pdf_path, dest, self.link)
+
+    def prune(self, older_than_days=None):
+        """
+        Delete cached PDFs that no row folder hard-links (and, with
+        older_than_days, that haven't been modified for that long), plus
+        staging files left by interrupted runs. Returns (files, bytes) freed.
+        """
+        now = time.time()
+        cutoff = now - older_than_days * 86400 if older_than_days is not None else None
+        freed = [0, 0]
+
+        def drop(path, st):
+            os.remove(path)
+            freed[0] += 1
+            freed[1] += st.st_size
+
+        if not os.path.isdir(self.cache_dir):
+            return 0, 0
+        for root, _, files in os.walk(self.cache_dir):
+            staging = os.path.basename(root) == "staging"
+            for fname in files:
+                path = os.path.join(root, fname)
+                st = os.stat(path)
+                if staging:
+                    if now - st.st_mtime > 86400:
+                        drop(path, st)
+                elif fname.endswith(".pdf") and st.st_nlink == 1:
+                    if cutoff is None or st.st_mtime < cutoff:
+                        drop(path, st)
+        return freed[0], freed[1]
+
+    # ── Convert-through-cache helpers ──
+    # `render(out_path)` returns (ok, reason). The returned info dict is
+    # meant for the metadata entry of the converted PDF. begin()/finish()
+    # are the two halves of convert() for callers that render elsewhere
+    # (another thread or process) and place the result themselves.
+
+    def begin(self, html_path, pdf_path, render_config):
+        """Materialize a hit at pdf_path. Returns (key, info); info["cache_hit"] says which."""
+        html_sha = sha256_file(html_path)
+        key = self.key(html_sha, render_config)
+        info = {"html_sha256": html_sha, "render_config": render_config}
+        if self.materialize(key, pdf_path):
+            self._count("hits")
+            return key, {**info, "cache_hit": True}
+        self._count("misses")
+        return key, {**info, "cache_hit": False}
+
+    def finish(self, key, staged, pdf_path, ok):
+        """Store a successful render of `key` from staged and place it at pdf_path."""
+        if ok:
+            self.store(key, staged)
+            self.materialize(key, pdf_path)
+        elif os.path.exists(staged):
+            os.remove(staged)
+
+    def convert(self, html_path, pdf_path, render_config, render):
+        """Materialize a cached render, or render into the cache. Returns (ok, reason, info)."""
+        key, info = self.begin(html_path, pdf_path, render_config)
+        if info["cache_hit"]:
+            return True, "ok", info
+        staged = self.staging_path(key)
+        try:
+            ok, reason = render(staged)
+        except BaseException:
+            self.finish(key, staged, pdf_path, False)
+            raise
+        self.finish(key, staged, pdf_path, ok)
+        return ok, reason, info
+
+    async def convert_async(self, html_path, pdf_path, render_config, render):
+        """Async twin of convert() for coroutine renders."""
+        key, info = self.begin(html_path, pdf_path, render_config)
+        if info["cache_hit"]:
+            return True, "ok", info
+        staged = self.staging_path(key)
+        try:
+            ok, reason = await render(staged)
+        except BaseException:
+            # Includes cancellation by a per-job timeout
+            self.finish(key, staged, pdf_path, False)
+            raise
+        self.finish(key, staged, pdf_path, ok)
+        return ok, reason, info
+
+
+# ── CLI ──────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the conversion cache")
+    parser.add_argument("--dir", default=CACHE_DIR, help="Cache directory")
+    parser.add_argument("--clear", action="store_true", help="Delete all cached PDFs")
+    parser.add_argument("--prune", action="store_true",
+                        help="Delete cached PDFs no row folder links to")
+    parser.add_argument("--older-than", type=float, default=None, metavar="DAYS",
+                        help="With --prune, only entries unmodified for DAYS")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dir):
+        print(f"  No cache at {args.dir}")
+        sys.exit(0)
+
+    if args.clear:
+        shutil.rmtree(args.dir)
+        print(f"  Cleared {args.dir}")
+        sys.exit(0)
+
+    if args.prune:
+        files, freed = ConversionCache(args.dir).prune(args.older_than)
+        print(f"  Pruned {files} files, {freed / (1024 * 1024):.1f} MB")
+
+    count = size = 0
+    for root, _, files in os.walk(args.dir):
+        for fname in files:
+            if fname.endswith(".pdf") and os.path.basename(root) != "staging":
+                count += 1
+                size += os.path.getsize(os.path.join(root, fname))
+    print(f"  {count} cached PDFs, {size / (1024 * 1024):.1f} MB in {args.dir}")
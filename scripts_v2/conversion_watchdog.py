@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+ACF Guidance v2 — Conversion Watchdog and Quarantine
+======================================================
+A renderer that hangs never raises, so one pathological saved page used
+to stall a whole overnight batch. Two pieces keep batches moving:
+
+  Supervisor   N worker processes running a picklable fn(*args). Every
+               job has a wall-clock deadline; a worker that overruns it
+               (or dies) is killed and replaced, and the job is reported
+               failed. Used for the text backends in html_pdf.py.
+               (BrowserPool has its own deadline watchdog for browsers.)
+
+  Quarantine   Inputs, keyed by content hash, that failed QUARANTINE_AFTER
+               runs in a row. Converters skip them until they change or
+               are released; one success clears the record.
+
+    sup = Supervisor(render_fn, size=4, timeout=120)
+    sup.run([(key, args), ...], on_result)   # on_result(key, ok, value, seconds)
+    sup.close()
+
+Quarantine management:
+  python conversion_watchdog.py --list                 # Show quarantined inputs
+  python conversion_watchdog.py --release PATH|SHA256  # Let an input be retried
+  python conversion_watchdog.py --clear                # Release everything
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import multiprocessing
+from multiprocessing.connection import wait
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if not os.path.exists(os.path.join(BASE_DIR, "output")):
+    BASE_DIR = os.path.dirname(BASE_DIR)
+
+QUARANTINE_PATH = os.path.join(BASE_DIR, "conversion_quarantine.json")
+QUARANTINE_AFTER = 3            # consecutive failed runs before an input is skipped
+
+DEFAULT_TIMEOUT = 120           # seconds per job
+
+
+# ── Supervised process pool ──────────────────────────────────────────────
+
+def _worker_loop(fn, conn):
+    while True:
+        try:
+            args = conn.recv()
+        except EOFError:
+            return
+        if args is None:
+            return
+        try:
+            conn.send((True, fn(*args)))
+        except Exception as e:
+            conn.send((False, str(e)[:300]))
+
+
+class _Worker:
+    def __init__(self, fn):
+        self.conn, child = multiprocessing.Pipe()
+        self.proc = multiprocessing.Process(target=_worker_loop, args=(fn, child), daemon=True)
+        self.proc.start()
+        child.close()
+        self.job = None          # (key, started, deadline) while busy
+
+    def kill(self):
+        if self.proc.is_alive():
+            self.proc.kill()
+        self.proc.join(5)
+        self.conn.close()
+
+
+class Supervisor:
+    """Worker processes with per-job deadlines; overrunning workers are replaced."""
+
+    def __init__(self, fn, size, timeout=DEFAULT_TIMEOUT):
+        self.fn = fn
+        self.size = size
+        self.timeout = timeout
+        self.workers = [_Worker(fn) for _ in range(size)]
+        self.stats = {"jobs": 0, "timeouts": 0, "crashes": 0, "restarts": 0}
+
+    def _replace(self, worker):
+        worker.kill()
+        self.stats["restarts"] += 1
+        fresh = _Worker(self.fn)
+        self.workers[self.workers.index(worker)] = fresh
+        return fresh
+
+    def run(self, tasks, on_result):
+        """
+        Run (key, args) tasks. on_result(key, ok, value, seconds) runs on
+        this thread; value is fn's return value, or the failure reason
+        ("timeout (Ns)", "worker crashed ...", or the exception text).
+        """
+        pending = list(reversed(tasks))
+
+        def finish(worker, ok, value):
+            key, started, _ = worker.job
+            worker.job = None
+            self.stats["jobs"] += 1
+            on_result(key, ok, value, time.perf_counter() - started)
+
+        while pending or any(w.job for w in self.workers):
+            for worker in list(self.workers):
+                if worker.job is None and pending:
+                    if not worker.proc.is_alive():      # died while idle
+                        worker = self._replace(worker)
+                    key, args = pending.pop()
+                    now = time.perf_counter()
+                    worker.job = (key, now, now + self.timeout)
+                    worker.conn.send(args)
+
+            busy = [w for w in self.workers if w.job]
+            next_deadline = min(w.job[2] for w in busy)
+            ready = wait([w.conn for w in busy] + [w.proc.sentinel for w in busy],
+                         timeout=max(0.0, next_deadline - time.perf_counter()))
+
+            for worker in busy:
+                if worker.conn in ready:
+                    try:
+                        ok, value = worker.conn.recv()
+                    except (EOFError, OSError):
+                        pass
+                    else:
+                        finish(worker, ok, value)
+                        continue
+                if worker.proc.sentinel in ready or not worker.proc.is_alive():
+                    self.stats["crashes"] += 1
+                    worker.proc.join(1)
+                    code = worker.proc.exitcode
+                    finish(worker, False, f"worker crashed (exit {code})")
+                    self._replace(worker)
+                elif time.perf_counter() >= worker.job[2]:
+                    self.stats["timeouts"] += 1
+                    finish(worker, False, f"timeout ({self.timeout}s)")
+                    self._replace(worker)
+        return dict(self.stats)
+
+    def close(self):
+        for worker in self.workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in self.workers:
+            worker.proc.join(5)
+            worker.kill()
+        self.workers = []
+
+
+# ── Quarantine ───────────────────────────────────────────────────────────
+
+class Quarantine:
+    """Failure counts per input content hash, persisted as JSON."""
+
+    def __init__(self, path=QUARANTINE_PATH, threshold=QUARANTINE_AFTER):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def is_quarantined(self, sha256):
+        entry = self.entries.get(sha256)
+        return bool(entry and entry["failures"] >= self.threshold)
+
+    def record(self, sha256, input_path, ok, reason=None):
+        """Count a failed run of an input, or clear it after a success."""
+        with self._lock:
+            if ok:
+                if self.entries.pop(sha256, None) is not None:
+                    self._save()
+                return
+            entry = self.entries.setdefault(sha256, {"failures": 0})
+            entry.update(path=input_path, failures=entry["failures"] + 1,
+                         last_reason=reason,
+                         last_failed_at=datetime.now(timezone.utc).isoformat())
+            self._save()
+
+    def release(self, what):
+        """Drop entries matching a hash or input path. Returns how many."""
+        with self._lock:
+            drop = [k for k, e in self.entries.items()
+                    if k == what or os.path.abspath(e.get("path", "")) == os.path.abspath(what)]
+            for k in drop:
+                del self.entries[k]
+            self._save()
+        return len(drop)
+
+    def quarantined(self):
+        return {k: e for k, e in self.entries.items() if e["failures"] >= self.threshold}
+
+    def _save(self):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+# ── CLI ──────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or edit the conversion quarantine")
+    parser.add_argument("--file", default=QUARANTINE_PATH, help="Quarantine file")
+    parser.add_argument("--list", action="store_true", help="Show quarantined inputs")
+    parser.add_argument("--release", metavar="PATH_OR_SHA256", help="Let an input be retried")
+    parser.add_argument("--clear", action="store_true", help="Release everything")
+    args = parser.parse_args()
+
+    q = Quarantine(args.file)
+    if args.clear:
+        q.entries = {}
+        q._save()
+        print(f"  Cleared {args.file}")
+        sys.exit(0)
+    if args.release:
+        print(f"  Released {q.release(args.release)} input(s)")
+        sys.exit(0)
+
+    held = q.quarantined()
+    print(f"  {len(held)} quarantined, {len(q.entries) - len(held)} with recent failures "
+          f"({args.file})")
+    for sha, e in sorted(held.items(), key=lambda kv: kv[1].get("path", "")):
+        print(f"    {e.get('path')}  ×{e['failures']}  {e.get('last_reason')}")
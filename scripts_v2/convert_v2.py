@@ -6,11 +6,19 @@ Converts validated HTML pages to clean PDFs using Playwright.
 
 Key improvement over v1: Renders only the visible content area,
 stripping navigation chrome, headers, footers, and site-wide elements.
+Plain pages (no tables, images or deep lists to lay out) are rendered
+as text PDFs instead; see complexity.py.
 
 Usage:
   python convert_v2.py                    # Convert all HTML in output_v2
   python convert_v2.py --dry-run          # Preview only
   python convert_v2.py --row 0412         # Convert specific row
+  python convert_v2.py --workers 8        # 8 pooled browsers (or fallback processes)
+  python convert_v2.py --allow-network    # Let renders fetch remote assets
+  python convert_v2.py --no-cache         # Render even if a cached PDF matches
+  python convert_v2.py --job-timeout 60   # Kill renders running over 60s
+  python convert_v2.py --retry-quarantined  # Retry inputs that kept failing
+  python convert_v2.py --no-route         # Playwright for every page, even plain ones
 
 Requires: playwright install chromium
 """
@@ -19,13 +27,19 @@ import os
 import sys
 import json
 import re
-import hashlib
 import argparse
 import logging
 from datetime import datetime
 from pathlib import Path
 
 from validate import validate_content, detect_file_type
+from browser_pool import DEFAULT_POOL_SIZE
+from conversion_cache import ConversionCache, sha256_file
+from text_pdf import metadata_header
+from html_pdf import Converter, get_backend, base_url_for
+from async_convert import DEFAULT_JOB_TIMEOUT
+from conversion_watchdog import Quarantine
+from complexity import DEFAULT_THRESHOLD
 
 # ── Configuration ────────────────────────────────────────────────────────
 
@@ -40,241 +54,32 @@ if not os.path.exists(os.path.join(BASE_DIR, "output_v2")):
 
 LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
 
-# CSS to inject for clean rendering
-CLEAN_CSS = """
-<style>
-  /* Hide site chrome */
-  nav, header, footer, .breadcrumb, .breadcrumbs, .site-header,
-  .site-footer, .skip-link, .skip-nav, .navbar, .menu, .sidebar,
-  .social-share, .cookie-notice, .banner, .alert-banner,
-  #skip-to-content, [role="navigation"], [role="banner"],
-  [role="contentinfo"], .usa-banner, .usa-header, .usa-footer,
-  .usa-nav, .usa-menu, .usa-accordion {
-    display: none !important;
-  }
-
-  /* Clean up the main content area */
-  body {
-    font-family: 'Times New Roman', serif;
-    font-size: 12pt;
-    line-height: 1.6;
-    color: #000;
-    background: #fff;
-    margin: 0.75in;
-    max-width: 100%;
-  }
-
-  main, article, .content, .main-content, #main-content,
-  [role="main"] {
-    max-width: 100%;
-    margin: 0;
-    padding: 0;
-  }
-
-  /* Ensure tables render properly */
-  table {
-    border-collapse: collapse;
-    width: 100%;
-    margin: 1em 0;
-  }
-  td, th {
-    border: 1px solid #999;
-    padding: 6px 8px;
-  }
-
-  /* Clean links */
-  a { color: #000; text-decoration: underline; }
-
-  /* Print-friendly */
-  @media print {
-    body { margin: 0; }
-  }
-</style>
-"""
-
-# JavaScript to clean up the page before PDF generation
-CLEANUP_JS = """
-() => {
-    // Remove nav, header, footer, banners
-    const removeSelectors = [
-        'nav', 'header', 'footer', '.breadcrumb', '.breadcrumbs',
-        '.site-header', '.site-footer', '.skip-link', '.skip-nav',
-        '.navbar', '.menu', '.sidebar', '.social-share', '.cookie-notice',
-        '.banner', '.alert-banner', '#skip-to-content',
-        '[role="navigation"]', '[role="banner"]', '[role="contentinfo"]',
-        '.usa-banner', '.usa-header', '.usa-footer', '.usa-nav',
-        '.usa-menu', '.usa-accordion', 'script', 'noscript',
-        'iframe', '.overlay', '.modal'
-    ];
-
-    removeSelectors.forEach(sel => {
-        document.querySelectorAll(sel).forEach(el => el.remove());
-    });
-
-    // Remove hidden elements
-    document.querySelectorAll('[style*="display: none"], [style*="display:none"], [hidden]')
-        .forEach(el => el.remove());
-
-    // Clean up the body
-    document.body.style.margin = '0';
-    document.body.style.padding = '20px';
-
-    // Return the visible text length for validation
-    return document.body.innerText.trim().length;
-}
-"""
-
-
-def sha256_file(filepath):
-    h = hashlib.sha256()
-    with open(filepath, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            h.update(chunk)
-    return h.hexdigest()
-
-
-def convert_html_to_pdf_playwright(html_path, pdf_path, logger):
-    """
-    Convert an HTML file to a clean PDF using Playwright.
-    Injects CSS and JS to strip navigation chrome before rendering.
-    """
-    from playwright.sync_api import sync_playwright
-
-    # Read the HTML
-    with open(html_path, "r", encoding="utf-8", errors="ignore") as f:
-        html_content = f.read()
-
-    # Inject our clean CSS before </head> or at the start
-    if "</head>" in html_content.lower():
-        html_content = re.sub(
-            r"(</head>)", CLEAN_CSS + r"\1",
-            html_content, count=1, flags=re.IGNORECASE
-        )
-    else:
-        html_content = CLEAN_CSS + html_content
-
-    # Write modified HTML to temp file
-    temp_html = html_path + ".clean.html"
-    with open(temp_html, "w", encoding="utf-8") as f:
-        f.write(html_content)
-
-    try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-
-            # Load the cleaned HTML
-            page.goto(f"file:///{os.path.abspath(temp_html).replace(os.sep, '/')}")
-            page.wait_for_load_state("networkidle")
-
-            # Run cleanup JS
-            visible_chars = page.evaluate(CLEANUP_JS)
-
-            if visible_chars < 200:
-                logger.debug(f"  Only {visible_chars} visible chars after cleanup")
-                browser.close()
-                return False, f"insufficient_content_after_cleanup ({visible_chars} chars)"
-
-            # Generate PDF
-            page.pdf(
-                path=pdf_path,
-                format="Letter",
-                margin={"top": "0.75in", "bottom": "0.75in",
-                        "left": "0.75in", "right": "0.75in"},
-                print_background=False,
-            )
-
-            browser.close()
-
-        # Validate the output PDF
-        if os.path.exists(pdf_path) and os.path.getsize(pdf_path) > 1000:
-            return True, "ok"
-        else:
-            return False, "pdf_too_small"
-
-    except Exception as e:
-        logger.error(f"  Playwright error: {e}")
-        return False, str(e)
-    finally:
-        # Cleanup temp file
-        if os.path.exists(temp_html):
-            os.remove(temp_html)
-
 
-def convert_html_to_pdf_simple(html_path, pdf_path, metadata, logger):
+def stale_conversion(metadata, html_file, html_path, job, backend):
     """
-    Fallback: Convert HTML to a simple text-based PDF using reportlab.
-    Used when Playwright is not available.
+    Filename of the PDF converted from html_file by the renderer the
+    backend would route it to now, when its recorded html_sha256 or
+    render_config no longer matches; None otherwise.
     """
-    try:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-        from reportlab.lib.units import inch
-    except ImportError:
-        logger.warning("  Neither Playwright nor reportlab available for conversion")
-        return False, "no_converter_available"
-
-    from validate import extract_visible_text
-
-    with open(html_path, "r", encoding="utf-8", errors="ignore") as f:
-        html_content = f.read()
-
-    text = extract_visible_text(html_content)
-    if len(text) < 200:
-        return False, "insufficient_content"
-
-    try:
-        doc = SimpleDocTemplate(pdf_path, pagesize=letter,
-                                leftMargin=0.75*inch, rightMargin=0.75*inch,
-                                topMargin=0.75*inch, bottomMargin=0.75*inch)
-
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'DocTitle', parent=styles['Heading1'],
-            fontSize=14, spaceAfter=12
-        )
-        body_style = ParagraphStyle(
-            'DocBody', parent=styles['Normal'],
-            fontSize=11, leading=14, spaceAfter=8
-        )
-
-        story = []
-
-        # Add title from metadata
-        doc_num = metadata.get("doc_number", "")
-        title = metadata.get("title", "")
-        if doc_num or title:
-            header = f"{doc_num} — {title}" if doc_num and title else (doc_num or title)
-            story.append(Paragraph(header, title_style))
-            story.append(Spacer(1, 12))
-
-        # Split text into paragraphs
-        paragraphs = [p.strip() for p in text.split('\n') if p.strip()]
-        for para in paragraphs:
-            # Escape XML special chars for reportlab
-            para = para.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-            try:
-                story.append(Paragraph(para, body_style))
-            except Exception:
-                # If paragraph causes issues, add as plain text
-                story.append(Paragraph(para[:500], body_style))
-
-        doc.build(story)
-        return True, "ok"
-
-    except Exception as e:
-        return False, str(e)
-
-
-def process_row(row_dir, dry_run=False, use_playwright=True, logger=None):
+    renderer, _ = backend.route(job)
+    render_config = renderer.render_config(job)
+    for entry in metadata.get("files_downloaded", []):
+        if (entry.get("converted_from") == html_file and entry.get("render_config")
+                and entry.get("conversion_method") == renderer.name
+                and (entry["render_config"] != render_config
+                     or entry.get("html_sha256") != sha256_file(html_path))):
+            return entry.get("filename")
+    return None
+
+
+def plan_row(row_dir, logger, backend=None):
     """
-    Process a single row directory: find HTML files that need conversion,
-    convert them to PDF.
+    Find the HTML files of one row directory that need conversion.
+    Returns a row plan {row, row_dir, meta_path, metadata, jobs, invalid},
+    or None when there is nothing to do. With a backend, a PDF already
+    converted from an HTML file whose source or render config changed
+    is planned again under its own filename.
     """
-    if logger is None:
-        logger = logging.getLogger("acf_v2.convert")
-
     meta_path = os.path.join(row_dir, "metadata.json")
     if not os.path.exists(meta_path):
         return None
@@ -293,17 +98,33 @@ def process_row(row_dir, dry_run=False, use_playwright=True, logger=None):
 
     has_pdf = any(f.endswith(".pdf") for f in os.listdir(row_dir) if f != "metadata.json")
 
-    if not needs_conversion and (not html_files or has_pdf):
-        return None  # Nothing to do
-
     row_id = os.path.basename(row_dir)
+    header = metadata_header(metadata)
+
+    # Re-render PDFs whose HTML or render config changed since conversion
+    stale = {}
+    if backend is not None and has_pdf and not needs_conversion:
+        for html_file in html_files:
+            html_path = os.path.join(row_dir, html_file)
+            job = {"html_path": html_path, "header": header,
+                   "base_url": base_url_for(metadata, html_file)}
+            pdf_name = stale_conversion(metadata, html_file, html_path, job, backend)
+            if pdf_name:
+                stale[html_file] = pdf_name
+        html_files = [f for f in html_files if f in stale]
+
+    if not needs_conversion and not stale and (not html_files or has_pdf):
+        return None  # Nothing to do
 
-    if dry_run:
-        logger.info(f"  [DRY] {row_id}: Would convert {len(html_files)} HTML file(s)")
-        return {"row": row_id, "action": "would_convert", "files": len(html_files)}
+    plan = {"row": row_id, "row_dir": row_dir, "meta_path": meta_path,
+            "metadata": metadata, "jobs": [], "invalid": 0, "html_files": html_files}
 
-    converted = 0
-    failed = 0
+    # Generate PDF filename
+    doc_num = metadata.get("doc_number", "").strip()
+    if doc_num:
+        base = re.sub(r'[^a-zA-Z0-9_-]', '_', doc_num)
+    else:
+        base = f"guidance_{row_id}"
 
     for html_file in html_files:
         html_path = os.path.join(row_dir, html_file)
@@ -312,56 +133,59 @@ def process_row(row_dir, dry_run=False, use_playwright=True, logger=None):
         vr = validate_content(html_path)
         if not vr.valid:
             logger.debug(f"  {row_id}: Skipping {html_file} — validation: {vr.reason}")
-            failed += 1
+            plan["invalid"] += 1
             continue
 
-        # Generate PDF filename
-        doc_num = metadata.get("doc_number", "").strip()
-        if doc_num:
-            safe_name = re.sub(r'[^a-zA-Z0-9_-]', '_', doc_num)
-            pdf_name = f"{safe_name}.pdf"
-        else:
-            pdf_name = f"guidance_{row_id}.pdf"
-
-        pdf_path = os.path.join(row_dir, pdf_name)
-
-        # Convert
-        if use_playwright:
-            success, reason = convert_html_to_pdf_playwright(html_path, pdf_path, logger)
-        else:
-            success, reason = convert_html_to_pdf_simple(html_path, pdf_path, metadata, logger)
-
-        if success:
-            logger.info(f"  {row_id}: Converted → {pdf_name}")
-            converted += 1
-
-            # Update metadata
-            metadata["files_downloaded"].append({
-                "filename": pdf_name,
-                "converted_from": html_file,
-                "size_bytes": os.path.getsize(pdf_path),
-                "sha256": sha256_file(pdf_path),
-                "content_type": "application/pdf",
-                "conversion_method": "playwright" if use_playwright else "reportlab",
-            })
-
-            # Remove needs_conversion flag from original
-            for f in metadata["files_downloaded"]:
-                if f.get("filename") == html_file:
-                    f["needs_conversion"] = False
-                    f["converted"] = True
-
-            metadata["status"] = "success"
-        else:
-            logger.warning(f"  {row_id}: Conversion failed — {reason}")
-            failed += 1
-
-    # Save updated metadata
-    with open(meta_path, "w", encoding="utf-8") as f:
+        # A second HTML file in the row gets its own PDF, not the first one's
+        n = len(plan["jobs"])
+        pdf_name = stale.get(html_file) or (f"{base}.pdf" if n == 0 else f"{base}_{n + 1}.pdf")
+        plan["jobs"].append({"html_path": html_path, "pdf_path": os.path.join(row_dir, pdf_name),
+                             "header": header, "size": os.path.getsize(html_path),
+                             "base_url": base_url_for(metadata, html_file),
+                             "row_plan": plan, "html_file": html_file})
+    return plan
+
+
+def record_conversion(job, ok, reason, info, logger):
+    """Update the row's metadata.json for one finished job."""
+    plan = job["row_plan"]
+    metadata = plan["metadata"]
+    row_id, html_file = plan["row"], job["html_file"]
+    pdf_name = os.path.basename(job["pdf_path"])
+
+    if not ok:
+        logger.warning(f"  {row_id}: Conversion failed — {reason}")
+        plan["failed"] += 1
+        return
+
+    logger.info(f"  {row_id}: Converted → {pdf_name}"
+                + (" (cached)" if info.get("cache_hit") else ""))
+    plan["converted"] += 1
+
+    # A re-render replaces the entry of the PDF it overwrote
+    files = metadata.setdefault("files_downloaded", [])
+    files[:] = [f for f in files if f.get("filename") != pdf_name]
+    files.append({
+        "filename": pdf_name,
+        "converted_from": html_file,
+        "size_bytes": os.path.getsize(job["pdf_path"]),
+        "sha256": sha256_file(job["pdf_path"]),
+        "content_type": "application/pdf",
+        "conversion_method": job["method"],
+        **info,
+    })
+
+    # Remove needs_conversion flag from original
+    for f in metadata["files_downloaded"]:
+        if f.get("filename") == html_file:
+            f["needs_conversion"] = False
+            f["converted"] = True
+
+    metadata["status"] = "success"
+
+    with open(plan["meta_path"], "w", encoding="utf-8") as f:
         json.dump(metadata, f, indent=2, ensure_ascii=False, default=str)
 
-    return {"row": row_id, "converted": converted, "failed": failed}
-
 
 def main():
     parser = argparse.ArgumentParser(description="Convert HTML pages to clean PDFs")
@@ -370,6 +194,21 @@ def main():
     parser.add_argument("--dry-run", action="store_true", help="Preview only")
     parser.add_argument("--no-playwright", action="store_true",
                         help="Use reportlab fallback instead of Playwright")
+    parser.add_argument("--workers", type=int, default=DEFAULT_POOL_SIZE,
+                        help="Browsers in the Playwright pool (processes with the text fallback)")
+    parser.add_argument("--allow-network", action="store_true",
+                        help="Let pages fetch remote CSS/fonts/images while rendering "
+                             "(default: offline, cached assets only)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always render, bypassing the conversion cache")
+    parser.add_argument("--job-timeout", type=float, default=DEFAULT_JOB_TIMEOUT,
+                        help="Seconds per file before its render is killed")
+    parser.add_argument("--retry-quarantined", action="store_true",
+                        help="Also convert inputs quarantined after repeated failures")
+    parser.add_argument("--no-route", action="store_true",
+                        help="Render every page in Playwright, however plain")
+    parser.add_argument("--route-threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Complexity score from which a page goes to Playwright")
     parser.add_argument("--verbose", "-v", action="store_true")
     args = parser.parse_args()
 
@@ -380,13 +219,6 @@ def main():
     output_dir = args.output or OUTPUT_DIR
     use_playwright = not args.no_playwright
 
-    if use_playwright:
-        try:
-            from playwright.sync_api import sync_playwright
-        except ImportError:
-            logger.warning("Playwright not installed — falling back to reportlab")
-            use_playwright = False
-
     stats = {"converted": 0, "failed": 0, "skipped": 0}
     results = []
 
@@ -398,30 +230,63 @@ def main():
         if not os.path.isdir(row_dir):
             logger.error(f"Row directory not found: {row_dir}")
             sys.exit(1)
-        result = process_row(row_dir, args.dry_run, use_playwright, logger)
-        if result:
-            results.append(result)
+        row_dirs = [row_dir]
     else:
-        # All rows
-        folders = sorted(f for f in os.listdir(output_dir)
-                         if os.path.isdir(os.path.join(output_dir, f)) and f.isdigit())
-        total = len(folders)
-
-        for i, folder in enumerate(folders):
-            row_dir = os.path.join(output_dir, folder)
-            result = process_row(row_dir, args.dry_run, use_playwright, logger)
-            if result:
-                results.append(result)
-                if not args.dry_run:
-                    c = result.get("converted", 0)
-                    f = result.get("failed", 0)
-                    stats["converted"] += c
-                    stats["failed"] += f
-            else:
-                stats["skipped"] += 1
-
-            if (i + 1) % 100 == 0:
-                logger.info(f"  Progress: {i+1}/{total} rows processed")
+        row_dirs = [os.path.join(output_dir, f) for f in sorted(os.listdir(output_dir))
+                    if os.path.isdir(os.path.join(output_dir, f)) and f.isdigit()]
+
+    # The backend is chosen before planning: its render config decides
+    # which earlier renders are stale
+    if use_playwright:
+        backend = get_backend("playwright" if args.no_route else "auto",
+                              not args.allow_network, job_timeout=args.job_timeout,
+                              threshold=args.route_threshold)
+    else:
+        backend = get_backend("reportlab", job_timeout=args.job_timeout)
+
+    plans = []
+    for i, row_dir in enumerate(row_dirs):
+        plan = plan_row(row_dir, logger, backend)
+        if plan is None:
+            stats["skipped"] += 1
+        elif args.dry_run:
+            logger.info(f"  [DRY] {plan['row']}: Would convert "
+                        f"{len(plan['html_files'])} HTML file(s)")
+            results.append({"row": plan["row"], "action": "would_convert",
+                            "files": len(plan["html_files"])})
+        else:
+            plan["converted"], plan["failed"] = 0, plan["invalid"]
+            plans.append(plan)
+        if (i + 1) % 100 == 0:
+            logger.info(f"  Progress: {i+1}/{len(row_dirs)} rows scanned")
+
+    jobs = [job for plan in plans for job in plan["jobs"]]
+    if jobs:
+        cache = None if args.no_cache else ConversionCache()
+        quarantine = Quarantine()
+        converter = None
+        if use_playwright:
+            try:
+                converter = Converter(backend, args.workers, cache, quarantine,
+                                      not args.retry_quarantined)
+            except RuntimeError as e:
+                logger.warning(f"Playwright not available ({e}) — falling back to reportlab")
+        if converter is None:
+            converter = Converter(get_backend("reportlab", job_timeout=args.job_timeout),
+                                  args.workers, cache, quarantine, not args.retry_quarantined)
+
+        with converter:
+            stats["engine"] = converter.run(
+                jobs, lambda job, ok, reason, info: record_conversion(
+                    job, ok, reason, info, logger))
+        if cache is not None:
+            stats["cache"] = dict(cache.stats)
+
+    for plan in plans:
+        stats["converted"] += plan["converted"]
+        stats["failed"] += plan["failed"]
+        results.append({"row": plan["row"], "converted": plan["converted"],
+                        "failed": plan["failed"]})
 
     elapsed = datetime.now() - start_time
 
@@ -434,6 +299,12 @@ def main():
         print(f"  Converted:     {stats['converted']} files")
         print(f"  Failed:        {stats['failed']} files")
         print(f"  Skipped:       {stats['skipped']} rows (no HTML to convert)")
+        if "cache" in stats:
+            print(f"  Cache hits:    {stats['cache']['hits']} files")
+        for method, count in sorted(stats.get("engine", {}).get("by_method", {}).items()):
+            print(f"  {method + ':':<15}{count} files")
+        if stats.get("engine", {}).get("quarantined"):
+            print(f"  Quarantined:   {stats['engine']['quarantined']} files (skipped)")
     print(f"  Elapsed:       {elapsed}")
 
     # Save report
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+ACF Guidance Harvester v2 — Boilerplate Template Finder
+=========================================================
+Fingerprints the visible text of every HTML/text file in the collection
+with SimHash and clusters near-identical pages. A cluster that spans many
+rows with different titles is almost certainly a junk template (portal
+"resource not found" shells, agency landing pages) rather than a real
+document, since unrelated guidance documents don't share a page body.
+
+Probable templates can be written out as learned fingerprints that
+validate.load_junk_fingerprints() feeds back into validation.
+
+Usage:
+  python find_templates.py                          # Scan output/
+  python find_templates.py --dir output_v2          # Specify directory
+  python find_templates.py --min-rows 10            # Stricter cluster size
+  python find_templates.py --write-fingerprints     # Save learned fingerprints
+"""
+
+import os
+import sys
+import json
+import argparse
+import logging
+from datetime import datetime
+from collections import defaultdict
+
+from validate import detect_file_type, extract_visible_text, read_bounded
+from simhash_index import simhash, SimHashIndex, DEFAULT_MAX_DISTANCE
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if not os.path.exists(os.path.join(BASE_DIR, "output")):
+    BASE_DIR = os.path.dirname(BASE_DIR)
+
+OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+REPORTS_DIR = os.path.join(BASE_DIR, "reports")
+FINGERPRINTS_PATH = os.path.join(REPORTS_DIR, "learned_junk_fingerprints.json")
+
+MIN_FINGERPRINT_CHARS = 50     # pages with less text are empty shells anyway
+MAX_FINGERPRINTS_PER_TEMPLATE = 25
+
+
+def fingerprint_collection(scan_dir):
+    """
+    Compute a SimHash for every HTML/text file in every row folder.
+    Returns list of page dicts.
+    """
+    logger = logging.getLogger("acf_v2.templates")
+
+    folders = sorted(f for f in os.listdir(scan_dir)
+                     if os.path.isdir(os.path.join(scan_dir, f)) and f.isdigit())
+    pages = []
+
+    for i, folder in enumerate(folders):
+        row_dir = os.path.join(scan_dir, folder)
+        meta = {}
+        meta_path = os.path.join(row_dir, "metadata.json")
+        if os.path.exists(meta_path):
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except Exception:
+                pass
+
+        for fname in os.listdir(row_dir):
+            fpath = os.path.join(row_dir, fname)
+            if fname == "metadata.json" or not os.path.isfile(fpath):
+                continue
+            if detect_file_type(fpath) not in ("html", "text"):
+                continue
+
+            try:
+                # Templates are small pages; the head window is plenty
+                head, _, _ = read_bounded(fpath)
+            except OSError:
+                continue
+            visible = extract_visible_text(head)
+            if len(visible) < MIN_FINGERPRINT_CHARS:
+                continue
+
+            pages.append({
+                "row": folder,
+                "file": fname,
+                "office": meta.get("office", "unknown"),
+                "title": (meta.get("title") or "").strip(),
+                "simhash": simhash(visible),
+                "visible_chars": len(visible),
+                "sample": visible[:200],
+            })
+
+        if (i + 1) % 500 == 0:
+            logger.info(f"  Fingerprinted {i+1}/{len(folders)} rows...")
+
+    return pages
+
+
+def cluster_pages(pages, max_distance=DEFAULT_MAX_DISTANCE):
+    """
+    Group pages whose fingerprints are within max_distance bits, using the
+    banded index for candidate lookup and union-find for transitive merges.
+    Returns list of clusters (lists of page indices), largest first.
+    """
+    parent = list(range(len(pages)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    index = SimHashIndex(max_distance)
+    for i, page in enumerate(pages):
+        hits = index.near(page["simhash"])
+        for _, _, j in hits:
+            parent[find(i)] = find(j)
+        # Exact duplicates add nothing to lookups — keep buckets small
+        if not hits or hits[0][0] > 0:
+            index.add(page["simhash"], i)
+
+    groups = defaultdict(list)
+    for i in range(len(pages)):
+        groups[find(i)].append(i)
+    return sorted(groups.values(), key=len, reverse=True)
+
+
+def summarize_clusters(pages, clusters, min_rows):
+    """
+    Describe clusters spanning at least min_rows rows. A cluster is a
+    probable junk template when its rows also carry at least min_rows
+    distinct titles, i.e. unrelated documents share one page body.
+    """
+    summaries = []
+    for members in clusters:
+        rows = sorted({pages[i]["row"] for i in members})
+        if len(rows) < min_rows:
+            continue
+        titles = {pages[i]["title"].lower() for i in members if pages[i]["title"]}
+        offices = defaultdict(int)
+        for i in members:
+            offices[pages[i]["office"]] += 1
+
+        summaries.append({
+            "template_id": f"tpl_{len(summaries):03d}",
+            "probable_template": len(titles) >= min_rows,
+            "rows": len(rows),
+            "files": len(members),
+            "distinct_titles": len(titles),
+            "offices": dict(offices),
+            "sample": pages[members[0]]["sample"],
+            "simhashes": sorted({f"{pages[i]['simhash']:016x}" for i in members}),
+            "members": [{"row": pages[i]["row"], "file": pages[i]["file"]}
+                        for i in members[:50]],
+        })
+    return summaries
+
+
+def write_fingerprints(summaries, path, max_distance):
+    """Save probable templates as learned fingerprints for validate.py."""
+    fingerprints = []
+    for s in summaries:
+        if not s["probable_template"]:
+            continue
+        for h in s["simhashes"][:MAX_FINGERPRINTS_PER_TEMPLATE]:
+            fingerprints.append({"template_id": s["template_id"], "simhash": h,
+                                 "rows": s["rows"], "sample": s["sample"][:100]})
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"created_at": datetime.now().isoformat(),
+                   "max_distance": max_distance,
+                   "fingerprints": fingerprints}, f, indent=2)
+    return len(fingerprints)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find boilerplate page templates")
+    parser.add_argument("--dir", type=str, default=None, help="Directory to scan")
+    parser.add_argument("--min-rows", type=int, default=5,
+                        help="Minimum rows a cluster must span to be reported")
+    parser.add_argument("--max-distance", type=int, default=DEFAULT_MAX_DISTANCE,
+                        help="Max Hamming distance between near-identical pages")
+    parser.add_argument("--write-fingerprints", nargs="?", const=FINGERPRINTS_PATH,
+                        default=None, metavar="PATH",
+                        help="Save probable templates as learned junk fingerprints")
+    parser.add_argument("--verbose", "-v", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s", datefmt="%H:%M:%S"
+    )
+    logger = logging.getLogger("acf_v2.templates")
+
+    scan_dir = args.dir or OUTPUT_DIR
+    if not os.path.isdir(scan_dir):
+        logger.error(f"Directory not found: {scan_dir}")
+        sys.exit(1)
+
+    logger.info(f"Fingerprinting pages in: {scan_dir}")
+    start = datetime.now()
+
+    pages = fingerprint_collection(scan_dir)
+    clusters = cluster_pages(pages, args.max_distance)
+    summaries = summarize_clusters(pages, clusters, args.min_rows)
+
+    elapsed = datetime.now() - start
+
+    print("\n" + "=" * 70)
+    print("BOILERPLATE TEMPLATE REPORT")
+    print("=" * 70)
+    print(f"\n  Pages fingerprinted:       {len(pages)}")
+    print(f"  Clusters (>= {args.min_rows} rows):     {len(summaries)}")
+    print(f"  Probable junk templates:   {sum(s['probable_template'] for s in summaries)}")
+
+    for s in summaries[:20]:
+        flag = "JUNK?" if s["probable_template"] else "     "
+        print(f"\n  {flag} {s['template_id']}  {s['rows']} rows, "
+              f"{s['distinct_titles']} titles, offices: "
+              + ", ".join(f"{o}={n}" for o, n in sorted(s["offices"].items())))
+        print(f"        {s['sample'][:100]}")
+
+    print(f"\n  Elapsed: {elapsed}")
+
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    report_path = os.path.join(REPORTS_DIR,
+                               f"templates_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(report_path, "w") as f:
+        json.dump({"pages": len(pages), "max_distance": args.max_distance,
+                   "min_rows": args.min_rows, "clusters": summaries,
+                   "elapsed_seconds": elapsed.total_seconds(), "scan_dir": scan_dir},
+                  f, indent=2, default=str)
+    print(f"  Full report saved: {report_path}")
+
+    if args.write_fingerprints:
+        n = write_fingerprints(summaries, args.write_fingerprints, args.max_distance)
+        print(f"  Learned fingerprints ({n}): {args.write_fingerprints}")
+
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,8 @@ Full reharvest with upgraded recovery methods.
 
 Key improvements over v1:
   1. Content validation gate — every download is checked for real content
-  2. Source priority chain — Portal → Direct URL → Wayback (validated)
+  2. Source priority chain — Portal → Direct URL → Wayback (validated,
+     best-ranked capture first; see wayback_rank.py)
   3. HTML quality detection — catches DOJ blocks, Wayback junk, empty shells
   4. Smart PDF detection — catches HTML files masquerading as PDFs
   5. Clean Playwright rendering — captures visible content area only
@@ -17,6 +18,8 @@ Usage:
   python harvest_v2.py --resume                  # Skip completed rows
   python harvest_v2.py --dry-run                 # Preview only
   python harvest_v2.py --validate-only           # Re-validate existing output_v2
+  python harvest_v2.py --warc-record ../warc   # Keep every HTTP exchange in WARC files
+  python harvest_v2.py --warc-replay ../warc   # Re-run offline from them
 
 Requirements:
   pip install openpyxl requests beautifulsoup4 playwright
@@ -27,8 +30,6 @@ import os
 import sys
 import json
 import re
-import time
-import hashlib
 import argparse
 import logging
 from datetime import datetime, timezone
@@ -42,6 +43,9 @@ import openpyxl
 
 # Import our validation module
 from validate import validate_content, detect_file_type, ValidationResult
+from wayback_rank import ranked_wayback_urls, capture_info
+from conversion_cache import sha256_file
+import warc_session
 
 # ── Configuration ────────────────────────────────────────────────────────
 
@@ -104,15 +108,7 @@ def setup_session():
     session.mount("http://", adapter)
     session.mount("https://", adapter)
     session.headers.update(HEADERS)
-    return session
-
-
-def sha256_file(filepath):
-    h = hashlib.sha256()
-    with open(filepath, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            h.update(chunk)
-    return h.hexdigest()
+    return warc_session.attach(session)
 
 
 def safe_filename(name, max_len=100):
@@ -334,7 +330,7 @@ def try_direct_urls(row_data, session, row_dir):
         all_files.extend(files)
         if files:
             break  # Got something, stop trying
-        time.sleep(REQUEST_DELAY)
+        warc_session.pause(REQUEST_DELAY)
 
     return all_files
 
@@ -353,94 +349,98 @@ def try_wayback_source(row_data, session, row_dir):
         return []
 
     for url in urls[:3]:  # Only try first 3 URLs to limit Wayback load
-        wb_url = f"https://web.archive.org/web/2/{url}"
-        logger.debug(f"  [WAYBACK] Trying: {wb_url}")
+        # Best-ranked captures first, fetched raw (no toolbar)
+        for attempt, (wb_url, capture) in enumerate(
+                ranked_wayback_urls(url, session, row_data.get("date")), start=1):
+            logger.debug(f"  [WAYBACK] Trying: {wb_url}")
 
-        try:
-            time.sleep(WAYBACK_DELAY)
-            resp = session.get(wb_url, timeout=30, allow_redirects=True)
-
-            # Check if Wayback actually has it
-            if resp.status_code != 200:
-                continue
-
-            final_url = resp.url
-
-            # Reject if it redirected to a DOJ or error page
-            parsed = urlparse(final_url)
-            if "justice.gov" in parsed.netloc.lower():
-                logger.debug(f"  [WAYBACK] Rejected — redirected to DOJ: {final_url}")
-                continue
+            try:
+                warc_session.pause(WAYBACK_DELAY)
+                resp = session.get(wb_url, timeout=30, allow_redirects=True)
 
-            content_type = resp.headers.get("Content-Type", "").lower()
+                # Check if Wayback actually has it
+                if resp.status_code != 200:
+                    continue
 
-            # If it's a direct file download from Wayback
-            if any(ct in content_type for ct in ["pdf", "msword", "officedocument", "octet-stream"]):
-                fname = guess_filename(resp, url)
-                fpath = os.path.join(row_dir, fname)
-                with open(fpath, "wb") as f:
-                    f.write(resp.content)
+                final_url = resp.url
 
-                # Validate
-                vr = validate_content(fpath)
-                if vr.valid:
-                    return [{
-                        "filename": fname,
-                        "source_url": url,
-                        "wayback_url": wb_url,
-                        "size_bytes": os.path.getsize(fpath),
-                        "sha256": sha256_file(fpath),
-                        "content_type": content_type,
-                        "source": "wayback",
-                        "validation": vr.to_dict(),
-                    }]
-                else:
-                    logger.debug(f"  [WAYBACK] File failed validation: {vr.reason}")
-                    os.remove(fpath)
+                # Reject if it redirected to a DOJ or error page
+                parsed = urlparse(final_url)
+                if "justice.gov" in parsed.netloc.lower():
+                    logger.debug(f"  [WAYBACK] Rejected — redirected to DOJ: {final_url}")
                     continue
 
-            # It's HTML — need to check content quality before accepting
-            if "html" in content_type or "text" in content_type:
-                html_content = resp.text
+                content_type = resp.headers.get("Content-Type", "").lower()
+
+                # If it's a direct file download from Wayback
+                if any(ct in content_type for ct in ["pdf", "msword", "officedocument", "octet-stream"]):
+                    fname = guess_filename(resp, url)
+                    fpath = os.path.join(row_dir, fname)
+                    with open(fpath, "wb") as f:
+                        f.write(resp.content)
+
+                    # Validate
+                    vr = validate_content(fpath)
+                    if vr.valid:
+                        return [{
+                            "filename": fname,
+                            "source_url": url,
+                            "wayback_url": wb_url,
+                            "wayback_capture": capture_info(capture, attempt),
+                            "size_bytes": os.path.getsize(fpath),
+                            "sha256": sha256_file(fpath),
+                            "content_type": content_type,
+                            "source": "wayback",
+                            "validation": vr.to_dict(),
+                        }]
+                    else:
+                        logger.debug(f"  [WAYBACK] File failed validation: {vr.reason}")
+                        os.remove(fpath)
+                        continue
 
-                # Quick pre-check before saving
-                from validate import check_for_junk_indicators, DOJ_INDICATORS, WAYBACK_ERROR_INDICATORS
-                doj = check_for_junk_indicators(html_content, DOJ_INDICATORS)
-                if doj:
-                    logger.debug(f"  [WAYBACK] Rejected — DOJ content detected")
-                    continue
-                wbe = check_for_junk_indicators(html_content, WAYBACK_ERROR_INDICATORS)
-                if wbe:
-                    logger.debug(f"  [WAYBACK] Rejected — Wayback error page")
-                    continue
+                # It's HTML — need to check content quality before accepting
+                if "html" in content_type or "text" in content_type:
+                    html_content = resp.text
 
-                # Save and validate
-                html_fname = "wayback_page.html"
-                html_path = os.path.join(row_dir, html_fname)
-                with open(html_path, "w", encoding="utf-8") as f:
-                    f.write(html_content)
+                    # Quick pre-check before saving
+                    from validate import check_for_junk_indicators, DOJ_INDICATORS, WAYBACK_ERROR_INDICATORS
+                    doj = check_for_junk_indicators(html_content, DOJ_INDICATORS)
+                    if doj:
+                        logger.debug(f"  [WAYBACK] Rejected — DOJ content detected")
+                        continue
+                    wbe = check_for_junk_indicators(html_content, WAYBACK_ERROR_INDICATORS)
+                    if wbe:
+                        logger.debug(f"  [WAYBACK] Rejected — Wayback error page")
+                        continue
 
-                vr = validate_content(html_path)
-                if vr.valid:
-                    return [{
-                        "filename": html_fname,
-                        "source_url": url,
-                        "wayback_url": wb_url,
-                        "size_bytes": os.path.getsize(html_path),
-                        "sha256": sha256_file(html_path),
-                        "content_type": "text/html",
-                        "source": "wayback",
-                        "needs_conversion": True,
-                        "validation": vr.to_dict(),
-                    }]
-                else:
-                    logger.debug(f"  [WAYBACK] HTML failed validation: {vr.reason}")
-                    os.remove(html_path)
-                    continue
+                    # Save and validate
+                    html_fname = "wayback_page.html"
+                    html_path = os.path.join(row_dir, html_fname)
+                    with open(html_path, "w", encoding="utf-8") as f:
+                        f.write(html_content)
+
+                    vr = validate_content(html_path)
+                    if vr.valid:
+                        return [{
+                            "filename": html_fname,
+                            "source_url": url,
+                            "wayback_url": wb_url,
+                            "wayback_capture": capture_info(capture, attempt),
+                            "size_bytes": os.path.getsize(html_path),
+                            "sha256": sha256_file(html_path),
+                            "content_type": "text/html",
+                            "source": "wayback",
+                            "needs_conversion": True,
+                            "validation": vr.to_dict(),
+                        }]
+                    else:
+                        logger.debug(f"  [WAYBACK] HTML failed validation: {vr.reason}")
+                        os.remove(html_path)
+                        continue
 
-        except requests.exceptions.RequestException as e:
-            logger.debug(f"  [WAYBACK] Request failed: {e}")
-            continue
+            except requests.exceptions.RequestException as e:
+                logger.debug(f"  [WAYBACK] Request failed: {e}")
+                continue
 
     return []
 
@@ -494,7 +494,7 @@ def try_download_url(url, session, row_dir, source="direct"):
     logger = logging.getLogger("acf_v2")
 
     try:
-        time.sleep(REQUEST_DELAY)
+        warc_session.pause(REQUEST_DELAY)
         resp = session.get(url, timeout=30, allow_redirects=True)
         resp.raise_for_status()
     except requests.exceptions.RequestException as e:
@@ -580,7 +580,7 @@ def scrape_page_for_files(response, page_url, session, row_dir, source):
             logger.debug(f"  [{source.upper()}] Found file link: {os.path.basename(parsed.path)}")
 
             try:
-                time.sleep(REQUEST_DELAY)
+                warc_session.pause(REQUEST_DELAY)
                 dl_resp = session.get(full_url, timeout=30, allow_redirects=True)
                 dl_resp.raise_for_status()
 
@@ -831,7 +831,9 @@ def main():
     parser.add_argument("--verbose", "-v", action="store_true", help="Debug logging")
     parser.add_argument("--input", type=str, default=None, help="Override input Excel path")
     parser.add_argument("--output", type=str, default=None, help="Override output directory")
+    warc_session.add_arguments(parser)
     args = parser.parse_args()
+    warc_session.setup(args.warc_record, args.warc_replay, stage="harvest_v2")
 
     logger = setup_logging(args.verbose)
 
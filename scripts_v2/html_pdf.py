@@ -0,0 +1,645 @@
+#!/usr/bin/env python3
+"""
+ACF Guidance v2 — HTML→PDF Conversion
+=======================================
+The one place saved pages are turned into PDFs. convert_v2.py and
+repair.py phase 2 used to carry their own copies of the clean CSS, the
+Playwright render, the reportlab fallback, the pool set-up and the cache
+plumbing; they now only plan jobs and record results.
+
+Jobs are plain dicts; keys other than these belong to the caller and
+come back untouched:
+
+    {"html_path": ..., "pdf_path": ..., "header": "doc — title", "size": bytes,
+     "base_url": "https://..."}
+
+base_url is the page's <base href> for Playwright renders; build it with
+base_url_for(metadata, html_file) (acf.gov when missing).
+
+Backends (pick by name with get_backend()):
+  playwright   Chromium render with CLEAN_CSS / CLEANUP_JS, offline by
+               default; engine "pool" (BrowserPool, one thread per
+               browser) or "async" (async_convert, pages on one browser)
+  reportlab    structured text PDF from text_pdf.py, across processes
+  fpdf         the same text blocks laid out with fpdf2, across processes
+  auto         per page: plain pages (complexity.py score below the
+               threshold) to reportlab, the rest to playwright
+
+Converter owns everything around a render: cache hits never reach a
+backend, misses render into the cache's staging area, and the worker
+pool lives as long as the Converter. Every render has a wall-clock
+deadline (job_timeout): a hung browser is killed and relaunched, a hung
+text worker process replaced (conversion_watchdog.py). With a Quarantine, inputs
+that failed several runs in a row are skipped with reason "quarantined".
+on_done always runs on the thread that called run(), so callers writing
+metadata.json never race:
+
+    with Converter(get_backend("playwright"), workers=8, cache=ConversionCache()) as conv:
+        stats = conv.run(jobs, on_done)      # on_done(job, ok, reason, info)
+
+Callers that produce one page at a time use convert(), which runs a
+single job and waits for it (calls from several threads take turns):
+
+    ok, reason, info = conv.convert(html_path, pdf_path, header)
+
+The dev/scripts recovery tools convert from many browser threads at
+once, so they call convert_html_to_fpdf() directly on their own thread
+instead (dev/scripts/v2_shared.py).
+
+`info` carries the fields for the converted-PDF metadata entry
+(html_sha256, render_config, cache_hit, and with "auto" complexity and
+route); job["method"] is the backend that rendered it and job["seconds"]
+the render time (0 for cache hits).
+
+benchmark_convert.py compares the backends on a fixed local corpus.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import as_completed
+
+from browser_pool import BrowserPool, DEFAULT_POOL_SIZE
+from async_convert import run_jobs, DEFAULT_JOB_TIMEOUT
+from conversion_cache import render_config_hash, sha256_file
+from offline_render import (
+    prepare_html, page_base_url, load_offline, load_online, load_offline_async,
+    load_online_async, default_cache, ACF_BASE_URL,
+)
+from text_pdf import (
+    convert_html_to_text_pdf, iter_blocks, block_text_len, MIN_TEXT_CHARS,
+)
+from conversion_watchdog import Supervisor
+from complexity import complexity_score, DEFAULT_THRESHOLD
+
+logger = logging.getLogger("acf_v2.html_pdf")
+
+# Bump when text_pdf.py / the fpdf layout change in a way that should
+# invalidate cached text renders
+TEXT_LAYOUT_VERSION = 1
+
+# CSS to inject for clean rendering
+CLEAN_CSS = """
+<style>
+  /* Hide site chrome */
+  nav, header, footer, .breadcrumb, .breadcrumbs, .site-header,
+  .site-footer, .skip-link, .skip-nav, .navbar, .menu, .sidebar,
+  .social-share, .cookie-notice, .banner, .alert-banner,
+  #skip-to-content, [role="navigation"], [role="banner"],
+  [role="contentinfo"], .usa-banner, .usa-header, .usa-footer,
+  .usa-nav, .usa-menu, .usa-accordion {
+    display: none !important;
+  }
+
+  /* Clean up the main content area */
+  body {
+    font-family: 'Times New Roman', serif;
+    font-size: 12pt;
+    line-height: 1.6;
+    color: #000;
+    background: #fff;
+    margin: 0.75in;
+    max-width: 100%;
+  }
+
+  main, article, .content, .main-content, #main-content,
+  [role="main"] {
+    max-width: 100%;
+    margin: 0;
+    padding: 0;
+  }
+
+  /* Ensure tables render properly */
+  table {
+    border-collapse: collapse;
+    width: 100%;
+    margin: 1em 0;
+  }
+  td, th {
+    border: 1px solid #999;
+    padding: 6px 8px;
+  }
+
+  /* Clean links */
+  a { color: #000; text-decoration: underline; }
+
+  /* Print-friendly */
+  @media print {
+    body { margin: 0; }
+  }
+</style>
+"""
+
+# JavaScript to clean up the page before PDF generation
+CLEANUP_JS = """
+() => {
+    // Remove nav, header, footer, banners
+    const removeSelectors = [
+        'nav', 'header', 'footer', '.breadcrumb', '.breadcrumbs',
+        '.site-header', '.site-footer', '.skip-link', '.skip-nav',
+        '.navbar', '.menu', '.sidebar', '.social-share', '.cookie-notice',
+        '.banner', '.alert-banner', '#skip-to-content',
+        '[role="navigation"]', '[role="banner"]', '[role="contentinfo"]',
+        '.usa-banner', '.usa-header', '.usa-footer', '.usa-nav',
+        '.usa-menu', '.usa-accordion', 'script', 'noscript',
+        'iframe', '.overlay', '.modal'
+    ];
+
+    removeSelectors.forEach(sel => {
+        document.querySelectorAll(sel).forEach(el => el.remove());
+    });
+
+    // Remove hidden elements
+    document.querySelectorAll('[style*="display: none"], [style*="display:none"], [hidden]')
+        .forEach(el => el.remove());
+
+    // Clean up the body
+    document.body.style.margin = '0';
+    document.body.style.padding = '20px';
+
+    // Return the visible text length for validation
+    return document.body.innerText.trim().length;
+}
+"""
+
+PDF_OPTIONS = {
+    "format": "Letter",
+    "margin": {"top": "0.75in", "bottom": "0.75in",
+               "left": "0.75in", "right": "0.75in"},
+    "print_background": False,
+}
+
+
+# ── Playwright render ────────────────────────────────────────────────────
+
+def base_url_for(metadata, html_file):
+    """
+    <base href> for one saved page of a row: the source URL recorded for
+    html_file in metadata.json (the original for Wayback captures), else
+    the row's first inventory URL, else acf.gov.
+    """
+    for key in ("files_downloaded", "repair_files"):
+        for entry in metadata.get(key) or []:
+            if entry.get("filename") == html_file:
+                source = entry.get("source_url") or entry.get("wayback_url")
+                if source:
+                    return page_base_url(source)
+    urls = metadata.get("urls") or []
+    first = urls[0] if urls else ""
+    return page_base_url(first.get("url", "") if isinstance(first, dict) else first)
+
+
+def read_clean_html(html_path, base_url=None):
+    """Read html_path with CLEAN_CSS and a <base href> (acf.gov by default) injected."""
+    with open(html_path, "r", encoding="utf-8", errors="ignore") as f:
+        return prepare_html(f.read(), CLEAN_CSS, base_url or ACF_BASE_URL)
+
+
+def _check_pdf(pdf_path):
+    if os.path.exists(pdf_path) and os.path.getsize(pdf_path) > 1000:
+        return True, "ok"
+    return False, "pdf_too_small"
+
+
+def render_clean_pdf(page, html_path, pdf_path, offline=True, base_url=None):
+    """
+    Render one HTML file to a clean PDF on an open Playwright page.
+    Offline (the default), remote assets are blocked or served from the
+    local asset cache; otherwise the page may fetch them. Relative URLs
+    resolve against base_url.
+    """
+    html_content = read_clean_html(html_path, base_url)
+    if offline:
+        load_offline(page, html_content)
+    else:
+        load_online(page, html_content)
+
+    visible_chars = page.evaluate(CLEANUP_JS)
+    if visible_chars < MIN_TEXT_CHARS:
+        return False, f"insufficient_content ({visible_chars} chars)"
+
+    page.pdf(path=pdf_path, **PDF_OPTIONS)
+    return _check_pdf(pdf_path)
+
+
+async def _probe_launch():
+    from playwright.async_api import async_playwright
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        await browser.close()
+
+
+async def render_clean_pdf_async(page, html_path, pdf_path, offline=True, base_url=None):
+    """Async twin of render_clean_pdf() for the async_convert engine."""
+    html_content = read_clean_html(html_path, base_url)
+    if offline:
+        await load_offline_async(page, html_content)
+    else:
+        await load_online_async(page, html_content)
+
+    visible_chars = await page.evaluate(CLEANUP_JS)
+    if visible_chars < MIN_TEXT_CHARS:
+        return False, f"insufficient_content ({visible_chars} chars)"
+
+    await page.pdf(path=pdf_path, **PDF_OPTIONS)
+    return _check_pdf(pdf_path)
+
+
+def _timed_render(page, html_path, pdf_path, offline, base_url=None):
+    start = time.perf_counter()
+    try:
+        ok, reason = render_clean_pdf(page, html_path, pdf_path, offline, base_url)
+    except Exception as e:
+        ok, reason = False, str(e)[:300]
+    return ok, reason, time.perf_counter() - start
+
+
+# ── fpdf layout ──────────────────────────────────────────────────────────
+
+def _latin1(text):
+    # fpdf2's core fonts are latin-1 only
+    return text.encode("latin-1", "replace").decode("latin-1")
+
+
+def convert_html_to_fpdf(html_path, pdf_path, header=None, min_text_chars=MIN_TEXT_CHARS):
+    """
+    Lay out text_pdf's blocks with fpdf2 — the dev/scripts converters'
+    look, from the structured extractor. Returns (ok, reason).
+    """
+    try:
+        from fpdf import FPDF
+    except ImportError:
+        return False, "fpdf2 not installed"
+
+    blocks = iter_blocks(html_path)
+    head, chars = [], 0
+    for block in blocks:
+        head.append(block)
+        chars += block_text_len(block)
+        if chars >= min_text_chars:
+            break
+    if chars < min_text_chars:
+        return False, "insufficient_content"
+
+    def all_blocks():
+        yield from head
+        yield from blocks
+
+    try:
+        pdf = FPDF(format="letter")
+        pdf.set_margins(19, 19)
+        pdf.set_auto_page_break(auto=True, margin=19)
+        pdf.add_page()
+        if header:
+            pdf.set_title(_latin1(header))
+            pdf.set_font("Helvetica", "B", 14)
+            pdf.multi_cell(0, 7, _latin1(header), new_x="LMARGIN", new_y="NEXT")
+            pdf.ln(4)
+
+        for block in all_blocks():
+            kind = block[0]
+            if kind == "heading":
+                pdf.set_font("Helvetica", "B", {1: 14, 2: 12, 3: 11}.get(block[1], 10))
+                pdf.ln(2)
+                pdf.multi_cell(0, 6, _latin1(block[2]), new_x="LMARGIN", new_y="NEXT")
+                pdf.ln(1)
+            elif kind == "para":
+                pdf.set_font("Helvetica", "", 10)
+                pdf.multi_cell(0, 5, _latin1(block[1]), new_x="LMARGIN", new_y="NEXT")
+                pdf.ln(2)
+            elif kind == "item":
+                depth = min(block[1], 6)
+                pdf.set_font("Helvetica", "", 10)
+                pdf.set_x(pdf.l_margin + 5 * depth)
+                pdf.multi_cell(0, 5, _latin1(f"{block[2]} {block[3]}"),
+                               new_x="LMARGIN", new_y="NEXT")
+            elif kind == "pre":
+                pdf.set_font("Courier", "", 8)
+                pdf.multi_cell(0, 4, _latin1(block[1]), new_x="LMARGIN", new_y="NEXT")
+                pdf.ln(2)
+            elif kind == "table":
+                pdf.set_font("Helvetica", "", 9)
+                for row in block[1]:
+                    line = " | ".join(c for c in row if c)
+                    if line:
+                        pdf.multi_cell(0, 5, _latin1(line), new_x="LMARGIN", new_y="NEXT")
+                pdf.ln(2)
+        pdf.output(pdf_path)
+    except Exception as e:
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
+        return False, str(e)[:300]
+
+    return _check_pdf(pdf_path)
+
+
+# Picklable entry point for the worker processes
+_TEXT_RENDERERS = {"reportlab": convert_html_to_text_pdf, "fpdf": convert_html_to_fpdf}
+
+
+def _render_text(name, html_path, pdf_path, header):
+    start = time.perf_counter()
+    try:
+        ok, reason = _TEXT_RENDERERS[name](html_path, pdf_path, header)
+    except Exception as e:
+        ok, reason = False, str(e)[:300]
+    return ok, reason, time.perf_counter() - start
+
+
+# ── Backends ─────────────────────────────────────────────────────────────
+# A backend knows its render config for a job (what goes into the cache
+# key) and how to render a batch of jobs with `workers` in parallel,
+# calling done(job, ok, reason, seconds) on the caller's thread for each.
+# Each job's output path is job["_out"]. route(job) names the backend
+# (one of its `tiers`, in render order) that actually renders a job,
+# plus metadata about that choice.
+
+class PlaywrightBackend:
+    name = "playwright"
+
+    def __init__(self, offline=True, engine="pool", job_timeout=DEFAULT_JOB_TIMEOUT):
+        self.offline = offline
+        self.engine = engine
+        self.job_timeout = job_timeout
+        self.pool = None
+        self.tiers = (self,)
+        self.stats = {}
+        # Offline renders only see the cached assets, so they are part of the config
+        self.assets = default_cache().fingerprint() if offline else None
+
+    def route(self, job):
+        return self, {}
+
+    def render_config(self, job):
+        options = {"offline": self.offline}
+        if self.assets:
+            options["assets"] = self.assets
+        base_url = job.get("base_url")
+        if base_url and base_url != ACF_BASE_URL:
+            options["base_url"] = base_url      # acf.gov pages keep their earlier hash
+        return render_config_hash(CLEAN_CSS, CLEANUP_JS, PDF_OPTIONS, options)
+
+    def start(self, workers):
+        """Launch browsers up front; raises RuntimeError when Playwright can't run."""
+        if self.engine == "async":
+            # The engine launches its own browser per batch; try one now so a
+            # missing Chromium fails here rather than halfway through a run
+            try:
+                asyncio.run(_probe_launch())
+            except Exception as e:
+                raise RuntimeError(f"Chromium failed to launch: {e}")
+            self.workers = workers
+            return
+        try:
+            self.pool = BrowserPool(size=workers, job_timeout=self.job_timeout)
+        except Exception as e:
+            raise RuntimeError(str(e))
+
+    def render_all(self, jobs, done):
+        if self.engine == "async":
+            self._render_async(jobs, done)
+            return
+        futures = {self.pool.submit(_timed_render, job["html_path"], job["_out"], self.offline,
+                                    job.get("base_url")): job
+                   for job in jobs}
+        for future in as_completed(futures):
+            try:
+                ok, reason, seconds = future.result()
+            except TimeoutError:
+                ok, reason, seconds = False, f"timeout ({self.job_timeout}s)", self.job_timeout
+            except Exception as e:
+                ok, reason, seconds = False, str(e)[:300], 0.0
+            done(futures[future], ok, reason, seconds)
+
+    def _render_async(self, jobs, done):
+        async def render(page, job):
+            return await render_clean_pdf_async(page, job["html_path"], job["_out"],
+                                                self.offline, job.get("base_url"))
+
+        self.stats["async_engine"] = run_jobs(jobs, render, done, self.workers,
+                                              self.job_timeout)
+
+    def close(self):
+        if self.pool is not None:
+            self.stats["browser_pool"] = dict(self.pool.stats)
+            self.pool.close()
+            self.pool = None
+
+
+class TextBackend:
+    """reportlab or fpdf text PDFs. CPU-bound, so jobs spread over processes."""
+
+    def __init__(self, name="reportlab", job_timeout=DEFAULT_JOB_TIMEOUT):
+        if name not in _TEXT_RENDERERS:
+            raise ValueError(f"Unknown text backend: {name}")
+        self.name = name
+        self.job_timeout = job_timeout
+        self.supervisor = None
+        self.tiers = (self,)
+        self.stats = {}
+
+    def route(self, job):
+        return self, {}
+
+    def render_config(self, job):
+        # The header line is part of the output
+        return render_config_hash(self.name, TEXT_LAYOUT_VERSION, job.get("header") or "")
+
+    def start(self, workers):
+        self.supervisor = Supervisor(_render_text, workers, self.job_timeout)
+
+    def render_all(self, jobs, done):
+        def on_result(i, ok, value, seconds):
+            if ok:
+                ok, reason, seconds = value
+            else:
+                reason = value
+            done(jobs[i], ok, reason, seconds)
+
+        tasks = [(i, (self.name, job["html_path"], job["_out"], job.get("header")))
+                 for i, job in enumerate(jobs)]
+        self.stats["supervisor"] = self.supervisor.run(tasks, on_result)
+
+    def close(self):
+        if self.supervisor is not None:
+            self.supervisor.close()
+            self.supervisor = None
+
+
+class RoutedBackend:
+    """
+    Two tiers: pages scoring below `threshold` render on the text
+    backend, the rest on the browser. The browser batch runs first, so a
+    browser that breaks mid-run fails before any text page was converted.
+    """
+
+    name = "auto"
+
+    def __init__(self, text, browser, threshold=DEFAULT_THRESHOLD):
+        self.text = text
+        self.browser = browser
+        self.threshold = threshold
+        self.tiers = (browser, text)
+        self._scores = {}           # (path, size, mtime) -> score
+
+    @property
+    def stats(self):
+        return {**self.text.stats, **self.browser.stats}
+
+    def score(self, html_path):
+        st = os.stat(html_path)
+        key = (html_path, st.st_size, st.st_mtime)
+        if key not in self._scores:
+            self._scores[key] = complexity_score(html_path)[0]
+        return self._scores[key]
+
+    def route(self, job):
+        score = self.score(job["html_path"])
+        if score >= self.threshold:
+            return self.browser, {"complexity": score, "route": "browser"}
+        return self.text, {"complexity": score, "route": "text"}
+
+    def render_config(self, job):
+        return self.route(job)[0].render_config(job)
+
+    def start(self, workers):
+        self.browser.start(workers)
+        try:
+            self.text.start(workers)
+        except Exception:
+            self.browser.close()
+            raise
+
+    def close(self):
+        self.text.close()
+        self.browser.close()
+
+
+BACKENDS = ("playwright", "reportlab", "fpdf", "auto")
+
+
+def get_backend(name, offline=True, engine="pool", job_timeout=DEFAULT_JOB_TIMEOUT,
+                threshold=DEFAULT_THRESHOLD):
+    """Backend by name. The Playwright options are ignored by text backends."""
+    if name == "playwright":
+        return PlaywrightBackend(offline, engine, job_timeout)
+    if name == "auto":
+        return RoutedBackend(TextBackend("reportlab", job_timeout),
+                             PlaywrightBackend(offline, engine, job_timeout), threshold)
+    return TextBackend(name, job_timeout)
+
+
+# ── Converter ────────────────────────────────────────────────────────────
+
+class Converter:
+    """Runs conversion jobs on one backend, through the conversion cache."""
+
+    def __init__(self, backend, workers=DEFAULT_POOL_SIZE, cache=None, quarantine=None,
+                 skip_quarantined=True):
+        self.backend = backend
+        self.workers = workers
+        self.cache = cache
+        self.quarantine = quarantine
+        self.skip_quarantined = skip_quarantined
+        self._lock = threading.Lock()
+        backend.start(workers)
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    def close(self):
+        self.backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _begin(self, job, render_config):
+        """Cache lookup for one job; sets job["_out"] on a miss."""
+        html_path, pdf_path = job["html_path"], job["pdf_path"]
+        if self.cache is not None:
+            key, info = self.cache.begin(html_path, pdf_path, render_config)
+            if not info["cache_hit"]:
+                job["_key"] = key
+                job["_out"] = self.cache.staging_path(key)
+            return info
+        # Unlink rather than overwrite: the old PDF may be a hard link into the cache
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
+        job["_out"] = pdf_path
+        return {"html_sha256": sha256_file(html_path), "render_config": render_config}
+
+    def run(self, jobs, on_done):
+        """
+        Convert every job, largest first. Blocks until all are done and
+        returns stats; on_done(job, ok, reason, info) runs per job on this
+        thread.
+        """
+        stats = {"backend": self.name, "jobs": len(jobs), "converted": 0, "failed": 0,
+                 "cache_hits": 0, "quarantined": 0, "render_seconds": 0.0, "by_method": {}}
+        infos = {}
+
+        def finish(job, ok, reason, seconds):
+            if self.cache is not None and "_key" in job:
+                self.cache.finish(job["_key"], job["_out"], job["pdf_path"], ok)
+            elif not ok and os.path.exists(job["_out"]):
+                # A failed or cancelled render may leave a partial PDF behind
+                os.remove(job["_out"])
+            job.pop("_key", None)
+            job.pop("_out", None)
+            job["seconds"] = seconds
+            stats["converted" if ok else "failed"] += 1
+            if ok:
+                stats["by_method"][job["method"]] = stats["by_method"].get(job["method"], 0) + 1
+            stats["render_seconds"] += seconds
+            info = infos.pop(id(job))
+            if self.quarantine is not None:
+                self.quarantine.record(info["html_sha256"], job["html_path"], ok, reason)
+            try:
+                on_done(job, ok, reason, info)
+            except Exception as e:
+                logger.error(f"  Result callback failed — {e}")
+
+        misses = {backend: [] for backend in self.backend.tiers}
+        for job in sorted(jobs, key=lambda j: j.get("size", 0), reverse=True):
+            if self.quarantine is not None and self.skip_quarantined:
+                if self.quarantine.is_quarantined(sha256_file(job["html_path"])):
+                    stats["quarantined"] += 1
+                    stats["failed"] += 1
+                    job["method"], job["seconds"] = self.name, 0.0
+                    on_done(job, False, "quarantined", {})
+                    continue
+            backend, route_info = self.backend.route(job)
+            job["method"] = backend.name
+            info = {**self._begin(job, backend.render_config(job)), **route_info}
+            infos[id(job)] = info
+            if info.get("cache_hit"):
+                stats["cache_hits"] += 1
+                finish(job, True, "ok", 0.0)
+            else:
+                misses[backend].append(job)
+
+        for backend, batch in misses.items():
+            if batch:
+                backend.render_all(batch, finish)
+        stats["render_seconds"] = round(stats["render_seconds"], 2)
+        stats.update(self.backend.stats)
+        return stats
+
+    def convert(self, html_path, pdf_path, header=None, base_url=None):
+        """
+        Convert one file and wait for it; returns (ok, reason, info).
+        Safe to call from several threads — calls take turns.
+        """
+        job = {"html_path": html_path, "pdf_path": pdf_path, "header": header,
+               "base_url": base_url, "size": os.path.getsize(html_path)}
+        result = []
+        with self._lock:
+            self.run([job], lambda job, ok, reason, info: result.append((ok, reason, info)))
+        return result[0]
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+ACF Guidance v2 — Offline Page Rendering
+==========================================
+Saved ACF pages still reference remote stylesheets, fonts, analytics and
+images. Loading them from file:// and waiting for `networkidle` stalls
+every render on those requests, and the converters had to write a
+.clean.html temp file next to each source to get there.
+
+Offline mode instead:
+  - hands the cleaned HTML to page.set_content() — nothing is written to
+    the collection tree
+  - routes every request: URLs present in the local asset cache (e.g. the
+    common acf.gov stylesheet) are served from disk, everything else is
+    aborted, so no render ever touches the network
+  - decides readiness from the DOM (document complete, fonts settled)
+    instead of `networkidle`
+
+Relative URLs resolve against a <base href> for the URL the page was
+saved from (page_base_url(): for a Wayback capture, the original URL),
+so cached assets are found under the same URLs the live site uses and
+pages from headstart.gov or hhs.gov don't resolve against acf.gov.
+acf.gov is the base only when the source is unknown.
+
+Cache management:
+  python offline_render.py --list                          # Show cached assets
+  python offline_render.py --add https://www.acf.gov/...css # Fetch into cache
+  python offline_render.py --add URL --from saved.css       # Cache a local copy
+  python offline_render.py --remove URL                    # Drop a cached asset
+
+The cache is curated by hand, so it has no eviction. Its contents shape
+offline renders, so fingerprint() is part of the Playwright render
+config: adding or removing an asset re-renders pages on the next run.
+"""
+
+import os
+import re
+import sys
+import html
+import hashlib
+import argparse
+from urllib.parse import urlparse, unquote
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+ACF_BASE_URL = "https://www.acf.gov/"
+
+_WAYBACK_URL = re.compile(r"^https?://web\.archive\.org/web/\d+[a-z_]*/(.+)$", re.IGNORECASE)
+
+READY_TIMEOUT_MS = 10000
+
+# Ready once the document has finished parsing and fonts (cached or
+# fallback) have settled. Aborted requests fail immediately, so this
+# resolves in milliseconds rather than after a network timeout.
+READY_JS = """
+() => document.readyState === 'complete' && !!document.body &&
+      (!document.fonts || document.fonts.status === 'loaded')
+"""
+
+
+class AssetCache:
+    """Local copies of remote page assets, stored as <dir>/<host>/<path>."""
+
+    def __init__(self, cache_dir=ASSETS_DIR):
+        self.cache_dir = cache_dir
+
+    def path_for(self, url):
+        """Cache path for a URL (query string and fragment ignored)."""
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or not parsed.netloc:
+            return None
+        rel = unquote(parsed.path).lstrip("/") or "index"
+        # Never escape the cache directory
+        parts = [p for p in rel.split("/") if p not in ("", ".", "..")]
+        return os.path.join(self.cache_dir, parsed.netloc.lower(), *parts)
+
+    def lookup(self, url):
+        path = self.path_for(url)
+        return path if path and os.path.isfile(path) else None
+
+    def add(self, url, content):
+        path = self.path_for(url)
+        if path is None:
+            raise ValueError(f"Not an http(s) URL: {url}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def remove(self, url):
+        path = self.lookup(url)
+        if path:
+            os.remove(path)
+        return path
+
+    def fingerprint(self):
+        """Short hash of the cached files (path, size, mtime); None when empty."""
+        entries = self.entries()
+        if not entries:
+            return None
+        h = hashlib.sha256()
+        for rel in entries:
+            st = os.stat(os.path.join(self.cache_dir, rel))
+            h.update(f"{rel}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+        return h.hexdigest()[:16]
+
+    def entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for fname in files:
+                found.append(os.path.relpath(os.path.join(root, fname), self.cache_dir))
+        return sorted(found)
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = AssetCache()
+    return _default_cache
+
+
+def page_base_url(source_url):
+    """
+    Base URL for a page saved from source_url: the URL itself, or for a
+    Wayback capture the archived original; ACF_BASE_URL if unknown.
+    """
+    source_url = (source_url or "").strip()
+    m = _WAYBACK_URL.match(source_url)
+    if m:
+        source_url = m.group(1)
+    if not source_url.lower().startswith(("http://", "https://")):
+        return ACF_BASE_URL
+    return source_url
+
+
+def prepare_html(html_content, clean_css, base_url=ACF_BASE_URL):
+    """Inject clean CSS (and a <base href> unless the page has one) into HTML."""
+    if "</head>" in html_content.lower():
+        html_content = re.sub(r"(</head>)", lambda m: clean_css + m.group(1),
+                              html_content, count=1, flags=re.IGNORECASE)
+    else:
+        html_content = clean_css + html_content
+
+    # <base> only applies to URLs parsed after it, so it goes first in <head>
+    if base_url and not re.search(r"<base\s", html_content, re.IGNORECASE):
+        base_tag = f'<base href="{html.escape(base_url, quote=True)}">'
+        html_content, n = re.subn(r"(<head\b[^>]*>)", lambda m: m.group(1) + base_tag,
+                                  html_content, count=1, flags=re.IGNORECASE)
+        if not n:
+            html_content = base_tag + html_content
+    return html_content
+
+
+# ── Sync API ─────────────────────────────────────────────────────────────
+
+def load_offline(page, html_content, cache=None):
+    """Load HTML into a Playwright page with network access replaced by the cache."""
+    cache = cache or default_cache()
+
+    def handle(route):
+        local = cache.lookup(route.request.url)
+        if local:
+            route.fulfill(path=local)
+        else:
+            route.abort()
+
+    page.route("**/*", handle)
+    page.set_content(html_content, wait_until="load")
+    page.wait_for_function(READY_JS, timeout=READY_TIMEOUT_MS)
+
+
+def load_online(page, html_content):
+    """Load HTML and let it fetch its remote assets."""
+    page.set_content(html_content, wait_until="networkidle")
+
+
+# ── Async API ────────────────────────────────────────────────────────────
+
+async def load_offline_async(page, html_content, cache=None):
+    """Async twin of load_offline()."""
+    cache = cache or default_cache()
+
+    async def handle(route):
+        local = cache.lookup(route.request.url)
+        if local:
+            await route.fulfill(path=local)
+        else:
+            await route.abort()
+
+    await page.route("**/*", handle)
+    await page.set_content(html_content, wait_until="load")
+    await page.wait_for_function(READY_JS, timeout=READY_TIMEOUT_MS)
+
+
+async def load_online_async(page, html_content):
+    await page.set_content(html_content, wait_until="networkidle")
+
+
+# ── CLI for cache management ─────────────────────────────────────────────
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the offline render asset cache")
+    parser.add_argument("--add", metavar="URL", help="Cache an asset under this URL")
+    parser.add_argument("--from", dest="from_file", metavar="FILE",
+                        help="Use a local file instead of downloading URL")
+    parser.add_argument("--remove", metavar="URL", help="Remove the asset cached under this URL")
+    parser.add_argument("--list", action="store_true", help="List cached assets")
+    parser.add_argument("--dir", default=ASSETS_DIR, help="Cache directory")
+    args = parser.parse_args()
+
+    cache = AssetCache(args.dir)
+
+    if args.add:
+        if args.from_file:
+            with open(args.from_file, "rb") as f:
+                content = f.read()
+        else:
+            import requests
+            resp = requests.get(args.add, timeout=30)
+            if resp.status_code != 200:
+                print(f"  HTTP {resp.status_code}: {args.add}")
+                sys.exit(1)
+            content = resp.content
+        print(f"  Cached {len(content):,} bytes → {cache.add(args.add, content)}")
+
+    if args.remove:
+        removed = cache.remove(args.remove)
+        print(f"  Removed {removed}" if removed else f"  Not cached: {args.remove}")
+
+    if args.list or not (args.add or args.remove):
+        entries = cache.entries()
+        print(f"  {len(entries)} cached assets in {args.dir}")
+        for e in entries:
+            print(f"    {e}")
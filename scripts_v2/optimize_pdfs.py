@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+ACF Guidance v2 — Converted-PDF Size Optimizer
+================================================
+Optional stage after conversion. Playwright writes every page.pdf() with
+full embedded fonts and loosely compressed content streams, and nothing
+rewrites them afterwards, so converted PDFs make up most of the
+collection's size. This stage rewrites each converted PDF in a process
+pool:
+
+  - content streams recompressed (zlib level 9)
+  - identical objects merged — the same font or logo embedded on every
+    page is stored once — and unreferenced objects dropped
+  - object streams and linearization ("fast web view") when pikepdf
+    (qpdf) is installed
+
+A rewrite only replaces the original if validate_content() passes, the
+page count is unchanged and it saves at least MIN_SAVING. The swap is an
+os.replace(), never an in-place write: a row PDF may be a hard link to a
+conversion cache entry, and that entry is then pointed at the optimized
+file too. The metadata entry gets the new sha256/size_bytes and an
+"optimized" block with result "optimized". A rewrite that is rejected
+(no_gain, page_count_changed, invalid_output) records the block too,
+with that result and the original left alone, so every checked PDF is
+skipped on later runs until it is converted again. Failures that may
+not recur (rewrite_failed, pdf_missing) are retried.
+
+Both converted_pdfs entries (repair.py) and files_downloaded entries with
+converted_from (convert_v2.py) are covered. Downloaded originals are
+never touched.
+
+Usage:
+  python optimize_pdfs.py                     # Optimize output/
+  python optimize_pdfs.py --dir output_v2     # Specify directory
+  python optimize_pdfs.py --workers 8         # Parallel workers
+  python optimize_pdfs.py --dry-run           # Measure savings, replace nothing
+
+Requires: pip install pypdf
+Optional: pip install pikepdf  (object streams and linearization; without
+          it PDFs are still recompressed and deduplicated by pypdf)
+"""
+
+import os
+import sys
+import json
+import argparse
+import logging
+from datetime import datetime, timezone
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from validate import validate_content
+from conversion_cache import ConversionCache, CACHE_DIR, sha256_file
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if not os.path.exists(os.path.join(BASE_DIR, "output")):
+    BASE_DIR = os.path.dirname(BASE_DIR)
+
+OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+REPORTS_DIR = os.path.join(BASE_DIR, "reports")
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+LOG_DATE = "%H:%M:%S"
+
+MIN_SAVING = 0.02           # keep the original unless the rewrite is 2% smaller
+ZLIB_LEVEL = 9
+
+# Rejections that will repeat on the same file; recorded so it isn't rewritten again
+SETTLED_REASONS = ("no_gain", "page_count_changed", "invalid_output")
+
+
+# ── Rewrite ──────────────────────────────────────────────────────────────
+
+def count_pages(pdf_path):
+    from pypdf import PdfReader
+    return len(PdfReader(pdf_path).pages)
+
+
+def rewrite_pdf(src, dest):
+    """
+    Write an optimized copy of src to dest. Returns the engine string
+    ("pypdf" or "pypdf+qpdf"); only the latter is linearized.
+    """
+    from pypdf import PdfWriter
+
+    writer = PdfWriter(clone_from=src)
+    for page in writer.pages:
+        page.compress_content_streams(level=ZLIB_LEVEL)
+    writer.compress_identical_objects()
+    with open(dest, "wb") as f:
+        writer.write(f)
+
+    try:
+        import pikepdf
+    except ImportError:
+        return "pypdf"
+    with pikepdf.open(dest, allow_overwriting_input=True) as pdf:
+        pdf.save(dest, linearize=True, recompress_flate=True,
+                 object_stream_mode=pikepdf.ObjectStreamMode.generate)
+    return "pypdf+qpdf"
+
+
+def optimize_job(job):
+    """
+    Worker: rewrite one PDF next to the original and check it. Runs in a
+    subprocess, so it takes and returns plain dicts; the caller decides
+    whether job["tmp"] replaces the original.
+    """
+    pdf_path = os.path.join(job["row_dir"], job["pdf"])
+    tmp = f"{pdf_path}.{os.getpid()}.opt.tmp"
+    result = {**job, "tmp": None}
+
+    if not os.path.exists(pdf_path):
+        return {**result, "reason": "pdf_missing"}
+    original_size = os.path.getsize(pdf_path)
+    result["original_size"] = original_size
+
+    try:
+        pages = count_pages(pdf_path)
+        engine = rewrite_pdf(pdf_path, tmp)
+        new_pages = count_pages(tmp)
+    except Exception as e:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return {**result, "reason": "rewrite_failed", "error": str(e)[:200]}
+
+    new_size = os.path.getsize(tmp)
+    result.update(engine=engine, pages=pages, new_size=new_size)
+    if new_pages != pages:
+        reason = f"page_count_changed ({pages} → {new_pages})"
+    elif not validate_content(tmp).valid:
+        reason = "invalid_output"
+    elif new_size > original_size * (1 - MIN_SAVING):
+        reason = "no_gain"
+    else:
+        return {**result, "tmp": tmp, "reason": "ok"}
+    os.remove(tmp)
+    return {**result, "reason": reason}
+
+
+# ── Collection ───────────────────────────────────────────────────────────
+
+def collect_jobs(output_dir):
+    """One job per converted PDF not yet optimized, with its metadata entries."""
+    jobs = []
+    folders = sorted(f for f in os.listdir(output_dir)
+                     if os.path.isdir(os.path.join(output_dir, f)) and f.isdigit())
+
+    for folder in folders:
+        row_dir = os.path.join(output_dir, folder)
+        meta_path = os.path.join(row_dir, "metadata.json")
+        if not os.path.exists(meta_path):
+            continue
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+        except Exception:
+            continue
+
+        # The same PDF can be listed in both places
+        by_pdf = {}
+        for list_name, name_key, from_key in (("converted_pdfs", "pdf", "from_html"),
+                                              ("files_downloaded", "filename", "converted_from")):
+            for i, entry in enumerate(metadata.get(list_name, [])):
+                if not (entry.get(name_key) and entry.get(from_key)):
+                    continue
+                job = by_pdf.setdefault(entry[name_key], {
+                    "row": folder, "row_dir": row_dir, "pdf": entry[name_key],
+                    "entries": [], "cache_key": None, "optimized": True})
+                job["entries"].append((list_name, i))
+                # A re-conversion adds an entry without the block
+                job["optimized"] = job["optimized"] and bool(entry.get("optimized"))
+                if entry.get("html_sha256") and entry.get("render_config"):
+                    job["cache_key"] = ConversionCache.key(entry["html_sha256"],
+                                                           entry["render_config"])
+        jobs += [job for job in by_pdf.values() if not job["optimized"]]
+    return jobs
+
+
+def place_result(result, cache):
+    """
+    Swap the checked rewrite in for the original. A row PDF hard-linked
+    to its cache entry keeps sharing it: the entry is replaced as well.
+    """
+    pdf_path = os.path.join(result["row_dir"], result["pdf"])
+    cached = cache.path_for(result["cache_key"]) if result["cache_key"] else None
+    linked = cached is not None and os.path.isfile(cached) and os.path.samefile(cached, pdf_path)
+    os.replace(result["tmp"], pdf_path)
+    if linked:
+        cache.replace(result["cache_key"], pdf_path)
+    result["sha256"] = sha256_file(pdf_path)
+
+
+def settled(result):
+    return result["reason"].split(" (")[0] in SETTLED_REASONS
+
+
+def write_results(results):
+    """
+    Record each result's "optimized" block, one metadata write per row.
+    Replaced PDFs also get their new sha256/size_bytes.
+    """
+    by_row = defaultdict(list)
+    for r in results:
+        by_row[r["row_dir"]].append(r)
+
+    optimized_at = datetime.now(timezone.utc).isoformat()
+    for row_dir, row_results in by_row.items():
+        meta_path = os.path.join(row_dir, "metadata.json")
+        with open(meta_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        for r in row_results:
+            for list_name, index in r["entries"]:
+                entries = metadata.get(list_name, [])
+                if index >= len(entries):
+                    continue
+                if r["reason"] == "ok":
+                    entries[index].update(size_bytes=r["new_size"], sha256=r["sha256"])
+                    entries[index]["optimized"] = {
+                        "result": "optimized", "engine": r["engine"],
+                        "original_size": r["original_size"],
+                        "linearized": r["engine"] == "pypdf+qpdf", "optimized_at": optimized_at}
+                else:
+                    entries[index]["optimized"] = {
+                        "result": r["reason"].split(" (")[0], "engine": r["engine"],
+                        "rewrite_size": r["new_size"], "checked_at": optimized_at}
+        tmp = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2, ensure_ascii=False, default=str)
+        os.replace(tmp, meta_path)
+
+
+# ── CLI ──────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Shrink converted PDFs in place")
+    parser.add_argument("--dir", type=str, default=None, help="Override output directory")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help="Conversion cache whose hard-linked entries follow the rewrite")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Measure savings without replacing anything")
+    parser.add_argument("--verbose", "-v", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format=LOG_FORMAT, datefmt=LOG_DATE)
+    logger = logging.getLogger("acf_v2.optimize")
+
+    output_dir = args.dir or OUTPUT_DIR
+    if not os.path.isdir(output_dir):
+        logger.error(f"Output directory not found: {output_dir}")
+        sys.exit(1)
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        logger.error("pypdf is required (pip install pypdf)")
+        sys.exit(1)
+
+    start_time = datetime.now()
+    cache = ConversionCache(args.cache_dir)
+    jobs = collect_jobs(output_dir)
+    logger.info(f"Optimizing {len(jobs)} converted PDFs with {args.workers} workers")
+
+    results, replaced = [], []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(optimize_job, job) for job in jobs]
+        for i, future in enumerate(as_completed(futures)):
+            result = future.result()
+            results.append(result)
+            if result["tmp"]:
+                if args.dry_run:
+                    os.remove(result["tmp"])
+                else:
+                    # Metadata follows each swap, so an interrupted run
+                    # never leaves a stale sha256 behind
+                    place_result(result, cache)
+                    write_results([result])
+                replaced.append(result)
+            else:
+                if settled(result) and not args.dry_run:
+                    write_results([result])
+                if result["reason"] != "no_gain":
+                    logger.debug(f"  {result['row']}: {result['pdf']} — {result['reason']}")
+            if (i + 1) % 200 == 0:
+                logger.info(f"  Progress: {i+1}/{len(jobs)} rewritten")
+
+    elapsed = datetime.now() - start_time
+    reasons = defaultdict(int)
+    for r in results:
+        reasons[r["reason"].split(" (")[0]] += 1
+    before = sum(r["original_size"] for r in replaced)
+    after = sum(r["new_size"] for r in replaced)
+    saved_mb = (before - after) / (1024 * 1024)
+
+    print("\n" + "=" * 60)
+    print("PDF OPTIMIZATION" + (" (DRY RUN)" if args.dry_run else ""))
+    print("=" * 60)
+    print(f"  PDFs checked:     {len(results)}")
+    label = "Would replace:" if args.dry_run else "Replaced:"
+    print(f"  {label:<18}{len(replaced)}")
+    for reason, count in sorted(reasons.items(), key=lambda x: -x[1]):
+        print(f"    {reason:25s}  {count}")
+    if before:
+        print(f"  Saved:            {saved_mb:.1f} MB ({(before - after) / before:.0%} of "
+              f"the replaced files)")
+    print(f"  Elapsed:          {elapsed}")
+
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    report_path = os.path.join(REPORTS_DIR,
+                               f"optimize_pdfs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(report_path, "w") as f:
+        json.dump({"checked": len(results), "replaced": len(replaced),
+                   "dry_run": args.dry_run, "reasons": dict(reasons),
+                   "bytes_before": before, "bytes_after": after,
+                   "failures": [{"row": r["row"], "pdf": r["pdf"], "reason": r["reason"],
+                                 "error": r.get("error")}
+                                for r in results if r["reason"] not in ("ok", "no_gain")],
+                   "elapsed_seconds": elapsed.total_seconds()}, f, indent=2, default=str)
+    print(f"  Report saved:     {report_path}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
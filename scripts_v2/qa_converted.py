@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+ACF Guidance v2 — Converted-PDF Quality Gate
+==============================================
+Checks every HTML→PDF conversion in the collection against its source.
+
+The converters only require the output PDF to be over 1,000 bytes, so
+blank renders and renders truncated by CLEANUP_JS pass unnoticed. This
+stage pulls the text layer from each converted PDF and compares it to the
+source HTML's extract_visible_text():
+
+  - length ratio   — PDF text chars / source visible chars
+  - token overlap  — share of distinct source words present in the PDF
+
+Conversions below either threshold are flagged as suspect in the row's
+metadata.json ("qa" block on the conversion entry). Both converted_pdfs
+entries (repair.py) and files_downloaded entries with converted_from
+(convert_v2.py) are checked.
+
+Usage:
+  python qa_converted.py                      # Check output/
+  python qa_converted.py --dir output_v2      # Specify directory
+  python qa_converted.py --workers 8          # Parallel workers
+  python qa_converted.py --dry-run            # Report only, don't touch metadata
+
+Requires: pip install pypdf   (or poppler's pdftotext on PATH)
+"""
+
+import os
+import re
+import sys
+import json
+import shutil
+import argparse
+import logging
+import subprocess
+from datetime import datetime, timezone
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from validate import extract_visible_text
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if not os.path.exists(os.path.join(BASE_DIR, "output")):
+    BASE_DIR = os.path.dirname(BASE_DIR)
+
+OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+REPORTS_DIR = os.path.join(BASE_DIR, "reports")
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+LOG_DATE = "%H:%M:%S"
+
+MIN_LENGTH_RATIO = 0.4      # PDF text vs source visible text
+MIN_TOKEN_OVERLAP = 0.5     # share of distinct source words found in the PDF
+BLANK_PDF_CHARS = 50        # less text than this is a blank render
+
+_TOKEN_RE = re.compile(r"[a-z0-9]{3,}")
+
+
+def extractor_available():
+    """Whether pypdf or poppler's pdftotext can be used."""
+    try:
+        import pypdf  # noqa: F401
+        return True
+    except ImportError:
+        return shutil.which("pdftotext") is not None
+
+
+def extract_pdf_text(pdf_path):
+    """
+    Pull the text layer from a PDF. Uses pypdf when installed, otherwise
+    poppler's pdftotext. Raises RuntimeError if neither is available.
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        PdfReader = None
+
+    if PdfReader is not None:
+        reader = PdfReader(pdf_path)
+        return "\n".join((page.extract_text() or "") for page in reader.pages)
+
+    if shutil.which("pdftotext"):
+        result = subprocess.run(["pdftotext", "-q", "-enc", "UTF-8", pdf_path, "-"],
+                                capture_output=True, timeout=120)
+        return result.stdout.decode("utf-8", errors="ignore")
+
+    raise RuntimeError("no PDF text extractor (pip install pypdf)")
+
+
+def tokenize(text):
+    return set(_TOKEN_RE.findall(text.lower()))
+
+
+def compare_texts(source_text, pdf_text, min_ratio=MIN_LENGTH_RATIO,
+                  min_overlap=MIN_TOKEN_OVERLAP):
+    """
+    Score a rendered PDF's text against its source's visible text.
+    Returns a qa dict with the scores, a verdict and a reason.
+    """
+    pdf_compact = re.sub(r"\s+", " ", pdf_text).strip()
+    source_chars = len(source_text)
+    pdf_chars = len(pdf_compact)
+
+    source_tokens = tokenize(source_text)
+    pdf_tokens = tokenize(pdf_compact)
+    overlap = (len(source_tokens & pdf_tokens) / len(source_tokens)) if source_tokens else 1.0
+    ratio = (pdf_chars / source_chars) if source_chars else 1.0
+
+    if pdf_chars < BLANK_PDF_CHARS:
+        reason = "blank_render"
+    elif ratio < min_ratio:
+        reason = "truncated_render"
+    elif overlap < min_overlap:
+        reason = "low_token_overlap"
+    else:
+        reason = "ok"
+
+    return {
+        "suspect": reason != "ok",
+        "reason": reason,
+        "source_chars": source_chars,
+        "pdf_chars": pdf_chars,
+        "length_ratio": round(ratio, 3),
+        "token_overlap": round(overlap, 3),
+    }
+
+
+def qa_job(job):
+    """
+    Worker: score one conversion. Runs in a subprocess, so it takes and
+    returns plain dicts.
+    """
+    pdf_path = os.path.join(job["row_dir"], job["pdf"])
+    html_path = os.path.join(job["row_dir"], job["html"])
+
+    if not os.path.exists(pdf_path):
+        return {**job, "qa": {"suspect": True, "reason": "pdf_missing"}}
+    if not os.path.exists(html_path):
+        return {**job, "qa": {"suspect": False, "reason": "source_missing"}}
+
+    try:
+        with open(html_path, "r", encoding="utf-8", errors="ignore") as f:
+            source_text = extract_visible_text(f.read())
+        pdf_text = extract_pdf_text(pdf_path)
+    except Exception as e:
+        return {**job, "qa": {"suspect": True, "reason": "extraction_failed",
+                              "error": str(e)[:200]}}
+
+    return {**job, "qa": compare_texts(source_text, pdf_text,
+                                       job["min_ratio"], job["min_overlap"])}
+
+
+def collect_jobs(output_dir, min_ratio, min_overlap):
+    """List every recorded HTML→PDF conversion in the collection."""
+    jobs = []
+    folders = sorted(f for f in os.listdir(output_dir)
+                     if os.path.isdir(os.path.join(output_dir, f)) and f.isdigit())
+
+    for folder in folders:
+        row_dir = os.path.join(output_dir, folder)
+        meta_path = os.path.join(row_dir, "metadata.json")
+        if not os.path.exists(meta_path):
+            continue
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+        except Exception:
+            continue
+
+        base = {"row": folder, "row_dir": row_dir,
+                "min_ratio": min_ratio, "min_overlap": min_overlap}
+        for i, entry in enumerate(metadata.get("converted_pdfs", [])):
+            if entry.get("pdf") and entry.get("from_html"):
+                jobs.append({**base, "list": "converted_pdfs", "index": i,
+                             "pdf": entry["pdf"], "html": entry["from_html"]})
+        for i, entry in enumerate(metadata.get("files_downloaded", [])):
+            if entry.get("converted_from") and entry.get("filename"):
+                jobs.append({**base, "list": "files_downloaded", "index": i,
+                             "pdf": entry["filename"], "html": entry["converted_from"]})
+    return jobs
+
+
+def write_results(results):
+    """Record qa blocks on the conversion entries, one metadata write per row."""
+    by_row = defaultdict(list)
+    for r in results:
+        by_row[r["row_dir"]].append(r)
+
+    checked_at = datetime.now(timezone.utc).isoformat()
+    for row_dir, row_results in by_row.items():
+        meta_path = os.path.join(row_dir, "metadata.json")
+        with open(meta_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        for r in row_results:
+            entries = metadata.get(r["list"], [])
+            if r["index"] < len(entries):
+                entries[r["index"]]["qa"] = {**r["qa"], "checked_at": checked_at}
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2, ensure_ascii=False, default=str)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="QA converted PDFs against source HTML")
+    parser.add_argument("--dir", type=str, default=None, help="Override output directory")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--min-ratio", type=float, default=MIN_LENGTH_RATIO)
+    parser.add_argument("--min-overlap", type=float, default=MIN_TOKEN_OVERLAP)
+    parser.add_argument("--dry-run", action="store_true", help="Don't update metadata")
+    parser.add_argument("--verbose", "-v", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format=LOG_FORMAT, datefmt=LOG_DATE)
+    logger = logging.getLogger("acf_v2.qa")
+
+    output_dir = args.dir or OUTPUT_DIR
+    if not os.path.isdir(output_dir):
+        logger.error(f"Output directory not found: {output_dir}")
+        sys.exit(1)
+    if not extractor_available():
+        logger.error("pypdf or poppler's pdftotext is required (pip install pypdf)")
+        sys.exit(1)
+
+    start_time = datetime.now()
+    jobs = collect_jobs(output_dir, args.min_ratio, args.min_overlap)
+    logger.info(f"Checking {len(jobs)} conversions with {args.workers} workers")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(qa_job, job) for job in jobs]
+        for i, future in enumerate(as_completed(futures)):
+            result = future.result()
+            results.append(result)
+            if result["qa"]["suspect"]:
+                logger.debug(f"  {result['row']}: {result['pdf']} — {result['qa']['reason']}")
+            if (i + 1) % 200 == 0:
+                logger.info(f"  Progress: {i+1}/{len(jobs)} checked")
+
+    if not args.dry_run:
+        write_results(results)
+
+    elapsed = datetime.now() - start_time
+    reasons = defaultdict(int)
+    for r in results:
+        reasons[r["qa"]["reason"]] += 1
+    suspects = [r for r in results if r["qa"]["suspect"]]
+
+    print("\n" + "=" * 60)
+    print("CONVERTED-PDF QA" + (" (DRY RUN)" if args.dry_run else ""))
+    print("=" * 60)
+    print(f"  Conversions checked: {len(results)}")
+    print(f"  Suspect:             {len(suspects)}")
+    for reason, count in sorted(reasons.items(), key=lambda x: -x[1]):
+        print(f"    {reason:25s}  {count}")
+    print(f"  Elapsed:             {elapsed}")
+
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    report_path = os.path.join(REPORTS_DIR,
+                               f"qa_converted_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(report_path, "w") as f:
+        json.dump({"checked": len(results), "reasons": dict(reasons),
+                   "suspects": [{"row": r["row"], "pdf": r["pdf"], "html": r["html"],
+                                 **r["qa"]} for r in suspects],
+                   "thresholds": {"min_ratio": args.min_ratio,
+                                  "min_overlap": args.min_overlap},
+                   "elapsed_seconds": elapsed.total_seconds()}, f, indent=2, default=str)
+    print(f"  Report saved:        {report_path}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,15 @@ Usage:
   python repair.py --phase 2              # Convert HTMLs only
   python repair.py --dry-run              # Preview both phases
   python repair.py --phase 2 --no-playwright  # Use reportlab fallback
+  python repair.py --phase 2 --workers 8      # 8 pooled browsers
+  python repair.py --phase 2 --engine async --workers 12  # 12 async pages
+  python repair.py --phase 2 --allow-network  # Let renders fetch remote assets
+  python repair.py --phase 2 --no-cache       # Render even if a cached PDF matches
+  python repair.py --phase 2 --job-timeout 60 # Kill renders running over 60s
+  python repair.py --phase 2 --retry-quarantined  # Retry inputs that kept failing
+  python repair.py --phase 2 --no-route       # Browser for every page, even plain ones
+  python repair.py --warc-record ../warc   # Keep every HTTP exchange in WARC files
+  python repair.py --warc-replay ../warc   # Re-run offline from them
 
 Requires:
   pip install openpyxl requests beautifulsoup4 playwright
@@ -25,8 +34,6 @@ import os
 import sys
 import json
 import re
-import time
-import hashlib
 import shutil
 import argparse
 import logging
@@ -44,6 +51,15 @@ from validate import (
     check_for_junk_indicators, DOJ_INDICATORS, WAYBACK_ERROR_INDICATORS,
     extract_visible_text
 )
+from browser_pool import DEFAULT_POOL_SIZE
+from async_convert import DEFAULT_JOB_TIMEOUT
+from text_pdf import metadata_header
+from conversion_cache import ConversionCache, sha256_file
+from html_pdf import Converter, get_backend, base_url_for
+from complexity import DEFAULT_THRESHOLD
+from conversion_watchdog import Quarantine
+from wayback_rank import ranked_wayback_urls, capture_info
+import warc_session
 
 # ── Configuration ────────────────────────────────────────────────────────
 
@@ -71,69 +87,6 @@ WAYBACK_DELAY = 2.0
 LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
 LOG_DATE = "%H:%M:%S"
 
-# Playwright clean CSS for Phase 2
-CLEAN_CSS = """
-<style>
-  nav, header, footer, .breadcrumb, .breadcrumbs, .site-header,
-  .site-footer, .skip-link, .skip-nav, .navbar, .menu, .sidebar,
-  .social-share, .cookie-notice, .banner, .alert-banner,
-  #skip-to-content, [role="navigation"], [role="banner"],
-  [role="contentinfo"], .usa-banner, .usa-header, .usa-footer,
-  .usa-nav, .usa-menu, .usa-accordion {
-    display: none !important;
-  }
-  body {
-    font-family: 'Times New Roman', serif;
-    font-size: 12pt;
-    line-height: 1.6;
-    color: #000;
-    background: #fff;
-    margin: 0.75in;
-    max-width: 100%;
-  }
-  main, article, .content, .main-content, #main-content,
-  [role="main"] {
-    max-width: 100%;
-    margin: 0;
-    padding: 0;
-  }
-  table { border-collapse: collapse; width: 100%; margin: 1em 0; }
-  td, th { border: 1px solid #999; padding: 6px 8px; }
-  a { color: #000; text-decoration: underline; }
-</style>
-"""
-
-CLEANUP_JS = """
-() => {
-    const removeSelectors = [
-        'nav', 'header', 'footer', '.breadcrumb', '.breadcrumbs',
-        '.site-header', '.site-footer', '.skip-link', '.skip-nav',
-        '.navbar', '.menu', '.sidebar', '.social-share', '.cookie-notice',
-        '.banner', '.alert-banner', '#skip-to-content',
-        '[role="navigation"]', '[role="banner"]', '[role="contentinfo"]',
-        '.usa-banner', '.usa-header', '.usa-footer', '.usa-nav',
-        '.usa-menu', '.usa-accordion', 'script', 'noscript',
-        'iframe', '.overlay', '.modal'
-    ];
-    removeSelectors.forEach(sel => {
-        document.querySelectorAll(sel).forEach(el => el.remove());
-    });
-    document.querySelectorAll('[style*="display: none"], [style*="display:none"], [hidden]')
-        .forEach(el => el.remove());
-    document.body.style.margin = '0';
-    document.body.style.padding = '20px';
-    return document.body.innerText.trim().length;
-}
-"""
-
-
-def sha256_file(filepath):
-    h = hashlib.sha256()
-    with open(filepath, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            h.update(chunk)
-    return h.hexdigest()
-
 
 def safe_filename(name, max_len=100):
     name = re.sub(r'[<>:"/\\|?*]', '_', name)
@@ -150,7 +103,7 @@ def setup_session():
     session.mount("http://", adapter)
     session.mount("https://", adapter)
     session.headers.update(HEADERS)
-    return session
+    return warc_session.attach(session)
 
 
 # ══════════════════════════════════════════════════════════════════════════
@@ -280,7 +233,7 @@ def try_redownload(row_data, session, row_dir, logger):
             if "justice.gov" in parsed.netloc.lower():
                 continue
 
-            time.sleep(REQUEST_DELAY)
+            warc_session.pause(REQUEST_DELAY)
             resp = session.get(url, timeout=30, allow_redirects=True)
 
             # Check if we got redirected to DOJ
@@ -328,7 +281,7 @@ def try_redownload(row_data, session, row_dir, logger):
                         ext = os.path.splitext(urlparse(full_url).path)[1].lower()
 
                         if ext in file_exts:
-                            time.sleep(REQUEST_DELAY)
+                            warc_session.pause(REQUEST_DELAY)
                             dl = session.get(full_url, timeout=30)
                             if dl.status_code == 200:
                                 fname = guess_filename_from_response(dl, full_url)
@@ -356,67 +309,71 @@ def try_redownload(row_data, session, row_dir, logger):
             logger.debug(f"    Request failed: {e}")
             continue
 
-    # Try Wayback as last resort
+    # Try Wayback as last resort: best-ranked captures first, fetched raw
+    target_date = metadata.get("issue_date") or metadata.get("date")
     for url in urls[:3]:
-        wb_url = f"https://web.archive.org/web/2/{url}"
-        try:
-            time.sleep(WAYBACK_DELAY)
-            resp = session.get(wb_url, timeout=30, allow_redirects=True)
-            if resp.status_code != 200:
-                continue
+        for attempt, (wb_url, capture) in enumerate(
+                ranked_wayback_urls(url, session, target_date), start=1):
+            try:
+                warc_session.pause(WAYBACK_DELAY)
+                resp = session.get(wb_url, timeout=30, allow_redirects=True)
+                if resp.status_code != 200:
+                    continue
 
-            # Validate Wayback didn't give us junk
-            if "justice.gov" in urlparse(resp.url).netloc.lower():
-                continue
+                # Validate Wayback didn't give us junk
+                if "justice.gov" in urlparse(resp.url).netloc.lower():
+                    continue
 
-            content_type = resp.headers.get("Content-Type", "").lower()
+                content_type = resp.headers.get("Content-Type", "").lower()
 
-            if any(ct in content_type for ct in ["pdf", "msword", "officedocument"]):
-                fname = guess_filename_from_response(resp, url)
-                fpath = os.path.join(row_dir, f"repaired_{fname}")
-                with open(fpath, "wb") as f:
-                    f.write(resp.content)
+                if any(ct in content_type for ct in ["pdf", "msword", "officedocument"]):
+                    fname = guess_filename_from_response(resp, url)
+                    fpath = os.path.join(row_dir, f"repaired_{fname}")
+                    with open(fpath, "wb") as f:
+                        f.write(resp.content)
 
-                vr = validate_content(fpath)
-                if vr.valid:
-                    downloaded.append({
-                        "filename": os.path.basename(fpath),
-                        "source_url": url,
-                        "wayback_url": wb_url,
-                        "size_bytes": os.path.getsize(fpath),
-                        "sha256": sha256_file(fpath),
-                        "source": "wayback_redownload",
-                        "validation": vr.to_dict(),
-                    })
-                    return True, downloaded
-                else:
-                    os.remove(fpath)
-
-            elif "html" in content_type:
-                # Check content quality before accepting
-                doj = check_for_junk_indicators(resp.text, DOJ_INDICATORS)
-                wbe = check_for_junk_indicators(resp.text, WAYBACK_ERROR_INDICATORS)
-                if doj or wbe:
-                    continue
-
-                visible = extract_visible_text(resp.text)
-                if len(visible) >= 500:
-                    fname = "repaired_wayback_page.html"
-                    fpath = os.path.join(row_dir, fname)
-                    with open(fpath, "w", encoding="utf-8") as f:
-                        f.write(resp.text)
-                    downloaded.append({
-                        "filename": fname,
-                        "source_url": url,
-                        "wayback_url": wb_url,
-                        "size_bytes": os.path.getsize(fpath),
-                        "source": "wayback_redownload",
-                        "needs_conversion": True,
-                    })
-                    return True, downloaded
+                    vr = validate_content(fpath)
+                    if vr.valid:
+                        downloaded.append({
+                            "filename": os.path.basename(fpath),
+                            "source_url": url,
+                            "wayback_url": wb_url,
+                            "wayback_capture": capture_info(capture, attempt),
+                            "size_bytes": os.path.getsize(fpath),
+                            "sha256": sha256_file(fpath),
+                            "source": "wayback_redownload",
+                            "validation": vr.to_dict(),
+                        })
+                        return True, downloaded
+                    else:
+                        os.remove(fpath)
+
+                elif "html" in content_type:
+                    # Check content quality before accepting
+                    doj = check_for_junk_indicators(resp.text, DOJ_INDICATORS)
+                    wbe = check_for_junk_indicators(resp.text, WAYBACK_ERROR_INDICATORS)
+                    if doj or wbe:
+                        continue
+
+                    visible = extract_visible_text(resp.text)
+                    if len(visible) >= 500:
+                        fname = "repaired_wayback_page.html"
+                        fpath = os.path.join(row_dir, fname)
+                        with open(fpath, "w", encoding="utf-8") as f:
+                            f.write(resp.text)
+                        downloaded.append({
+                            "filename": fname,
+                            "source_url": url,
+                            "wayback_url": wb_url,
+                            "wayback_capture": capture_info(capture, attempt),
+                            "size_bytes": os.path.getsize(fpath),
+                            "source": "wayback_redownload",
+                            "needs_conversion": True,
+                        })
+                        return True, downloaded
 
-        except requests.exceptions.RequestException:
-            continue
+            except requests.exceptions.RequestException:
+                continue
 
     return False, []
 
@@ -524,9 +481,12 @@ def phase1_redownload(output_dir, dry_run=False):
 # PHASE 2: Convert HTML files to clean PDFs
 # ══════════════════════════════════════════════════════════════════════════
 
-def identify_html_files(output_dir):
+def identify_html_files(output_dir, backend=None):
     """
     Find all HTML files that are valid content but need PDF conversion.
+    With an html_pdf backend, HTML whose recorded conversion by that
+    backend was made from a different source hash or render config is
+    picked up again to replace its stale PDF.
     Returns list of dicts: {row, row_dir, html_files, metadata}
     """
     html_rows = []
@@ -580,7 +540,21 @@ def identify_html_files(output_dir):
                     if vr.valid:
                         valid_pdfs.append(pf)
 
-                if valid_pdfs:
+                # A PDF we converted from this HTML under another source or config?
+                stale_pdf = None
+                if backend is not None:
+                    job = {"html_path": fpath, "header": metadata_header(metadata),
+                           "base_url": base_url_for(metadata, fname)}
+                    renderer, _ = backend.route(job)
+                    render_config = renderer.render_config(job)
+                    for entry in metadata.get("converted_pdfs", []):
+                        if (entry.get("from_html") == fname and entry.get("render_config")
+                                and entry.get("method") == renderer.name
+                                and (entry["render_config"] != render_config
+                                     or entry.get("html_sha256") != sha256_file(fpath))):
+                            stale_pdf = entry.get("pdf")
+
+                if valid_pdfs and not stale_pdf:
                     continue  # Already has a valid PDF, skip
 
                 # Validate the HTML
@@ -590,6 +564,7 @@ def identify_html_files(output_dir):
                         "filename": fname,
                         "filepath": fpath,
                         "size": os.path.getsize(fpath),
+                        "replaces": stale_pdf,
                     })
 
         if html_files:
@@ -603,109 +578,150 @@ def identify_html_files(output_dir):
     return html_rows
 
 
-def convert_with_playwright(html_path, pdf_path, logger):
-    """Convert HTML to clean PDF using Playwright."""
-    from playwright.sync_api import sync_playwright
-
-    with open(html_path, "r", encoding="utf-8", errors="ignore") as f:
-        html_content = f.read()
-
-    # Inject clean CSS
-    if "</head>" in html_content.lower():
-        html_content = re.sub(r"(</head>)", CLEAN_CSS + r"\1",
-                              html_content, count=1, flags=re.IGNORECASE)
-    else:
-        html_content = CLEAN_CSS + html_content
+def plan_pdf_paths(row_info):
+    """
+    Pick an output PDF path for each HTML file of a row, never reusing an
+    existing file or a name already given to a sibling.
+    Returns list of (html_file_dict, pdf_path).
+    """
+    row_dir = row_info["row_dir"]
+    doc_num = row_info["metadata"].get("doc_number", "").strip()
+    taken = set()
+    planned = []
+
+    for hf in row_info["html_files"]:
+        # Re-render of a stale conversion: keep its name
+        if hf.get("replaces"):
+            taken.add(hf["replaces"])
+            planned.append((hf, os.path.join(row_dir, hf["replaces"])))
+            continue
 
-    temp_html = html_path + ".clean.tmp.html"
-    with open(temp_html, "w", encoding="utf-8") as f:
-        f.write(html_content)
+        # Generate PDF name
+        if doc_num:
+            base = re.sub(r'[^a-zA-Z0-9_-]', '_', doc_num)
+        else:
+            base = os.path.splitext(hf["filename"])[0]
 
-    try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            page.goto(f"file:///{os.path.abspath(temp_html).replace(os.sep, '/')}")
-            page.wait_for_load_state("networkidle")
-
-            visible_chars = page.evaluate(CLEANUP_JS)
-
-            if visible_chars < 200:
-                browser.close()
-                return False, f"insufficient_content ({visible_chars} chars)"
-
-            page.pdf(
-                path=pdf_path,
-                format="Letter",
-                margin={"top": "0.75in", "bottom": "0.75in",
-                        "left": "0.75in", "right": "0.75in"},
-                print_background=False,
-            )
-            browser.close()
-
-        if os.path.exists(pdf_path) and os.path.getsize(pdf_path) > 1000:
-            return True, "ok"
-        return False, "pdf_too_small"
-
-    except Exception as e:
-        return False, str(e)
-    finally:
-        if os.path.exists(temp_html):
-            os.remove(temp_html)
-
-
-def convert_with_reportlab(html_path, pdf_path, metadata, logger):
-    """Fallback PDF conversion using reportlab."""
-    try:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-        from reportlab.lib.units import inch
-    except ImportError:
-        return False, "reportlab not installed"
+        pdf_name = f"{base}.pdf"
+        n = 1
+        # Don't overwrite existing
+        while pdf_name in taken or os.path.exists(os.path.join(row_dir, pdf_name)):
+            pdf_name = f"{base}_clean.pdf" if n == 1 else f"{base}_clean{n}.pdf"
+            n += 1
 
-    with open(html_path, "r", encoding="utf-8", errors="ignore") as f:
-        html_content = f.read()
+        taken.add(pdf_name)
+        planned.append((hf, os.path.join(row_dir, pdf_name)))
+    return planned
 
-    text = extract_visible_text(html_content)
-    if len(text) < 200:
-        return False, "insufficient_content"
 
+def record_converted_pdf(row_dir, pdf_path, html_name, method, extra=None):
+    """
+    Add a converted_pdfs entry to the row's metadata.json, replacing any
+    earlier entry for the same PDF. `extra` carries the cache fields
+    (html_sha256, render_config, cache_hit) and, when routed, the page's
+    complexity score and route.
+    """
+    meta_path = os.path.join(row_dir, "metadata.json")
+    if not os.path.exists(meta_path):
+        return
     try:
-        doc = SimpleDocTemplate(pdf_path, pagesize=letter,
-                                leftMargin=0.75*inch, rightMargin=0.75*inch,
-                                topMargin=0.75*inch, bottomMargin=0.75*inch)
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle('DocTitle', parent=styles['Heading1'],
-                                     fontSize=14, spaceAfter=12)
-        body_style = ParagraphStyle('DocBody', parent=styles['Normal'],
-                                    fontSize=11, leading=14, spaceAfter=8)
-        story = []
-
-        doc_num = metadata.get("doc_number", "")
-        title = metadata.get("title", "")
-        if doc_num or title:
-            header = f"{doc_num} — {title}" if doc_num and title else (doc_num or title)
-            header = header.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-            story.append(Paragraph(header, title_style))
-            story.append(Spacer(1, 12))
-
-        paragraphs = [p.strip() for p in text.split('\n') if p.strip()]
-        for para in paragraphs:
-            para = para.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-            try:
-                story.append(Paragraph(para[:2000], body_style))
-            except Exception:
-                pass
-
-        doc.build(story)
-        return True, "ok"
-    except Exception as e:
-        return False, str(e)
+        with open(meta_path, "r", encoding="utf-8") as f:
+            m = json.load(f)
+        pdf_name = os.path.basename(pdf_path)
+        m["converted_pdfs"] = [e for e in m.get("converted_pdfs", [])
+                               if e.get("pdf") != pdf_name]
+        m["converted_pdfs"].append({
+            "pdf": pdf_name,
+            "from_html": html_name,
+            "size_bytes": os.path.getsize(pdf_path),
+            "sha256": sha256_file(pdf_path),
+            "method": method,
+            "converted_at": datetime.now(timezone.utc).isoformat(),
+            **(extra or {}),
+        })
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(m, f, indent=2, ensure_ascii=False, default=str)
+    except Exception:
+        pass
+
+
+def build_jobs(html_rows):
+    """One html_pdf job per HTML file to convert, carrying its row."""
+    jobs = []
+    for row_info in html_rows:
+        header = metadata_header(row_info["metadata"])
+        for hf, pdf_path in plan_pdf_paths(row_info):
+            jobs.append({"html_path": hf["filepath"], "pdf_path": pdf_path,
+                         "header": header, "size": hf["size"],
+                         "base_url": base_url_for(row_info["metadata"], hf["filename"]),
+                         "row_info": row_info, "html_file": hf})
+    return jobs
+
+
+def convert_rows(html_rows, stats, converter, logger):
+    """
+    Convert all rows on a started html_pdf Converter, recording each PDF
+    in its row's metadata as it finishes. rows/min progress counts rows
+    whose files are all done.
+    """
+    jobs = build_jobs(html_rows)
+    remaining = defaultdict(int)
+    for job in jobs:
+        remaining[job["row_info"]["row"]] += 1
 
+    batch_start = datetime.now()
+    rows_done = [0]
 
-def phase2_convert(output_dir, dry_run=False, use_playwright=True):
-    """Phase 2: Convert valid HTML files to clean PDFs."""
+    def on_done(job, ok, reason, info):
+        row_info, hf, pdf_path = job["row_info"], job["html_file"], job["pdf_path"]
+        row_id = row_info["row"]
+        if ok:
+            stats["converted"] += 1
+            stats["details"].append({"row": row_id, "html": hf["filename"],
+                                     "pdf": os.path.basename(pdf_path), "result": "ok",
+                                     "cache_hit": bool(info.get("cache_hit"))})
+            record_converted_pdf(row_info["row_dir"], pdf_path, hf["filename"],
+                                 job["method"], info)
+        else:
+            stats["failed"] += 1
+            stats["details"].append({"row": row_id, "html": hf["filename"],
+                                     "result": "failed", "reason": reason})
+            logger.debug(f"  {row_id}: Failed — {reason} ({job['seconds']:.1f}s)")
+
+        remaining[row_id] -= 1
+        if remaining[row_id] == 0:
+            rows_done[0] += 1
+            # Progress every 100 rows
+            if rows_done[0] % 100 == 0:
+                elapsed = (datetime.now() - batch_start).total_seconds()
+                rate = rows_done[0] / elapsed * 60 if elapsed > 0 else 0
+                logger.info(f"  Progress: {rows_done[0]}/{len(html_rows)} rows | "
+                            f"{stats['converted']} converted | {rate:.0f} rows/min")
+
+    stats["engine"] = converter.run(jobs, on_done)
+
+
+def phase2_convert(output_dir, dry_run=False, use_playwright=True, workers=DEFAULT_POOL_SIZE,
+                   engine="pool", job_timeout=DEFAULT_JOB_TIMEOUT, offline=True,
+                   use_cache=True, retry_quarantined=False, route=True,
+                   route_threshold=DEFAULT_THRESHOLD):
+    """
+    Phase 2: Convert valid HTML files to clean PDFs.
+    With Playwright, rows are converted `workers` at a time on a shared
+    pool of long-lived browsers instead of one launch per file, or with
+    engine="async", `workers` pages at a time on one asyncio-driven browser.
+    Renders are offline (no network, see offline_render.py) unless
+    offline=False, and go through the conversion cache unless use_cache is
+    False, so unchanged sources under an unchanged render config are never
+    rendered twice. The render itself is html_pdf.py's.
+    Every render has a `job_timeout` deadline after which its browser or
+    worker process is killed and replaced; inputs that failed several
+    runs in a row are skipped unless retry_quarantined (see
+    conversion_watchdog.py).
+    With route (the default), only pages whose complexity score reaches
+    route_threshold go to the browser; plain ones are rendered as text
+    PDFs (see complexity.py).
+    """
     logger = logging.getLogger("repair")
 
     logger.info("")
@@ -714,7 +730,12 @@ def phase2_convert(output_dir, dry_run=False, use_playwright=True):
     logger.info("=" * 60)
 
     logger.info("Identifying HTML files needing conversion...")
-    html_rows = identify_html_files(output_dir)
+    if not use_playwright:
+        name = "reportlab"
+    else:
+        name = "auto" if route else "playwright"
+    backend = get_backend(name, offline, engine, job_timeout, route_threshold)
+    html_rows = identify_html_files(output_dir, backend)
 
     total_files = sum(len(r["html_files"]) for r in html_rows)
     logger.info(f"  Found {total_files} HTML files across {len(html_rows)} rows")
@@ -729,98 +750,46 @@ def phase2_convert(output_dir, dry_run=False, use_playwright=True):
             logger.info(f"    ... and {len(html_rows) - 10} more rows")
         return {"identified": total_files, "converted": 0, "failed": 0}
 
-    # Check Playwright availability
+    stats = {"converted": 0, "failed": 0, "skipped": 0, "details": []}
+    cache = ConversionCache() if use_cache else None
+    quarantine = Quarantine()
+
+    # Only a failed launch falls back; errors once rows are converting propagate
+    converter = None
     if use_playwright:
         try:
-            from playwright.sync_api import sync_playwright
-            # Quick test
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                browser.close()
-            logger.info("  Playwright: ready")
-        except Exception as e:
+            converter = Converter(backend, workers, cache, quarantine, not retry_quarantined)
+        except RuntimeError as e:
             logger.warning(f"  Playwright not available ({e}) — using reportlab fallback")
-            use_playwright = False
-
-    stats = {"converted": 0, "failed": 0, "skipped": 0, "details": []}
-    batch_start = datetime.now()
-
-    for i, row_info in enumerate(html_rows):
-        row_id = row_info["row"]
-        row_dir = row_info["row_dir"]
-        metadata = row_info["metadata"]
-
-        for hf in row_info["html_files"]:
-            html_path = hf["filepath"]
-
-            # Generate PDF name
-            doc_num = metadata.get("doc_number", "").strip()
-            if doc_num:
-                safe_name = re.sub(r'[^a-zA-Z0-9_-]', '_', doc_num)
-                pdf_name = f"{safe_name}.pdf"
-            else:
-                base = os.path.splitext(hf["filename"])[0]
-                pdf_name = f"{base}.pdf"
-
-            pdf_path = os.path.join(row_dir, pdf_name)
-
-            # Don't overwrite existing
-            if os.path.exists(pdf_path):
-                base, ext = os.path.splitext(pdf_path)
-                pdf_path = f"{base}_clean{ext}"
-                pdf_name = os.path.basename(pdf_path)
-
-            # Convert
-            if use_playwright:
-                success, reason = convert_with_playwright(html_path, pdf_path, logger)
-            else:
-                success, reason = convert_with_reportlab(html_path, pdf_path, metadata, logger)
-
-            if success:
-                stats["converted"] += 1
-                stats["details"].append({
-                    "row": row_id, "html": hf["filename"],
-                    "pdf": pdf_name, "result": "ok"
-                })
-
-                # Update metadata
-                meta_path = os.path.join(row_dir, "metadata.json")
-                if os.path.exists(meta_path):
-                    try:
-                        with open(meta_path, "r", encoding="utf-8") as f:
-                            m = json.load(f)
-                        if "converted_pdfs" not in m:
-                            m["converted_pdfs"] = []
-                        m["converted_pdfs"].append({
-                            "pdf": pdf_name,
-                            "from_html": hf["filename"],
-                            "size_bytes": os.path.getsize(pdf_path),
-                            "sha256": sha256_file(pdf_path),
-                            "method": "playwright" if use_playwright else "reportlab",
-                            "converted_at": datetime.now(timezone.utc).isoformat(),
-                        })
-                        with open(meta_path, "w", encoding="utf-8") as f:
-                            json.dump(m, f, indent=2, ensure_ascii=False, default=str)
-                    except Exception:
-                        pass
+        else:
+            if engine == "async":
+                logger.info(f"  Playwright: async engine ({workers} pages, "
+                            f"{job_timeout}s timeout)")
             else:
-                stats["failed"] += 1
-                stats["details"].append({
-                    "row": row_id, "html": hf["filename"],
-                    "result": "failed", "reason": reason
-                })
-                logger.debug(f"  {row_id}: Failed — {reason}")
-
-        # Progress every 100 rows
-        if (i + 1) % 100 == 0:
-            elapsed = (datetime.now() - batch_start).total_seconds()
-            rate = (i + 1) / elapsed * 60 if elapsed > 0 else 0
-            logger.info(f"  Progress: {i+1}/{len(html_rows)} rows | "
-                        f"{stats['converted']} converted | {rate:.0f} rows/min")
+                logger.info(f"  Playwright: ready ({workers} browsers, "
+                            f"{job_timeout}s timeout)")
+            if route:
+                logger.info(f"  Routing: complexity < {route_threshold} → reportlab")
+    if converter is None:
+        converter = Converter(get_backend("reportlab", job_timeout=job_timeout), workers,
+                              cache, quarantine, not retry_quarantined)
+    with converter:
+        convert_rows(html_rows, stats, converter, logger)
+
+    if cache is not None:
+        stats["cache"] = dict(cache.stats)
 
     logger.info(f"\n  Phase 2 complete:")
     logger.info(f"    Converted:  {stats['converted']}")
     logger.info(f"    Failed:     {stats['failed']}")
+    quarantined = stats.get("engine", {}).get("quarantined", 0)
+    if quarantined:
+        logger.info(f"    Quarantined (skipped): {quarantined}")
+    if cache is not None:
+        logger.info(f"    Cache hits: {cache.stats['hits']}")
+    by_method = stats.get("engine", {}).get("by_method", {})
+    if len(by_method) > 1:
+        logger.info("    By method:  " + ", ".join(f"{m} {n}" for m, n in sorted(by_method.items())))
 
     return stats
 
@@ -837,8 +806,29 @@ def main():
     parser.add_argument("--dry-run", action="store_true", help="Preview only")
     parser.add_argument("--no-playwright", action="store_true",
                         help="Use reportlab instead of Playwright for conversion")
+    parser.add_argument("--workers", type=int, default=DEFAULT_POOL_SIZE,
+                        help="Browsers in the Playwright pool (pages with --engine async, "
+                             "processes with the text fallback)")
+    parser.add_argument("--engine", choices=["pool", "async"], default="pool",
+                        help="Phase 2 Playwright engine: thread pool of browsers, "
+                             "or asyncio pages on one browser")
+    parser.add_argument("--job-timeout", type=float, default=DEFAULT_JOB_TIMEOUT,
+                        help="Seconds per file before its render is killed")
+    parser.add_argument("--retry-quarantined", action="store_true",
+                        help="Also convert inputs quarantined after repeated failures")
+    parser.add_argument("--no-route", action="store_true",
+                        help="Render every page in the browser, however plain")
+    parser.add_argument("--route-threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Complexity score from which a page goes to the browser")
+    parser.add_argument("--allow-network", action="store_true",
+                        help="Let pages fetch remote CSS/fonts/images while rendering "
+                             "(default: offline, cached assets only)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always render, bypassing the conversion cache")
     parser.add_argument("--verbose", "-v", action="store_true")
+    warc_session.add_arguments(parser)
     args = parser.parse_args()
+    warc_session.setup(args.warc_record, args.warc_replay, stage="repair")
 
     logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
                         format=LOG_FORMAT, datefmt=LOG_DATE)
@@ -867,7 +857,11 @@ def main():
 
     # Phase 2
     if args.phase is None or args.phase == 2:
-        all_stats["phase2"] = phase2_convert(output_dir, args.dry_run, use_playwright)
+        all_stats["phase2"] = phase2_convert(output_dir, args.dry_run, use_playwright,
+                                             args.workers, args.engine, args.job_timeout,
+                                             not args.allow_network, not args.no_cache,
+                                             args.retry_quarantined, not args.no_route,
+                                             args.route_threshold)
 
     elapsed = datetime.now() - start_time
 
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+ACF Guidance Harvester v2 — Rule-Pack Validation Engine
+=========================================================
+Runs content validation as an ordered list of rules loaded from YAML (or
+JSON) rule packs instead of the fixed sequence in validate_content(), for
+audits (audit_v1.py --rules). The pipeline itself keeps calling
+validate_content(); the default pack names validate.py's constants
+(MIN_TEXT_CHARS, GENERIC_ERROR_MAX_CHARS, ...) for its thresholds, so the
+two agree unless a pack overrides a value with a number to try it out.
+
+Each rule declares the inputs it needs (size, header, text, visible text),
+and reading an undeclared input raises RulePackError. Inputs are computed
+lazily and cached per file, so a rule that never runs never pays for them,
+and rules sharing an input compute it once. Rules are stable-sorted by
+input cost so cheap checks short-circuit first.
+
+Per-rule evaluation counts, hit counts and cumulative time are collected
+for audit reports.
+
+Usage:
+  python rule_engine.py <file_or_directory>              # default pack
+  python rule_engine.py <target> --rules my_pack.yaml    # custom pack(s)
+
+Requires: pip install pyyaml  (for YAML packs; JSON packs need nothing)
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import logging
+from collections import OrderedDict
+
+import validate
+from validate import (
+    ValidationResult, detect_file_type, check_binary_structure,
+    check_for_junk_indicators, extract_visible_text, count_visible_chars,
+    count_visible_chars_in_file, read_bounded, SHELL_ONLY_PATTERNS,
+)
+from simhash_index import simhash
+
+logger = logging.getLogger("acf_v2.rules")
+
+RULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules")
+DEFAULT_PACK = os.path.join(RULES_DIR, "default.yaml")
+
+# Relative cost of each input; rules are stable-sorted by their most
+# expensive declared input.
+INPUT_COSTS = OrderedDict([
+    ("size", 0),
+    ("header", 1),
+    ("text", 2),
+    ("visible_chars", 3),
+    ("visible_text", 4),
+])
+
+
+class RulePackError(Exception):
+    """Raised for malformed rule packs."""
+
+
+# ── Lazy per-file inputs ─────────────────────────────────────────────────
+
+class ValidationContext:
+    """
+    Per-file inputs for rule checks, each computed on first access.
+    `visible_limit` caps visible-text counting on files too large to read
+    whole (see validate.count_visible_chars). While a rule runs, only the
+    inputs in its `needs` may be read (see use()).
+    """
+
+    def __init__(self, filepath, visible_limit):
+        self.filepath = filepath
+        self.visible_limit = visible_limit
+        self._cache = {}
+        self._rule = None
+        self._allowed = None        # None = any input
+
+    def use(self, rule=None):
+        """Restrict input access to rule.needs; use() lifts the restriction."""
+        self._rule = rule
+        self._allowed = set(rule.needs) if rule else None
+
+    def _declared(self, name):
+        if self._allowed is not None and name not in self._allowed:
+            raise RulePackError(f"{self._rule.pack}/{self._rule.id}: reads input "
+                                f"'{name}' not declared in needs")
+
+    def _get(self, name, compute):
+        if name not in self._cache:
+            self._cache[name] = compute()
+        return self._cache[name]
+
+    @property
+    def size(self):
+        self._declared("size")
+        return self._get("size", lambda: os.path.getsize(self.filepath))
+
+    @property
+    def actual_type(self):
+        self._declared("header")
+        return self._get("header", lambda: detect_file_type(self.filepath))
+
+    @property
+    def ext(self):
+        return os.path.splitext(self.filepath)[1].lower()
+
+    def _read_text(self):
+        head, tail, truncated = read_bounded(self.filepath)
+        return {"head": head, "window": head + "\n" + tail if truncated else head,
+                "truncated": truncated}
+
+    @property
+    def truncated(self):
+        self._declared("text")
+        return self._get("text", self._read_text)["truncated"]
+
+    @property
+    def text(self):
+        """Full content, or head + tail windows for very large files."""
+        self._declared("text")
+        return self._get("text", self._read_text)["window"]
+
+    def _count_visible(self):
+        text = self._get("text", self._read_text)
+        if not text["truncated"]:
+            return len(self._get("visible_text", self._extract_visible))
+        count = count_visible_chars(text["head"], self.visible_limit)
+        if count < self.visible_limit:
+            count = count_visible_chars_in_file(self.filepath, self.visible_limit)
+        return count
+
+    def _extract_visible(self):
+        return extract_visible_text(self._get("text", self._read_text)["head"])
+
+    @property
+    def visible_chars(self):
+        self._declared("visible_chars")
+        return self._get("visible_chars", self._count_visible)
+
+    @property
+    def visible_text(self):
+        self._declared("visible_text")
+        return self._get("visible_text", self._extract_visible)
+
+
+# ── Rule checks ──────────────────────────────────────────────────────────
+# Each check takes (ctx, params) and returns None to continue, or a
+# ValidationResult to stop with that verdict.
+
+_CONSTANT_NAME = re.compile(r"^[A-Z][A-Z0-9_]*$")
+
+
+def _resolve_param(value):
+    """
+    Parameters are given inline, or by the name of a constant in validate.py
+    (an indicator list like DOJ_INDICATORS, a threshold like MIN_TEXT_CHARS).
+    """
+    if isinstance(value, str) and _CONSTANT_NAME.match(value):
+        if not hasattr(validate, value):
+            raise RulePackError(f"Unknown validate.py constant: {value}")
+        return getattr(validate, value)
+    return value
+
+
+def check_file_exists(ctx, params):
+    if not os.path.exists(ctx.filepath):
+        return ValidationResult(False, ctx.filepath, "file_not_found")
+
+
+def check_file_size(ctx, params):
+    if ctx.size == 0:
+        return ValidationResult(False, ctx.filepath, "file_empty")
+    if ctx.size < params.get("min_bytes", validate.MIN_FILE_BYTES):
+        return ValidationResult(False, ctx.filepath, "file_too_small",
+                                {"size_bytes": ctx.size})
+
+
+def check_binary_document(ctx, params):
+    actual_type = ctx.actual_type
+    details = {"actual_type": actual_type, "size_bytes": ctx.size}
+
+    if actual_type in ("pdf", "zip_based", "ole", "rtf"):
+        reason, struct_details = check_binary_structure(ctx.filepath, actual_type, ctx.size)
+        return ValidationResult(reason == "ok", ctx.filepath, reason,
+                                {**details, **struct_details})
+    if actual_type in ("png", "jpg", "gif"):
+        return ValidationResult(True, ctx.filepath, "ok", details)
+    if actual_type not in ("html", "text"):
+        if ctx.size > params.get("unknown_binary_min_bytes", validate.UNKNOWN_BINARY_MIN_BYTES):
+            return ValidationResult(True, ctx.filepath, "ok",
+                                    {"actual_type": "unknown_binary", "size_bytes": ctx.size})
+        return ValidationResult(False, ctx.filepath, "file_too_small", details)
+
+
+def check_html_masquerade(ctx, params):
+    if ctx.ext == ".pdf" and ctx.actual_type == "html":
+        return ValidationResult(False, ctx.filepath, "html_masquerade",
+                                {"declared_type": "pdf", "actual_type": "html"})
+
+
+def check_indicators(ctx, params):
+    matches = check_for_junk_indicators(ctx.text, params["indicators"])
+    if matches:
+        return ValidationResult(False, ctx.filepath, params["reason"],
+                                {"matched_indicators": matches})
+
+
+def check_generic_error(ctx, params):
+    matches = check_for_junk_indicators(ctx.text, params["indicators"])
+    if matches and ctx.visible_chars < params.get("max_visible_chars",
+                                                  validate.GENERIC_ERROR_MAX_CHARS):
+        return ValidationResult(False, ctx.filepath, params.get("reason", "generic_error_page"),
+                                {"matched_indicators": matches,
+                                 "visible_chars": ctx.visible_chars})
+
+
+def check_empty_shell(ctx, params):
+    if ctx.visible_chars >= params.get("min_text_chars", validate.MIN_TEXT_CHARS):
+        return None
+    patterns = params.get("shell_patterns", SHELL_ONLY_PATTERNS)
+    shell = any(re.search(p, ctx.text, re.IGNORECASE) for p in patterns)
+    return ValidationResult(False, ctx.filepath,
+                            "shell_page_no_content" if shell else "insufficient_content",
+                            {"visible_chars": ctx.visible_chars})
+
+
+def check_learned_template(ctx, params):
+    index = validate._learned_junk_index
+    if not index:
+        return None
+    hit = index.nearest(simhash(ctx.visible_text))
+    if hit:
+        distance, _, template_id = hit
+        return ValidationResult(False, ctx.filepath, "learned_junk_template",
+                                {"template_id": template_id, "distance": distance,
+                                 "visible_chars": len(ctx.visible_text)})
+
+
+CHECKS = {
+    "file_exists": check_file_exists,
+    "file_size": check_file_size,
+    "binary_document": check_binary_document,
+    "html_masquerade": check_html_masquerade,
+    "indicators": check_indicators,
+    "generic_error": check_generic_error,
+    "empty_shell": check_empty_shell,
+    "learned_template": check_learned_template,
+}
+
+
+# ── Rule packs ───────────────────────────────────────────────────────────
+
+def load_rule_pack(path):
+    """Load a rule pack from YAML or JSON. Returns the parsed dict."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.lower().endswith(".json"):
+            pack = json.load(f)
+        else:
+            try:
+                import yaml
+            except ImportError:
+                raise RulePackError("PyYAML is required for YAML rule packs "
+                                    "(pip install pyyaml), or use a .json pack")
+            pack = yaml.safe_load(f)
+
+    if not isinstance(pack, dict) or not isinstance(pack.get("rules"), list):
+        raise RulePackError(f"{path}: rule pack needs a top-level 'rules' list")
+    return pack
+
+
+class Rule:
+    def __init__(self, spec, pack_name):
+        self.id = spec.get("id") or spec.get("check")
+        self.check_name = spec.get("check")
+        if self.check_name not in CHECKS:
+            raise RulePackError(f"{pack_name}/{self.id}: unknown check '{self.check_name}'")
+        self.check = CHECKS[self.check_name]
+        self.needs = list(spec.get("needs", []))
+        unknown = [n for n in self.needs if n not in INPUT_COSTS]
+        if unknown:
+            raise RulePackError(f"{pack_name}/{self.id}: unknown inputs {unknown}")
+        self.params = {k: _resolve_param(v) for k, v in spec.get("params", {}).items()}
+        self.pack = pack_name
+        self.cost = max((INPUT_COSTS[n] for n in self.needs), default=-1)
+        self.evaluated = 0
+        self.hits = 0
+        self.seconds = 0.0
+
+
+class RuleEngine:
+    """Ordered rules from one or more packs, with per-rule timing."""
+
+    def __init__(self, packs):
+        self.rules = []
+        for pack in packs:
+            name = pack.get("name", "unnamed")
+            rules = [Rule(spec, name) for spec in pack["rules"]]
+            if pack.get("sort_by_cost", True):
+                rules.sort(key=lambda r: r.cost)
+            self.rules.extend(rules)
+
+        # Large files count visible text only up to the highest threshold
+        self.visible_limit = max(
+            [r.params.get("min_text_chars", 0) for r in self.rules] +
+            [r.params.get("max_visible_chars", 0) for r in self.rules] + [1])
+        self.files = 0
+
+    @classmethod
+    def from_files(cls, paths=None):
+        return cls([load_rule_pack(p) for p in (paths or [DEFAULT_PACK])])
+
+    def validate(self, filepath):
+        """Run the rules against one file. Returns a ValidationResult."""
+        ctx = ValidationContext(filepath, self.visible_limit)
+        self.files += 1
+
+        for rule in self.rules:
+            start = time.perf_counter()
+            ctx.use(rule)
+            try:
+                result = rule.check(ctx, rule.params)
+            except (OSError, IOError) as e:
+                result = ValidationResult(False, filepath, "read_error", {"error": str(e)})
+            finally:
+                ctx.use()
+            rule.seconds += time.perf_counter() - start
+            rule.evaluated += 1
+            if result is not None:
+                rule.hits += 1
+                result.details.setdefault("rule", rule.id)
+                return result
+
+        details = {"actual_type": ctx.actual_type, "size_bytes": ctx.size}
+        if ctx.actual_type in ("html", "text"):
+            details["visible_chars"] = ctx.visible_chars
+            if ctx.truncated:
+                details["bounded_read"] = True
+        return ValidationResult(True, filepath, "ok", details)
+
+    def stats(self):
+        """Per-rule counters for audit reports, in execution order."""
+        return {
+            "files": self.files,
+            "rules": [{
+                "id": r.id, "pack": r.pack, "check": r.check_name,
+                "needs": r.needs, "evaluated": r.evaluated, "hits": r.hits,
+                "total_ms": round(r.seconds * 1000, 3),
+                "avg_ms": round(r.seconds * 1000 / r.evaluated, 4) if r.evaluated else 0.0,
+            } for r in self.rules],
+        }
+
+
+# ── CLI for standalone testing ───────────────────────────────────────────
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Validate files with a rule pack")
+    parser.add_argument("target", help="File or harvest row directory")
+    parser.add_argument("--rules", action="append", default=None,
+                        help="Rule pack (YAML/JSON); repeat to chain packs")
+    args = parser.parse_args()
+
+    engine = RuleEngine.from_files(args.rules)
+
+    if os.path.isdir(args.target):
+        paths = [os.path.join(args.target, f) for f in sorted(os.listdir(args.target))
+                 if f != "metadata.json" and os.path.isfile(os.path.join(args.target, f))]
+    elif os.path.isfile(args.target):
+        paths = [args.target]
+    else:
+        print(f"Not found: {args.target}")
+        sys.exit(1)
+
+    for path in paths:
+        r = engine.validate(path)
+        status = "✓ PASS" if r.valid else "✗ FAIL"
+        print(f"  {status}  {os.path.basename(path):40s}  {r.reason}")
+
+    print("\n  Rule timings:")
+    for s in engine.stats()["rules"]:
+        print(f"    {s['id']:20s}  evaluated {s['evaluated']:5d}  hits {s['hits']:5d}"
+              f"  {s['total_ms']:9.2f} ms")
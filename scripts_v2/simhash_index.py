@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+ACF Guidance Harvester v2 — SimHash Fingerprints
+==================================================
+64-bit SimHash fingerprints of page text plus a banded index for
+near-duplicate lookup.
+
+Two pages whose fingerprints differ in at most `max_distance` bits are
+treated as the same template. The index splits each fingerprint into
+max_distance + 1 bands; by the pigeonhole principle any two fingerprints
+within that distance share at least one band exactly, so a lookup only
+compares against the handful of entries in the matching band buckets
+instead of the whole collection.
+
+Pure standard library so validate.py can use it without extra deps.
+"""
+
+import re
+import hashlib
+from collections import Counter, defaultdict
+
+FINGERPRINT_BITS = 64
+DEFAULT_MAX_DISTANCE = 6      # bits; same template with a different title/date
+SHINGLE_SIZE = 3              # words per shingle
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _hash64(token):
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text, shingle_size=SHINGLE_SIZE):
+    """
+    Compute a 64-bit SimHash of text from weighted word shingles.
+    Returns 0 for text with no words.
+    """
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return 0
+    if len(words) < shingle_size:
+        shingles = Counter([" ".join(words)])
+    else:
+        shingles = Counter(" ".join(words[i:i + shingle_size])
+                           for i in range(len(words) - shingle_size + 1))
+
+    # Accumulate weights per (byte position, byte value) rather than per
+    # bit: 8 updates per shingle instead of 64, then expand to bits once.
+    total = 0
+    byte_weights = [defaultdict(int) for _ in range(FINGERPRINT_BITS // 8)]
+    for shingle, weight in shingles.items():
+        h = _hash64(shingle)
+        total += weight
+        for i, weights in enumerate(byte_weights):
+            weights[(h >> (8 * i)) & 0xFF] += weight
+
+    fingerprint = 0
+    for i, weights in enumerate(byte_weights):
+        set_weight = [0] * 8
+        for value, weight in weights.items():
+            for bit in range(8):
+                if value >> bit & 1:
+                    set_weight[bit] += weight
+        for bit in range(8):
+            # Bit is set when shingles with it set outweigh those without
+            if 2 * set_weight[bit] > total:
+                fingerprint |= 1 << (8 * i + bit)
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class SimHashIndex:
+    """
+    Banded index of SimHash fingerprints for near-duplicate lookup.
+    Each entry carries an arbitrary key (e.g. a file path or cluster id).
+    """
+
+    def __init__(self, max_distance=DEFAULT_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.num_bands = max_distance + 1
+        # Spread the 64 bits as evenly as possible so no band is tiny
+        # (a 4-bit band would put 1/16 of the collection in each bucket)
+        width, extra = divmod(FINGERPRINT_BITS, self.num_bands)
+        self.bands = []   # (shift, mask)
+        shift = 0
+        for i in range(self.num_bands):
+            bits = width + (1 if i < extra else 0)
+            self.bands.append((shift, (1 << bits) - 1))
+            shift += bits
+        self.buckets = [defaultdict(list) for _ in range(self.num_bands)]
+        self.entries = []   # (fingerprint, key)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _bands(self, fingerprint):
+        for i, (shift, mask) in enumerate(self.bands):
+            yield i, (fingerprint >> shift) & mask
+
+    def add(self, fingerprint, key):
+        idx = len(self.entries)
+        self.entries.append((fingerprint, key))
+        for band, value in self._bands(fingerprint):
+            self.buckets[band][value].append(idx)
+        return idx
+
+    def near(self, fingerprint):
+        """Return [(distance, fingerprint, key)] within max_distance, closest first."""
+        seen = set()
+        hits = []
+        for band, value in self._bands(fingerprint):
+            for idx in self.buckets[band].get(value, ()):
+                if idx in seen:
+                    continue
+                seen.add(idx)
+                fp, key = self.entries[idx]
+                dist = hamming_distance(fingerprint, fp)
+                if dist <= self.max_distance:
+                    hits.append((dist, fp, key))
+        hits.sort(key=lambda h: h[0])
+        return hits
+
+    def nearest(self, fingerprint):
+        """Return the closest (distance, fingerprint, key), or None."""
+        hits = self.near(fingerprint)
+        return hits[0] if hits else None
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+ACF Guidance v2 — Structured Text-PDF Fallback
+================================================
+HTML→PDF without a browser, for machines where Playwright isn't
+available. Replaces the old reportlab fallbacks, which split
+extract_visible_text() output on newlines — text that had already been
+collapsed to one line — and so produced a single paragraph cut at 2,000
+characters.
+
+  - Blocks (headings, paragraphs, list items, tables, preformatted text)
+    come from a streaming html.parser pass over the file read in chunks,
+    so extraction is linear in the input and never holds the whole page.
+  - The reportlab story is built incrementally: build() consumes a
+    window of flowables that refills from the block stream, so even very
+    long documents keep only a bounded number of flowables alive.
+  - Pure functions of (html_path, pdf_path, header), so callers can run
+    rows across a process pool.
+
+Site chrome (nav, header, footer, scripts, styles) is skipped, as in
+validate.extract_visible_text().
+
+Requires: pip install reportlab
+"""
+
+import os
+from html import escape
+from html.parser import HTMLParser
+
+READ_CHUNK = 64 * 1024
+STORY_WINDOW = 200              # flowables alive at once during build()
+MIN_TEXT_CHARS = 200            # less visible text than this isn't worth a PDF
+
+MAX_TABLE_COLS = 6              # wider tables, or ones with long cells,
+MAX_TABLE_CELL_CHARS = 200      # are written out row by row instead
+TABLE_CHUNK_ROWS = 50           # long tables become several Table flowables
+
+SKIP_TAGS = {"script", "style", "noscript", "nav", "header", "footer", "title",
+             "template", "svg", "iframe", "select", "button"}
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+BLOCK_TAGS = {"p", "div", "section", "article", "main", "blockquote", "address",
+              "dd", "dt", "figcaption", "caption", "form", "fieldset", "body"}
+CELL_BREAK_TAGS = {"br", "td", "th", "tr", "li", "table"}
+VOID_TAGS = {"br", "hr", "img", "input", "meta", "link", "area", "base", "col",
+             "embed", "source", "track", "wbr"}
+
+
+# ── Block extraction ─────────────────────────────────────────────────────
+
+class BlockExtractor(HTMLParser):
+    """
+    Streaming HTML → blocks. Completed blocks accumulate in self.blocks
+    for the caller to drain after each feed():
+
+      ("heading", level, text)   ("para", text)   ("pre", text)
+      ("item", depth, marker, text)              ("table", rows)
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks = []
+        self._text = []
+        self._skip = 0
+        self._heading = None
+        self._pre = 0
+        self._lists = []          # stack of [ordered, counter]
+        self._in_item = False
+        self._table = None        # rows of the current (outermost) table
+        self._table_depth = 0
+        self._row = None
+        self._cell = None
+
+    # ── helpers ──
+
+    def _flush(self):
+        if self._cell is not None:
+            return                # text stays in the current table cell
+        raw = "".join(self._text)
+        self._text = []
+        if self._pre:
+            text = raw.strip("\n")
+        else:
+            text = " ".join(raw.split())
+        if not text:
+            return
+        if self._heading:
+            self.blocks.append(("heading", self._heading, text))
+        elif self._pre:
+            self.blocks.append(("pre", text))
+        elif self._in_item and self._lists:
+            ordered, counter = self._lists[-1]
+            marker = f"{counter}." if ordered else "•"
+            self.blocks.append(("item", len(self._lists), marker, text))
+        else:
+            self.blocks.append(("para", text))
+
+    # ── HTMLParser callbacks ──
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            if tag not in VOID_TAGS:
+                self._skip += 1
+            return
+        if self._skip:
+            return
+        if tag == "table":
+            self._table_depth += 1
+            if self._table_depth == 1:
+                self._flush()
+                self._table = []
+            return
+        if self._table is not None:
+            if tag == "tr" and self._table_depth == 1:
+                self._row = []
+            elif tag in ("td", "th") and self._row is not None and self._cell is None:
+                self._cell = []
+            elif self._cell is not None and (tag in BLOCK_TAGS or tag in CELL_BREAK_TAGS):
+                self._cell.append(" ")
+            return
+
+        if tag in HEADING_TAGS:
+            self._flush()
+            self._heading = int(tag[1])
+        elif tag in ("ul", "ol"):
+            self._flush()
+            self._lists.append([tag == "ol", 0])
+        elif tag == "li":
+            self._flush()
+            if self._lists:
+                self._lists[-1][1] += 1
+            self._in_item = True
+        elif tag == "pre":
+            self._flush()
+            self._pre += 1
+        elif tag == "br":
+            self._text.append("\n" if self._pre else " ")
+            if not self._pre and not self._heading and not self._in_item:
+                self._flush()
+        elif tag in BLOCK_TAGS or tag == "hr":
+            self._flush()
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            if self._skip:
+                self._skip -= 1
+            return
+        if self._skip:
+            return
+
+        if tag == "table":
+            if self._table_depth == 0:
+                return
+            self._table_depth -= 1
+            if self._table_depth == 0:
+                self._end_row()
+                if self._table:
+                    self.blocks.append(("table", self._table))
+                self._table = None
+            return
+        if self._table is not None:
+            if tag in ("td", "th"):
+                self._end_cell()
+            elif tag == "tr" and self._table_depth == 1:
+                self._end_row()
+            return
+
+        if tag in HEADING_TAGS:
+            self._flush()
+            self._heading = None
+        elif tag in ("ul", "ol"):
+            self._flush()
+            if self._lists:
+                self._lists.pop()
+            self._in_item = bool(self._lists)
+        elif tag == "li":
+            self._flush()
+            self._in_item = False
+        elif tag == "pre":
+            self._flush()
+            self._pre = max(0, self._pre - 1)
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if self._cell is not None:
+            self._cell.append(data)
+        elif self._table is None:
+            self._text.append(data)
+
+    # ── tables ──
+
+    def _end_cell(self):
+        if self._cell is not None and self._row is not None:
+            self._row.append(" ".join("".join(self._cell).split()))
+        self._cell = None
+
+    def _end_row(self):
+        self._end_cell()
+        if self._row is not None and any(self._row):
+            self._table.append(self._row)
+        self._row = None
+
+    def finish(self):
+        self.close()
+        self._end_row()
+        if self._table:
+            self.blocks.append(("table", self._table))
+            self._table = None
+        self._flush()
+
+
+def iter_blocks(html_path, chunk_size=READ_CHUNK):
+    """Yield blocks from an HTML file, reading and parsing it in chunks."""
+    parser = BlockExtractor()
+    with open(html_path, "r", encoding="utf-8", errors="ignore") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            parser.feed(chunk)
+            if parser.blocks:
+                yield from parser.blocks
+                parser.blocks = []
+    parser.finish()
+    yield from parser.blocks
+
+
+def block_text_len(block):
+    if block[0] == "table":
+        return sum(len(c) for row in block[1] for c in row)
+    return len(block[-1])
+
+
+# ── Story building ───────────────────────────────────────────────────────
+
+class StreamingStory(list):
+    """
+    A list of flowables that refills itself from a generator as
+    doc.build() consumes it from the front, so only about `window`
+    flowables exist at once. build() checks len() before every flowable,
+    which is where the refill happens.
+    """
+
+    def __init__(self, flowables, window=STORY_WINDOW):
+        super().__init__()
+        self._source = iter(flowables)
+        self._window = window
+        self._refill()
+
+    def _refill(self):
+        while self._source is not None and list.__len__(self) < self._window:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __len__(self):
+        if self._source is not None and list.__len__(self) < self._window // 2:
+            self._refill()
+        return list.__len__(self)
+
+
+def _styles():
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    base = getSampleStyleSheet()
+    styles = {
+        "title": ParagraphStyle("DocTitle", parent=base["Heading1"], fontSize=14, spaceAfter=12),
+        "body": ParagraphStyle("DocBody", parent=base["Normal"], fontSize=11, leading=14,
+                               spaceAfter=8),
+        "pre": ParagraphStyle("DocPre", parent=base["Code"], fontSize=8.5, leading=10.5),
+        "cell": ParagraphStyle("DocCell", parent=base["Normal"], fontSize=9, leading=11),
+    }
+    for level in range(1, 7):
+        size = max(11, 15 - level)
+        styles[f"h{level}"] = ParagraphStyle(f"DocH{level}", parent=base["Normal"],
+                                             fontName="Helvetica-Bold", fontSize=size,
+                                             leading=size + 3, spaceBefore=8, spaceAfter=6)
+    for depth in range(1, 7):
+        styles[f"item{depth}"] = ParagraphStyle(f"DocItem{depth}", parent=styles["body"],
+                                                leftIndent=14 * depth, bulletIndent=14 * depth - 10,
+                                                spaceAfter=4)
+    return styles
+
+
+def _table_flowables(rows, styles, width):
+    from reportlab.platypus import Paragraph, Table, TableStyle
+    from reportlab.lib import colors
+
+    ncols = max(len(r) for r in rows)
+    longest = max(len(c) for r in rows for c in r)
+    if ncols > MAX_TABLE_COLS or longest > MAX_TABLE_CELL_CHARS:
+        # Too wide for a page — one paragraph per row
+        for row in rows:
+            text = " | ".join(c for c in row if c)
+            if text:
+                yield Paragraph(escape(text), styles["body"])
+        return
+
+    col_width = width / ncols
+    for start in range(0, len(rows), TABLE_CHUNK_ROWS):
+        chunk = rows[start:start + TABLE_CHUNK_ROWS]
+        data = [[Paragraph(escape(c), styles["cell"]) for c in r] + [""] * (ncols - len(r))
+                for r in chunk]
+        table = Table(data, colWidths=[col_width] * ncols, repeatRows=0)
+        table.setStyle(TableStyle([
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ]))
+        yield table
+
+
+def iter_flowables(blocks, header, styles, width):
+    from reportlab.platypus import Paragraph, Spacer, Preformatted
+
+    if header:
+        yield Paragraph(escape(header), styles["title"])
+        yield Spacer(1, 12)
+
+    for block in blocks:
+        kind = block[0]
+        if kind == "heading":
+            yield Paragraph(escape(block[2]), styles[f"h{block[1]}"])
+        elif kind == "para":
+            yield Paragraph(escape(block[1]), styles["body"])
+        elif kind == "item":
+            depth = min(block[1], 6)
+            yield Paragraph(escape(block[3]), styles[f"item{depth}"], bulletText=block[2])
+        elif kind == "pre":
+            yield Preformatted(block[1], styles["pre"], maxLineLength=110)
+        elif kind == "table":
+            yield from _table_flowables(block[1], styles, width)
+
+
+# ── Conversion ───────────────────────────────────────────────────────────
+
+def convert_html_to_text_pdf(html_path, pdf_path, header=None, min_text_chars=MIN_TEXT_CHARS):
+    """
+    Convert one HTML file to a text PDF. `header` (e.g. "doc number — title")
+    is set as the first line. Returns (ok, reason).
+    """
+    try:
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.units import inch
+        from reportlab.platypus import SimpleDocTemplate
+    except ImportError:
+        return False, "reportlab not installed"
+
+    # Buffer blocks only until there's enough text to be worth a PDF
+    blocks = iter_blocks(html_path)
+    head, chars = [], 0
+    for block in blocks:
+        head.append(block)
+        chars += block_text_len(block)
+        if chars >= min_text_chars:
+            break
+    if chars < min_text_chars:
+        return False, "insufficient_content"
+
+    def all_blocks():
+        yield from head
+        yield from blocks
+
+    try:
+        doc = SimpleDocTemplate(pdf_path, pagesize=letter,
+                                leftMargin=0.75*inch, rightMargin=0.75*inch,
+                                topMargin=0.75*inch, bottomMargin=0.75*inch,
+                                title=header or "")
+        story = StreamingStory(iter_flowables(all_blocks(), header, _styles(), doc.width))
+        doc.build(story)
+    except Exception as e:
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
+        return False, str(e)[:300]
+
+    if os.path.exists(pdf_path) and os.path.getsize(pdf_path) > 1000:
+        return True, "ok"
+    return False, "pdf_too_small"
+
+
+def metadata_header(metadata):
+    """The "doc number — title" line the fallback PDFs open with."""
+    doc_num = (metadata.get("doc_number") or "").strip()
+    title = (metadata.get("title") or "").strip()
+    return f"{doc_num} — {title}" if doc_num and title else (doc_num or title)
+
+
+# ── CLI for standalone testing ───────────────────────────────────────────
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 3:
+        print("Usage: python text_pdf.py <input.html> <output.pdf> [header]")
+        sys.exit(1)
+    print(convert_html_to_text_pdf(sys.argv[1], sys.argv[2],
+                                   sys.argv[3] if len(sys.argv) > 3 else None))
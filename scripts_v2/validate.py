@@ -8,6 +8,8 @@ Validates downloaded content to catch the failure modes from v1:
   3. Empty shell pages (nav/header only, no document content)
   4. HTML files masquerading as PDFs
   5. Generic error/redirect pages
+  6. Truncated or corrupt PDF / Office containers
+  7. Pages matching learned junk templates (see find_templates.py)
 
 Every downloaded file passes through validate_content() before being
 accepted into the collection.
@@ -15,9 +17,13 @@ accepted into the collection.
 
 import os
 import re
+import json
 import struct
+import zipfile
 import logging
 
+from simhash_index import simhash, SimHashIndex, DEFAULT_MAX_DISTANCE
+
 logger = logging.getLogger("acf_v2.validate")
 
 # ── Junk content indicators ──────────────────────────────────────────────
@@ -65,6 +71,48 @@ SHELL_ONLY_PATTERNS = [
     r"skip\s+navigation",
 ]
 
+# ── Thresholds ───────────────────────────────────────────────────────────
+# validate_content() uses these; rules/default.yaml refers to them by name,
+# so the audit-only rule engine checks the same limits.
+
+MIN_FILE_BYTES = 200              # anything smaller is a stub
+UNKNOWN_BINARY_MIN_BYTES = 5000   # unknown binaries above this are accepted
+MIN_TEXT_CHARS = 500              # visible text an HTML/text page needs
+
+# ── Bounded reads for very large HTML/text files ─────────────────────────
+# Files up to HEAD + TAIL bytes are read in full, so results for normal
+# pages are unchanged. Larger files (multi-MB Wayback/portal saves) only
+# have the head and tail windows checked for junk indicators.
+
+BOUNDED_HEAD_BYTES = 256 * 1024
+BOUNDED_TAIL_BYTES = 64 * 1024
+STREAM_CHUNK_CHARS = 256 * 1024   # chunk size when a large file's text is counted in full
+GENERIC_ERROR_MAX_CHARS = 2000    # error-page indicators only count on short pages
+
+# ── Learned junk templates ───────────────────────────────────────────────
+# SimHash fingerprints of boilerplate pages found by find_templates.py.
+# Empty until load_junk_fingerprints() is called.
+
+_learned_junk_index = None
+
+
+def load_junk_fingerprints(path):
+    """
+    Load learned junk-template fingerprints written by find_templates.py
+    and use them in every subsequent validate_content() call.
+    Returns the SimHashIndex.
+    """
+    global _learned_junk_index
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    index = SimHashIndex(data.get("max_distance", DEFAULT_MAX_DISTANCE))
+    for entry in data.get("fingerprints", []):
+        index.add(int(entry["simhash"], 16), entry.get("template_id"))
+    _learned_junk_index = index
+    logger.info(f"Loaded {len(index)} learned junk fingerprints from {path}")
+    return index
+
+
 # ── File signature detection ─────────────────────────────────────────────
 
 FILE_SIGNATURES = {
@@ -119,6 +167,122 @@ def is_html_masquerading_as_pdf(filepath):
     return actual_type == "html"
 
 
+# ── Structural integrity checks (binary documents) ───────────────────────
+# Cheap checks that catch truncated downloads and corrupt containers
+# without parsing the whole file: only the header/trailer bytes and the
+# zip central directory are read.
+
+PDF_TAIL_BYTES = 2048               # %%EOF must sit in the last 1 KB per spec; allow slack
+OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+OLE_FREE_SECTOR = 0xFFFFFFFF
+OOXML_EXTENSIONS = {".docx", ".xlsx", ".pptx", ".docm", ".xlsm", ".pptm",
+                    ".dotx", ".xltx", ".potx"}   # must list [Content_Types].xml
+
+
+def check_pdf_structure(filepath, file_size):
+    """
+    Check a PDF trailer: %%EOF and startxref in the tail, and an xref
+    offset that points inside the file at an xref table or xref stream.
+    Returns (reason, details); reason is "ok" when the trailer is sound.
+    """
+    tail_len = min(file_size, PDF_TAIL_BYTES)
+    with open(filepath, "rb") as f:
+        head = f.read(1024)
+        f.seek(file_size - tail_len)
+        tail = f.read(tail_len)
+
+    if re.search(rb"<(!doctype|html|body)", head, re.IGNORECASE):
+        return "pdf_corrupt", {"problem": "html_after_pdf_header"}
+
+    if b"%%EOF" not in tail:
+        return "pdf_truncated", {"problem": "missing_eof_marker"}
+
+    matches = re.findall(rb"startxref\s+(\d+)", tail)
+    if not matches:
+        return "pdf_truncated", {"problem": "missing_startxref"}
+
+    xref_offset = int(matches[-1])
+    if xref_offset >= file_size:
+        return "pdf_truncated", {"problem": "xref_offset_past_eof",
+                                 "xref_offset": xref_offset}
+
+    with open(filepath, "rb") as f:
+        f.seek(xref_offset)
+        at_xref = f.read(64).lstrip()
+
+    details = {"xref_offset": xref_offset}
+    if not (at_xref.startswith(b"xref") or re.match(rb"\d+\s+\d+\s+obj", at_xref)):
+        # Many viewers repair slightly-off offsets, so only note it
+        details["xref_offset_mismatch"] = True
+    return "ok", details
+
+
+def check_ooxml_structure(filepath):
+    """
+    Check a zip container through its central directory only. OOXML
+    documents (OOXML_EXTENSIONS) must also list [Content_Types].xml; other
+    zips (.zip, .odt, .epub, ...) only need a readable central directory.
+    A missing or unreadable central directory means the download was cut
+    short. Returns (reason, details).
+    """
+    try:
+        with zipfile.ZipFile(filepath) as zf:
+            names = zf.namelist()
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, OSError, ValueError) as e:
+        return "ooxml_corrupt", {"problem": "bad_central_directory", "error": str(e)}
+
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext in OOXML_EXTENSIONS and "[Content_Types].xml" not in names:
+        return "ooxml_corrupt", {"problem": "missing_content_types",
+                                 "zip_entries": len(names)}
+    return "ok", {"zip_entries": len(names)}
+
+
+def check_ole_structure(filepath, file_size):
+    """
+    Check an OLE2 compound file header (legacy doc/xls/ppt): full magic,
+    byte-order mark, sector size, and that the directory and FAT sectors
+    it points to lie inside the file. Returns (reason, details).
+    """
+    with open(filepath, "rb") as f:
+        header = f.read(512)
+
+    if len(header) < 512 or not header.startswith(OLE_MAGIC):
+        return "ole_corrupt", {"problem": "bad_header"}
+
+    byte_order, sector_shift, mini_shift = struct.unpack_from("<HHH", header, 28)
+    if byte_order != 0xFFFE or sector_shift not in (9, 12) or mini_shift != 6:
+        return "ole_corrupt", {"problem": "bad_header_fields",
+                               "sector_shift": sector_shift}
+
+    sector_size = 1 << sector_shift
+    num_fat_sectors, first_dir_sector = struct.unpack_from("<II", header, 44)
+    difat = struct.unpack_from("<109I", header, 76)
+
+    # Sector N lives at byte offset (N + 1) * sector_size
+    referenced = [first_dir_sector] + [s for s in difat[:num_fat_sectors]
+                                       if s != OLE_FREE_SECTOR]
+    last_needed = (max(referenced) + 2) * sector_size
+    if last_needed > file_size:
+        return "ole_truncated", {"problem": "sector_past_eof",
+                                 "needed_bytes": last_needed}
+    return "ok", {"sector_size": sector_size, "fat_sectors": num_fat_sectors}
+
+
+def check_binary_structure(filepath, actual_type, file_size):
+    """Dispatch to the structural check for a binary document type."""
+    try:
+        if actual_type == "pdf":
+            return check_pdf_structure(filepath, file_size)
+        if actual_type == "zip_based":
+            return check_ooxml_structure(filepath)
+        if actual_type == "ole":
+            return check_ole_structure(filepath, file_size)
+    except (OSError, IOError, struct.error) as e:
+        return "read_error", {"error": str(e)}
+    return "ok", {}
+
+
 # ── Content quality checks ───────────────────────────────────────────────
 
 def extract_visible_text(html_content):
@@ -150,6 +314,138 @@ def extract_visible_text(html_content):
     return text
 
 
+_HIDDEN_BLOCK_TAGS = "script|style|noscript|nav|header|footer"
+
+_VISIBLE_TOKEN_RE = re.compile(
+    rf"<({_HIDDEN_BLOCK_TAGS})[^>]*>.*?(?:</\1>|\Z)"   # hidden block, or cut off by window
+    r"|<[^>]+>"                                         # any other tag
+    r"|[^<]+"                                           # text run
+    r"|<",                                              # stray '<'
+    re.DOTALL | re.IGNORECASE,
+)
+
+
+def count_visible_chars(html_content, limit=None):
+    """
+    Count visible text characters in a single lazy pass, stopping as soon
+    as the count reaches `limit`. Approximates len(extract_visible_text())
+    without building the stripped copy of the page; the count is a lower
+    bound once `limit` is hit.
+    """
+    counter = VisibleCharCounter(limit)
+    counter.feed(html_content, final=True)
+    return counter.count
+
+
+class VisibleCharCounter:
+    """
+    count_visible_chars() fed one chunk at a time, so a large file can be
+    counted without holding it in memory. A tag or word cut at a chunk
+    boundary is finished with the next chunk; for a hidden block
+    (script/style/...) left open, only its closing tag is looked for.
+    """
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.count = 0
+        self._pending_space = False
+        self._carry = ""
+        self._hidden_close = None    # e.g. "</script>" while inside an open block
+
+    @property
+    def done(self):
+        return self.limit is not None and self.count >= self.limit
+
+    def feed(self, text, final=False):
+        """Count text; final=True for the last chunk. Returns the count so far."""
+        if self.done:
+            return self.count
+        buf = self._carry + text
+        self._carry = ""
+        pos = 0
+
+        if self._hidden_close:
+            end = buf.lower().find(self._hidden_close)
+            if end < 0:
+                if not final:
+                    self._carry = buf[-len(self._hidden_close):]
+                return self.count
+            pos = end + len(self._hidden_close)
+            self._hidden_close = None
+
+        for m in _VISIBLE_TOKEN_RE.finditer(buf, pos):
+            token = m.group(0)
+            if not final:
+                hidden = m.group(1)
+                if hidden and m.end() == len(buf) and \
+                        not token.lower().endswith(f"</{hidden.lower()}>"):
+                    self._hidden_close = f"</{hidden.lower()}>"
+                    self._pending_space = True
+                    self._carry = buf[-len(self._hidden_close):]
+                    return self.count
+                if token == "<" and buf.find(">", m.end()) < 0 \
+                        and len(buf) - m.start() < STREAM_CHUNK_CHARS:
+                    self._carry = buf[m.start():]        # tag cut by the boundary
+                    return self.count
+                if not token.startswith("<") and m.end() == len(buf):
+                    cut = max(token.rfind(" "), token.rfind("\n"), token.rfind("\t"))
+                    self._carry = token[cut + 1:]        # word cut by the boundary
+                    token = token[:cut + 1]
+                    if not token:
+                        return self.count
+            self._add(token)
+            if self.done:
+                break
+        return self.count
+
+    def _add(self, token):
+        if token.startswith("<") and len(token) > 1:
+            self._pending_space = True
+            return
+        token = token.replace("&nbsp;", " ").replace("&amp;", "&")
+        token = token.replace("&lt;", "<").replace("&gt;", ">")
+        token = re.sub(r"&#?\w+;", " ", token)
+        if token[:1].isspace():
+            self._pending_space = True
+        words = token.split()
+        if not words:
+            return
+        if self._pending_space and self.count:
+            self.count += 1
+        self.count += sum(len(w) for w in words) + len(words) - 1
+        self._pending_space = token[-1:].isspace()
+
+
+def count_visible_chars_in_file(filepath, limit=None, chunk_chars=STREAM_CHUNK_CHARS):
+    """count_visible_chars() over a whole file, read chunk_chars at a time."""
+    counter = VisibleCharCounter(limit)
+    with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
+        while not counter.done:
+            chunk = f.read(chunk_chars)
+            counter.feed(chunk, final=not chunk)
+            if not chunk:
+                break
+    return counter.count
+
+
+def read_bounded(filepath, head_bytes=BOUNDED_HEAD_BYTES, tail_bytes=BOUNDED_TAIL_BYTES):
+    """
+    Read the head and tail windows of a text file.
+    Returns (head, tail, truncated). When the file fits in both windows
+    it is read whole: head holds the full content, tail is "" and
+    truncated is False.
+    """
+    file_size = os.path.getsize(filepath)
+    with open(filepath, "rb") as f:
+        if file_size <= head_bytes + tail_bytes:
+            return f.read().decode("utf-8", errors="ignore"), "", False
+        head = f.read(head_bytes)
+        f.seek(file_size - tail_bytes)
+        tail = f.read(tail_bytes)
+    return (head.decode("utf-8", errors="ignore"),
+            tail.decode("utf-8", errors="ignore"), True)
+
+
 def check_for_junk_indicators(text, indicators):
     """Check if text contains any of the given junk indicators."""
     text_lower = text.lower()
@@ -160,7 +456,7 @@ def check_for_junk_indicators(text, indicators):
     return matched
 
 
-def is_empty_shell(html_content, min_chars=500):
+def is_empty_shell(html_content, min_chars=MIN_TEXT_CHARS):
     """
     Check if an HTML page is just a navigation shell with no real content.
     Returns (is_shell: bool, char_count: int, reason: str)
@@ -203,10 +499,20 @@ class ValidationResult:
         }
 
 
-def validate_content(filepath, min_text_chars=500):
+def validate_content(filepath, min_text_chars=MIN_TEXT_CHARS, bounded=True,
+                     head_bytes=BOUNDED_HEAD_BYTES, tail_bytes=BOUNDED_TAIL_BYTES,
+                     junk_index=None):
     """
     Comprehensive content validation for a downloaded file.
 
+    With bounded=True, HTML/text files larger than head_bytes + tail_bytes
+    are checked over those two windows only, and visible text is counted
+    just until it passes the thresholds. Smaller files are read in full,
+    so their results are identical to bounded=False.
+
+    junk_index overrides the learned junk templates loaded with
+    load_junk_fingerprints(); pages within its Hamming distance are rejected.
+
     Returns ValidationResult with:
       - valid: bool — whether the file contains real document content
       - reason: str — machine-readable reason code
@@ -216,13 +522,19 @@ def validate_content(filepath, min_text_chars=500):
       ok                    — File passed validation
       file_not_found        — File doesn't exist
       file_empty            — File is 0 bytes
-      file_too_small        — File under 200 bytes
+      file_too_small        — File under MIN_FILE_BYTES
       html_masquerade       — .pdf file is actually HTML
+      pdf_truncated         — PDF missing %%EOF/startxref, or xref past end of file
+      pdf_corrupt           — PDF header followed by HTML content
+      ooxml_corrupt         — Zip central directory unreadable, or no [Content_Types].xml
+      ole_corrupt           — Legacy Office file with a bad compound-file header
+      ole_truncated         — Legacy Office file cut short before its FAT/directory
       doj_access_denied     — DOJ block page
       wayback_error         — Wayback Machine error/calendar page
       generic_error_page    — 404, 500, or similar error page
       empty_shell           — Nav/header only, no document content
       insufficient_content  — HTML with too little real text
+      learned_junk_template — Near-duplicate of a learned boilerplate page
     """
 
     # ── Basic file checks ──
@@ -233,17 +545,19 @@ def validate_content(filepath, min_text_chars=500):
     if file_size == 0:
         return ValidationResult(False, filepath, "file_empty")
 
-    if file_size < 200:
+    if file_size < MIN_FILE_BYTES:
         return ValidationResult(False, filepath, "file_too_small",
                                 {"size_bytes": file_size})
 
     # ── Detect actual file type ──
     actual_type = detect_file_type(filepath)
 
-    # If it's a real binary document (PDF, Office, etc.), it's valid
+    # Real binary documents (PDF, Office, etc.) are valid if structurally intact
     if actual_type in ("pdf", "zip_based", "ole", "rtf"):
-        return ValidationResult(True, filepath, "ok",
-                                {"actual_type": actual_type, "size_bytes": file_size})
+        reason, struct_details = check_binary_structure(filepath, actual_type, file_size)
+        return ValidationResult(reason == "ok", filepath, reason,
+                                {"actual_type": actual_type, "size_bytes": file_size,
+                                 **struct_details})
 
     # Images are unusual for guidance docs but technically valid
     if actual_type in ("png", "jpg", "gif"):
@@ -253,7 +567,7 @@ def validate_content(filepath, min_text_chars=500):
     # ── HTML/text content needs deeper inspection ──
     if actual_type not in ("html", "text"):
         # Unknown binary — accept if reasonably sized
-        if file_size > 5000:
+        if file_size > UNKNOWN_BINARY_MIN_BYTES:
             return ValidationResult(True, filepath, "ok",
                                     {"actual_type": "unknown_binary", "size_bytes": file_size})
         return ValidationResult(False, filepath, "file_too_small",
@@ -261,12 +575,20 @@ def validate_content(filepath, min_text_chars=500):
 
     # Read the HTML/text content
     try:
-        with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-            content = f.read()
+        if bounded:
+            content, tail, truncated = read_bounded(filepath, head_bytes, tail_bytes)
+        else:
+            with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
+                content = f.read()
+            tail, truncated = "", False
     except Exception as e:
         return ValidationResult(False, filepath, "read_error",
                                 {"error": str(e)})
 
+    if truncated:
+        return _validate_large_text(filepath, content, tail, actual_type,
+                                    file_size, min_text_chars, junk_index)
+
     # ── Check for HTML masquerading as PDF ──
     ext = os.path.splitext(filepath)[1].lower()
     if ext == ".pdf" and actual_type == "html":
@@ -290,7 +612,7 @@ def validate_content(filepath, min_text_chars=500):
     if err_matches:
         # Only flag if the page is short (long pages with a 404 mention might be legit)
         visible_text = extract_visible_text(content)
-        if len(visible_text) < 2000:
+        if len(visible_text) < GENERIC_ERROR_MAX_CHARS:
             return ValidationResult(False, filepath, "generic_error_page",
                                     {"matched_indicators": err_matches,
                                      "visible_chars": len(visible_text)})
@@ -301,14 +623,89 @@ def validate_content(filepath, min_text_chars=500):
         return ValidationResult(False, filepath, shell_reason,
                                 {"visible_chars": char_count})
 
+    visible_text = extract_visible_text(content)
+
+    # ── Check against learned junk templates ──
+    if junk_index is None:
+        junk_index = _learned_junk_index
+    if junk_index:
+        hit = junk_index.nearest(simhash(visible_text))
+        if hit:
+            distance, _, template_id = hit
+            return ValidationResult(False, filepath, "learned_junk_template",
+                                    {"template_id": template_id,
+                                     "distance": distance,
+                                     "visible_chars": len(visible_text)})
+
     # ── Passed all checks ──
     return ValidationResult(True, filepath, "ok",
                             {"actual_type": actual_type,
                              "size_bytes": file_size,
-                             "visible_chars": extract_visible_text(content).__len__()})
+                             "visible_chars": len(visible_text)})
+
+
+def _validate_large_text(filepath, head, tail, actual_type, file_size, min_text_chars,
+                         junk_index=None):
+    """
+    validate_content() checks for an HTML/text file too large to read whole.
+    Junk indicators are matched over the head and tail windows; visible
+    text is counted over the head and stops once it passes the thresholds.
+    Only if the head is too thin is the whole file counted, streamed in
+    chunks. Learned junk templates are matched on the head's visible
+    text, the same text find_templates.py fingerprints.
+    """
+    window = head + "\n" + tail
+    details = {"bounded_read": True, "size_bytes": file_size}
+
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext == ".pdf" and actual_type == "html":
+        return ValidationResult(False, filepath, "html_masquerade",
+                                {"declared_type": "pdf", "actual_type": "html", **details})
+
+    doj_matches = check_for_junk_indicators(window, DOJ_INDICATORS)
+    if doj_matches:
+        return ValidationResult(False, filepath, "doj_access_denied",
+                                {"matched_indicators": doj_matches, **details})
+
+    wb_matches = check_for_junk_indicators(window, WAYBACK_ERROR_INDICATORS)
+    if wb_matches:
+        return ValidationResult(False, filepath, "wayback_error",
+                                {"matched_indicators": wb_matches, **details})
+
+    limit = max(min_text_chars, GENERIC_ERROR_MAX_CHARS)
+    visible_chars = count_visible_chars(head, limit)
+    if visible_chars < limit:
+        # Head window is mostly markup/scripts — count through the whole file
+        visible_chars = count_visible_chars_in_file(filepath, limit)
+
+    err_matches = check_for_junk_indicators(window, GENERIC_ERROR_INDICATORS)
+    if err_matches and visible_chars < GENERIC_ERROR_MAX_CHARS:
+        return ValidationResult(False, filepath, "generic_error_page",
+                                {"matched_indicators": err_matches,
+                                 "visible_chars": visible_chars, **details})
+
+    if visible_chars < min_text_chars:
+        shell = any(re.search(p, window, re.IGNORECASE) for p in SHELL_ONLY_PATTERNS)
+        return ValidationResult(False, filepath,
+                                "shell_page_no_content" if shell else "insufficient_content",
+                                {"visible_chars": visible_chars, **details})
+
+    if junk_index is None:
+        junk_index = _learned_junk_index
+    if junk_index:
+        hit = junk_index.nearest(simhash(extract_visible_text(head)))
+        if hit:
+            distance, _, template_id = hit
+            return ValidationResult(False, filepath, "learned_junk_template",
+                                    {"template_id": template_id, "distance": distance,
+                                     "visible_chars": visible_chars, **details})
+
+    return ValidationResult(True, filepath, "ok",
+                            {"actual_type": actual_type,
+                             "visible_chars": visible_chars, **details})
 
 
-def validate_directory(dir_path, min_text_chars=500):
+def validate_directory(dir_path, min_text_chars=MIN_TEXT_CHARS):
     """
     Validate all files in a harvest row directory.
     Returns list of ValidationResults.
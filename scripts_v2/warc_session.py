@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+ACF Guidance v2 — WARC Recording and Offline Replay
+=====================================================
+Working on a recovery heuristic (harvest_v2.py, repair.py) used to mean
+hitting acf.gov and the Wayback Machine again on every run: slow, and
+often blocked. With --warc-record DIR, every request/response
+pair a stage's requests.Session sends is written to gzipped WARC 1.1
+files in DIR (a request and a response record per exchange, one gzip
+member per record, so standard WARC tools can read them). With
+--warc-replay DIR, the session serves those responses from the WARCs
+instead and never touches the network:
+
+  - exchanges are looked up by method and URL; a URL fetched several
+    times is replayed in the order it was recorded, sticking on the last
+    response (so retries and redirects replay exactly)
+  - a HEAD with no HEAD on record is answered from a GET of the URL,
+    without the body
+  - anything not on record raises requests.ConnectionError, which the
+    stages already treat as an unreachable URL
+  - pause() (the stages' politeness sleeps) returns at once, so a
+    replayed stage runs in seconds
+
+The WARCs double as a provenance archive of exactly what was fetched.
+Each WARC gets a .idx file (one JSON line per record: method, URL,
+status, offset, length) written alongside, so replay doesn't have to
+decompress every archive to find a response; a WARC without one is
+indexed on first use.
+
+Bodies are stored decoded: requests has already undone any gzip
+Content-Encoding by the time a response is recorded, so that header is
+dropped and Content-Length set to the stored body.
+
+Browser stages (Playwright) are not covered; only requests sessions.
+The dev/scripts stages use this same module through dev/scripts/v2_shared.py.
+
+    warc_session.add_arguments(parser)
+    args = parser.parse_args()
+    warc_session.setup(args.warc_record, args.warc_replay, stage="repair")
+    session = warc_session.attach(requests.Session())
+    ...
+    warc_session.pause(1.5)     # instead of time.sleep between requests
+"""
+
+import base64
+import glob
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+MAX_WARC_BYTES = 1024 ** 3          # start a new WARC file after this many bytes
+DROP_HEADERS = {"content-encoding", "transfer-encoding", "content-length"}
+
+_writer = None
+_archive = None
+
+
+# ── Writing ──────────────────────────────────────────────────────────────
+
+def _sha1(data):
+    return "sha1:" + base64.b32encode(hashlib.sha1(data).digest()).decode()
+
+
+def _warc_record(warc_type, uri, block, content_type, extra=None):
+    record_id = f"<urn:uuid:{uuid.uuid4()}>"
+    headers = [
+        ("WARC-Type", warc_type),
+        ("WARC-Record-ID", record_id),
+        ("WARC-Date", datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")),
+    ]
+    if uri:
+        headers.append(("WARC-Target-URI", uri))
+    headers += list((extra or {}).items())
+    headers += [("WARC-Block-Digest", _sha1(block)), ("Content-Type", content_type),
+                ("Content-Length", str(len(block)))]
+    head = "WARC/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers) + "\r\n"
+    return record_id, head.encode("utf-8") + block + b"\r\n\r\n"
+
+
+def _request_block(request):
+    parts = urlsplit(request.url)
+    target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    lines = [f"{request.method} {target} HTTP/1.1", f"Host: {parts.netloc}"]
+    lines += [f"{k}: {v}" for k, v in request.headers.items() if k.lower() != "host"]
+    body = request.body or b""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8") + body
+
+
+def _response_block(response, body):
+    lines = [f"HTTP/1.1 {response.status_code} {response.reason or ''}".rstrip()]
+    keep_length = response.request.method == "HEAD"
+    for k, v in response.headers.items():
+        if k.lower() in DROP_HEADERS and not (keep_length and k.lower() == "content-length"):
+            continue
+        lines.append(f"{k}: {v}")
+    if not keep_length:
+        lines.append(f"Content-Length: {len(body)}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8") + body
+
+
+class WarcWriter:
+    """Appends request/response record pairs to rotating .warc.gz files."""
+
+    def __init__(self, directory, stage):
+        self.directory = directory
+        self.stage = stage
+        self._lock = threading.Lock()
+        self._file = None
+        self._index = None
+        self._serial = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self):
+        stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        path = os.path.join(self.directory, f"{self.stage}-{stamp}-{self._serial:05d}.warc.gz")
+        self._serial += 1
+        self._file = open(path, "ab")
+        self._index = open(path + ".idx", "a", encoding="utf-8")
+        info = (f"software: acf_v2 warc_session\r\nformat: WARC File Format 1.1\r\n"
+                f"stage: {self.stage}\r\n").encode("utf-8")
+        self._append(_warc_record("warcinfo", None, info, "application/warc-fields")[1])
+
+    def _append(self, record):
+        offset = self._file.tell()
+        data = zlib.compressobj(6, zlib.DEFLATED, 31)
+        member = data.compress(record) + data.flush()
+        self._file.write(member)
+        return offset, len(member)
+
+    def write(self, response, body):
+        """Record one exchange; body is the (decoded) response body."""
+        request = response.request
+        with self._lock:
+            if self._file is None or self._file.tell() > MAX_WARC_BYTES:
+                self.close()
+                self._open()
+            resp_id, resp_record = _warc_record(
+                "response", request.url, _response_block(response, body),
+                "application/http;msgtype=response",
+                {"WARC-Payload-Digest": _sha1(body)})
+            offset, length = self._append(resp_record)
+            _, req_record = _warc_record(
+                "request", request.url, _request_block(request),
+                "application/http;msgtype=request", {"WARC-Concurrent-To": resp_id})
+            self._append(req_record)
+            self._file.flush()
+            self._index.write(json.dumps({
+                "method": request.method, "url": request.url,
+                "status": response.status_code, "offset": offset, "length": length,
+            }) + "\n")
+            self._index.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._index.close()
+            self._file = self._index = None
+
+
+class RecordingAdapter(BaseAdapter):
+    """Sends through the session's own adapter and writes each exchange to a WARC."""
+
+    def __init__(self, inner, writer):
+        super().__init__()
+        self.inner = inner
+        self.writer = writer
+
+    def send(self, request, **kwargs):
+        response = self.inner.send(request, **kwargs)
+        body = response.content or b""      # reads streamed bodies too; iter_content still works
+        self.writer.write(response, body)
+        return response
+
+    def close(self):
+        self.inner.close()
+
+
+# ── Reading ──────────────────────────────────────────────────────────────
+
+def _read_member(path, offset, length):
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return zlib.decompress(f.read(length), 31)
+
+
+def _split_record(record):
+    """WARC record bytes → (warc headers dict, block bytes)."""
+    head, _, rest = record.partition(b"\r\n\r\n")
+    headers = {}
+    for line in head.decode("utf-8", "replace").split("\r\n")[1:]:
+        k, _, v = line.partition(":")
+        headers[k.strip()] = v.strip()
+    return headers, rest[:int(headers.get("Content-Length", len(rest)))]
+
+
+def _split_http(block):
+    """HTTP response block → (status, reason, headers list, body)."""
+    head, _, body = block.partition(b"\r\n\r\n")
+    lines = head.decode("iso-8859-1").split("\r\n")
+    _, status, *reason = lines[0].split(" ", 2)
+    headers = [tuple(s.strip() for s in line.split(":", 1)) for line in lines[1:] if ":" in line]
+    return int(status), (reason[0] if reason else ""), headers, body
+
+
+def index_warc(path):
+    """Build (and save) the .idx lines of a WARC written without one."""
+    with open(path, "rb") as f:
+        data = f.read()
+    entries, methods, pos = [], {}, 0
+    while pos < len(data):
+        d = zlib.decompressobj(31)
+        record = d.decompress(data[pos:])
+        length = len(data) - pos - len(d.unused_data)
+        headers, block = _split_record(record)
+        if headers.get("WARC-Type") == "response":
+            status = int(block.split(b" ", 2)[1]) if block.startswith(b"HTTP/") else 0
+            entries.append({"id": headers.get("WARC-Record-ID"),
+                            "url": headers.get("WARC-Target-URI"), "status": status,
+                            "offset": pos, "length": length})
+        elif headers.get("WARC-Type") == "request":
+            methods[headers.get("WARC-Concurrent-To")] = block.split(b" ", 1)[0].decode()
+        pos += length
+    with open(path + ".idx", "w", encoding="utf-8") as f:
+        for e in entries:
+            f.write(json.dumps({"method": methods.get(e.pop("id"), "GET"), **e}) + "\n")
+
+
+class WarcArchive:
+    """Every recorded exchange in a directory of WARCs, by (method, URL)."""
+
+    def __init__(self, directory):
+        self.exchanges = {}
+        self._cursor = {}
+        self._lock = threading.Lock()
+        for path in sorted(glob.glob(os.path.join(directory, "*.warc.gz"))):
+            if not os.path.exists(path + ".idx"):
+                index_warc(path)
+            with open(path + ".idx", "r", encoding="utf-8") as f:
+                for line in f:
+                    e = json.loads(line)
+                    self.exchanges.setdefault((e["method"], e["url"]), []).append(
+                        (path, e["offset"], e["length"]))
+
+    def next_response(self, method, url):
+        """(status, reason, headers, body) of the next recorded exchange, or None."""
+        key = (method, url)
+        with self._lock:
+            records = self.exchanges.get(key)
+            if not records:
+                return None
+            n = self._cursor.get(key, 0)
+            self._cursor[key] = n + 1
+            path, offset, length = records[min(n, len(records) - 1)]
+        _, block = _split_record(_read_member(path, offset, length))
+        return _split_http(block)
+
+
+class ReplayAdapter(BaseAdapter):
+    """Answers requests from a WarcArchive; never opens a connection."""
+
+    def __init__(self, archive):
+        super().__init__()
+        self.archive = archive
+
+    def send(self, request, **kwargs):
+        found = self.archive.next_response(request.method, request.url)
+        if found is None and request.method == "HEAD":
+            found = self.archive.next_response("GET", request.url)
+            if found is not None:
+                found = found[:3] + (b"",)
+        if found is None:
+            raise requests.exceptions.ConnectionError(
+                f"not in WARC archive: {request.method} {request.url}", request=request)
+
+        status, reason, headers, body = found
+        response = requests.Response()
+        response.status_code = status
+        response.reason = reason
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = body
+        response.raw = io.BytesIO(body)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        pass
+
+
+# ── Stage wiring ─────────────────────────────────────────────────────────
+
+def add_arguments(parser):
+    """--warc-record / --warc-replay for a stage's argument parser."""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--warc-record", metavar="DIR", default=None,
+                       help="Write every HTTP request/response to WARC files in DIR")
+    group.add_argument("--warc-replay", metavar="DIR", default=None,
+                       help="Serve HTTP from the WARC files in DIR; no network access")
+
+
+def setup(record_dir=None, replay_dir=None, stage="acf"):
+    """Choose the mode for every session attach() is called on afterwards."""
+    global _writer, _archive
+    _writer = WarcWriter(record_dir, stage) if record_dir else None
+    _archive = WarcArchive(replay_dir) if replay_dir else None
+    if _archive is not None:
+        logging.getLogger("acf_v2").info(
+            f"WARC replay: {sum(len(v) for v in _archive.exchanges.values())} "
+            f"recorded exchanges from {replay_dir}")
+
+
+def attach(session):
+    """Mount the recording or replay adapter on session (no-op without setup())."""
+    for prefix in ("https://", "http://"):
+        if _archive is not None:
+            session.mount(prefix, ReplayAdapter(_archive))
+        elif _writer is not None:
+            inner = session.adapters.get(prefix) or HTTPAdapter()
+            session.mount(prefix, RecordingAdapter(inner, _writer))
+    return session
+
+
+def replaying():
+    return _archive is not None
+
+
+def pause(seconds):
+    """Politeness delay between live requests; skipped when replaying."""
+    if _archive is None:
+        time.sleep(seconds)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="List or index recorded WARC exchanges")
+    parser.add_argument("directory")
+    parser.add_argument("--reindex", action="store_true",
+                        help="Rebuild the .idx files from the WARCs")
+    args = parser.parse_args()
+
+    if args.reindex:
+        for path in sorted(glob.glob(os.path.join(args.directory, "*.warc.gz"))):
+            index_warc(path)
+    archive = WarcArchive(args.directory)
+    for (method, url), records in sorted(archive.exchanges.items(), key=lambda kv: kv[0][1]):
+        print(f"{method:4s} x{len(records)}  {url}")
+    print(f"{len(archive.exchanges)} URLs, "
+          f"{sum(len(v) for v in archive.exchanges.values())} exchanges")
+    sys.exit(0)
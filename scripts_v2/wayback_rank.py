@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+ACF Guidance v2 — Wayback Snapshot Ranking
+============================================
+Following https://web.archive.org/web/2/{url} lands on whatever capture
+the Wayback Machine thinks is closest to "2": often a redirect notice,
+a calendar page or an error page that was archived by mistake, always
+wrapped in the Wayback toolbar — and then fails WAYBACK_ERROR_INDICATORS.
+Instead, list the URL's captures from the CDX API (one per month) and
+try them best-first, scored from the CDX fields alone:
+
+  statuscode   200 +10; 3xx -6 (redirect notice); anything else dropped
+  mimetype     +4 if it matches what the URL should be (a .pdf URL →
+               application/pdf, a page → text/html); -4 for warc/revisit
+               or unk
+  length       -6 under STUB_BYTES (error page or stub); up to +3 on a
+               log scale for larger captures
+  digest       +1 per other month with the same content, up to +3 —
+               content that stayed put is the real page, not a glitch
+  date         up to -6 by distance in years from the inventory date;
+               captures from before it count double (the document may
+               not have existed yet); without a date, newer breaks ties
+
+After sorting, captures with a digest already in the list are moved
+behind the distinct ones, so a second try is a different document
+rather than the same bytes again. Snapshots are fetched in raw mode
+(web/{timestamp}id_/{url}): the archived bytes, no toolbar, no
+rewritten links.
+
+Usage:
+  python wayback_rank.py URL [--date 2015-03-02]   # Show the ranking
+"""
+
+import os
+import re
+import math
+import logging
+from datetime import datetime
+from urllib.parse import urlparse
+
+CDX_API = "https://web.archive.org/cdx/search/cdx"
+CDX_FIELDS = ["timestamp", "original", "mimetype", "statuscode", "length", "digest"]
+CDX_LIMIT = 500
+MAX_TRIES = 3               # snapshots downloaded per URL at most
+STUB_BYTES = 1500
+
+EXPECTED_MIME = {
+    ".pdf": "application/pdf",
+    ".doc": "application/msword",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".xls": "application/vnd.ms-excel",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+DATE_FORMATS = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%B %d, %Y",
+                "%b %d, %Y", "%B %Y", "%Y%m%d"]
+
+
+def raw_url(timestamp, original):
+    """Wayback URL that returns the archived bytes as captured."""
+    return f"https://web.archive.org/web/{timestamp}id_/{original}"
+
+
+def parse_date(value):
+    """Inventory date (various spellings) → datetime, or None."""
+    value = str(value or "").strip()
+    if not value:
+        return None
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    m = re.search(r"\b(19|20)\d{2}\b", value)
+    return datetime(int(m.group(0)), 7, 1) if m else None
+
+
+def expected_mime(url):
+    """Mimetype a good capture of url should have."""
+    ext = os.path.splitext(urlparse(url).path)[1].lower()
+    return EXPECTED_MIME.get(ext, "text/html")
+
+
+def cdx_captures(url, session, limit=CDX_LIMIT, timeout=30):
+    """One capture per month of url from the CDX API, as dicts; [] on failure."""
+    params = {"url": url, "output": "json", "fl": ",".join(CDX_FIELDS),
+              "collapse": "timestamp:6", "filter": "!statuscode:[45]..", "limit": limit}
+    try:
+        resp = session.get(CDX_API, params=params, timeout=timeout)
+        if resp.status_code != 200 or not resp.text.strip():
+            return []
+        data = resp.json()
+    except Exception as e:
+        logging.getLogger("acf_v2").debug(f"  [WAYBACK] CDX query failed for {url}: {e}")
+        return []
+    if len(data) < 2:
+        return []
+    return [dict(zip(data[0], row)) for row in data[1:]]
+
+
+def score_capture(capture, target_date=None, expected=None, digest_counts=None):
+    """Expected-validity score of one capture (see module docstring); None = unusable."""
+    status = str(capture.get("statuscode", ""))
+    if status == "200":
+        score = 10.0
+    elif status.startswith("3"):
+        score = -6.0
+    else:
+        return None
+
+    mime = (capture.get("mimetype") or "").lower()
+    if expected and mime == expected:
+        score += 4
+    elif mime in ("warc/revisit", "unk", ""):
+        score -= 4
+
+    length = int(capture["length"]) if str(capture.get("length", "")).isdigit() else 0
+    if length and length < STUB_BYTES:
+        score -= 6
+    elif length:
+        score += min(3.0, math.log10(length / STUB_BYTES) * 1.5)
+
+    if digest_counts:
+        score += min(3, digest_counts.get(capture.get("digest"), 1) - 1)
+
+    if target_date:
+        try:
+            taken = datetime.strptime(capture["timestamp"][:8], "%Y%m%d")
+        except (KeyError, ValueError):
+            taken = None
+        if taken:
+            years = (taken - target_date).days / 365.25
+            score -= min(6.0, abs(years) * (2 if years < 0 else 1))
+    return round(score, 3)
+
+
+def rank_snapshots(captures, target_date=None, url=None):
+    """
+    Captures sorted best-first, each with a "score" added; unusable ones
+    (4xx/5xx) dropped. target_date: inventory date (string or datetime).
+    url: the URL asked for, to know what mimetype to expect.
+    """
+    if isinstance(target_date, str) or target_date is None:
+        target_date = parse_date(target_date)
+    expected = expected_mime(url) if url else None
+    digest_counts = {}
+    for c in captures:
+        digest_counts[c.get("digest")] = digest_counts.get(c.get("digest"), 0) + 1
+
+    scored = []
+    for c in captures:
+        s = score_capture(c, target_date, expected, digest_counts)
+        if s is not None:
+            scored.append({**c, "score": s})
+    scored.sort(key=lambda c: (-c["score"], -int(c.get("timestamp") or 0)))
+
+    # Distinct content first; repeats of an already-listed digest after
+    seen, first, repeats = set(), [], []
+    for c in scored:
+        (repeats if c.get("digest") in seen else first).append(c)
+        seen.add(c.get("digest"))
+    return first + repeats
+
+
+def ranked_wayback_urls(url, session, target_date=None, max_tries=MAX_TRIES):
+    """
+    [(raw wayback URL, capture)] to try for url, best first. If the CDX
+    API has nothing (or fails), the latest capture in raw mode.
+    """
+    ranked = rank_snapshots(cdx_captures(url, session), target_date, url)[:max_tries]
+    if not ranked:
+        return [(raw_url("2", url), None)]
+    return [(raw_url(c["timestamp"], c["original"]), c) for c in ranked]
+
+
+def capture_info(capture, attempt):
+    """What metadata records about the snapshot a file came from."""
+    info = {"attempt": attempt}
+    if capture:
+        info.update(timestamp=capture["timestamp"], score=capture["score"],
+                    mimetype=capture.get("mimetype"), digest=capture.get("digest"))
+    return info
+
+
+def main():
+    import argparse
+    import requests
+
+    parser = argparse.ArgumentParser(description="Rank Wayback captures of a URL")
+    parser.add_argument("url")
+    parser.add_argument("--date", default=None, help="Inventory date of the document")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    captures = cdx_captures(args.url, requests.Session())
+    ranked = rank_snapshots(captures, args.date, args.url)
+    print(f"{len(captures)} captures, {len(ranked)} usable (expecting {expected_mime(args.url)})")
+    for c in ranked[:args.top]:
+        print(f"  {c['score']:6.2f}  {c['timestamp']}  {c['statuscode']:>3s}  "
+              f"{c['mimetype']:28s} {c['length']:>9s}  {c['digest'][:10]}")
+
+
+if __name__ == "__main__":
+    main()